@@ -0,0 +1,48 @@
+"""
+Worker process for queued AI assistant jobs (the /ai-assistant/*/async endpoints).
+
+Web workers only insert rows into the ai_jobs table; this process claims them
+with SKIP LOCKED, calls the AI upstream and stores the results, so jobs survive
+restarts and can be polled from any web worker. Several copies can run at once.
+
+Usage:
+    python ai_job_worker.py              # AI_ASSISTANT_ASYNC_MAX_WORKERS threads (default 1)
+    python ai_job_worker.py --threads 2
+"""
+import os
+import signal
+import sys
+import time
+
+from api.utils.ai_jobs import start_ai_job_workers, stop_ai_job_workers
+from api.utils.migrations import ensure_migrations
+# Registers the generate-section / improve-area job handlers.
+import api.routes.ai_assistant_proxy  # noqa: F401
+
+
+def _thread_count(argv):
+    if '--threads' in argv:
+        return int(argv[argv.index('--threads') + 1])
+    return int(os.getenv('AI_ASSISTANT_ASYNC_MAX_WORKERS', '1'))
+
+
+if __name__ == '__main__':
+    threads = max(1, _thread_count(sys.argv[1:]))
+    print(f"🔄 Starting AI job worker ({threads} threads)...")
+    try:
+        ensure_migrations()
+    except Exception as e:
+        print(f"❌ Error applying migrations: {e}")
+        sys.exit(1)
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    start_ai_job_workers(threads)
+    try:
+        while not stopping:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    print("🛑 Stopping AI job worker...")
+    stop_ai_job_workers()
+    print("✅ AI job worker stopped")
@@ -239,6 +239,17 @@ class AIService:
         # OpenRouter only for content generation (never HuggingFace)
         return self._make_openrouter_request(messages, temperature=temperature, max_tokens=max_tokens)
 
+    def risk_analysis_model_id(self) -> str:
+        """Identifies the engine analyze_proposal_risks would call (part of the Risk Gate cache key)."""
+        if self.provider == "huggingface":
+            return f"huggingface:{HF_RISK_GATE_URL or ''}"
+        risk_gate_api_url = (
+            os.getenv("RISK_GATE_API_URL")
+            or os.getenv("Risk_Gate_engine_API")
+            or ""
+        ).rstrip("/")
+        return f"risk-gate-api:{risk_gate_api_url}"
+
     def analyze_proposal_risks(self, proposal_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Analyze proposal for compound risks.
@@ -8,8 +8,6 @@ AI assistant API key server-side.
 import contextlib
 import os
 import time
-import threading
-from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Dict, Optional, Tuple
 
@@ -17,6 +15,14 @@ import requests
 from dotenv import load_dotenv
 from flask import Blueprint, jsonify, request
 
+from api.utils.ai_jobs import enqueue_ai_job, register_job_handler, wait_for_ai_job
+from api.utils.ai_upstream import (
+    CircuitOpen,
+    UpstreamBusy,
+    get_upstream_breaker,
+    get_upstream_gate,
+    get_upstream_session,
+)
 from api.utils.decorators import token_required
 from api.utils.database import get_db_connection
 
@@ -28,11 +34,6 @@ load_dotenv()
 
 
 bp = Blueprint("ai_assistant_proxy", __name__, url_prefix="")
-_async_jobs: Dict[str, Dict[str, Any]] = {}
-_async_jobs_lock = threading.Lock()
-_async_executor: Optional[ThreadPoolExecutor] = None
-# Serialize authenticated upstream POSTs so one worker never runs two HF calls at once (OOM on small RAM).
-_upstream_post_lock = threading.Lock()
 
 
 def _getenv(name: str, default: str = "") -> str:
@@ -74,28 +75,6 @@ def _is_async_enabled() -> bool:
     return _getenv("AI_ASSISTANT_ASYNC_ENABLED", "false").lower() in ("1", "true", "yes", "on")
 
 
-def _get_async_executor() -> ThreadPoolExecutor:
-    global _async_executor
-    if _async_executor is None:
-        _async_executor = ThreadPoolExecutor(
-            max_workers=_getenv_int("AI_ASSISTANT_ASYNC_MAX_WORKERS", 1, minimum=1, maximum=8)
-        )
-    return _async_executor
-
-
-def _set_async_job(job_id: str, patch: Dict[str, Any]) -> None:
-    with _async_jobs_lock:
-        existing = _async_jobs.get(job_id, {})
-        existing.update(patch)
-        _async_jobs[job_id] = existing
-
-
-def _get_async_job(job_id: str) -> Optional[Dict[str, Any]]:
-    with _async_jobs_lock:
-        data = _async_jobs.get(job_id)
-        return dict(data) if data is not None else None
-
-
 def _parse_max_tokens(value: Any, default: int = 192) -> int:
     try:
         parsed = int(value)
@@ -296,21 +275,39 @@ def _call_upstream(
         )
 
     start = time.monotonic()
-    lock_ctx = _upstream_post_lock if include_auth and method == "POST" else contextlib.nullcontext()
+    # Authenticated POSTs (model inference) share a bounded number of upstream slots and
+    # the circuit breaker; /health is never queued so it can always probe the Space.
+    gated = include_auth and method == "POST"
+    breaker = get_upstream_breaker()
+    gate_ctx = get_upstream_gate().slot(endpoint) if gated else contextlib.nullcontext(0.0)
     try:
-        with lock_ctx:
-            resp = requests.request(
-                method,
-                url,
-                headers=headers,
-                json=payload,
-                # Separate connect/read timeouts: fail fast on bad network, allow slow model inference.
-                timeout=(connect_timeout, read_timeout),
-            )
+        with gate_ctx as waited_s:
+            if gated:
+                breaker.before_call()
+            upstream_ok = False
+            try:
+                resp = (get_upstream_session() or requests).request(
+                    method,
+                    url,
+                    headers=headers,
+                    json=payload,
+                    # Separate connect/read timeouts: fail fast on bad network, allow slow model inference.
+                    timeout=(connect_timeout, read_timeout),
+                )
+                upstream_ok = resp.status_code < 500
+            finally:
+                if gated:
+                    if upstream_ok:
+                        breaker.record_success()
+                    else:
+                        breaker.record_failure()
             elapsed_ms = int((time.monotonic() - start) * 1000)
-            print(f"[AI Assistant Proxy] response status={resp.status_code} elapsed_ms={elapsed_ms} endpoint={endpoint}")
+            print(
+                f"[AI Assistant Proxy] response status={resp.status_code} elapsed_ms={elapsed_ms} "
+                f"queue_wait_ms={int(waited_s * 1000)} endpoint={endpoint}"
+            )
 
-            # Parse body best-effort (keep inside lock so a second HF call does not start while buffering body).
+            # Parse body best-effort.
             body_json: Any = None
             body_text = (resp.text or "").strip()
             if body_text:
@@ -337,6 +334,31 @@ def _call_upstream(
                 },
                 resp.status_code,
             )
+    except UpstreamBusy as e:
+        elapsed_ms = int((time.monotonic() - start) * 1000)
+        print(f"[AI Assistant Proxy] busy elapsed_ms={elapsed_ms} endpoint={endpoint} reason={e.reason}")
+        return (
+            {
+                "success": False,
+                "error": "AI Assistant is busy, please retry shortly.",
+                "code": "UPSTREAM_BUSY",
+                "upstream_status": None,
+                "details": e.reason,
+            },
+            503,
+        )
+    except CircuitOpen as e:
+        print(f"[AI Assistant Proxy] circuit_open endpoint={endpoint} retry_after_s={e.retry_after:.0f}")
+        return (
+            {
+                "success": False,
+                "error": "Upstream AI Assistant is unavailable, please retry shortly.",
+                "code": "UPSTREAM_CIRCUIT_OPEN",
+                "upstream_status": None,
+                "retry_after": int(e.retry_after) + 1,
+            },
+            503,
+        )
     except requests.exceptions.ConnectTimeout as e:
         elapsed_ms = int((time.monotonic() - start) * 1000)
         print(
@@ -384,6 +406,52 @@ def _call_upstream(
         )
 
 
+def _run_generate_section_job(payload: Dict[str, Any], username: Optional[str]) -> Tuple[Any, int]:
+    started = time.monotonic()
+    body, status = _call_upstream("/generate-section", payload, include_auth=True)
+    if 200 <= status <= 299:
+        _track_ai_usage(
+            username=username,
+            endpoint="generate",
+            prompt_text=payload.get("proposal_text") or "",
+            section_type=payload.get("section_name") or "generate",
+            response_tokens=_estimate_response_tokens(body),
+            response_time_ms=int((time.monotonic() - started) * 1000),
+        )
+    return body, status
+
+
+def _run_improve_area_job(payload: Dict[str, Any], username: Optional[str]) -> Tuple[Any, int]:
+    started = time.monotonic()
+    body, status = _call_upstream("/improve-area", payload, include_auth=True)
+    if 200 <= status <= 299:
+        _track_ai_usage(
+            username=username,
+            endpoint="improve",
+            prompt_text=payload.get("proposal_text") or "",
+            section_type=payload.get("area_name") or "improve",
+            response_tokens=_estimate_response_tokens(body),
+            response_time_ms=int((time.monotonic() - started) * 1000),
+        )
+    return body, status
+
+
+# Jobs run in the AI job worker process (ai_job_worker.py), which imports this module.
+register_job_handler("generate-section", _run_generate_section_job)
+register_job_handler("improve-area", _run_improve_area_job)
+
+
+def _enqueue_job_response(action: str, payload: Dict[str, Any], username: Optional[str], req_id: str):
+    try:
+        job = enqueue_ai_job(action, payload, username=username, req_id=req_id)
+    except Exception as e:
+        print(f"[AI Assistant Proxy][{req_id}] enqueue failed action={action}: {e}")
+        return jsonify({"success": False, "error": "Could not queue the AI request, please retry."}), 503
+    status = "done" if job["status"] == "done" else ("error" if job["status"] == "error" else "pending")
+    print(f"[AI Assistant Proxy][{req_id}] action={action} job_id={job['id']} deduplicated={job['deduplicated']}")
+    return jsonify({"success": True, "job_id": job["id"], "status": status, "deduplicated": job["deduplicated"]}), 202
+
+
 @bp.get("/ai-assistant/health")
 def ai_assistant_health():
     # Per requirement: calls upstream health; no key required.
@@ -478,44 +546,15 @@ def proxy_generate_section_async(username=None):
         return jsonify({"success": False, "error": "section_name and proposal_text are required."}), 400
 
     req_id = (request.headers.get("X-AI-Request-ID") or "").strip() or f"ai-{int(time.time()*1000)}"
-    job_id = f"job-{int(time.time()*1000)}-{os.getpid()}-{abs(hash(req_id)) % 100000}"
-    _set_async_job(
-        job_id,
-        {
-            "status": "pending",
-            "created_at": int(time.time()),
-            "req_id": req_id,
-            "action": "generate-section",
-            "section_name": section_name,
-        },
-    )
-
-    def _run() -> None:
-        started = time.monotonic()
-        payload = {
-            "section_name": section_name,
-            "proposal_text": _compact_text(
-                proposal_text,
-                _getenv_int("AI_ASSISTANT_MAX_CHARS", 12000, minimum=1000, maximum=30000),
-            ),
-            "max_tokens": max_tokens,
-        }
-        body, status = _call_upstream("/generate-section", payload, include_auth=True)
-        if 200 <= status <= 299:
-            _track_ai_usage(
-                username=username,
-                endpoint="generate",
-                prompt_text=proposal_text,
-                section_type=section_name or "generate",
-                response_tokens=_estimate_response_tokens(body),
-                response_time_ms=int((time.monotonic() - started) * 1000),
-            )
-            _set_async_job(job_id, {"status": "done", "status_code": status, "result": body})
-        else:
-            _set_async_job(job_id, {"status": "error", "status_code": status, "error": body})
-
-    _get_async_executor().submit(_run)
-    return jsonify({"success": True, "job_id": job_id, "status": "pending"}), 202
+    payload = {
+        "section_name": section_name,
+        "proposal_text": _compact_text(
+            proposal_text,
+            _getenv_int("AI_ASSISTANT_MAX_CHARS", 12000, minimum=1000, maximum=30000),
+        ),
+        "max_tokens": max_tokens,
+    }
+    return _enqueue_job_response("generate-section", payload, username, req_id)
 
 
 @bp.get("/ai-assistant/jobs/<job_id>")
@@ -524,7 +563,12 @@ def proxy_ai_job_status(job_id: str, username=None):
     if not _is_async_enabled():
         return jsonify({"success": False, "error": "Async AI assistant mode is disabled."}), 404
 
-    job = _get_async_job(job_id)
+    # ?wait=N long-polls: the request returns as soon as the job finishes, or after N seconds.
+    try:
+        wait_s = float(request.args.get("wait") or 0)
+    except ValueError:
+        wait_s = 0.0
+    job = wait_for_ai_job(job_id, username, wait_s)
     if job is None:
         return jsonify({"success": False, "error": "Job not found."}), 404
 
@@ -532,7 +576,7 @@ def proxy_ai_job_status(job_id: str, username=None):
     if status == "done":
         return jsonify({"success": True, "job_id": job_id, "status": "done", "result": job.get("result")}), 200
     if status == "error":
-        err = job.get("error")
+        err = job.get("result")
         status_code = int(job.get("status_code") or 500)
         return jsonify({"success": False, "job_id": job_id, "status": "error", "error": err}), status_code
     return jsonify({"success": True, "job_id": job_id, "status": "pending"}), 200
@@ -624,42 +668,12 @@ def proxy_improve_area_async(username=None):
         return jsonify({"success": False, "error": "area_name and proposal_text are required."}), 400
 
     req_id = (request.headers.get("X-AI-Request-ID") or "").strip() or f"ai-{int(time.time()*1000)}"
-    job_id = f"job-{int(time.time()*1000)}-{os.getpid()}-{abs(hash(req_id)) % 100000}"
-    _set_async_job(
-        job_id,
-        {
-            "status": "pending",
-            "created_at": int(time.time()),
-            "req_id": req_id,
-            "action": "improve-area",
-            "area_name": area_name,
-        },
-    )
-
-    def _run() -> None:
-        started = time.monotonic()
-        payload = {
-            "area_name": area_name,
-            "proposal_text": _compact_text(
-                proposal_text,
-                _getenv_int("AI_ASSISTANT_MAX_CHARS", 12000, minimum=1000, maximum=30000),
-            ),
-            "max_tokens": max_tokens,
-        }
-        body, status = _call_upstream("/improve-area", payload, include_auth=True)
-        if 200 <= status <= 299:
-            _track_ai_usage(
-                username=username,
-                endpoint="improve",
-                prompt_text=proposal_text,
-                section_type=area_name or "improve",
-                response_tokens=_estimate_response_tokens(body),
-                response_time_ms=int((time.monotonic() - started) * 1000),
-            )
-            _set_async_job(job_id, {"status": "done", "status_code": status, "result": body})
-        else:
-            _set_async_job(job_id, {"status": "error", "status_code": status, "error": body})
-
-    _get_async_executor().submit(_run)
-    return jsonify({"success": True, "job_id": job_id, "status": "pending"}), 202
-
+    payload = {
+        "area_name": area_name,
+        "proposal_text": _compact_text(
+            proposal_text,
+            _getenv_int("AI_ASSISTANT_MAX_CHARS", 12000, minimum=1000, maximum=30000),
+        ),
+        "max_tokens": max_tokens,
+    }
+    return _enqueue_job_response("improve-area", payload, username, req_id)
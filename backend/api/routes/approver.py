@@ -9,9 +9,10 @@ import html
 import psycopg2.extras
 from datetime import datetime, timedelta
 
-from api.utils.database import get_db_connection
+from api.utils.database import get_db_connection, get_table_columns, invalidate_schema_catalog
 from api.utils.decorators import token_required
-from api.utils.email import send_email, get_logo_html
+from api.utils.email import get_logo_html
+from api.utils.email_outbox import enqueue_email
 from api.utils.helpers import (
     generate_proposal_pdf,
     create_docusign_envelope,
@@ -19,13 +20,29 @@ from api.utils.helpers import (
     resolve_user_id,
     log_activity,
     log_status_change,
+    prewarm_proposal_pdf,
 )
 from api.utils.finance_audit import log_finance_audit_async, evaluate_proposal_compliance
+from api.utils.proposal_financials import refresh_proposal_financials_safe
+from api.utils.listing import (
+    SORT_KEY,
+    ListingError,
+    keyset_sql,
+    page_info,
+    paginate,
+    parse_listing_args,
+    proposal_recency_sql,
+)
 
 from api.routes.client import _encode_identity_hash
 
 bp = Blueprint('approver', __name__)
 
+APPROVAL_LIST_FIELDS = (
+    'id', 'title', 'content', 'client', 'client_name', 'client_email', 'owner_id', 'user_id',
+    'status', 'budget', 'created_at', 'updated_at', 'updatedAt',
+)
+
 # ============================================================================
 # APPROVER ROUTES
 # ============================================================================
@@ -38,25 +55,18 @@ def options_pending_approvals():
 @bp.get("/proposals/pending_approval")
 @token_required
 def get_pending_approvals(username=None, user_id=None, email=None):
-    """Get all proposals pending approval"""
+    """Get all proposals pending approval (paged with `limit`/`cursor`, see api/utils/listing.py)"""
     try:
+        try:
+            listing = parse_listing_args(request.args, APPROVAL_LIST_FIELDS, heavy=('content',))
+        except ListingError as e:
+            return {'detail': str(e)}, 400
+
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
             def _get_table_columns(table_name: str):
-                cursor.execute(
-                    """
-                    SELECT column_name
-                    FROM information_schema.columns
-                    WHERE table_name = %s
-                    """,
-                    (table_name,),
-                )
-                cols = cursor.fetchall() or []
-                return [
-                    (c['column_name'] if isinstance(c, dict) else c[0])
-                    for c in cols
-                ]
+                return list(get_table_columns(table_name, cursor))
 
             def _pick_first(existing, candidates):
                 for c in candidates:
@@ -66,17 +76,7 @@ def get_pending_approvals(username=None, user_id=None, email=None):
 
             # Detect actual proposals table schema so we can support
             # environments with either client/client_name and owner_id/user_id.
-            cursor.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_name = 'proposals'
-                """
-            )
-            cols = cursor.fetchall()
-            existing_columns = [
-                (c['column_name'] if isinstance(c, dict) else c[0]) for c in cols
-            ]
+            existing_columns = get_table_columns('proposals', cursor)
 
             # Build column expressions that only reference existing columns
             if 'client' in existing_columns:
@@ -119,11 +119,19 @@ def get_pending_approvals(username=None, user_id=None, email=None):
             else:
                 budget_expr = 'NULL::numeric'
 
-            query = f'''
-                SELECT 
+            from_where = '''
+                FROM proposals
+                WHERE LOWER(COALESCE(status, '')) IN (
+                    'pending ceo approval',
+                    'pending approval',
+                    'in review',
+                    'submitted'
+                )
+            '''
+            select_list = f'''
                     id,
                     title,
-                    content,
+                    {'content' if listing.wants('content') else 'NULL::text AS content'},
                     {client_expr} AS client,
                     {client_email_expr} AS client_email,
                     {owner_expr} AS user_id,
@@ -131,21 +139,25 @@ def get_pending_approvals(username=None, user_id=None, email=None):
                     created_at,
                     updated_at,
                     {budget_expr} AS budget
-                FROM proposals
-                WHERE LOWER(COALESCE(status, '')) IN (
-                    'pending ceo approval',
-                    'pending approval',
-                    'in review',
-                    'submitted'
-                )
-                ORDER BY updated_at DESC, created_at DESC
             '''
 
-            cursor.execute(query)
-            rows = cursor.fetchall()
+            page = None
+            if listing.paginated:
+                recency_sql = proposal_recency_sql()
+                condition, tail, page_params = keyset_sql(listing, recency_sql)
+                cursor.execute(
+                    f"SELECT {select_list}, {recency_sql} AS {SORT_KEY} {from_where}"
+                    f"{' AND ' + condition if condition else ''} {tail}",
+                    tuple(page_params),
+                )
+                rows, has_more, next_cursor = paginate(listing, [dict(r) for r in cursor.fetchall()])
+                page = page_info(cursor, listing, len(rows), has_more, next_cursor, from_where)
+            else:
+                cursor.execute(f"SELECT {select_list} {from_where} ORDER BY updated_at DESC, created_at DESC")
+                rows = cursor.fetchall()
             proposals = []
             for row in rows:
-                proposals.append({
+                proposals.append(listing.project({
                     'id': row['id'],
                     'title': row['title'],
                     'content': row.get('content'),
@@ -157,7 +169,9 @@ def get_pending_approvals(username=None, user_id=None, email=None):
                     'budget': row.get('budget'),
                     'created_at': row['created_at'].isoformat() if row['created_at'] else None,
                     'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None,
-                })
+                }))
+            if page is not None:
+                return {'proposals': proposals, 'page': page}, 200
             return {'proposals': proposals}, 200
     except Exception as e:
         print(f"❌ Error fetching pending approvals: {e}")
@@ -169,8 +183,13 @@ def get_pending_approvals(username=None, user_id=None, email=None):
 @bp.get("/proposals/all")
 @token_required
 def get_all_proposals_for_admin(username=None, user_id=None, email=None):
-    """Get proposals across all users for admin/approver dashboards."""
+    """Get proposals across all users for admin/approver dashboards (paged with `limit`/`cursor`)."""
     try:
+        try:
+            listing = parse_listing_args(request.args, APPROVAL_LIST_FIELDS, heavy=('content',))
+        except ListingError as e:
+            return {'detail': str(e)}, 400
+
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
@@ -190,18 +209,7 @@ def get_all_proposals_for_admin(username=None, user_id=None, email=None):
                 return {'detail': 'Admin access required'}, 403
 
             # Detect actual proposals table schema so we can support multiple environments.
-            cursor.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_name = 'proposals'
-                """
-            )
-            cols = cursor.fetchall() or []
-            existing_columns = [
-                (c['column_name'] if isinstance(c, dict) else c[0])
-                for c in cols
-            ]
+            existing_columns = get_table_columns('proposals', cursor)
 
             if 'client' in existing_columns:
                 client_expr = 'client'
@@ -227,11 +235,10 @@ def get_all_proposals_for_admin(username=None, user_id=None, email=None):
             else:
                 budget_expr = 'NULL::numeric'
 
-            query = f'''
-                SELECT
+            select_list = f'''
                     id,
                     title,
-                    content,
+                    {'content' if listing.wants('content') else 'NULL::text AS content'},
                     {client_expr} AS client,
                     {client_email_expr} AS client_email,
                     {owner_expr} AS user_id,
@@ -239,15 +246,28 @@ def get_all_proposals_for_admin(username=None, user_id=None, email=None):
                     created_at,
                     updated_at,
                     {budget_expr} AS budget
-                FROM proposals
-                ORDER BY updated_at DESC NULLS LAST, created_at DESC NULLS LAST
             '''
 
-            cursor.execute(query)
-            rows = cursor.fetchall() or []
+            page = None
+            if listing.paginated:
+                recency_sql = proposal_recency_sql()
+                condition, tail, page_params = keyset_sql(listing, recency_sql)
+                cursor.execute(
+                    f"SELECT {select_list}, {recency_sql} AS {SORT_KEY} FROM proposals"
+                    f"{' WHERE ' + condition if condition else ''} {tail}",
+                    tuple(page_params),
+                )
+                rows, has_more, next_cursor = paginate(listing, [dict(r) for r in cursor.fetchall()])
+                page = page_info(cursor, listing, len(rows), has_more, next_cursor, 'FROM proposals')
+            else:
+                cursor.execute(
+                    f"SELECT {select_list} FROM proposals "
+                    "ORDER BY updated_at DESC NULLS LAST, created_at DESC NULLS LAST"
+                )
+                rows = cursor.fetchall() or []
             proposals = []
             for row in rows:
-                proposals.append({
+                proposals.append(listing.project({
                     'id': row.get('id'),
                     'title': row.get('title'),
                     'content': row.get('content'),
@@ -261,8 +281,10 @@ def get_all_proposals_for_admin(username=None, user_id=None, email=None):
                     'created_at': row.get('created_at').isoformat() if row.get('created_at') else None,
                     'updated_at': row.get('updated_at').isoformat() if row.get('updated_at') else None,
                     'updatedAt': row.get('updated_at').isoformat() if row.get('updated_at') else None,
-                })
+                }))
 
+            if page is not None:
+                return {'proposals': proposals, 'page': page}, 200
             return {'proposals': proposals}, 200
     except Exception as e:
         print(f"❌ Error fetching all proposals for admin: {e}")
@@ -298,19 +320,7 @@ def approve_proposal(username=None, proposal_id=None):
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
             def _get_table_columns(table_name: str):
-                cursor.execute(
-                    """
-                    SELECT column_name
-                    FROM information_schema.columns
-                    WHERE table_name = %s
-                    """,
-                    (table_name,),
-                )
-                cols = cursor.fetchall() or []
-                return [
-                    (c['column_name'] if isinstance(c, dict) else c[0])
-                    for c in cols
-                ]
+                return list(get_table_columns(table_name, cursor))
 
             def _pick_first(existing, candidates):
                 for c in candidates:
@@ -497,6 +507,7 @@ def approve_proposal(username=None, proposal_id=None):
                     if 'identity_last4_hash' not in proposal_cols:
                         cursor.execute("ALTER TABLE proposals ADD COLUMN identity_last4_hash TEXT")
                         conn.commit()
+                        invalidate_schema_catalog('proposals')
                 except Exception as schema_err:
                     print(f"⚠️ Failed to ensure identity_last4_hash column exists: {schema_err}")
 
@@ -522,10 +533,12 @@ def approve_proposal(username=None, proposal_id=None):
                 ('Sent to Client', proposal_id)
             )
             status_row = cursor.fetchone()
+            refresh_proposal_financials_safe(cursor, proposal_id)
             conn.commit()
             
             if status_row:
                 new_status = status_row['status']
+                prewarm_proposal_pdf(proposal_id)
                 print(f"[SUCCESS] Proposal {proposal_id} '{title}' approved and status updated")
 
                 log_finance_audit_async(
@@ -580,6 +593,7 @@ def approve_proposal(username=None, proposal_id=None):
 
                 # Send email to client
                 email_sent = False
+                email_message_id = None
                 # Note: client_email might be empty since the column doesn't exist in schema
                 # We'll still create the envelope if we have a client name
                 if client_name and client_name != 'Unknown':
@@ -725,9 +739,16 @@ def approve_proposal(username=None, proposal_id=None):
                         <p>Kind regards,<br>{approver_name}<br>Khonology Team</p>
                         """
                         
-                        email_sent = send_email(effective_client_email, email_subject, email_body)
+                        queued = enqueue_email(
+                            effective_client_email,
+                            email_subject,
+                            email_body,
+                            requested_by=username,
+                        )
+                        email_message_id = queued['id']
+                        email_sent = queued['status'] != 'failed'
                         if email_sent:
-                            print(f"[EMAIL] ✅ Proposal email sent successfully to {effective_client_email}")
+                            print(f"[EMAIL] ✅ Proposal email {queued['status']} for {effective_client_email} (message {email_message_id})")
                         else:
                             print(f"[EMAIL] ❌ Failed to send proposal email to {effective_client_email}")
                             print(f"   Check SENDGRID_* or SMTP_* env vars and logs above for details")
@@ -754,7 +775,8 @@ def approve_proposal(username=None, proposal_id=None):
                 return {
                     'detail': 'Proposal approved and sent to client',
                     'status': new_status,
-                    'email_sent': email_sent
+                    'email_sent': email_sent,
+                    'email_message_id': email_message_id,
                 }, 200
             else:
                 return {'detail': 'Failed to update proposal status'}, 500
@@ -788,14 +810,7 @@ def request_changes(username=None, proposal_id=None):
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
             # Determine ownership column (owner_id vs user_id) to support both schemas
-            cursor.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_name = 'proposals'
-                """
-            )
-            existing_columns = [row['column_name'] for row in cursor.fetchall()]
+            existing_columns = get_table_columns('proposals', cursor)
 
             owner_col = None
             if 'owner_id' in existing_columns:
@@ -832,6 +847,7 @@ def request_changes(username=None, proposal_id=None):
                 """,
                 (proposal_id,)
             )
+            refresh_proposal_financials_safe(cursor, proposal_id)
             
             # Get creator/owner ID (ensure int for notifications)
             try:
@@ -1013,8 +1029,9 @@ def request_changes(username=None, proposal_id=None):
                     log_status_change(
                         proposal_id=proposal_id,
                         user_id=approver_id,
-                        old_status=old_status,
-                        new_status='Changes Requested',
+                        from_status=old_status,
+                        to_status='Changes Requested',
+                        cursor=cursor,
                     )
                     desc_part = ""
                     if manager_name or manager_email:
@@ -1074,14 +1091,7 @@ def reject_proposal(username=None, proposal_id=None):
             cursor = conn.cursor()
 
             # Determine ownership column (owner_id vs user_id)
-            cursor.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_name = 'proposals'
-                """
-            )
-            existing_columns = [row[0] for row in cursor.fetchall()]
+            existing_columns = get_table_columns('proposals', cursor)
 
             owner_col = None
             if 'owner_id' in existing_columns:
@@ -1116,6 +1126,7 @@ def reject_proposal(username=None, proposal_id=None):
                 '''UPDATE proposals SET status = 'Draft', updated_at = NOW() WHERE id = %s''',
                 (proposal_id,)
             )
+            refresh_proposal_financials_safe(cursor, proposal_id)
             conn.commit()
 
             log_finance_audit_async(
@@ -10,15 +10,17 @@ from datetime import datetime, timedelta, timezone
 import psycopg2
 import psycopg2.extras
 
-from api.utils.database import get_db_connection, _pg_conn, release_pg_conn
+from api.utils.database import column_exists, get_db_connection, invalidate_schema_catalog, _pg_conn, release_pg_conn
 from api.utils.profile_avatar import (
     fetch_user_profile_dict_by_username,
     patch_user_profile_avatar,
 )
 from api.utils.decorators import token_required
-from api.utils.auth import verify_token, get_valid_tokens, generate_token, hash_password, verify_password, save_tokens
+from api.utils.identity_cache import invalidate_identity
+from api.utils.auth import verify_token, generate_token, revoke_token, hash_password, verify_password
 from api.utils.firebase_auth import verify_firebase_token, get_user_from_token, firebase_token_required, initialize_firebase
-from api.utils.email import send_email, send_verification_email
+from api.utils.email import send_email, verification_email_content
+from api.utils.email_outbox import enqueue_email
 from api.utils.jwt_validator import JWTValidationError, validate_jwt_token, extract_user_info
 from werkzeug.security import check_password_hash
 
@@ -64,6 +66,7 @@ def _try_upgrade_to_finance_manager(cursor, conn, user_id, uid, email) -> bool:
         upgraded = cursor.rowcount > 0
         if upgraded:
             conn.commit()
+            invalidate_identity(user_id=user_id)
         else:
             conn.rollback()
         return upgraded
@@ -80,6 +83,7 @@ def _try_upgrade_to_finance_manager(cursor, conn, user_id, uid, email) -> bool:
         upgraded = cursor.rowcount > 0
         if upgraded:
             conn.commit()
+            invalidate_identity(user_id=user_id)
         else:
             conn.rollback()
         return upgraded
@@ -220,20 +224,14 @@ def register():
         try:
             # Check if is_email_verified column exists, if not add it
             try:
-                cursor.execute('''
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name='users' AND column_name='is_email_verified'
-                ''')
-                has_column = cursor.fetchone() is not None
-                
-                if not has_column:
+                if not column_exists('users', 'is_email_verified', cursor):
                     print("[INFO] Adding is_email_verified column to users table...")
                     cursor.execute('''
                         ALTER TABLE users 
                         ADD COLUMN is_email_verified BOOLEAN DEFAULT true
                     ''')
                     conn.commit()
+                    invalidate_schema_catalog('users')
             except Exception as e:
                 print(f"[WARN] Could not check/add is_email_verified column: {e}")
             
@@ -263,7 +261,9 @@ def register():
             
             # Generate verification token and send email
             verification_token = generate_verification_token(user_id, email)
-            email_sent = send_verification_email(email, verification_token, username)
+            subject, html_content = verification_email_content(verification_token, username)
+            queued = enqueue_email(email, subject, html_content, requested_by=username)
+            email_sent = queued['status'] != 'failed'
             
             if not email_sent:
                 print(f'[WARN] Failed to send verification email to {email}, but user was created')
@@ -318,7 +318,6 @@ def login():
         
         # Generate token
         token = generate_token(username)
-        save_tokens(get_valid_tokens())
         
         return {
             'token': token,
@@ -368,7 +367,6 @@ def login_email():
         
         # Generate token
         token = generate_token(user[1])  # username
-        save_tokens(get_valid_tokens())
         
         return {
             'token': token,
@@ -454,6 +452,21 @@ def get_current_user(username=None):
     except Exception as e:
         return {'detail': str(e)}, 500
 
+@bp.post("/logout")
+def logout():
+    """Revoke the caller's backend session token (Firebase ID tokens simply expire)"""
+    parts = (request.headers.get('Authorization') or '').split()
+    token = parts[-1] if parts else None
+    if not token:
+        return {'detail': 'Token is missing'}, 401
+    try:
+        revoke_token(token)
+        return {'detail': 'Logged out'}, 200
+    except Exception as e:
+        print(f'Logout error: {e}')
+        traceback.print_exc()
+        return {'detail': str(e)}, 500
+
 @bp.get("/user/profile")
 @token_required
 def get_user_profile(username=None):
@@ -528,7 +541,6 @@ def firebase_auth():
         if os.getenv("DEV_BYPASS_DB_FOR_FIREBASE", "false").lower() == "true":
             username = email.split("@")[0]
             backend_token = generate_token(username)
-            save_tokens(get_valid_tokens())
 
             # Map requested role to the normalized roles used on the frontend.
             normalized_role = _normalize_role(requested_role, default='manager')
@@ -602,6 +614,7 @@ def firebase_auth():
                                     (user_id,),
                                 )
                                 conn.commit()
+                                invalidate_identity(user_id=user_id)
                                 user_role = 'admin'
                                 normalized_role = 'admin'
                                 print(f'🔐 Upgraded user {email} to admin based on requested_role="{requested_role_lower}"')
@@ -621,6 +634,7 @@ def firebase_auth():
                                     (user_id,),
                                 )
                                 conn.commit()
+                                invalidate_identity(user_id=user_id)
                                 user_role = 'finance_manager'
                                 normalized_role = 'finance_manager'
                                 print(f'🔐 Upgraded user {email} to finance_manager based on requested_role="{requested_role_lower}"')
@@ -642,7 +656,6 @@ def firebase_auth():
 
                 # Generate backend auth token for this user using legacy token system
                 backend_token = generate_token(username)
-                save_tokens(get_valid_tokens())
                 
                 return {
                     'token': id_token,  # Return Firebase token for frontend
@@ -681,7 +694,6 @@ def firebase_auth():
                         conn.rollback()
 
                     backend_token = generate_token(username)
-                    save_tokens(get_valid_tokens())
                     return {
                         'token': id_token,
                         'backend_token': backend_token,
@@ -744,7 +756,6 @@ def firebase_auth():
 
                 # Generate backend auth token for this new user using legacy token system
                 backend_token = generate_token(user[1])
-                save_tokens(get_valid_tokens())
                 
                 return {
                     'token': id_token,  # Return Firebase token for frontend
@@ -889,7 +900,6 @@ def khonobuzz_jwt_login():
                 conn.commit()
 
             backend_token = generate_token(username)
-            save_tokens(get_valid_tokens())
 
             return {
                 'token': backend_token,
@@ -1217,7 +1227,9 @@ def resend_verification():
             
             # Generate new verification token and send email
             verification_token = generate_verification_token(user_id, user_email)
-            email_sent = send_verification_email(user_email, verification_token, username)
+            subject, html_content = verification_email_content(verification_token, username)
+            queued = enqueue_email(user_email, subject, html_content, requested_by=username, dedupe=False)
+            email_sent = queued['status'] != 'failed'
             
             if not email_sent:
                 return {'detail': 'Failed to send verification email. Please try again later.'}, 500
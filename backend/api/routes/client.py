@@ -15,11 +15,23 @@ from psycopg2 import sql
 import psycopg2.extras
 from datetime import datetime, timedelta, timezone
 
-from api.utils.database import get_db_connection
+from api.utils.database import column_exists, get_db_connection, get_id_type, get_table_columns
 from api.utils.decorators import token_required
 from api.utils.jwt_validator import validate_jwt_token, JWTValidationError
 from api.utils.helpers import log_status_change
 from api.utils.email import send_email
+from api.utils.proposal_financials import refresh_proposal_financials_safe
+from api.utils.proposal_stages import (
+    CLIENT_DASHBOARD_CODES,
+    CLIENT_PORTAL_CODES,
+    STAGE_APPROVED,
+    STAGE_DECLINED,
+    STAGE_REJECTED,
+    STAGE_SIGNED,
+    client_group,
+    stage_code_for_status,
+    stage_code_in_sql,
+)
 
 bp = Blueprint('client', __name__)
 
@@ -92,40 +104,8 @@ def _now_utc():
     return datetime.now(timezone.utc)
 
 
-def _ensure_client_activity_schema(cursor):
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS proposal_client_activity (
-            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-            proposal_id UUID REFERENCES proposals(id) ON DELETE CASCADE,
-            client_id UUID REFERENCES clients(id) ON DELETE CASCADE,
-            event_type VARCHAR(50) NOT NULL,
-            metadata JSONB,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """
-    )
-    cursor.execute(
-        """
-        CREATE INDEX IF NOT EXISTS idx_activity_client_created
-        ON proposal_client_activity(client_id, created_at DESC)
-        """
-    )
-
-
 def _status_group_for_dashboard(raw_status: str | None) -> str:
-    s = (raw_status or '').lower().strip()
-    if not s:
-        return 'active'
-    if 'request' in s and 'change' in s:
-        return 'requested_changes'
-    if 'change requested' in s or 'requested changes' in s:
-        return 'requested_changes'
-    if 'reject' in s or 'declin' in s:
-        return 'rejected'
-    if 'signed' in s or 'client signed' in s or 'approved' in s:
-        return 'signed'
-    return 'active'
+    return client_group(stage_code_for_status(raw_status))
 
 
 def _dashboard_counts_from_status_rows(rows: list[dict]) -> dict:
@@ -164,18 +144,7 @@ def _accessible_client_proposals(cursor, invitation_token: str, client_email: st
     if engagement_select_parts:
         engagement_select_sql = ', ' + ', '.join(engagement_select_parts)
 
-    released_status_where = """
-        (
-            LOWER(COALESCE(p.status, '')) LIKE '%%sent to client%%'
-            OR LOWER(COALESCE(p.status, '')) LIKE '%%released%%'
-            OR LOWER(COALESCE(p.status, '')) LIKE '%%sent for signature%%'
-            OR LOWER(COALESCE(p.status, '')) LIKE '%%signed%%'
-            OR LOWER(COALESCE(p.status, '')) LIKE '%%client signed%%'
-            OR LOWER(COALESCE(p.status, '')) LIKE '%%declined%%'
-            OR LOWER(COALESCE(p.status, '')) LIKE '%%rejected%%'
-            OR LOWER(COALESCE(p.status, '')) LIKE '%%request%%change%%'
-        )
-    """
+    released_status_where = stage_code_in_sql(CLIENT_DASHBOARD_CODES, 'stage_code' in columns)
 
     query = f"""
         SELECT DISTINCT
@@ -252,71 +221,6 @@ def _hash_client_otp(code: str, challenge_salt: str) -> str:
     return base64.urlsafe_b64encode(digest).decode('utf-8')
 
 
-def _ensure_client_device_session_schema(cursor):
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS client_trusted_devices (
-            invitation_token TEXT NOT NULL,
-            device_id TEXT NOT NULL,
-            first_seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-            last_seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-            PRIMARY KEY (invitation_token, device_id)
-        )
-        """
-    )
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS client_device_otp_challenges (
-            id TEXT PRIMARY KEY,
-            invitation_token TEXT NOT NULL,
-            device_id TEXT NOT NULL,
-            challenge_salt TEXT NOT NULL,
-            otp_hash TEXT NOT NULL,
-            mojo_state_id TEXT NULL,
-            attempts INTEGER NOT NULL DEFAULT 0,
-            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-            expires_at TIMESTAMPTZ NOT NULL,
-            verified_at TIMESTAMPTZ NULL
-        )
-        """
-    )
-
-    # Backfill: add mojo_state_id column if table existed before this feature.
-    try:
-        cursor.execute(
-            """
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_name='client_device_otp_challenges' AND column_name='mojo_state_id'
-            """
-        )
-        has_col = cursor.fetchone() is not None
-        if not has_col:
-            cursor.execute("ALTER TABLE client_device_otp_challenges ADD COLUMN mojo_state_id TEXT")
-    except Exception:
-        pass
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS client_device_sessions (
-            id TEXT PRIMARY KEY,
-            invitation_token TEXT NOT NULL,
-            device_id TEXT NOT NULL,
-            session_token_hash TEXT NOT NULL,
-            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-            last_seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-            expires_at TIMESTAMPTZ NOT NULL,
-            revoked_at TIMESTAMPTZ NULL
-        )
-        """
-    )
-    cursor.execute(
-        """
-        CREATE INDEX IF NOT EXISTS client_device_sessions_invitation_device_idx
-        ON client_device_sessions(invitation_token, device_id)
-        """
-    )
-
-
 def _extract_client_device_session():
     device_id = (request.headers.get('X-Client-Device-Id') or request.args.get('device_id') or '').strip()
     session_token = (request.headers.get('X-Client-Session-Token') or request.args.get('session_token') or '').strip()
@@ -422,42 +326,6 @@ def _verify_identity_hash(last4: str, encoded: str) -> bool:
     return hmac.compare_digest(actual, expected)
 
 
-def _ensure_identity_schema(cursor):
-    cursor.execute(
-        """
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_schema = 'public' AND table_name = 'proposals'
-        """
-    )
-    cols = {r['column_name'] if isinstance(r, dict) else r[0] for r in cursor.fetchall() or []}
-    if 'identity_last4_hash' not in cols:
-        cursor.execute("ALTER TABLE proposals ADD COLUMN identity_last4_hash TEXT")
-
-    cursor.execute("SELECT to_regclass(%s)", ("public.client_identity_access",))
-    table_row = cursor.fetchone()
-    if isinstance(table_row, dict):
-        table_val = next(iter(table_row.values()), None)
-    else:
-        table_val = table_row[0] if table_row else None
-    has_table = table_val is not None
-    if not has_table:
-        cursor.execute(
-            """
-            CREATE TABLE client_identity_access (
-                invitation_token TEXT PRIMARY KEY,
-                proposal_id INTEGER,
-                attempts INTEGER DEFAULT 0,
-                locked_at TIMESTAMP NULL,
-                verified_at TIMESTAMP NULL,
-                last_attempt_at TIMESTAMP NULL,
-                unlocked_token TEXT NULL,
-                unlocked_expires_at TIMESTAMP NULL
-            )
-            """
-        )
-
-
 def _lookup_invitation_by_token(cursor, token: str):
     inv_info = _get_invitation_column_info(cursor)
     token_col = inv_info['token_col']
@@ -497,15 +365,7 @@ def _lookup_invitation_by_token(cursor, token: str):
 
 
 def _proposal_identity_hash(cursor, proposal_id: int):
-    cursor.execute(
-        """
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_schema = 'public' AND table_name = 'proposals'
-        """
-    )
-    cols = {r['column_name'] if isinstance(r, dict) else r[0] for r in cursor.fetchall() or []}
-    if 'identity_last4_hash' not in cols:
+    if not column_exists('proposals', 'identity_last4_hash', cursor):
         return None
     cursor.execute("SELECT identity_last4_hash FROM proposals WHERE id = %s", (proposal_id,))
     row = cursor.fetchone()
@@ -663,14 +523,7 @@ def _notify_hard_lock(cursor, proposal_id: int, invited_email: str | None, invit
     if create_notification is None:
         return
 
-    cursor.execute(
-        """
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_schema = 'public' AND table_name = 'proposals'
-        """
-    )
-    cols = {r['column_name'] if isinstance(r, dict) else r[0] for r in cursor.fetchall() or []}
+    cols = get_table_columns('proposals', cursor)
     owner_col = 'owner_id' if 'owner_id' in cols else ('user_id' if 'user_id' in cols else None)
     if not owner_col:
         return
@@ -718,8 +571,6 @@ def start_client_device_session():
 
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            _ensure_identity_schema(cursor)
-            _ensure_client_device_session_schema(cursor)
 
             invitation_token = _resolve_invitation_token(cursor, token)
             try:
@@ -869,7 +720,6 @@ def verify_client_device_otp():
 
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            _ensure_client_device_session_schema(cursor)
             cursor.execute(
                 """
                 SELECT id, invitation_token, device_id, challenge_salt, otp_hash, mojo_state_id, attempts, expires_at, verified_at
@@ -971,8 +821,6 @@ def verify_client_identity():
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-            _ensure_client_device_session_schema(cursor)
-
             invitation_token = _resolve_invitation_token(cursor, token)
 
             invitation, err, code = _lookup_invitation_by_token(cursor, invitation_token)
@@ -1093,14 +941,7 @@ def verify_client_identity():
 
 
 def _get_invitation_column_info(cursor):
-    cursor.execute(
-        """
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_schema = 'public' AND table_name = 'collaboration_invitations'
-        """
-    )
-    cols = {r['column_name'] if isinstance(r, dict) else r[0] for r in cursor.fetchall()}
+    cols = get_table_columns('collaboration_invitations', cursor)
 
     token_col = 'access_token' if 'access_token' in cols else ('token' if 'token' in cols else None)
     email_col = (
@@ -1122,22 +963,7 @@ def _get_invitation_column_info(cursor):
 
 
 def _get_proposal_column_info(cursor):
-    cursor.execute(
-        """
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_name = 'proposals'
-        """
-    )
-    rows = cursor.fetchall()
-    column_names = set()
-    for row in rows:
-        if isinstance(row, dict):
-            name = row.get('column_name')
-        else:
-            name = row[0] if row else None
-        if name:
-            column_names.add(name)
+    column_names = set(get_table_columns('proposals', cursor))
     if 'client_name' in column_names:
         client_name_expr = 'p.client_name'
     elif 'client' in column_names:
@@ -1353,9 +1179,6 @@ def get_client_proposals():
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-            _ensure_identity_schema(cursor)
-            _ensure_client_device_session_schema(cursor)
-
             invitation_token = _resolve_invitation_token(cursor, token)
 
             inv_info = _get_invitation_column_info(cursor)
@@ -1427,14 +1250,7 @@ def get_client_proposals():
             if engagement_select_parts:
                 engagement_select_sql = ', ' + ', '.join(engagement_select_parts)
 
-            released_status_where = """
-                (
-                    LOWER(COALESCE(p.status, '')) LIKE '%%sent to client%%'
-                    OR LOWER(COALESCE(p.status, '')) LIKE '%%released%%'
-                    OR LOWER(COALESCE(p.status, '')) LIKE '%%sent for signature%%'
-                    OR LOWER(COALESCE(p.status, '')) LIKE '%%signed%%'
-                )
-            """
+            released_status_where = stage_code_in_sql(CLIENT_PORTAL_CODES, 'stage_code' in columns)
 
             query = f"""
                 SELECT DISTINCT
@@ -1499,9 +1315,6 @@ def get_client_proposal_details(proposal_id):
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-            _ensure_identity_schema(cursor)
-            _ensure_client_device_session_schema(cursor)
-
             invitation_token = _resolve_invitation_token(cursor, token)
             invitation, err, code = _lookup_invitation_by_token(cursor, invitation_token)
             if err:
@@ -1653,9 +1466,6 @@ def add_client_comment(proposal_id):
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-            _ensure_identity_schema(cursor)
-            _ensure_client_device_session_schema(cursor)
-
             invitation_token = _resolve_invitation_token(cursor, token)
 
             # Verify token
@@ -1744,9 +1554,6 @@ def client_approve_proposal(proposal_id):
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-            _ensure_identity_schema(cursor)
-            _ensure_client_device_session_schema(cursor)
-
             invitation_token = _resolve_invitation_token(cursor, token)
             
             # Verify token
@@ -1971,9 +1778,6 @@ def client_reject_proposal(proposal_id):
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-            _ensure_identity_schema(cursor)
-            _ensure_client_device_session_schema(cursor)
-
             invitation_token = _resolve_invitation_token(cursor, token)
             
             # Verify token
@@ -2046,7 +1850,7 @@ def client_reject_proposal(proposal_id):
             """, (proposal_id, rejection_info, client_user_id, 'resolved'))
 
             if old_status is not None and old_status != 'Client Declined':
-                log_status_change(proposal_id, client_user_id, old_status, 'Client Declined')
+                log_status_change(proposal_id, client_user_id, old_status, 'Client Declined', cursor=cursor)
             
             conn.commit()
             
@@ -2079,9 +1883,6 @@ def get_client_signing_url(proposal_id):
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-            _ensure_identity_schema(cursor)
-            _ensure_client_device_session_schema(cursor)
-
             invitation_token = _resolve_invitation_token(cursor, token)
             
             # Verify token and get client email
@@ -2304,8 +2105,6 @@ def client_sign_proposal_token(proposal_id=None):
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-            _ensure_identity_schema(cursor)
-
             invitation_token = _resolve_invitation_token(cursor, token)
 
             inv_info = _get_invitation_column_info(cursor)
@@ -2475,8 +2274,6 @@ def client_docusign_signing_url_api(proposal_id):
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-            _ensure_identity_schema(cursor)
-
             invitation_token = _resolve_invitation_token(cursor, token)
 
             inv_info = _get_invitation_column_info(cursor)
@@ -2717,6 +2514,7 @@ def client_docusign_signing_url_api(proposal_id):
                     """,
                     (proposal_id,),
                 )
+                refresh_proposal_financials_safe(cursor, proposal_id)
                 conn.commit()
 
                 if signing_url:
@@ -2942,9 +2740,6 @@ def get_client_dashboard_overview_api():
 
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            _ensure_identity_schema(cursor)
-            _ensure_client_device_session_schema(cursor)
-            _ensure_client_activity_schema(cursor)
 
             ctx, err, code = _resolve_client_context(cursor, token)
             if err:
@@ -2956,15 +2751,16 @@ def get_client_dashboard_overview_api():
             token_proposal_id = ctx['token_proposal_id']
 
             proposals = _accessible_client_proposals(cursor, invitation_token, client_email, token_proposal_id)
-            proposal_ids = [str(p.get('id')) for p in proposals if p.get('id') is not None]
+            pid_type = get_id_type('proposals', cursor=cursor)
+            proposal_ids = pid_type.coerce_many(p.get('id') for p in proposals)
 
             status_rows = []
             if proposal_ids:
                 cursor.execute(
-                    """
+                    f"""
                     SELECT p.status as status, COUNT(*)::int as count
                     FROM proposals p
-                    WHERE p.id::text = ANY(%s)
+                    WHERE {pid_type.any_sql('p.id')}
                     GROUP BY p.status
                     """,
                     (proposal_ids,),
@@ -2981,32 +2777,38 @@ def get_client_dashboard_overview_api():
                 client_id = c_row.get('id') if isinstance(c_row, dict) else c_row[0]
 
             if client_id and proposal_ids:
+                # The activity table's proposal_id may not share proposals.id's type.
+                activity_pid_type = get_id_type('proposal_client_activity', 'proposal_id', cursor)
+                activity_ids = activity_pid_type.coerce_many(proposal_ids)
                 cursor.execute(
-                    """
+                    f"""
                     SELECT a.event_type, a.created_at, a.metadata,
                            p.id::text as proposal_id, p.title as proposal_title, p.status as proposal_status
                     FROM proposal_client_activity a
                     JOIN proposals p ON p.id = a.proposal_id
                     WHERE a.client_id = %s
-                      AND a.proposal_id::text = ANY(%s)
+                      AND {activity_pid_type.any_sql('a.proposal_id')}
                     ORDER BY a.created_at DESC
                     LIMIT 10
                     """,
-                    (client_id, proposal_ids),
+                    (client_id, activity_ids),
                 )
                 recent_activity = cursor.fetchall() or []
 
             cutoff_sql = "NOW() - (%s || ' weeks')::interval"
             if proposal_ids:
+                has_stage_code = 'stage_code' in _get_proposal_column_info(cursor)['columns']
+                signed_sql = stage_code_in_sql((STAGE_SIGNED, STAGE_APPROVED), has_stage_code)
+                rejected_sql = stage_code_in_sql((STAGE_DECLINED, STAGE_REJECTED), has_stage_code)
                 cursor.execute(
                     f"""
                     SELECT
                         date_trunc('week', p.created_at)::date as period,
                         COUNT(*)::int as created,
-                        COUNT(*) FILTER (WHERE LOWER(COALESCE(p.status,'')) LIKE '%%signed%%' OR LOWER(COALESCE(p.status,'')) LIKE '%%client signed%%' OR LOWER(COALESCE(p.status,'')) LIKE '%%approved%%')::int as signed,
-                        COUNT(*) FILTER (WHERE LOWER(COALESCE(p.status,'')) LIKE '%%rejected%%' OR LOWER(COALESCE(p.status,'')) LIKE '%%declined%%')::int as rejected
+                        COUNT(*) FILTER (WHERE {signed_sql})::int as signed,
+                        COUNT(*) FILTER (WHERE {rejected_sql})::int as rejected
                     FROM proposals p
-                    WHERE p.id::text = ANY(%s)
+                    WHERE {pid_type.any_sql('p.id')}
                       AND p.created_at >= {cutoff_sql}
                     GROUP BY 1
                     ORDER BY 1 ASC
@@ -3132,14 +2934,7 @@ def log_client_activity():
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-            cursor.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_schema = 'public' AND table_name = 'collaboration_invitations'
-                """
-            )
-            inv_cols = {r['column_name'] for r in cursor.fetchall()}
+            inv_cols = get_table_columns('collaboration_invitations', cursor)
 
             token_col = 'access_token' if 'access_token' in inv_cols else ('token' if 'token' in inv_cols else None)
             if not token_col:
@@ -3184,12 +2979,12 @@ def log_client_activity():
                 client_row = cursor.fetchone()
                 client_id = client_row['id'] if client_row else None
             
-            # Convert proposal_id to appropriate type (handle both int and UUID)
-            # First try to get proposal to verify it exists
-            cursor.execute("""
-                SELECT id FROM proposals WHERE id = %s OR id::text = %s
-            """, (proposal_id, str(proposal_id)))
-            proposal = cursor.fetchone()
+            # Bind proposal_id as the key's own type (int or UUID) so id's index is used
+            typed_proposal_id = get_id_type('proposals', cursor=cursor).coerce(proposal_id)
+            proposal = None
+            if typed_proposal_id is not None:
+                cursor.execute("SELECT id FROM proposals WHERE id = %s", (typed_proposal_id,))
+                proposal = cursor.fetchone()
             if not proposal:
                 return {'detail': 'Proposal not found'}, 404
             
@@ -3237,14 +3032,7 @@ def start_client_session():
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-            cursor.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_schema = 'public' AND table_name = 'collaboration_invitations'
-                """
-            )
-            inv_cols = {r['column_name'] for r in cursor.fetchall()}
+            inv_cols = get_table_columns('collaboration_invitations', cursor)
 
             token_col = 'access_token' if 'access_token' in inv_cols else ('token' if 'token' in inv_cols else None)
             if not token_col:
@@ -3269,10 +3057,11 @@ def start_client_session():
                 client_id = client_row['id'] if client_row else None
             
             # Verify proposal exists
-            cursor.execute("""
-                SELECT id FROM proposals WHERE id = %s OR id::text = %s
-            """, (proposal_id, str(proposal_id)))
-            proposal = cursor.fetchone()
+            typed_proposal_id = get_id_type('proposals', cursor=cursor).coerce(proposal_id)
+            proposal = None
+            if typed_proposal_id is not None:
+                cursor.execute("SELECT id FROM proposals WHERE id = %s", (typed_proposal_id,))
+                proposal = cursor.fetchone()
             if not proposal:
                 return {'detail': 'Proposal not found'}, 404
             
@@ -3317,13 +3106,15 @@ def end_client_session():
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
             
             # Get session
-            cursor.execute("""
-                SELECT id, session_start, proposal_id, client_id
-                FROM proposal_client_session
-                WHERE id = %s OR id::text = %s
-            """, (session_id, str(session_id)))
-            
-            session = cursor.fetchone()
+            typed_session_id = get_id_type('proposal_client_session', cursor=cursor).coerce(session_id)
+            session = None
+            if typed_session_id is not None:
+                cursor.execute("""
+                    SELECT id, session_start, proposal_id, client_id
+                    FROM proposal_client_session
+                    WHERE id = %s
+                """, (typed_session_id,))
+                session = cursor.fetchone()
             if not session:
                 return {'detail': 'Session not found'}, 404
             
@@ -12,9 +12,10 @@ from datetime import datetime, timedelta, timezone
 from pathlib import Path
 import psycopg2.extras
 
-from api.utils.database import get_db_connection
+from api.utils.database import get_db_connection, get_table_columns
 from api.utils.decorators import token_required
 from api.utils.email import send_email, get_logo_html
+from api.utils.email_outbox import enqueue_email
 
 bp = Blueprint('clients', __name__)
 
@@ -150,10 +151,13 @@ def send_client_invitation(username=None, user_id=None, email=None):
 
             subject = "You're Invited to Complete Your Client Onboarding"
 
-            print(f"[INVITE] Sending email to {invited_email}...")
+            print(f"[INVITE] Queueing email to {invited_email}...")
+            email_message_id = None
             try:
-                email_sent = send_email(invited_email, subject, html_content)
-                print(f"[INVITE] Email sent: {email_sent}")
+                queued = enqueue_email(invited_email, subject, html_content, requested_by=username)
+                email_message_id = queued['id']
+                email_sent = queued['status'] != 'failed'
+                print(f"[INVITE] Email {queued['status']} (message {email_message_id})")
             except Exception as email_error:
                 print(f"[WARN] Failed to send invitation email: {email_error}")
                 print(f"[WARN] Invitation created successfully, but email delivery failed")
@@ -168,6 +172,8 @@ def send_client_invitation(username=None, user_id=None, email=None):
                 "invited_email": invited_email,
                 "expires_at": expires_at.isoformat(),
                 "invited_at": invited_at.isoformat(),
+                "email_sent": email_sent,
+                "email_message_id": email_message_id,
             }), 201
 
     except Exception as exc:
@@ -447,15 +453,23 @@ def resend_invitation(username=None, invitation_id=None):
             html_content = html_content.replace('{{logo_html}}', logo_html)
 
             subject = "Reminder: Complete Your Client Onboarding"
+            email_message_id = None
             try:
-                email_sent = send_email(invitation['invited_email'], subject, html_content)
-                print(f"[RESEND] Email sent: {email_sent}")
+                queued = enqueue_email(
+                    invitation['invited_email'], subject, html_content, requested_by=username, dedupe=False
+                )
+                email_message_id = queued['id']
+                print(f"[RESEND] Email {queued['status']} (message {email_message_id})")
             except Exception as email_error:
                 print(f"[WARN] Failed to send reminder email: {email_error}")
                 print(f"[WARN] Invitation updated successfully, but email delivery failed")
                 # Don't fail the request if email fails - invitation is still updated
 
-            return jsonify({"success": True, "message": "Invitation resent"}), 200
+            return jsonify({
+                "success": True,
+                "message": "Invitation resent",
+                "email_message_id": email_message_id,
+            }), 200
 
     except Exception as exc:
         print(f"[ERROR] Error resending invitation: {exc}")
@@ -530,17 +544,7 @@ def get_clients(username=None, user_id=None, email=None):
             user_role = (current_user.get('role') or '').lower().strip()
 
             # Check which columns exist in the clients table
-            cursor.execute("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name='clients'
-                ORDER BY ordinal_position
-            """)
-            available_columns = {
-                row[0] if isinstance(row, tuple) else row.get('column_name')
-                for row in cursor.fetchall()
-            }
-            available_columns = {col for col in available_columns if col}
+            available_columns = get_table_columns('clients', cursor)
             
             # Build SELECT query based on available columns
             select_fields = []
@@ -670,18 +674,7 @@ def create_client(username=None, user_id=None, email=None):
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-            cursor.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_name='clients'
-                """
-            )
-            clients_columns = {
-                (row[0] if isinstance(row, tuple) else row.get('column_name'))
-                for row in cursor.fetchall()
-            }
-            clients_columns = {c for c in clients_columns if c}
+            clients_columns = get_table_columns('clients', cursor)
 
             current_user = _resolve_current_user(cursor, username=username, user_id=user_id, email=email)
             if not current_user:
@@ -896,18 +889,7 @@ def update_client(username=None, client_id=None, user_id=None, email=None):
             if user_role not in allowed_roles and not is_finance_variant:
                 return jsonify({"error": "Insufficient permissions"}), 403
 
-            cursor.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_name='clients'
-                """
-            )
-            clients_columns = {
-                (row[0] if isinstance(row, tuple) else row.get('column_name'))
-                for row in cursor.fetchall()
-            }
-            clients_columns = {c for c in clients_columns if c}
+            clients_columns = get_table_columns('clients', cursor)
 
             cursor.execute("SELECT * FROM clients WHERE id = %s", (client_id,))
             existing = cursor.fetchone()
@@ -10,7 +10,7 @@ import psycopg2
 import psycopg2.extras
 from datetime import datetime, timedelta
 
-from api.utils.database import get_db_connection
+from api.utils.database import get_db_connection, get_table_columns
 from api.utils.decorators import token_required
 from api.utils.email import send_email, get_logo_html
 from api.utils.helpers import create_notification
@@ -65,14 +65,7 @@ def _get_comment_notification_recipients(cursor, proposal_id, actor_user_id):
 
 
 def _get_proposal_owner_and_title(cursor, proposal_id):
-    cursor.execute(
-        """
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_schema = 'public' AND table_name = 'proposals'
-        """
-    )
-    cols = {r.get('column_name') for r in cursor.fetchall() or []}
+    cols = get_table_columns('proposals', cursor)
     owner_col = 'user_id' if 'user_id' in cols else ('owner_id' if 'owner_id' in cols else None)
     if not owner_col:
         return None, f"Proposal {proposal_id}"
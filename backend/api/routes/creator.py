@@ -13,7 +13,6 @@ import cloudinary.api
 import cloudinary.uploader
 import psycopg2.extras
 from datetime import datetime
-import requests
 
 try:
     from PyPDF2 import PdfReader
@@ -25,10 +24,20 @@ try:
 except ImportError:
     docx = None
 
-from api.utils.database import get_db_connection
+from api.utils.asset_cache import fetch_asset
+from api.utils.database import get_db_connection, get_id_type, get_table_columns, invalidate_schema_catalog
 from api.utils.decorators import token_required
 from api.utils.ai_safety import enforce_safe_for_external_ai, AISafetyError
 from api.utils.finance_audit import log_finance_audit_async, evaluate_proposal_compliance
+from api.utils.helpers import prewarm_proposal_pdf
+from api.utils.proposal_financials import refresh_proposal_financials_safe
+from api.utils.version_store import (
+    get_version_by_number,
+    list_versions,
+    load_all_contents,
+    save_version,
+    serialize_version,
+)
 try:
     from hf_ai_assistant_service import HFAIAssistantError
 except ImportError:
@@ -39,21 +48,29 @@ from api.routes.client import _encode_identity_hash
 bp = Blueprint('creator', __name__, url_prefix='')
 
 
-def _ensure_invitation_email_tracking_schema(cursor):
-    """Best-effort: add columns used to track email send attempts for invitations."""
+def _record_invitation_email_status(conn, cursor, invitation_id, status, error=None, count_attempt=True):
+    """Best-effort: store the latest email status on an invitation row and commit."""
     try:
         cursor.execute(
             """
-            ALTER TABLE collaboration_invitations
-            ADD COLUMN IF NOT EXISTS last_email_sent_at TIMESTAMPTZ,
-            ADD COLUMN IF NOT EXISTS last_email_status TEXT,
-            ADD COLUMN IF NOT EXISTS last_email_error TEXT,
-            ADD COLUMN IF NOT EXISTS last_email_attempts INTEGER DEFAULT 0
-            """
+            UPDATE collaboration_invitations
+            SET last_email_sent_at = NOW(),
+                last_email_status = %s,
+                last_email_error = %s,
+                last_email_attempts = COALESCE(last_email_attempts, 0) + %s
+            WHERE id = %s
+            """,
+            (status, error, 1 if count_attempt else 0, invitation_id),
         )
-    except Exception as e:
-        # Do not fail core flow if schema migrations are not permitted.
-        print(f"⚠️ Failed to ensure invitation email tracking columns: {e}")
+        conn.commit()
+        return True
+    except Exception as track_err:
+        print(f"⚠️ Failed to store invitation email send status: {track_err}")
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        return False
 
 
 def _build_upload_base_url():
@@ -258,10 +275,8 @@ def _slugify(value: str) -> str:
 
 
 def _download_asset_bytes(*, url: str) -> tuple[bytes, str | None]:
-    resp = requests.get(url, timeout=60)
-    resp.raise_for_status()
-    content_type = resp.headers.get("content-type")
-    return resp.content, content_type
+    asset = fetch_asset(url, timeout=60)
+    return asset.content, asset.content_type
 
 
 def _extract_text_from_file_bytes(file_bytes: bytes, content_type: str | None, filename: str | None) -> str:
@@ -735,6 +750,7 @@ def submit_for_review(username=None, proposal_id=None):
                 '''UPDATE proposals SET status = 'Submitted', updated_at = CURRENT_TIMESTAMP WHERE id = %s''',
                 (proposal_id,)
             )
+            refresh_proposal_financials_safe(cursor, proposal_id)
             conn.commit()
             return {'detail': 'Proposal submitted for review'}, 200
     except Exception as e:
@@ -777,14 +793,7 @@ def send_for_approval(username=None, proposal_id=None, user_id=None, email=None)
             user_id = effective_user_id
             
             # Determine ownership column based on actual schema (owner_id vs user_id)
-            cursor.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_name = 'proposals'
-                """
-            )
-            existing_columns = [row[0] for row in cursor.fetchall()]
+            existing_columns = get_table_columns('proposals', cursor)
 
             owner_col = None
             if 'owner_id' in existing_columns:
@@ -818,6 +827,7 @@ def send_for_approval(username=None, proposal_id=None, user_id=None, email=None)
                 f'''UPDATE proposals SET status = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s''',
                 (new_status, proposal_id)
             )
+            refresh_proposal_financials_safe(cursor, proposal_id)
             
             # If resubmission, notify admin users
             if is_resubmission:
@@ -906,6 +916,7 @@ def finance_resubmit(username=None, proposal_id=None, user_id=None, email=None):
                 "UPDATE proposals SET status = 'Resubmitted', updated_at = NOW() WHERE id = %s",
                 (proposal_id,)
             )
+            refresh_proposal_financials_safe(cursor, proposal_id)
 
             proposal_title = proposal.get('title') or f'Proposal {proposal_id}'
 
@@ -963,19 +974,7 @@ def send_to_client(username=None, proposal_id=None):
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
             def _get_table_columns(table_name: str):
-                cursor.execute(
-                    """
-                    SELECT column_name
-                    FROM information_schema.columns
-                    WHERE table_schema = 'public' AND table_name = %s
-                    """,
-                    (table_name,),
-                )
-                cols = cursor.fetchall() or []
-                return {
-                    (c['column_name'] if isinstance(c, dict) else c[0])
-                    for c in cols
-                }
+                return set(get_table_columns(table_name, cursor))
 
             def _pick_first(existing, candidates):
                 for c in candidates:
@@ -1048,6 +1047,7 @@ def send_to_client(username=None, proposal_id=None):
                 try:
                     if 'identity_last4_hash' not in proposal_cols:
                         cursor.execute("ALTER TABLE proposals ADD COLUMN identity_last4_hash TEXT")
+                        invalidate_schema_catalog('proposals')
                         proposal_cols.add('identity_last4_hash')
                 except Exception as schema_err:
                     print(f"⚠️ Failed to ensure identity_last4_hash column exists: {schema_err}")
@@ -1070,7 +1070,10 @@ def send_to_client(username=None, proposal_id=None):
                 """UPDATE proposals SET status = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s""",
                 (new_status, proposal_id)
             )
+            refresh_proposal_financials_safe(cursor, proposal_id)
             conn.commit()
+            # The client will open the preview next; render it while the email goes out.
+            prewarm_proposal_pdf(proposal_id)
 
             log_finance_audit_async(
                 user_id=sender.get('id'),
@@ -1089,6 +1092,9 @@ def send_to_client(username=None, proposal_id=None):
             # Send email to client
             email_sent = False
             email_error_message = None
+            email_message_id = None
+            email_status = None
+            email_tracked = False
             access_token = None
             invitation_row_id = None
             client_email = proposal.get('client_email')
@@ -1097,7 +1103,8 @@ def send_to_client(username=None, proposal_id=None):
             
             if client_email and client_email.strip():
                 try:
-                    from api.utils.email import send_email, get_logo_html
+                    from api.utils.email import get_logo_html
+                    from api.utils.email_outbox import enqueue_email
                     import secrets
                     
                     from api.utils.helpers import get_frontend_url
@@ -1199,9 +1206,21 @@ def send_to_client(username=None, proposal_id=None):
                     <p>Kind regards,<br>{sender_name}<br>Khonology Team</p>
                     """
                     
-                    email_sent = send_email(client_email, email_subject, email_body)
+                    # Mark the invitation queued before a worker can report the delivery outcome.
+                    if invitation_row_id:
+                        email_tracked = _record_invitation_email_status(conn, cursor, invitation_row_id, 'queued')
+                    queued = enqueue_email(
+                        client_email,
+                        email_subject,
+                        email_body,
+                        context={'collaboration_invitation_id': invitation_row_id} if invitation_row_id else None,
+                        requested_by=username,
+                    )
+                    email_message_id = queued['id']
+                    email_status = queued['status']
+                    email_sent = email_status != 'failed'
                     if email_sent:
-                        print(f"[EMAIL] Proposal email sent to {client_email}")
+                        print(f"[EMAIL] Proposal email {email_status} for {client_email} (message {email_message_id})")
                     else:
                         print(f"[EMAIL] Failed to send proposal email to {client_email}")
                 except Exception as email_error:
@@ -1209,28 +1228,17 @@ def send_to_client(username=None, proposal_id=None):
                     email_error_message = str(email_error)
                     traceback.print_exc()
 
-                # Persist send status on invitation row if possible.
-                try:
-                    _ensure_invitation_email_tracking_schema(cursor)
-                    if invitation_row_id:
-                        cursor.execute(
-                            """
-                            UPDATE collaboration_invitations
-                            SET last_email_sent_at = NOW(),
-                                last_email_status = %s,
-                                last_email_error = %s,
-                                last_email_attempts = COALESCE(last_email_attempts, 0) + 1
-                            WHERE id = %s
-                            """,
-                            (
-                                'sent' if email_sent else 'failed',
-                                None if email_sent else (email_error_message or 'send_email returned false'),
-                                invitation_row_id,
-                            ),
-                        )
-                        conn.commit()
-                except Exception as track_err:
-                    print(f"⚠️ Failed to store invitation email send status: {track_err}")
+                # The outbox worker records the outcome of queued messages; persist the rest here
+                # (queue failures, synchronous fallback sends and duplicates that already finished).
+                if invitation_row_id and email_status not in ('queued', 'sending'):
+                    _record_invitation_email_status(
+                        conn,
+                        cursor,
+                        invitation_row_id,
+                        email_status if email_sent else 'failed',
+                        None if email_sent else (email_error_message or 'send_email returned false'),
+                        count_attempt=not email_tracked,
+                    )
             else:
                 if client_email is None:
                     print(f"[EMAIL] No client_email column available on proposals table for proposal {proposal_id}")
@@ -1241,6 +1249,8 @@ def send_to_client(username=None, proposal_id=None):
                 'detail': 'Proposal sent to client',
                 'status': new_status,
                 'email_sent': email_sent,
+                'email_status': email_status,
+                'email_message_id': email_message_id,
                 'email_error': email_error_message,
                 'access_token': access_token,
             }, 200
@@ -1263,9 +1273,6 @@ def resend_client_email(username=None, proposal_id=None, user_id=None, email=Non
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-            _ensure_invitation_email_tracking_schema(cursor)
-            conn.commit()
-
             # Load proposal basics
             cursor.execute(
                 """
@@ -1320,8 +1327,12 @@ def resend_client_email(username=None, proposal_id=None, user_id=None, email=Non
             access_token = invitation.get('access_token')
             invitation_id = invitation.get('id')
 
+            email_message_id = None
+            email_status = None
+            email_tracked = False
             try:
-                from api.utils.email import send_email, get_logo_html
+                from api.utils.email import get_logo_html
+                from api.utils.email_outbox import enqueue_email
                 from api.utils.helpers import get_frontend_url
                 frontend_url = get_frontend_url()
 
@@ -1343,32 +1354,39 @@ def resend_client_email(username=None, proposal_id=None, user_id=None, email=Non
                 <p style="word-break: break-all; color: #666;"><a href="{client_link}" style="color: #0066cc; text-decoration: underline;">{client_link}</a></p>
                 """
 
-                ok = send_email(effective_email, email_subject, email_body)
+                email_tracked = _record_invitation_email_status(conn, cursor, invitation_id, 'queued')
+                queued = enqueue_email(
+                    effective_email,
+                    email_subject,
+                    email_body,
+                    context={'collaboration_invitation_id': invitation_id},
+                    requested_by=username,
+                    dedupe=False,
+                )
+                email_message_id = queued['id']
+                email_status = queued['status']
+                ok = email_status != 'failed'
                 err_msg = None if ok else 'send_email returned false'
 
             except Exception as e:
                 ok = False
                 err_msg = str(e)
 
-            try:
-                cursor.execute(
-                    """
-                    UPDATE collaboration_invitations
-                    SET last_email_sent_at = NOW(),
-                        last_email_status = %s,
-                        last_email_error = %s,
-                        last_email_attempts = COALESCE(last_email_attempts, 0) + 1
-                    WHERE id = %s
-                    """,
-                    ('sent' if ok else 'failed', err_msg, invitation_id),
+            if email_status not in ('queued', 'sending'):
+                _record_invitation_email_status(
+                    conn,
+                    cursor,
+                    invitation_id,
+                    email_status if ok else 'failed',
+                    err_msg,
+                    count_attempt=not email_tracked,
                 )
-                conn.commit()
-            except Exception as track_err:
-                print(f"⚠️ Failed to update resend status: {track_err}")
 
             return {
                 'detail': 'Email resent' if ok else 'Email resend failed',
                 'email_sent': bool(ok),
+                'email_status': email_status,
+                'email_message_id': email_message_id,
                 'email_error': err_msg,
                 'access_token': access_token,
                 'invitation_id': invitation_id,
@@ -1508,7 +1526,7 @@ def get_upload_signature(username=None):
 @bp.post("/proposals/<int:proposal_id>/versions")
 @token_required
 def create_version(username=None, proposal_id=None, user_id=None, email=None):
-    """Create a new version of a proposal"""
+    """Create a new version of a proposal (stored as a snapshot or a delta, see version_store)"""
     try:
         data = request.get_json()
         print(f"📝 Creating version {data.get('version_number')} for proposal {proposal_id}")
@@ -1527,31 +1545,20 @@ def create_version(username=None, proposal_id=None, user_id=None, email=None):
                 effective_user_id = user_row[0] if user_row else None
 
             user_id = effective_user_id
+            content = data.get('content', '')
             
-            # Get next version number if not provided
-            if 'version_number' not in data:
-                cursor.execute(
-                    'SELECT COALESCE(MAX(version_number), 0) + 1 FROM proposal_versions WHERE proposal_id = %s',
-                    (proposal_id,)
+            def _save():
+                return save_version(
+                    cursor,
+                    proposal_id,
+                    content,
+                    created_by=user_id,
+                    version_number=data.get('version_number'),
+                    change_description=data.get('change_description'),
                 )
-                version_number = cursor.fetchone()[0] or 1
-            else:
-                version_number = data.get('version_number', 1)
             
             try:
-                cursor.execute(
-                    '''INSERT INTO proposal_versions 
-                       (proposal_id, version_number, content, created_by)
-                       VALUES (%s, %s, %s, %s)
-                       RETURNING id, proposal_id, version_number, content, created_by, created_at''',
-                    (
-                        proposal_id,
-                        version_number,
-                        data.get('content', ''),
-                        user_id
-                    )
-                )
-                result = cursor.fetchone()
+                result = _save()
                 conn.commit()
             except Exception as seq_error:
                 # Rollback the failed transaction
@@ -1568,19 +1575,7 @@ def create_version(username=None, proposal_id=None, user_id=None, email=None):
                         conn.commit()
                         
                         # Retry the insert in a fresh transaction
-                        cursor.execute(
-                            '''INSERT INTO proposal_versions 
-                               (proposal_id, version_number, content, created_by)
-                               VALUES (%s, %s, %s, %s)
-                               RETURNING id, proposal_id, version_number, content, created_by, created_at''',
-                            (
-                                proposal_id,
-                                version_number,
-                                data.get('content', ''),
-                                user_id
-                            )
-                        )
-                        result = cursor.fetchone()
+                        result = _save()
                         conn.commit()
                     except Exception as retry_error:
                         conn.rollback()
@@ -1589,16 +1584,11 @@ def create_version(username=None, proposal_id=None, user_id=None, email=None):
                     # For other errors, re-raise
                     raise
             
-            version = {
-                'id': result[0],
-                'proposal_id': result[1],
-                'version_number': result[2],
-                'content': result[3],
-                'created_by': result[4],
-                'created_at': result[5].isoformat() if result[5] else None
-            }
+            version = serialize_version(result)
+            version['content'] = content
             
-            print(f"✅ Version {result[2]} created for proposal {proposal_id}")
+            print(f"✅ Version {version['version_number']} created for proposal {proposal_id} "
+                  f"({version['storage_kind']}, {version['stored_size']} of {version['content_size']} bytes)")
             return version, 201
     except Exception as e:
         print(f"❌ Error creating version: {e}")
@@ -1608,29 +1598,20 @@ def create_version(username=None, proposal_id=None, user_id=None, email=None):
 @bp.get("/proposals/<int:proposal_id>/versions")
 @token_required
 def get_versions(username=None, proposal_id=None):
-    """Get all versions of a proposal"""
+    """Get all versions of a proposal
+
+    `?content=false` returns only metadata (number, author, timestamp, sizes,
+    change summary) without reconstructing any content.
+    """
     try:
+        include_content = request.args.get('content', 'true').strip().lower() not in ('0', 'false', 'no')
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                '''SELECT id, proposal_id, version_number, content, created_by, created_at
-                   FROM proposal_versions
-                   WHERE proposal_id = %s
-                   ORDER BY version_number DESC''',
-                (proposal_id,)
-            )
-            rows = cursor.fetchall()
-            
-            versions = []
-            for row in rows:
-                versions.append({
-                    'id': row[0],
-                    'proposal_id': row[1],
-                    'version_number': row[2],
-                    'content': row[3],
-                    'created_by': row[4],
-                    'created_at': row[5].isoformat() if row[5] else None
-                })
+            versions = list_versions(cursor, proposal_id)
+            if include_content and versions:
+                contents = load_all_contents(cursor, proposal_id)
+                for version in versions:
+                    version['content'] = contents.get(version['id'])
             
             print(f"✅ Found {len(versions)} versions for proposal {proposal_id}")
             return versions, 200
@@ -1646,27 +1627,11 @@ def get_version(username=None, proposal_id=None, version_number=None):
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                '''SELECT id, proposal_id, version_number, content, created_by, created_at, change_description
-                   FROM proposal_versions
-                   WHERE proposal_id = %s AND version_number = %s''',
-                (proposal_id, version_number)
-            )
-            row = cursor.fetchone()
+            version = get_version_by_number(cursor, proposal_id, version_number)
             
-            if not row:
+            if not version:
                 return {'detail': 'Version not found'}, 404
             
-            version = {
-                'id': row[0],
-                'proposal_id': row[1],
-                'version_number': row[2],
-                'content': row[3],
-                'created_by': row[4],
-                'created_at': row[5].isoformat() if row[5] else None,
-                'change_description': row[6]
-            }
-            
             return version, 200
     except Exception as e:
         print(f"❌ Error getting version: {e}")
@@ -2357,13 +2322,15 @@ def get_proposal_analytics(username=None, proposal_id=None):
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
             
             # Verify proposal exists and user has access
-            cursor.execute("""
-                SELECT id, title, status, client_id
-                FROM proposals 
-                WHERE id = %s OR id::text = %s
-            """, (proposal_id, str(proposal_id)))
-            
-            proposal = cursor.fetchone()
+            typed_proposal_id = get_id_type('proposals', cursor=cursor).coerce(proposal_id)
+            proposal = None
+            if typed_proposal_id is not None:
+                cursor.execute("""
+                    SELECT id, title, status, client_id
+                    FROM proposals
+                    WHERE id = %s
+                """, (typed_proposal_id,))
+                proposal = cursor.fetchone()
             if not proposal:
                 return {'detail': 'Proposal not found'}, 404
             
@@ -2574,14 +2541,7 @@ def get_proposal_collaborators(username=None, proposal_id=None, user_id=None, em
             is_admin = role_key in ['admin', 'ceo', 'approver']
 
             # Verify ownership
-            cursor.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_name = 'proposals'
-                """
-            )
-            proposal_columns = [row['column_name'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+            proposal_columns = get_table_columns('proposals', cursor)
             owner_col = 'owner_id' if 'owner_id' in proposal_columns else ('user_id' if 'user_id' in proposal_columns else None)
             if not owner_col:
                 return {'detail': 'Proposals table is missing owner column'}, 500
@@ -2689,14 +2649,7 @@ def invite_collaborator(username=None, proposal_id=None, user_id=None, email=Non
             is_admin = role_key in ['admin', 'ceo', 'approver']
             
             # Verify ownership
-            cursor.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_name = 'proposals'
-                """
-            )
-            proposal_columns = [row['column_name'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+            proposal_columns = get_table_columns('proposals', cursor)
             owner_col = 'owner_id' if 'owner_id' in proposal_columns else ('user_id' if 'user_id' in proposal_columns else None)
             if not owner_col:
                 return {'detail': 'Proposals table is missing owner column'}, 500
@@ -2742,8 +2695,10 @@ def invite_collaborator(username=None, proposal_id=None, user_id=None, email=Non
             # Send invitation email
             email_sent = False
             email_error = None
+            email_message_id = None
             try:
-                from api.utils.email import send_email, get_logo_html
+                from api.utils.email import get_logo_html
+                from api.utils.email_outbox import enqueue_email
                 from api.utils.helpers import get_frontend_url
                 base_url = get_frontend_url()
                 invite_url = f"{base_url}/#/collaborate?token={access_token}"
@@ -2760,13 +2715,19 @@ def invite_collaborator(username=None, proposal_id=None, user_id=None, email=Non
                 <p>This link will give you full access to edit, comment, and suggest changes.</p>
                 """
                 
-                send_email(
+                queued = enqueue_email(
                     to_email=invited_email,
                     subject=f"Collaboration Invitation: {proposal['title']}",
-                    html_content=email_body
+                    html_content=email_body,
+                    context={'collaboration_invitation_id': invitation['id']},
+                    requested_by=username,
                 )
-                email_sent = True
-                print(f"✅ Invitation email sent successfully to {invited_email}")
+                email_message_id = queued['id']
+                email_sent = queued['status'] != 'failed'
+                if email_sent:
+                    print(f"✅ Invitation email queued for {invited_email} (message {email_message_id})")
+                else:
+                    email_error = 'send_email returned false'
             except Exception as e:
                 email_error = str(e)
                 print(f"❌ Error sending invitation email to {invited_email}: {email_error}")
@@ -2781,7 +2742,8 @@ def invite_collaborator(username=None, proposal_id=None, user_id=None, email=Non
                 'status': invitation['status'],
                 'invited_at': invitation['invited_at'].isoformat() if invitation['invited_at'] else None,
                 'access_token': invitation['access_token'],
-                'email_sent': email_sent
+                'email_sent': email_sent,
+                'email_message_id': email_message_id,
             }
             
             # Include email error message if email failed to send
@@ -2884,6 +2846,7 @@ def archive_proposal(username=None, proposal_id=None):
             """, (proposal_id,))
             
             result = cursor.fetchone()
+            refresh_proposal_financials_safe(cursor, proposal_id)
             conn.commit()
             
             # Log activity
@@ -2963,6 +2926,7 @@ def restore_proposal(username=None, proposal_id=None):
             """, (proposal_id,))
             
             result = cursor.fetchone()
+            refresh_proposal_financials_safe(cursor, proposal_id)
             conn.commit()
             
             # Log activity
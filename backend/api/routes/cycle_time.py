@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
 import psycopg2
-from api.utils.database import _pg_conn, release_pg_conn
+from api.utils.database import _pg_conn, release_pg_conn, get_table_columns, table_exists
 from api.utils.decorators import token_required
 
 bp = Blueprint("cycle_time", __name__)
@@ -18,8 +18,7 @@ def _parse_date(s: str | None):
 
 
 def _table_exists(cursor, table_name: str) -> bool:
-    cursor.execute("SELECT to_regclass(%s)", (f"public.{table_name}",))
-    return cursor.fetchone()[0] is not None
+    return table_exists(table_name, cursor)
 
 
 @bp.get("/analytics/cycle-time")
@@ -61,16 +60,8 @@ def cycle_time_metrics(username=None, user_id=None, email=None):
             owner_filter = request.args.get("owner_id")
 
         # Discover schema
-        cursor.execute(
-            """
-            SELECT column_name, data_type
-            FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = 'proposals'
-            """
-        )
-        cols = cursor.fetchall()
-        existing_columns = {r[0] for r in cols}
-        col_types = {r[0]: r[1] for r in cols}
+        col_types = get_table_columns("proposals", cursor)
+        existing_columns = set(col_types)
 
         owner_col = None
         if "owner_id" in existing_columns:
@@ -373,27 +364,12 @@ def client_engagement(username=None, user_id=None, email=None):
         if owner_filter is None:
             owner_filter = request.args.get("owner_id")
 
-        cursor.execute(
-            """
-            SELECT column_name, data_type
-            FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = 'proposals'
-            """
-        )
-        cols = cursor.fetchall()
-        existing_columns = {r[0] for r in cols}
-        col_types = {r[0]: r[1] for r in cols}
+        col_types = get_table_columns("proposals", cursor)
+        existing_columns = set(col_types)
 
         clients_cols = set()
         if region_filter and _table_exists(cursor, "clients"):
-            cursor.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_schema = 'public' AND table_name = 'clients'
-                """
-            )
-            clients_cols = {r[0] for r in cursor.fetchall() or []}
+            clients_cols = set(get_table_columns("clients", cursor))
 
         owner_col = None
         if "owner_id" in existing_columns:
@@ -874,16 +850,8 @@ def collaboration_load(username=None, user_id=None, email=None):
             if owner_filter is None:
                 owner_filter = request.args.get("owner_id")
 
-            cursor.execute(
-                """
-                SELECT column_name, data_type
-                FROM information_schema.columns
-                WHERE table_schema = 'public' AND table_name = 'proposals'
-                """
-            )
-            cols = cursor.fetchall()
-            existing_columns = {r[0] for r in cols}
-            col_types = {r[0]: r[1] for r in cols}
+            col_types = get_table_columns("proposals", cursor)
+            existing_columns = set(col_types)
 
             owner_col = None
             if "owner_id" in existing_columns:
@@ -23,10 +23,32 @@ import psycopg2.extras
 from psycopg2.extras import Json
 from flask import Blueprint, jsonify, request
 
-from api.utils.database import get_db_connection
+from api.utils.database import get_db_connection, get_table_columns, table_exists
 from api.utils.decorators import token_required, finance_required
 from api.utils.helpers import create_notification
-from api.routes.finance_export import _extract_amount_from_content as _extract_amount_from_content_export
+from api.utils.finance_engine import (
+    FINANCE_STAGE_CODES,
+    FINANCE_STAGES,
+    FinanceSnapshot,
+    get_finance_snapshot,
+    group_totals,
+    indices,
+    mask_and,
+    mask_eq,
+    mask_ge,
+    mask_isin,
+    mask_le,
+    mask_lt,
+    masked_count,
+    masked_sum,
+    multiply,
+    top_indices,
+)
+from api.utils.proposal_financials import (
+    AMOUNT_COLUMN_CANDIDATES,
+    finance_stage_for_status,
+    refresh_proposal_financials,
+)
 
 
 bp = Blueprint("finance_analytics", __name__)
@@ -92,22 +114,7 @@ def _status_key(status: Any) -> str:
 
 
 def _stage_from_status(status: Any) -> str:
-    s = _status_key(status)
-    if not s or "draft" in s:
-        return "Draft"
-    if "signed" in s or "client signed" in s or "won" in s:
-        return "Signed"
-    if "negotiat" in s:
-        return "Negotiation"
-    if "view" in s or "opened" in s:
-        return "Viewed"
-    if "sent" in s or "released" in s:
-        return "Sent"
-    if "review" in s or "pending" in s or "approved" in s:
-        return "In Review"
-    if "archiv" in s or "cancel" in s or "declin" in s or "lost" in s:
-        return "Archived"
-    return "Other"
+    return finance_stage_for_status(status)
 
 
 def _stage_probability(stage: str) -> float:
@@ -126,31 +133,6 @@ def _stage_probability(stage: str) -> float:
     return float(mapping.get(stage_key, 0.25))
 
 
-def _extract_amount_from_content(content_data: Any) -> float:
-    """Extract a monetary amount from proposal content.
-
-    We intentionally reuse the finance export extraction logic so analytics and exports
-    stay consistent.
-    """
-    try:
-        return float(_extract_amount_from_content_export(content_data) or 0.0)
-    except Exception:
-        return 0.0
-
-
-def _safe_json_load(value: Any) -> Any:
-    if value is None:
-        return None
-    if isinstance(value, (dict, list)):
-        return value
-    if isinstance(value, str):
-        try:
-            return json.loads(value)
-        except Exception:
-            return None
-    return None
-
-
 def _year_param() -> int:
     y = _parse_int(request.args.get("year"), None)
     if y is None:
@@ -159,12 +141,7 @@ def _year_param() -> int:
 
 
 def _table_exists(cursor, table_name: str) -> bool:
-    cursor.execute("SELECT to_regclass(%s)", (f"public.{table_name}",))
-    row = cursor.fetchone()
-    if not row:
-        return False
-    val = row.get("to_regclass") if isinstance(row, dict) else row[0]
-    return val is not None
+    return table_exists(table_name, cursor)
 
 
 @dataclass
@@ -179,20 +156,14 @@ class ProposalFinanceRow:
     amount_field: Optional[float]
     amount: float
     ai_probability: Optional[float]
+    last_status_change_at: Optional[datetime] = None
 
 
 def _load_proposals_with_finance(year: int) -> List[ProposalFinanceRow]:
     with get_db_connection() as conn:
         cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-        cursor.execute(
-            """
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = 'proposals'
-            """
-        )
-        cols = {r["column_name"] for r in cursor.fetchall() or []}
+        cols = set(get_table_columns("proposals", cursor))
 
         client_expr = "NULL::text"
         if "client" in cols:
@@ -208,13 +179,14 @@ def _load_proposals_with_finance(year: int) -> List[ProposalFinanceRow]:
         if "updated_at" not in cols:
             updated_expr = "p.created_at"
 
-        content_expr = "p.content" if "content" in cols else "NULL::text"
-        sections_expr = "p.sections" if "sections" in cols else "NULL::text"
+        status_changed_expr = "NULL::timestamp"
+        if "last_status_change_at" in cols:
+            status_changed_expr = "p.last_status_change_at"
 
         # Pull a numeric amount directly from the proposals table when available.
         # This matches what the Flutter UI shows in the proposals list.
         amount_expr = "NULL::text"
-        for candidate in ["budget", "amount", "total_amount", "value", "total", "price"]:
+        for candidate in AMOUNT_COLUMN_CANDIDATES:
             if candidate in cols:
                 amount_expr = f"p.{candidate}::text"
                 break
@@ -222,6 +194,9 @@ def _load_proposals_with_finance(year: int) -> List[ProposalFinanceRow]:
         # Load proposals broadly (pipeline KPIs should not go blank when the user selects
         # a year that doesn't match created_at/updated_at). Year filtering is applied
         # later at aggregation time for month-based charts.
+        #
+        # Derived amounts come from the proposal_financials projection (maintained on
+        # write), so the heavy content/sections JSON is no longer selected here.
         cursor.execute(
             f"""
             WITH latest_risk AS (
@@ -240,25 +215,37 @@ def _load_proposals_with_finance(year: int) -> List[ProposalFinanceRow]:
                 p.created_at,
                 {updated_expr} AS updated_at,
                 {target_close_expr} AS target_close_at,
+                {status_changed_expr} AS last_status_change_at,
                 {amount_expr} AS amount_field,
-                {content_expr} AS content,
-                {sections_expr} AS sections,
+                pf.amount AS projected_amount,
+                (pf.proposal_id IS NULL) AS projection_missing,
                 lr.risk_score AS risk_score
             FROM proposals p
+            LEFT JOIN proposal_financials pf ON pf.proposal_id = p.id
             LEFT JOIN latest_risk lr ON lr.proposal_id = p.id
             """,
         )
 
         rows = cursor.fetchall() or []
 
+        # Self-heal: proposals written before the projection existed (or by a path that
+        # skipped the refresh) are computed once here and persisted.
+        missing_ids = [r.get("id") for r in rows if r.get("projection_missing")]
+        healed: Dict[int, Dict[str, Any]] = {}
+        if missing_ids:
+            try:
+                healed = refresh_proposal_financials(cursor, missing_ids)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"[FINANCE] Failed to self-heal proposal_financials: {e}")
+
     out: List[ProposalFinanceRow] = []
     for r in rows:
         pid = _parse_int(r.get("id"), None)
         if pid is None:
             continue
 
-        content_obj = _safe_json_load(r.get("content"))
-        sections_obj = _safe_json_load(r.get("sections"))
         amount_field = None
         try:
             if r.get("amount_field") is not None:
@@ -268,15 +255,10 @@ def _load_proposals_with_finance(year: int) -> List[ProposalFinanceRow]:
         except Exception:
             amount_field = None
 
-        amount = 0.0
-        if amount_field is not None and amount_field > 0:
-            amount = float(amount_field)
+        if pid in healed:
+            amount = float(healed[pid].get("amount") or 0.0)
         else:
-            amount = float(_extract_amount_from_content(content_obj) or 0.0)
-            # Fallback: some deployments store pricing tables in the `sections` column
-            # while leaving `content` as non-JSON text.
-            if amount <= 0 and sections_obj is not None:
-                amount = float(_extract_amount_from_content(sections_obj) or 0.0)
+            amount = _parse_float(r.get("projected_amount"), default=0.0)
 
         risk_score = r.get("risk_score")
         ai_probability = None
@@ -302,6 +284,7 @@ def _load_proposals_with_finance(year: int) -> List[ProposalFinanceRow]:
                 amount_field=amount_field,
                 amount=float(amount or 0.0),
                 ai_probability=ai_probability,
+                last_status_change_at=_parse_date(r.get("last_status_change_at")),
             )
         )
 
@@ -388,217 +371,234 @@ def _signed_at(p: ProposalFinanceRow) -> Optional[datetime]:
     return dt
 
 
-@bp.get("/finance/summary")
-@token_required
-@finance_required
-def finance_summary(username=None, user_id=None, email=None):
-    year = _year_param()
+def _build_finance_snapshot(year: int) -> FinanceSnapshot:
     proposals = _load_proposals_with_finance(year)
 
-    pipeline_value = 0.0
-    expected_revenue = 0.0
-    signed_revenue = 0.0
-    signed_deals = 0
-    sent_total = 0
-    signed_total = 0
-
+    client_codes: Dict[str, int] = {}
+    records: List[Dict[str, Any]] = []
     for p in proposals:
-        pipeline_value += float(p.amount)
-
-        if _is_open_deal(p):
-            expected_revenue += float(p.amount) * float(_effective_probability(p))
+        stage = _stage_from_status(p.status)
 
-        if _is_signed(p):
-            signed_revenue += float(p.amount)
-            signed_deals += 1
+        activity = p.updated_at or p.created_at
+        if activity is not None and activity.tzinfo is None:
+            activity = activity.replace(tzinfo=timezone.utc)
 
-        if _is_sent(p):
-            sent_total += 1
-        if _is_signed(p):
-            signed_total += 1
+        forecast_year, forecast_month = 0, 0
+        forecast_key = _expected_close_month(p)
+        if forecast_key:
+            forecast_year, forecast_month = (int(x) for x in forecast_key.split("-"))
 
-    # Some deployments mark proposals directly as Signed without ever passing
-    # through an explicit Sent/Released status. If we only divide by sent_total
-    # we can incorrectly show 0% even though signed deals exist.
-    denom = sent_total if sent_total > 0 else signed_total
-    win_rate = (signed_total / denom) if denom > 0 else 0.0
-    avg_deal = (signed_revenue / signed_deals) if signed_deals > 0 else 0.0
+        client = (p.client_name or "").strip() or "Unknown Client"
+        client_code = client_codes.setdefault(client, len(client_codes))
 
-    return (
-        jsonify(
+        records.append(
             {
-                "metric": "finance_summary",
-                "year": year,
-                "pipeline_value": round(pipeline_value, 2),
-                "expected_revenue": round(expected_revenue, 2),
-                "signed_revenue": round(signed_revenue, 2),
-                "win_rate": round(win_rate, 4),
-                "average_deal_size": round(avg_deal, 2),
-                "sent": int(sent_total),
-                "signed": int(signed_total),
-                "signed_deals": int(signed_deals),
+                "amount": float(p.amount or 0.0),
+                "probability": float(_effective_probability(p)),
+                "stage_code": FINANCE_STAGE_CODES.get(stage, FINANCE_STAGE_CODES["Other"]),
+                "is_sent": _is_sent(p),
+                "is_signed": _is_signed(p),
+                "is_open": stage not in {"Signed", "Archived"},
+                "activity_year": activity.year if activity else 0,
+                "activity_month": activity.month if activity else 0,
+                "forecast_year": forecast_year,
+                "forecast_month": forecast_month,
+                "activity_ts": activity.timestamp() if activity else -1.0,
+                "client_code": client_code,
             }
-        ),
-        200,
-    )
+        )
 
+    return FinanceSnapshot(proposals, records, list(client_codes.keys()))
 
-@bp.get("/finance/recent-signed")
-@token_required
-@finance_required
-def recent_signed_deals(username=None, user_id=None, email=None):
-    year = _year_param()
-    limit = _parse_int(request.args.get("limit"), 10) or 10
-    limit = max(1, min(limit, 50))
 
-    proposals = _load_proposals_with_finance(year)
+def _finance_snapshot(year: int) -> FinanceSnapshot:
+    # Finance endpoints are org-wide (finance_required), so the scope is "all".
+    return get_finance_snapshot((year, "all"), lambda: _build_finance_snapshot(year))
 
-    signed_rows: List[Tuple[datetime, ProposalFinanceRow]] = []
-    for p in proposals:
-        dt = _signed_at(p)
-        if dt is None:
-            continue
-        signed_rows.append((dt, p))
 
-    signed_rows.sort(key=lambda t: t[0], reverse=True)
+def _month_keys(year: int) -> List[str]:
+    return [f"{year:04d}-{m:02d}" for m in range(1, 13)]
+
 
+def _kpi_summary(snap: FinanceSnapshot, year: int) -> Dict[str, Any]:
+    pipeline_value = masked_sum(snap.amount)
+    expected_revenue = masked_sum(multiply(snap.amount, snap.probability), snap.is_open)
+    signed_revenue = masked_sum(snap.amount, snap.is_signed)
+    signed_total = masked_count(snap.is_signed)
+    sent_total = masked_count(snap.is_sent)
+
+    # Some deployments mark proposals directly as Signed without ever passing
+    # through an explicit Sent/Released status. If we only divide by sent_total
+    # we can incorrectly show 0% even though signed deals exist.
+    denom = sent_total if sent_total > 0 else signed_total
+    win_rate = (signed_total / denom) if denom > 0 else 0.0
+    avg_deal = (signed_revenue / signed_total) if signed_total > 0 else 0.0
+
+    return {
+        "metric": "finance_summary",
+        "year": year,
+        "pipeline_value": round(pipeline_value, 2),
+        "expected_revenue": round(expected_revenue, 2),
+        "signed_revenue": round(signed_revenue, 2),
+        "win_rate": round(win_rate, 4),
+        "average_deal_size": round(avg_deal, 2),
+        "sent": int(sent_total),
+        "signed": int(signed_total),
+        "signed_deals": int(signed_total),
+    }
+
+
+def _kpi_recent_signed(snap: FinanceSnapshot, year: int, limit: int) -> Dict[str, Any]:
+    mask = mask_and(snap.is_signed, mask_ge(snap.activity_ts, 0.0))
     items: List[Dict[str, Any]] = []
-    for dt, p in signed_rows[:limit]:
+    for i in top_indices(snap.activity_ts, mask, limit):
+        p = snap.rows[i]
         items.append(
             {
                 "proposal_id": int(p.proposal_id),
                 "proposal": p.title,
                 "client": p.client_name,
                 "amount": round(float(p.amount), 2),
-                "signed_at": dt.isoformat(),
+                "signed_at": _signed_at(p).isoformat(),
             }
         )
+    return {"metric": "recent_signed_deals", "year": year, "items": items}
 
-    return jsonify({"metric": "recent_signed_deals", "year": year, "items": items}), 200
 
+def _kpi_forecast_monthly(snap: FinanceSnapshot, year: int) -> Dict[str, Any]:
+    totals = group_totals(
+        snap.forecast_month,
+        multiply(snap.amount, snap.probability),
+        mask_eq(snap.forecast_year, year),
+        13,
+    )
+    items = [
+        {"month": k, "forecast_revenue": round(totals[m], 2)}
+        for m, k in enumerate(_month_keys(year), start=1)
+    ]
+    return {"metric": "monthly_revenue_forecast", "year": year, "items": items}
 
-@bp.get("/finance/forecast/monthly")
-@token_required
-@finance_required
-def revenue_forecast_monthly(username=None, user_id=None, email=None):
-    year = _year_param()
-    proposals = _load_proposals_with_finance(year)
 
-    forecast: Dict[str, float] = {f"{year:04d}-{m:02d}": 0.0 for m in range(1, 13)}
+def _kpi_win_rate(snap: FinanceSnapshot, year: int) -> Dict[str, Any]:
+    # Attribute sent/signed to the month of last update/creation (simple and consistent).
+    in_year = mask_eq(snap.activity_year, year)
+    sent_by_month = group_totals(snap.activity_month, None, mask_and(in_year, snap.is_sent), 13)
+    signed_by_month = group_totals(snap.activity_month, None, mask_and(in_year, snap.is_signed), 13)
 
-    for p in proposals:
-        month = _expected_close_month(p)
-        if not month or not month.startswith(f"{year:04d}-"):
-            continue
-        prob = _effective_probability(p)
-        forecast[month] = float(forecast.get(month, 0.0) + (p.amount * prob))
+    sent_total = int(sum(sent_by_month))
+    signed_total = int(sum(signed_by_month))
+    denom = sent_total if sent_total > 0 else signed_total
+    win_rate = (signed_total / denom) if denom > 0 else 0.0
 
-    items = [{"month": k, "forecast_revenue": round(v, 2)} for k, v in sorted(forecast.items())]
+    trend = []
+    for m, month in enumerate(_month_keys(year), start=1):
+        sent = int(sent_by_month[m])
+        signed = int(signed_by_month[m])
+        month_denom = sent if sent > 0 else signed
+        rate = (signed / month_denom) if month_denom > 0 else 0.0
+        trend.append({"month": month, "sent": sent, "signed": signed, "win_rate": round(rate, 4)})
 
-    return jsonify({"metric": "monthly_revenue_forecast", "year": year, "items": items}), 200
+    return {
+        "metric": "proposal_win_rate",
+        "year": year,
+        "sent": sent_total,
+        "signed": signed_total,
+        "win_rate": round(win_rate, 4),
+        "trend": trend,
+    }
 
 
-@bp.get("/finance/win-rate")
-@token_required
-@finance_required
-def proposal_win_rate(username=None, user_id=None, email=None):
-    year = _year_param()
-    proposals = _load_proposals_with_finance(year)
+def _kpi_average_deal_size(snap: FinanceSnapshot, year: int) -> Dict[str, Any]:
+    total_signed = masked_sum(snap.amount, snap.is_signed)
+    count_signed = masked_count(snap.is_signed)
+    avg = (total_signed / count_signed) if count_signed > 0 else 0.0
+    return {
+        "metric": "average_deal_size",
+        "year": year,
+        "total_signed_revenue": round(total_signed, 2),
+        "signed_deals": int(count_signed),
+        "average_deal_size": round(avg, 2),
+    }
 
-    sent_total = 0
-    signed_total = 0
 
-    by_month: Dict[str, Dict[str, int]] = {f"{year:04d}-{m:02d}": {"sent": 0, "signed": 0} for m in range(1, 13)}
+def _kpi_revenue_growth(snap: FinanceSnapshot, year: int) -> Dict[str, Any]:
+    totals = group_totals(
+        snap.activity_month,
+        snap.amount,
+        mask_and(snap.is_signed, mask_eq(snap.activity_year, year)),
+        13,
+    )
+    items = [
+        {"month": k, "signed_revenue": round(totals[m], 2)}
+        for m, k in enumerate(_month_keys(year), start=1)
+    ]
+    return {"metric": "signed_revenue_growth", "year": year, "items": items}
 
-    for p in proposals:
-        # Attribute sent/signed to the month of last update/creation (simple and consistent).
-        dt = p.updated_at or p.created_at
-        if dt is None:
-            continue
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=timezone.utc)
-        if dt.year != year:
-            continue
-        month = _month_key(dt)
 
-        if _is_sent(p):
-            sent_total += 1
-            by_month[month]["sent"] += 1
-        if _is_signed(p):
-            signed_total += 1
-            by_month[month]["signed"] += 1
+def _kpi_funnel(snap: FinanceSnapshot, year: int) -> Dict[str, Any]:
+    stage_order = ["Sent", "Viewed", "Negotiation", "Signed"]
+    totals = group_totals(snap.stage_code, snap.amount, snap.all_rows_mask(), len(FINANCE_STAGES))
+    items = [{"stage": s, "value": round(float(totals[FINANCE_STAGE_CODES[s]]), 2)} for s in stage_order]
+    return {"metric": "revenue_funnel", "year": year, "items": items}
 
-    denom = sent_total if sent_total > 0 else signed_total
-    win_rate = (signed_total / denom) if denom > 0 else 0.0
-    trend = []
-    for month in sorted(by_month.keys()):
-        sent = int(by_month[month]["sent"])
-        signed = int(by_month[month]["signed"])
-        month_denom = sent if sent > 0 else signed
-        rate = (signed / month_denom) if month_denom > 0 else 0.0
-        trend.append({"month": month, "sent": sent, "signed": signed, "win_rate": round(rate, 4)})
 
-    return jsonify(
-        {
-            "metric": "proposal_win_rate",
-            "year": year,
-            "sent": int(sent_total),
-            "signed": int(signed_total),
-            "win_rate": round(win_rate, 4),
-            "trend": trend,
-        }
-    ), 200
+def _kpi_top_clients(snap: FinanceSnapshot, year: int, limit: int) -> Dict[str, Any]:
+    n = len(snap.client_names)
+    revenue = group_totals(snap.client_code, snap.amount, snap.is_signed, n)
+    counts = group_totals(snap.client_code, None, snap.is_signed, n)
+    ranked = sorted((c for c in range(n) if counts[c] > 0), key=lambda c: revenue[c], reverse=True)
+    items = [{"client": snap.client_names[c], "revenue": round(float(revenue[c]), 2)} for c in ranked]
+    return {"metric": "top_clients_by_revenue", "year": year, "items": items[:limit]}
 
 
-@bp.get("/finance/average-deal-size")
+@bp.get("/finance/summary")
 @token_required
 @finance_required
-def average_deal_size(username=None, user_id=None, email=None):
+def finance_summary(username=None, user_id=None, email=None):
     year = _year_param()
-    proposals = _load_proposals_with_finance(year)
+    return jsonify(_kpi_summary(_finance_snapshot(year), year)), 200
 
-    total_signed = 0.0
-    count_signed = 0
 
-    for p in proposals:
-        if not _is_signed(p):
-            continue
-        total_signed += float(p.amount)
-        count_signed += 1
+@bp.get("/finance/recent-signed")
+@token_required
+@finance_required
+def recent_signed_deals(username=None, user_id=None, email=None):
+    year = _year_param()
+    limit = _parse_int(request.args.get("limit"), 10) or 10
+    limit = max(1, min(limit, 50))
+    return jsonify(_kpi_recent_signed(_finance_snapshot(year), year, limit)), 200
 
-    avg = (total_signed / count_signed) if count_signed > 0 else 0.0
 
-    return jsonify(
-        {
-            "metric": "average_deal_size",
-            "year": year,
-            "total_signed_revenue": round(total_signed, 2),
-            "signed_deals": int(count_signed),
-            "average_deal_size": round(avg, 2),
-        }
-    ), 200
+@bp.get("/finance/forecast/monthly")
+@token_required
+@finance_required
+def revenue_forecast_monthly(username=None, user_id=None, email=None):
+    year = _year_param()
+    return jsonify(_kpi_forecast_monthly(_finance_snapshot(year), year)), 200
 
 
-@bp.get("/finance/revenue-growth")
+@bp.get("/finance/win-rate")
 @token_required
 @finance_required
-def revenue_growth_trend(username=None, user_id=None, email=None):
+def proposal_win_rate(username=None, user_id=None, email=None):
     year = _year_param()
-    proposals = _load_proposals_with_finance(year)
+    return jsonify(_kpi_win_rate(_finance_snapshot(year), year)), 200
 
-    by_month: Dict[str, float] = {f"{year:04d}-{m:02d}": 0.0 for m in range(1, 13)}
 
-    for p in proposals:
-        if not _is_signed(p):
-            continue
-        month = _signed_month(p)
-        if not month or not month.startswith(f"{year:04d}-"):
-            continue
-        by_month[month] = float(by_month.get(month, 0.0) + p.amount)
+@bp.get("/finance/average-deal-size")
+@token_required
+@finance_required
+def average_deal_size(username=None, user_id=None, email=None):
+    year = _year_param()
+    return jsonify(_kpi_average_deal_size(_finance_snapshot(year), year)), 200
 
-    items = [{"month": k, "signed_revenue": round(v, 2)} for k, v in sorted(by_month.items())]
 
-    return jsonify({"metric": "signed_revenue_growth", "year": year, "items": items}), 200
+@bp.get("/finance/revenue-growth")
+@token_required
+@finance_required
+def revenue_growth_trend(username=None, user_id=None, email=None):
+    year = _year_param()
+    return jsonify(_kpi_revenue_growth(_finance_snapshot(year), year)), 200
 
 
 @bp.get("/finance/funnel")
@@ -606,41 +606,31 @@ def revenue_growth_trend(username=None, user_id=None, email=None):
 @finance_required
 def revenue_funnel(username=None, user_id=None, email=None):
     year = _year_param()
-    proposals = _load_proposals_with_finance(year)
+    return jsonify(_kpi_funnel(_finance_snapshot(year), year)), 200
 
-    stage_order = ["Sent", "Viewed", "Negotiation", "Signed"]
-    totals = {s: 0.0 for s in stage_order}
 
-    for p in proposals:
-        stage = _stage_from_status(p.status)
-        if stage not in totals:
-            continue
-        totals[stage] += float(p.amount)
-
-    items = [{"stage": s, "value": round(float(totals.get(s, 0.0)), 2)} for s in stage_order]
-
-    return jsonify({"metric": "revenue_funnel", "year": year, "items": items}), 200
-
-
-def _latest_status_change_at(cursor, proposal_id: int) -> Optional[datetime]:
-    if not _table_exists(cursor, "activity_log"):
-        return None
+def _latest_status_changes(cursor, proposal_ids: List[int]) -> Dict[int, datetime]:
+    """Latest 'status_changed' activity per proposal, in one indexed DISTINCT ON scan."""
+    if not proposal_ids or not _table_exists(cursor, "activity_log"):
+        return {}
     cursor.execute(
         """
-        SELECT created_at
+        SELECT DISTINCT ON (proposal_id) proposal_id, created_at
         FROM activity_log
-        WHERE proposal_id = %s AND action_type = 'status_changed'
-        ORDER BY created_at DESC
-        LIMIT 1
+        WHERE proposal_id = ANY(%s) AND action_type = 'status_changed'
+        ORDER BY proposal_id, created_at DESC
         """,
-        (proposal_id,),
+        (list(proposal_ids),),
     )
-    row = cursor.fetchone()
-    if not row:
-        return None
-    if isinstance(row, dict):
-        return row.get("created_at")
-    return row[0]
+    out: Dict[int, datetime] = {}
+    for row in cursor.fetchall() or []:
+        if isinstance(row, dict):
+            pid, created_at = row.get("proposal_id"), row.get("created_at")
+        else:
+            pid, created_at = row[0], row[1]
+        if pid is not None and created_at is not None:
+            out[int(pid)] = created_at
+    return out
 
 
 @bp.get("/finance/deal-aging")
@@ -651,44 +641,53 @@ def deal_aging(username=None, user_id=None, email=None):
     threshold_days = max(1, min(threshold_days, 3650))
 
     year = _year_param()
-    proposals = _load_proposals_with_finance(year)
+    proposals = _finance_snapshot(year).rows
 
     now = datetime.now(timezone.utc)
 
     items: List[Dict[str, Any]] = []
 
-    with get_db_connection() as conn:
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        for p in proposals:
-            stage = _stage_from_status(p.status)
-            if stage in {"Signed", "Archived"}:
-                continue
-
-            changed_at = _latest_status_change_at(cursor, p.proposal_id) or p.updated_at or p.created_at
-            if changed_at is None:
-                continue
-            if changed_at.tzinfo is None:
-                changed_at = changed_at.replace(tzinfo=timezone.utc)
-
-            days = (now - changed_at).total_seconds() / 86400.0
-            if days < 0:
-                continue
-
-            flagged = days >= float(threshold_days)
-            if not flagged:
-                continue
-
-            items.append(
-                {
-                    "proposal_id": int(p.proposal_id),
-                    "proposal": p.title,
-                    "client": p.client_name,
-                    "stage": stage,
-                    "days_in_stage": int(round(days)),
-                    "status": p.status,
-                    "flagged": bool(flagged),
-                }
-            )
+    open_deals = [p for p in proposals if _stage_from_status(p.status) not in {"Signed", "Archived"}]
+
+    # last_status_change_at is maintained by log_status_change(); only proposals
+    # without it fall back to a single batched activity_log lookup.
+    changed_at_by_id: Dict[int, datetime] = {
+        p.proposal_id: p.last_status_change_at for p in open_deals if p.last_status_change_at is not None
+    }
+    missing_ids = [p.proposal_id for p in open_deals if p.proposal_id not in changed_at_by_id]
+    if missing_ids:
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            changed_at_by_id.update(_latest_status_changes(cursor, missing_ids))
+
+    for p in open_deals:
+        stage = _stage_from_status(p.status)
+
+        changed_at = changed_at_by_id.get(p.proposal_id) or p.updated_at or p.created_at
+        if changed_at is None:
+            continue
+        if changed_at.tzinfo is None:
+            changed_at = changed_at.replace(tzinfo=timezone.utc)
+
+        days = (now - changed_at).total_seconds() / 86400.0
+        if days < 0:
+            continue
+
+        flagged = days >= float(threshold_days)
+        if not flagged:
+            continue
+
+        items.append(
+            {
+                "proposal_id": int(p.proposal_id),
+                "proposal": p.title,
+                "client": p.client_name,
+                "stage": stage,
+                "days_in_stage": int(round(days)),
+                "status": p.status,
+                "flagged": bool(flagged),
+            }
+        )
 
     items.sort(key=lambda x: (-(x.get("days_in_stage") or 0), str(x.get("proposal") or "")))
 
@@ -710,59 +709,48 @@ def top_clients_by_revenue(username=None, user_id=None, email=None):
     limit = _parse_int(request.args.get("limit"), 10) or 10
     limit = max(1, min(limit, 50))
 
-    proposals = _load_proposals_with_finance(year)
-
-    totals: Dict[str, float] = {}
-    for p in proposals:
-        if not _is_signed(p):
-            continue
-        client = (p.client_name or "").strip() or "Unknown Client"
-        totals[client] = float(totals.get(client, 0.0) + p.amount)
-
-    items = [
-        {"client": k, "revenue": round(float(v), 2)}
-        for k, v in sorted(totals.items(), key=lambda kv: kv[1], reverse=True)
-    ]
-
-    return jsonify({"metric": "top_clients_by_revenue", "year": year, "items": items[:limit]}), 200
+    return jsonify(_kpi_top_clients(_finance_snapshot(year), year, limit)), 200
 
 
 def _compute_finance_alert_items(
     year: int, discount_max: float, stuck_days: int
 ) -> List[Dict[str, Any]]:
     """Compute current finance alerts from proposals and compliance (ephemeral snapshot)."""
-    proposals = _load_proposals_with_finance(year)
-    now = datetime.now(timezone.utc)
+    snap = _finance_snapshot(year)
+    now_ts = datetime.now(timezone.utc).timestamp()
 
     alerts: List[Dict[str, Any]] = []
 
-    for p in proposals:
-        try:
-            _ = _safe_json_load(None)
-        except Exception:
-            pass
-
-        stage = _stage_from_status(p.status)
-        if stage == "Negotiation":
-            dt = p.updated_at or p.created_at
-            if dt is not None:
-                if dt.tzinfo is None:
-                    dt = dt.replace(tzinfo=timezone.utc)
-                days = (now - dt).total_seconds() / 86400.0
-                if days >= float(stuck_days):
-                    alerts.append(
-                        {
-                            "type": "STUCK_IN_NEGOTIATION",
-                            "severity": "warning",
-                            "proposal_id": int(p.proposal_id),
-                            "proposal": p.title,
-                            "client": p.client_name,
-                            "details": {"days": int(round(days)), "threshold": int(stuck_days)},
-                        }
-                    )
+    stuck_mask = mask_and(
+        mask_eq(snap.stage_code, FINANCE_STAGE_CODES["Negotiation"]),
+        mask_ge(snap.activity_ts, 0.0),
+        mask_le(snap.activity_ts, now_ts - float(stuck_days) * 86400.0),
+    )
+    low_prob_mask = mask_and(
+        mask_isin(
+            snap.stage_code,
+            [FINANCE_STAGE_CODES[s] for s in ("Sent", "Viewed", "Negotiation", "In Review")],
+        ),
+        mask_lt(snap.probability, 0.3),
+    )
+    stuck_rows = set(indices(stuck_mask))
+    low_prob_rows = set(indices(low_prob_mask))
 
-        prob = _effective_probability(p)
-        if stage in {"Sent", "Viewed", "Negotiation", "In Review"} and prob < 0.3:
+    for i in sorted(stuck_rows | low_prob_rows):
+        p = snap.rows[i]
+        if i in stuck_rows:
+            days = (now_ts - float(snap.activity_ts[i])) / 86400.0
+            alerts.append(
+                {
+                    "type": "STUCK_IN_NEGOTIATION",
+                    "severity": "warning",
+                    "proposal_id": int(p.proposal_id),
+                    "proposal": p.title,
+                    "client": p.client_name,
+                    "details": {"days": int(round(days)), "threshold": int(stuck_days)},
+                }
+            )
+        if i in low_prob_rows:
             alerts.append(
                 {
                     "type": "LOW_CLOSE_PROBABILITY",
@@ -770,7 +758,7 @@ def _compute_finance_alert_items(
                     "proposal_id": int(p.proposal_id),
                     "proposal": p.title,
                     "client": p.client_name,
-                    "details": {"probability": round(prob, 4)},
+                    "details": {"probability": round(float(snap.probability[i]), 4)},
                 }
             )
 
@@ -854,37 +842,6 @@ def _finance_alert_recipient_user_ids(cursor) -> List[int]:
     return list(dict.fromkeys(out))
 
 
-def _ensure_finance_alert_events_table(cursor) -> None:
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS finance_alert_events (
-            id SERIAL PRIMARY KEY,
-            alert_type TEXT NOT NULL,
-            proposal_id INTEGER NOT NULL,
-            severity TEXT,
-            details JSONB,
-            proposal_title TEXT,
-            client_name TEXT,
-            created_at TIMESTAMPTZ NOT NULL DEFAULT (timezone('utc', now())),
-            resolved_at TIMESTAMPTZ NULL
-        )
-        """
-    )
-    cursor.execute(
-        """
-        CREATE UNIQUE INDEX IF NOT EXISTS idx_finance_alert_events_open_unique
-        ON finance_alert_events (alert_type, proposal_id)
-        WHERE resolved_at IS NULL
-        """
-    )
-    cursor.execute(
-        """
-        CREATE INDEX IF NOT EXISTS idx_finance_alert_events_created
-        ON finance_alert_events (created_at DESC)
-        """
-    )
-
-
 def _sync_finance_alert_events_and_fetch(
     year: int, current: List[Dict[str, Any]]
 ) -> List[Dict[str, Any]]:
@@ -898,7 +855,6 @@ def _sync_finance_alert_events_and_fetch(
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            _ensure_finance_alert_events_table(cursor)
 
             cursor.execute(
                 """
@@ -1080,3 +1036,38 @@ def finance_alerts(username=None, user_id=None, email=None):
         ]
 
     return jsonify({"metric": "finance_alerts", "year": year, "items": items[:250]}), 200
+
+
+@bp.get("/finance/dashboard")
+@token_required
+@finance_required
+def finance_dashboard(username=None, user_id=None, email=None):
+    """Every finance KPI computed from one snapshot, for a single dashboard round-trip."""
+    year = _year_param()
+    limit = _parse_int(request.args.get("limit"), 10) or 10
+    limit = max(1, min(limit, 50))
+    discount_max = _parse_float(request.args.get("discount_max"), 20.0)
+    stuck_days = _parse_int(request.args.get("stuck_days"), 45) or 45
+
+    snap = _finance_snapshot(year)
+
+    deduped = _compute_finance_alert_items(year, discount_max, stuck_days)
+    alerts = _sync_finance_alert_events_and_fetch(year, deduped) or [
+        {**a, "status": "active", "triggered_at": None, "resolved_at": None} for a in deduped
+    ]
+
+    return jsonify(
+        {
+            "metric": "finance_dashboard",
+            "year": year,
+            "summary": _kpi_summary(snap, year),
+            "recent_signed": _kpi_recent_signed(snap, year, limit),
+            "forecast_monthly": _kpi_forecast_monthly(snap, year),
+            "win_rate": _kpi_win_rate(snap, year),
+            "average_deal_size": _kpi_average_deal_size(snap, year),
+            "revenue_growth": _kpi_revenue_growth(snap, year),
+            "funnel": _kpi_funnel(snap, year),
+            "top_clients": _kpi_top_clients(snap, year, limit),
+            "alerts": {"metric": "finance_alerts", "year": year, "items": alerts[:250]},
+        }
+    ), 200
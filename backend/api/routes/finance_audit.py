@@ -1,13 +1,20 @@
 from datetime import datetime
-import csv
-import io
-import json
+import os
 
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, Response, jsonify, request
 import psycopg2.extras
 
 from api.utils.database import get_db_connection
 from api.utils.decorators import token_required, finance_audit_required
+from api.utils.streaming_export import (
+    CONTENT_TYPES,
+    export_headers,
+    file_size,
+    iter_csv,
+    iter_file,
+    iter_query,
+    write_pdf,
+)
 
 
 bp = Blueprint('finance_audit', __name__)
@@ -92,63 +99,68 @@ def list_audit_logs(username=None, user_id=None, email=None):
         return jsonify({'detail': str(e)}), 500
 
 
-def _rows_to_csv(rows):
-    out = io.StringIO()
-    writer = csv.writer(out)
-    writer.writerow([
-        'id', 'created_at', 'username', 'user_id',
-        'entity_type', 'entity_id', 'action_type',
-        'field_name', 'old_value', 'new_value',
-    ])
-    for r in rows:
-        writer.writerow([
-            r.get('id'),
-            r.get('created_at'),
-            r.get('username'),
-            r.get('user_id'),
-            r.get('entity_type'),
-            r.get('entity_id'),
-            r.get('action_type'),
-            r.get('field_name'),
-            r.get('old_value'),
-            r.get('new_value'),
-        ])
-    return out.getvalue()
-
-
-def _rows_to_pdf_bytes(rows):
-    try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.pdfgen import canvas
-    except Exception:
-        raise RuntimeError('PDF export not available (reportlab missing)')
-
-    buf = io.BytesIO()
-    c = canvas.Canvas(buf, pagesize=letter)
-    width, height = letter
-
-    y = height - 40
-    c.setFont('Helvetica-Bold', 12)
-    c.drawString(40, y, 'Finance Audit Logs')
-    y -= 20
-
-    c.setFont('Helvetica', 8)
-    for r in rows:
-        line = (
-            f"{r.get('created_at')} | {r.get('username')} | {r.get('entity_type')}"
-            f"#{r.get('entity_id')} | {r.get('action_type')} | {r.get('field_name')}"
-        )
-        c.drawString(40, y, line[:140])
-        y -= 12
-        if y < 60:
-            c.showPage()
-            y = height - 40
-            c.setFont('Helvetica', 8)
-
-    c.showPage()
-    c.save()
-    buf.seek(0)
-    return buf.getvalue()
+AUDIT_EXPORT_HEADERS = [
+    'id', 'created_at', 'username', 'user_id',
+    'entity_type', 'entity_id', 'action_type',
+    'field_name', 'old_value', 'new_value',
+]
+
+# 0 = no cap; exports stream, so the old fixed LIMIT 5000 is no longer needed for memory.
+AUDIT_EXPORT_MAX_ROWS = int(os.getenv('AUDIT_EXPORT_MAX_ROWS', '0'))
+
+
+def _iso(value):
+    if value and hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _audit_csv_row(r):
+    return [
+        r.get('id'),
+        _iso(r.get('created_at')),
+        r.get('username'),
+        r.get('user_id'),
+        r.get('entity_type'),
+        r.get('entity_id'),
+        r.get('action_type'),
+        r.get('field_name'),
+        r.get('old_value'),
+        r.get('new_value'),
+    ]
+
+
+def _audit_pdf_row(r):
+    return [
+        _iso(r.get('created_at')),
+        r.get('username'),
+        f"{r.get('entity_type')}#{r.get('entity_id')}",
+        r.get('action_type'),
+        r.get('field_name'),
+    ]
+
+
+def _audit_export_sql(where_sql):
+    sql = f"""
+        SELECT id, user_id, username, entity_type, entity_id,
+               field_name, old_value, new_value, action_type, created_at
+        FROM finance_audit_logs
+        {where_sql}
+        ORDER BY created_at DESC, id DESC
+    """
+    if AUDIT_EXPORT_MAX_ROWS > 0:
+        sql += f" LIMIT {AUDIT_EXPORT_MAX_ROWS}"
+    return sql
+
+
+def _count_audit_rows(where_sql, params):
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM finance_audit_logs {where_sql}", params)
+        total = int(cursor.fetchone()[0] or 0)
+    if AUDIT_EXPORT_MAX_ROWS > 0:
+        total = min(total, AUDIT_EXPORT_MAX_ROWS)
+    return total
 
 
 @bp.get('/finance/audit-logs/export')
@@ -157,52 +169,45 @@ def _rows_to_pdf_bytes(rows):
 def export_audit_logs(username=None, user_id=None, email=None):
     try:
         format_type = (request.args.get('format') or 'csv').lower().strip()
-        where_sql, params = _build_filters(request.args)
-
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            cursor.execute(
-                f"""
-                SELECT id, user_id, username, entity_type, entity_id,
-                       field_name, old_value, new_value, action_type, created_at
-                FROM finance_audit_logs
-                {where_sql}
-                ORDER BY created_at DESC, id DESC
-                LIMIT 5000
-                """,
-                params,
-            )
-            rows = cursor.fetchall() or []
+        if format_type not in ('csv', 'pdf'):
+            return jsonify({'detail': 'Unsupported format'}), 400
 
-        for r in rows:
-            if r.get('created_at') and hasattr(r['created_at'], 'isoformat'):
-                r['created_at'] = r['created_at'].isoformat()
+        where_sql, params = _build_filters(request.args)
+        sql = _audit_export_sql(where_sql)
+        total = _count_audit_rows(where_sql, params)
 
         ts = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+        filename = f"finance_audit_{ts}.{format_type}"
 
         if format_type == 'csv':
-            csv_data = _rows_to_csv(rows)
-            output = io.BytesIO(csv_data.encode('utf-8'))
-            output.seek(0)
-            return send_file(
-                output,
-                as_attachment=True,
-                download_name=f"finance_audit_{ts}.csv",
-                mimetype='text/csv',
+            def generate():
+                try:
+                    with get_db_connection() as conn:
+                        rows = iter_query(conn, sql, params, name='audit_export')
+                        yield from iter_csv(AUDIT_EXPORT_HEADERS, (_audit_csv_row(r) for r in rows), bom=False)
+                except Exception as e:
+                    print(f"Error streaming finance audit export: {e}")
+                    raise
+
+            return Response(
+                generate(),
+                content_type=CONTENT_TYPES['csv'],
+                headers=export_headers(filename, 'csv', total),
             )
 
-        if format_type == 'pdf':
-            pdf_bytes = _rows_to_pdf_bytes(rows)
-            output = io.BytesIO(pdf_bytes)
-            output.seek(0)
-            return send_file(
-                output,
-                as_attachment=True,
-                download_name=f"finance_audit_{ts}.pdf",
-                mimetype='application/pdf',
+        with get_db_connection() as conn:
+            rows = iter_query(conn, sql, params, name='audit_export')
+            spool, count = write_pdf(
+                'Finance Audit Logs',
+                ['Created', 'User', 'Entity', 'Action', 'Field'],
+                (_audit_pdf_row(r) for r in rows),
             )
 
-        return jsonify({'detail': 'Unsupported format'}), 400
+        return Response(
+            iter_file(spool),
+            content_type=CONTENT_TYPES['pdf'],
+            headers=export_headers(filename, 'pdf', count, file_size(spool)),
+        )
     except Exception as e:
         return jsonify({'detail': str(e)}), 500
 
@@ -1,233 +1,48 @@
 """
 Finance export routes for financial data export functionality
-Handles CSV and Excel exports for proposal summaries and client reports
+Handles CSV, Excel and PDF exports for proposal summaries and client reports
+
+Rows are read through a server-side cursor and written straight into the
+response (CSV) or into a spooled temp file (XLSX/PDF), so memory stays flat
+however many proposals are exported. See api/utils/streaming_export.py.
 """
-from flask import Blueprint, request, jsonify, send_file
-from typing import Optional, Dict, Any, List
-from datetime import datetime, timedelta
-import csv
-import io
-import os
-import tempfile
+from flask import Blueprint, Response, request, jsonify
+from datetime import datetime
 from api.utils.decorators import token_required, finance_required
-from api.utils.database import get_db_connection
+from api.utils.database import get_db_connection, get_table_columns, table_exists
+from api.utils.proposal_financials import refresh_proposal_financials
+from api.utils.streaming_export import (
+    CONTENT_TYPES,
+    OPENPYXL_AVAILABLE,
+    export_headers,
+    file_size,
+    iter_csv,
+    iter_file,
+    iter_query,
+    write_pdf,
+    write_xlsx,
+)
 import psycopg2.extras
-import json
 
 bp = Blueprint('finance_export', __name__)
 
+SUMMARY_HEADERS = [
+    'Proposal ID', 'Title', 'Client', 'Status',
+    'Created Date', 'Updated Date', 'Amount (ZAR)',
+    'Days in Status', 'Created By'
+]
 
-def _ensure_str(v):
-    if v is None:
-        return ''
-    return str(v)
+CLIENT_REPORT_HEADERS = [
+    'Client Name', 'Total Proposals', 'Total Amount (ZAR)',
+    'Approved Proposals', 'Approved Amount (ZAR)',
+    'Pending Proposals', 'Pending Amount (ZAR)',
+    'Success Rate (%)', 'Average Deal Size (ZAR)'
+]
 
 
-def _rows_to_pdf_bytes(title: str, headers: List[str], rows: List[List[Any]]):
-    try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.pdfgen import canvas
-    except Exception:
-        raise RuntimeError('PDF export not available (reportlab missing)')
-
-    buf = io.BytesIO()
-    c = canvas.Canvas(buf, pagesize=letter)
-    width, height = letter
-
-    y = height - 40
-    c.setFont('Helvetica-Bold', 12)
-    c.drawString(40, y, title[:120])
-    y -= 18
-
-    c.setFont('Helvetica', 8)
-    c.drawString(40, y, 'Generated: ' + datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC'))
-    y -= 18
-
-    c.setFont('Helvetica-Bold', 8)
-    c.drawString(40, y, ' | '.join([h[:28] for h in headers])[:140])
-    y -= 14
-    c.setFont('Helvetica', 8)
-
-    for r in rows:
-        line = ' | '.join([_ensure_str(v) for v in r])
-        c.drawString(40, y, line[:140])
-        y -= 12
-        if y < 60:
-            c.showPage()
-            y = height - 40
-            c.setFont('Helvetica', 8)
-
-    c.showPage()
-    c.save()
-    buf.seek(0)
-    return buf.getvalue()
-
-
-def _ensure_str(v):
-    if v is None:
-        return ''
-    return str(v)
-
-
-def _rows_to_pdf_bytes(title: str, headers: List[str], rows: List[List[Any]]):
-    try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.pdfgen import canvas
-    except Exception:
-        raise RuntimeError('PDF export not available (reportlab missing)')
-
-    buf = io.BytesIO()
-    c = canvas.Canvas(buf, pagesize=letter)
-    width, height = letter
-
-    y = height - 40
-    c.setFont('Helvetica-Bold', 12)
-    c.drawString(40, y, title[:120])
-    y -= 18
-
-    c.setFont('Helvetica', 8)
-    c.drawString(40, y, 'Generated: ' + datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC'))
-    y -= 18
-
-    c.setFont('Helvetica-Bold', 8)
-    c.drawString(40, y, ' | '.join([h[:28] for h in headers])[:140])
-    y -= 14
-    c.setFont('Helvetica', 8)
-
-    for r in rows:
-        line = ' | '.join([_ensure_str(v) for v in r])
-        c.drawString(40, y, line[:140])
-        y -= 12
-        if y < 60:
-            c.showPage()
-            y = height - 40
-            c.setFont('Helvetica', 8)
-
-    c.showPage()
-    c.save()
-    buf.seek(0)
-    return buf.getvalue()
-
-def _extract_amount_from_content(content_data):
-    """Extract financial amount from proposal content using same logic as frontend"""
-    if not content_data:
-        return 0.0
-    
-    def _parse_num(v):
-        if v is None:
-            return 0
-        if isinstance(v, (int, float)):
-            return float(v)
-        cleaned = str(v).replace(',', '').replace('R', '').replace('$', '').strip()
-        try:
-            return float(cleaned)
-        except:
-            return 0.0
-    
-    # Try direct amount fields first
-    if isinstance(content_data, dict):
-        for key in ['budget', 'amount', 'total', 'value', 'price']:
-            if key in content_data:
-                amount = _parse_num(content_data[key])
-                if amount > 0:
-                    return amount
-
-    def _find_header_index(headers, needles):
-        if not isinstance(headers, list):
-            return None
-        for i, header in enumerate(headers):
-            try:
-                h = str(header).lower().strip()
-            except Exception:
-                continue
-            for n in needles:
-                if h == n or n in h:
-                    return i
-        return None
-
-    def _table_subtotal_from_cells(cells):
-        if not isinstance(cells, list) or not cells:
-            return 0.0
-        header_row = cells[0] if isinstance(cells[0], list) else None
-        if not isinstance(header_row, list):
-            return 0.0
-
-        total_col = _find_header_index(header_row, ['total', 'amount', 'line total'])
-        qty_col = _find_header_index(header_row, ['quantity', 'qty'])
-        unit_col = _find_header_index(header_row, ['unit price', 'price'])
-
-        subtotal = 0.0
-        for row in cells[1:]:
-            if not isinstance(row, list):
-                continue
-            row_total = 0.0
-            if total_col is not None and 0 <= total_col < len(row):
-                row_total = _parse_num(row[total_col])
-            if row_total == 0.0:
-                qty = _parse_num(row[qty_col]) if qty_col is not None and 0 <= qty_col < len(row) else 0.0
-                unit = _parse_num(row[unit_col]) if unit_col is not None and 0 <= unit_col < len(row) else 0.0
-                row_total = qty * unit
-            subtotal += float(row_total)
-        return float(subtotal)
-
-    def _sum_price_tables_from_tables_list(tables_any):
-        if not isinstance(tables_any, list):
-            return 0.0
-        total = 0.0
-        for t in tables_any:
-            if not isinstance(t, dict):
-                continue
-            if str(t.get('type') or '').lower().strip() != 'price':
-                continue
-            cells = t.get('cells')
-            subtotal = _table_subtotal_from_cells(cells)
-            vat_rate = _parse_num(t.get('vatRate'))
-            vat = subtotal * vat_rate if vat_rate > 0 else 0.0
-            total += (subtotal + vat)
-        return float(total)
-
-    def _sum_price_tables_from_section(section):
-        if not isinstance(section, dict):
-            return 0.0
-        total = 0.0
-        total += _sum_price_tables_from_tables_list(section.get('tables'))
-
-        positioned = section.get('positionedPricingTables')
-        if isinstance(positioned, list):
-            for p in positioned:
-                if not isinstance(p, dict):
-                    continue
-                table = p.get('table')
-                if isinstance(table, dict):
-                    total += _sum_price_tables_from_tables_list([table])
-
-        body = section.get('body') or section.get('content')
-        if isinstance(body, dict):
-            total += _sum_price_tables_from_tables_list(body.get('tables'))
-            positioned2 = body.get('positionedPricingTables')
-            if isinstance(positioned2, list):
-                for p in positioned2:
-                    if not isinstance(p, dict):
-                        continue
-                    table = p.get('table')
-                    if isinstance(table, dict):
-                        total += _sum_price_tables_from_tables_list([table])
-        return float(total)
-
-    # Try to extract from pricing tables in sections
-    sections_list = None
-    if isinstance(content_data, dict) and isinstance(content_data.get('sections'), list):
-        sections_list = content_data.get('sections')
-    elif isinstance(content_data, list):
-        sections_list = content_data
-
-    if isinstance(sections_list, list):
-        total = 0.0
-        for section in sections_list:
-            total += _sum_price_tables_from_section(section)
-        return float(total)
-    
-    return 0.0
+def _supported_formats():
+    return ['csv', 'xlsx', 'pdf'] if OPENPYXL_AVAILABLE else ['csv', 'pdf']
+
 
 def _format_currency(amount):
     """Format amount as South African Rand"""
@@ -236,177 +51,166 @@ def _format_currency(amount):
     return f"R {amount:,.2f}"
 
 
+def _format_date(value):
+    return value.strftime('%Y-%m-%d') if value else ''
 
-def _get_proposals_with_financials(user_id=None, status_filter=None, date_from=None, date_to=None):
-    """Get proposals with financial calculations. Uses dynamic column names to support both owner_id/user_id and client/client_name."""
-    proposals = []
-
-    params = []
-
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-            cursor.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_name = 'proposals'
-                """
-            )
-            existing_columns = [row['column_name'] for row in cursor.fetchall()]
-
-            cursor.execute(
-                """
-                SELECT EXISTS(
-                    SELECT 1
-                    FROM information_schema.tables
-                    WHERE table_name = 'users'
-                ) AS users_table_exists
-                """
-            )
-            users_table_exists = bool((cursor.fetchone() or {}).get('users_table_exists'))
-
-            users_full_name_exists = False
-            if users_table_exists:
-                cursor.execute(
-                    """
-                    SELECT EXISTS(
-                        SELECT 1
-                        FROM information_schema.columns
-                        WHERE table_name = 'users' AND column_name = 'full_name'
-                    ) AS full_name_exists
-                    """
-                )
-                users_full_name_exists = bool((cursor.fetchone() or {}).get('full_name_exists'))
-
-            owner_col = None
-            if 'created_by' in existing_columns:
-                owner_col = 'created_by'
-            elif 'owner_id' in existing_columns:
-                owner_col = 'owner_id'
-            elif 'user_id' in existing_columns:
-                owner_col = 'user_id'
-
-            client_col = None
-            if 'client_name' in existing_columns:
-                client_col = 'client_name'
-            elif 'client' in existing_columns:
-                client_col = 'client'
-
-            content_col = None
-            if 'content' in existing_columns:
-                content_col = 'content'
-            elif 'sections' in existing_columns:
-                content_col = 'sections'
-
-            select_cols = [
-                'p.id',
-                'p.title',
-                'p.status',
-            ]
-            if client_col:
-                select_cols.append(f"p.{client_col} AS client_name")
-            else:
-                select_cols.append("NULL AS client_name")
-
-            if 'created_at' in existing_columns:
-                select_cols.append('p.created_at')
-            else:
-                select_cols.append('NULL AS created_at')
-
-            if 'updated_at' in existing_columns:
-                select_cols.append('p.updated_at')
-            else:
-                select_cols.append('NULL AS updated_at')
-
-            if content_col:
-                select_cols.append(f"p.{content_col} AS content")
-            else:
-                select_cols.append("NULL AS content")
-
-            join_sql = ""
-            if owner_col and users_table_exists and users_full_name_exists:
-                join_sql = f"LEFT JOIN users u ON u.id::text = p.{owner_col}::text"
-                select_cols.append("u.full_name AS created_by")
-            elif owner_col:
-                select_cols.append(f"p.{owner_col}::text AS created_by")
-            else:
-                select_cols.append("NULL AS created_by")
 
-            query = f"""
-                SELECT {', '.join(select_cols)}
-                FROM proposals p
-                {join_sql}
-                WHERE 1=1
-            """
+def _proposal_export_query(cursor, status_filter=None, date_from=None, date_to=None):
+    """Build the proposal export query. Uses dynamic column names to support both owner_id/user_id and client/client_name.
 
+    Returns a dict with 'select', 'from' (joins + WHERE), 'order' and 'params' so the
+    same filters can be reused for COUNT(*) and the self-heal lookup.
+    """
+    params = []
+    existing_columns = list(get_table_columns('proposals', cursor))
+
+    users_table_exists = table_exists('users', cursor)
+    users_full_name_exists = users_table_exists and 'full_name' in get_table_columns('users', cursor)
+
+    owner_col = None
+    if 'created_by' in existing_columns:
+        owner_col = 'created_by'
+    elif 'owner_id' in existing_columns:
+        owner_col = 'owner_id'
+    elif 'user_id' in existing_columns:
+        owner_col = 'user_id'
+
+    client_col = None
+    if 'client_name' in existing_columns:
+        client_col = 'client_name'
+    elif 'client' in existing_columns:
+        client_col = 'client'
+
+    select_cols = [
+        'p.id',
+        'p.title',
+        'p.status',
+    ]
+    if client_col:
+        select_cols.append(f"p.{client_col} AS client_name")
+    else:
+        select_cols.append("NULL AS client_name")
+
+    if 'created_at' in existing_columns:
+        select_cols.append('p.created_at')
+    else:
+        select_cols.append('NULL AS created_at')
+
+    if 'updated_at' in existing_columns:
+        select_cols.append('p.updated_at')
+    else:
+        select_cols.append('NULL AS updated_at')
+
+    # Amounts come from the proposal_financials projection instead of
+    # parsing every proposal's content JSON.
+    select_cols.append("pf.amount AS projected_amount")
+
+    join_sql = "LEFT JOIN proposal_financials pf ON pf.proposal_id = p.id"
+    if owner_col and users_table_exists and users_full_name_exists:
+        join_sql += f"\n            LEFT JOIN users u ON u.id::text = p.{owner_col}::text"
+        select_cols.append("u.full_name AS created_by")
+    elif owner_col:
+        select_cols.append(f"p.{owner_col}::text AS created_by")
+    else:
+        select_cols.append("NULL AS created_by")
+
+    from_sql = f"""
+            FROM proposals p
+            {join_sql}
+            WHERE 1=1
+    """
+
+    if status_filter:
+        from_sql += " AND LOWER(p.status) LIKE %s"
+        params.append(f"%{status_filter.lower()}%")
+
+    if date_from and 'created_at' in existing_columns:
+        from_sql += " AND p.created_at >= %s"
+        params.append(date_from)
+
+    if date_to and 'created_at' in existing_columns:
+        from_sql += " AND p.created_at <= %s"
+        params.append(date_to)
+
+    if 'created_at' in existing_columns:
+        order_sql = " ORDER BY p.created_at DESC, p.id DESC"
+    else:
+        order_sql = " ORDER BY p.id DESC"
+
+    return {
+        'select': f"SELECT {', '.join(select_cols)}",
+        'from': from_sql,
+        'order': order_sql,
+        'params': params,
+    }
+
+
+def _count_proposals_for_export(status_filter=None, date_from=None, date_to=None):
+    """Number of proposals an export will contain.
+
+    Also self-heals missing proposal_financials rows up front, so the streaming
+    pass can read amounts straight from the projection without committing mid-cursor.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        query = _proposal_export_query(cursor, status_filter, date_from, date_to)
+
+        cursor.execute(f"SELECT p.id {query['from']} AND pf.proposal_id IS NULL", query['params'])
+        missing_ids = [r['id'] for r in cursor.fetchall() or []]
+        if missing_ids:
+            try:
+                refresh_proposal_financials(cursor, missing_ids)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"[FINANCE] Failed to self-heal proposal_financials: {e}")
 
-            if status_filter:
-                query += " AND LOWER(p.status) LIKE %s"
-                params.append(f"%{status_filter.lower()}%")
+        cursor.execute(f"SELECT COUNT(*) AS total {query['from']}", query['params'])
+        row = cursor.fetchone()
+        conn.commit()
+        return int(row['total'] or 0) if row else 0
 
-            if date_from and 'created_at' in existing_columns:
-                query += " AND p.created_at >= %s"
-                params.append(date_from)
 
-            if date_to and 'created_at' in existing_columns:
-                query += " AND p.created_at <= %s"
-                params.append(date_to)
+def _proposal_from_row(row):
+    amount = float(row.get('projected_amount') or 0.0)
 
-            if 'created_at' in existing_columns:
-                query += " ORDER BY p.created_at DESC"
-            else:
-                query += " ORDER BY p.id DESC"
+    days_in_status = 0
+    if row.get('updated_at'):
+        try:
+            days_in_status = (datetime.now() - row['updated_at']).days
+        except Exception:
+            pass
+
+    return {
+        'id': row['id'],
+        'title': row.get('title') or '',
+        'client_name': row.get('client_name') or '',
+        'status': row.get('status') or '',
+        'created_at': row.get('created_at'),
+        'updated_at': row.get('updated_at'),
+        'created_by': row.get('created_by') or '',
+        'amount': amount,
+        'formatted_amount': _format_currency(amount),
+        'days_in_status': days_in_status
+    }
+
+
+def _iter_proposals_with_financials(conn, status_filter=None, date_from=None, date_to=None):
+    """Yield proposals with financial calculations, streamed through a server-side cursor."""
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    query = _proposal_export_query(cursor, status_filter, date_from, date_to)
+    sql = query['select'] + query['from'] + query['order']
+    for row in iter_query(conn, sql, query['params'], name='proposal_export'):
+        yield _proposal_from_row(row)
 
-            cursor.execute(query, params)
-            rows = cursor.fetchall() or []
-            
-            for row in rows:
-                amount = 0.0
-                if row.get('content'):
-                    try:
-                        content_data = json.loads(row['content']) if isinstance(row['content'], str) else row['content']
-                        amount = _extract_amount_from_content(content_data)
-                    except Exception:
-                        pass
-                
-                days_in_status = 0
-                if row.get('updated_at'):
-                    try:
-                        days_in_status = (datetime.now() - row['updated_at']).days
-                    except Exception:
-                        pass
-                
-                proposal = {
-                    'id': row['id'],
-                    'title': row.get('title') or '',
-                    'client_name': row.get('client_name') or '',
-                    'status': row.get('status') or '',
-                    'created_at': row.get('created_at'),
-                    'updated_at': row.get('updated_at'),
-                    'created_by': row.get('created_by') or '',
-                    'amount': amount,
-                    'formatted_amount': _format_currency(amount),
-                    'days_in_status': days_in_status
-                }
-                proposals.append(proposal)
-                
-    except Exception as e:
-        print(f"Error fetching proposals: {e}")
-        import traceback
-        traceback.print_exc()
-        return []
-    
-    return proposals
 
 def _get_client_portfolio_data(proposals):
-    """Aggregate proposal data by client"""
+    """Aggregate proposal data by client (accepts any iterable, keeps one entry per client)"""
     client_data = {}
-    
+
     for proposal in proposals:
         client = proposal['client_name'] or 'Unknown Client'
-        
+
         if client not in client_data:
             client_data[client] = {
                 'client_name': client,
@@ -416,13 +220,11 @@ def _get_client_portfolio_data(proposals):
                 'approved_amount': 0.0,
                 'pending_proposals': 0,
                 'pending_amount': 0.0,
-                'proposals': []
             }
-        
+
         client_data[client]['total_proposals'] += 1
         client_data[client]['total_amount'] += proposal['amount']
-        client_data[client]['proposals'].append(proposal)
-        
+
         status = proposal['status'].lower()
         if 'approved' in status or 'signed' in status:
             client_data[client]['approved_proposals'] += 1
@@ -430,141 +232,99 @@ def _get_client_portfolio_data(proposals):
         elif 'pending' in status or 'review' in status:
             client_data[client]['pending_proposals'] += 1
             client_data[client]['pending_amount'] += proposal['amount']
-    
+
     # Calculate additional metrics
     for client in client_data.values():
         client['success_rate'] = (client['approved_proposals'] / client['total_proposals'] * 100) if client['total_proposals'] > 0 else 0
         client['average_deal_size'] = client['total_amount'] / client['total_proposals'] if client['total_proposals'] > 0 else 0
         client['formatted_total'] = _format_currency(client['total_amount'])
         client['formatted_average'] = _format_currency(client['average_deal_size'])
-    
+
     return list(client_data.values())
 
-def _generate_csv_summary(proposals):
-    """Generate CSV for proposal financial summary (Excel-friendly: UTF-8 BOM, CRLF)."""
-    output = io.StringIO()
-    writer = csv.writer(output, lineterminator='\r\n')
-    
-    # Header
-    writer.writerow([
-        'Proposal ID', 'Title', 'Client', 'Status', 
-        'Created Date', 'Updated Date', 'Amount (ZAR)', 
-        'Days in Status', 'Created By'
-    ])
-    
-    # Data rows
-    for proposal in proposals:
-        writer.writerow([
-            proposal['id'],
-            proposal['title'],
-            proposal['client_name'],
-            proposal['status'],
-            proposal['created_at'].strftime('%Y-%m-%d') if proposal['created_at'] else '',
-            proposal['updated_at'].strftime('%Y-%m-%d') if proposal['updated_at'] else '',
-            f"{proposal['amount']:.2f}",
-            proposal['days_in_status'],
-            proposal['created_by']
-        ])
-    
-    return output.getvalue()
-
-def _generate_csv_client_report(client_data):
-    """Generate CSV for client financial report (Excel-friendly: UTF-8 BOM, CRLF)."""
-    output = io.StringIO()
-    writer = csv.writer(output, lineterminator='\r\n')
-    
-    # Header
-    writer.writerow([
-        'Client Name', 'Total Proposals', 'Total Amount (ZAR)', 
-        'Approved Proposals', 'Approved Amount (ZAR)', 
-        'Pending Proposals', 'Pending Amount (ZAR)',
-        'Success Rate (%)', 'Average Deal Size (ZAR)'
-    ])
-    
-    # Data rows
-    for client in client_data:
-        writer.writerow([
+
+def _summary_row(proposal, format_type):
+    """One proposal summary row: text for CSV, numbers for Excel, truncated text for PDF"""
+    if format_type == 'pdf':
+        return [
+            proposal.get('id'),
+            (proposal.get('title') or '')[:60],
+            (proposal.get('client_name') or '')[:40],
+            (proposal.get('status') or '')[:30],
+            _format_date(proposal.get('created_at')),
+            _format_date(proposal.get('updated_at')),
+            f"{float(proposal.get('amount') or 0.0):.2f}",
+            proposal.get('days_in_status'),
+            (proposal.get('created_by') or '')[:40],
+        ]
+    return [
+        proposal['id'],
+        proposal['title'],
+        proposal['client_name'],
+        proposal['status'],
+        _format_date(proposal['created_at']),
+        _format_date(proposal['updated_at']),
+        proposal['amount'] if format_type == 'xlsx' else f"{proposal['amount']:.2f}",
+        proposal['days_in_status'],
+        proposal['created_by']
+    ]
+
+
+def _client_report_row(client, format_type):
+    """One client report row: text for CSV/PDF, numbers for Excel"""
+    if format_type == 'xlsx':
+        return [
             client['client_name'],
             client['total_proposals'],
-            f"{client['total_amount']:.2f}",
+            client['total_amount'],
             client['approved_proposals'],
-            f"{client['approved_amount']:.2f}",
+            client['approved_amount'],
             client['pending_proposals'],
-            f"{client['pending_amount']:.2f}",
-            f"{client['success_rate']:.1f}",
-            f"{client['average_deal_size']:.2f}"
-        ])
-    
-    return output.getvalue()
-
-try:
-    from openpyxl import Workbook
-    OPENPYXL_AVAILABLE = True
-except ImportError:
-    OPENPYXL_AVAILABLE = False
-
-
-def _generate_xlsx_summary(proposals):
-    """Generate Excel (.xlsx) for proposal financial summary."""
-    if not OPENPYXL_AVAILABLE:
-        return None
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Proposal Summary"
-    headers = [
-        'Proposal ID', 'Title', 'Client', 'Status',
-        'Created Date', 'Updated Date', 'Amount (ZAR)',
-        'Days in Status', 'Created By'
-    ]
-    for col, h in enumerate(headers, 1):
-        ws.cell(row=1, column=col, value=h)
-    for row_idx, proposal in enumerate(proposals, 2):
-        ws.cell(row=row_idx, column=1, value=proposal['id'])
-        ws.cell(row=row_idx, column=2, value=proposal['title'])
-        ws.cell(row=row_idx, column=3, value=proposal['client_name'])
-        ws.cell(row=row_idx, column=4, value=proposal['status'])
-        ws.cell(row=row_idx, column=5,
-               value=proposal['created_at'].strftime('%Y-%m-%d') if proposal['created_at'] else '')
-        ws.cell(row=row_idx, column=6,
-               value=proposal['updated_at'].strftime('%Y-%m-%d') if proposal['updated_at'] else '')
-        ws.cell(row=row_idx, column=7, value=proposal['amount'])
-        ws.cell(row=row_idx, column=8, value=proposal['days_in_status'])
-        ws.cell(row=row_idx, column=9, value=proposal['created_by'])
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    return buf
-
-
-def _generate_xlsx_client_report(client_data):
-    """Generate Excel (.xlsx) for client financial report."""
-    if not OPENPYXL_AVAILABLE:
-        return None
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Client Report"
-    headers = [
-        'Client Name', 'Total Proposals', 'Total Amount (ZAR)',
-        'Approved Proposals', 'Approved Amount (ZAR)',
-        'Pending Proposals', 'Pending Amount (ZAR)',
-        'Success Rate (%)', 'Average Deal Size (ZAR)'
+            client['pending_amount'],
+            client['success_rate'],
+            client['average_deal_size'],
+        ]
+    return [
+        client['client_name'][:50] if format_type == 'pdf' else client['client_name'],
+        client['total_proposals'],
+        f"{client['total_amount']:.2f}",
+        client['approved_proposals'],
+        f"{client['approved_amount']:.2f}",
+        client['pending_proposals'],
+        f"{client['pending_amount']:.2f}",
+        f"{client['success_rate']:.1f}",
+        f"{client['average_deal_size']:.2f}"
     ]
-    for col, h in enumerate(headers, 1):
-        ws.cell(row=1, column=col, value=h)
-    for row_idx, client in enumerate(client_data, 2):
-        ws.cell(row=row_idx, column=1, value=client['client_name'])
-        ws.cell(row=row_idx, column=2, value=client['total_proposals'])
-        ws.cell(row=row_idx, column=3, value=client['total_amount'])
-        ws.cell(row=row_idx, column=4, value=client['approved_proposals'])
-        ws.cell(row=row_idx, column=5, value=client['approved_amount'])
-        ws.cell(row=row_idx, column=6, value=client['pending_proposals'])
-        ws.cell(row=row_idx, column=7, value=client['pending_amount'])
-        ws.cell(row=row_idx, column=8, value=client['success_rate'])
-        ws.cell(row=row_idx, column=9, value=client['average_deal_size'])
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    return buf
+
+
+def _logged_stream(chunks, label):
+    try:
+        for chunk in chunks:
+            yield chunk
+    except Exception as e:
+        print(f"Error streaming {label}: {e}")
+        raise
+
+
+def _csv_response(chunks, filename, row_count, label):
+    return Response(
+        _logged_stream(chunks, label),
+        content_type=CONTENT_TYPES['csv'],
+        headers=export_headers(filename, 'csv', row_count),
+    )
+
+
+def _spooled_response(spool, filename, format_type, row_count):
+    return Response(
+        iter_file(spool),
+        content_type=CONTENT_TYPES[format_type],
+        headers=export_headers(filename, format_type, row_count, file_size(spool)),
+    )
+
+
+def _unsupported_format_response():
+    formats = ', '.join(f.upper() for f in _supported_formats())
+    return jsonify({'error': f'Only {formats} formats are currently supported'}), 400
 
 
 @bp.route("/finance/export/proposal-summary", methods=["GET", "OPTIONS"])
@@ -577,116 +337,39 @@ def export_proposal_summary(username=None, user_id=None, email=None):
         status_filter = request.args.get('status')
         date_from = request.args.get('date_from')
         date_to = request.args.get('date_to')
-        
-        # Get proposals data
-        proposals = _get_proposals_with_financials(
-            user_id=user_id,
-            status_filter=status_filter,
-            date_from=date_from,
-            date_to=date_to
-        )
-
-        if not proposals:
-            return jsonify({
-                'error': 'No proposals found to export',
-                'report': 'proposal_summary',
-                'format': format_type,
-            }), 404
-        
-        ts = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
 
+        if format_type not in _supported_formats():
+            return _unsupported_format_response()
 
-        if not proposals:
+        total = _count_proposals_for_export(status_filter, date_from, date_to)
+        if not total:
             return jsonify({
                 'error': 'No proposals found to export',
                 'report': 'proposal_summary',
                 'format': format_type,
             }), 404
-        
+
         ts = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+        filename = f"proposal_summary_{ts}.{format_type}"
 
         if format_type == 'csv':
-            csv_data = _generate_csv_summary(proposals)
-            
-            # Excel-friendly: UTF-8 BOM so Excel parses columns correctly
-            output = io.BytesIO()
-            output.write(b'\xef\xbb\xbf')  # UTF-8 BOM
-            output.write(csv_data.encode('utf-8'))
-            output.seek(0)
-            
-            filename = f"proposal_summary_{ts}.csv"
-            filename = f"proposal_summary_{ts}.csv"
-            
-            return send_file(
-                output,
-                as_attachment=True,
-                download_name=filename,
-                mimetype='text/csv'
-            )
-        
-        elif format_type == 'pdf':
-            headers = [
-                'Proposal ID', 'Title', 'Client', 'Status',
-                'Created Date', 'Updated Date', 'Amount (ZAR)',
-                'Days in Status', 'Created By'
-            ]
-
-            rows = []
-            for proposal in proposals:
-                rows.append([
-                    proposal.get('id'),
-                    (proposal.get('title') or '')[:60],
-                    (proposal.get('client_name') or '')[:40],
-                    (proposal.get('status') or '')[:30],
-                    proposal.get('created_at').strftime('%Y-%m-%d') if proposal.get('created_at') else '',
-                    proposal.get('updated_at').strftime('%Y-%m-%d') if proposal.get('updated_at') else '',
-                    f"{float(proposal.get('amount') or 0.0):.2f}",
-                    proposal.get('days_in_status'),
-                    (proposal.get('created_by') or '')[:40],
-                ])
-
-            pdf_bytes = _rows_to_pdf_bytes('Proposal Financial Summary', headers, rows)
-            output = io.BytesIO(pdf_bytes)
-            output.seek(0)
-            filename = f"proposal_summary_{ts}.pdf"
-
-        elif format_type == 'pdf':
-            headers = [
-                'Proposal ID', 'Title', 'Client', 'Status',
-                'Created Date', 'Updated Date', 'Amount (ZAR)',
-                'Days in Status', 'Created By'
-            ]
-
-            rows = []
-            for proposal in proposals:
-                rows.append([
-                    proposal.get('id'),
-                    (proposal.get('title') or '')[:60],
-                    (proposal.get('client_name') or '')[:40],
-                    (proposal.get('status') or '')[:30],
-                    proposal.get('created_at').strftime('%Y-%m-%d') if proposal.get('created_at') else '',
-                    proposal.get('updated_at').strftime('%Y-%m-%d') if proposal.get('updated_at') else '',
-                    f"{float(proposal.get('amount') or 0.0):.2f}",
-                    proposal.get('days_in_status'),
-                    (proposal.get('created_by') or '')[:40],
-                ])
-
-            pdf_bytes = _rows_to_pdf_bytes('Proposal Financial Summary', headers, rows)
-            output = io.BytesIO(pdf_bytes)
-            output.seek(0)
-            filename = f"proposal_summary_{ts}.pdf"
-
-            return send_file(
-                output,
-                as_attachment=True,
-                download_name=filename,
-                mimetype='application/pdf',
-            )
+            def generate():
+                with get_db_connection() as conn:
+                    proposals = _iter_proposals_with_financials(conn, status_filter, date_from, date_to)
+                    yield from iter_csv(SUMMARY_HEADERS, (_summary_row(p, 'csv') for p in proposals))
 
+            return _csv_response(generate(), filename, total, 'proposal summary')
+
+        with get_db_connection() as conn:
+            proposals = _iter_proposals_with_financials(conn, status_filter, date_from, date_to)
+            rows = (_summary_row(p, format_type) for p in proposals)
+            if format_type == 'xlsx':
+                spool, count = write_xlsx('Proposal Summary', SUMMARY_HEADERS, rows)
+            else:
+                spool, count = write_pdf('Proposal Financial Summary', SUMMARY_HEADERS, rows)
+
+        return _spooled_response(spool, filename, format_type, count)
 
-        else:
-            return jsonify({'error': 'Only CSV and PDF formats are currently supported'}), 400
-            
     except Exception as e:
         print(f"Error exporting proposal summary: {e}")
         return jsonify({'error': 'Failed to generate export'}), 500
@@ -701,84 +384,37 @@ def export_client_report(username=None, user_id=None, email=None):
         status_filter = request.args.get('status')
         date_from = request.args.get('date_from')
         date_to = request.args.get('date_to')
-        
-        # Get proposals data
-        proposals = _get_proposals_with_financials(
-            user_id=user_id,
-            status_filter=status_filter,
-            date_from=date_from,
-            date_to=date_to
-        )
-
-        if not proposals:
+
+        if format_type not in _supported_formats():
+            return _unsupported_format_response()
+
+        total = _count_proposals_for_export(status_filter, date_from, date_to)
+        if not total:
             return jsonify({
                 'error': 'No proposals found to export',
                 'report': 'client_report',
                 'format': format_type,
             }), 404
-        
-        # Aggregate by client
-        client_data = _get_client_portfolio_data(proposals)
-        
-        ts = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
 
-        if format_type == 'csv':
-            csv_data = _generate_csv_client_report(client_data)
-            
-            # Excel-friendly: UTF-8 BOM so Excel parses columns correctly
-            output = io.BytesIO()
-            output.write(b'\xef\xbb\xbf')  # UTF-8 BOM
-            output.write(csv_data.encode('utf-8'))
-            output.seek(0)
-            
-            filename = f"client_report_{ts}.csv"
-            filename = f"client_report_{ts}.csv"
-            
-            return send_file(
-                output,
-                as_attachment=True,
-                download_name=filename,
-                mimetype='text/csv'
-            )
-
-        elif format_type == 'pdf':
-            headers = [
-                'Client Name', 'Total Proposals', 'Total Amount (ZAR)',
-                'Approved Proposals', 'Approved Amount (ZAR)',
-                'Pending Proposals', 'Pending Amount (ZAR)',
-                'Success Rate (%)', 'Average Deal Size (ZAR)'
-            ]
-
-            rows = []
-            for client in client_data:
-                rows.append([
-                    (client.get('client_name') or '')[:50],
-                    client.get('total_proposals'),
-                    f"{float(client.get('total_amount') or 0.0):.2f}",
-                    client.get('approved_proposals'),
-                    f"{float(client.get('approved_amount') or 0.0):.2f}",
-                    client.get('pending_proposals'),
-                    f"{float(client.get('pending_amount') or 0.0):.2f}",
-                    f"{float(client.get('success_rate') or 0.0):.1f}",
-                    f"{float(client.get('average_deal_size') or 0.0):.2f}",
-                ])
-
-            pdf_bytes = _rows_to_pdf_bytes('Client Financial Report', headers, rows)
-            output = io.BytesIO(pdf_bytes)
-            output.seek(0)
-            filename = f"client_report_{ts}.pdf"
-
-            return send_file(
-                output,
-                as_attachment=True,
-                download_name=filename,
-                mimetype='application/pdf',
+        # Aggregate by client while streaming; only one entry per client is held
+        with get_db_connection() as conn:
+            client_data = _get_client_portfolio_data(
+                _iter_proposals_with_financials(conn, status_filter, date_from, date_to)
             )
 
+        ts = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+        filename = f"client_report_{ts}.{format_type}"
+        rows = (_client_report_row(c, format_type) for c in client_data)
 
+        if format_type == 'csv':
+            return _csv_response(iter_csv(CLIENT_REPORT_HEADERS, rows), filename, len(client_data), 'client report')
+        if format_type == 'xlsx':
+            spool, count = write_xlsx('Client Report', CLIENT_REPORT_HEADERS, rows)
         else:
-            return jsonify({'error': 'Only CSV and PDF formats are currently supported'}), 400
-            
+            spool, count = write_pdf('Client Financial Report', CLIENT_REPORT_HEADERS, rows)
+
+        return _spooled_response(spool, filename, format_type, count)
+
     except Exception as e:
         print(f"Error exporting client report: {e}")
         return jsonify({'error': 'Failed to generate export'}), 500
@@ -816,7 +452,7 @@ def get_export_summary_stats(username=None, user_id=None, email=None):
             'total_proposals': total_proposals,
             'status_breakdown': status_breakdown,
             'date_range': date_range,
-            'supported_formats': ['csv', 'pdf'],
+            'supported_formats': _supported_formats(),
             'report_types': ['proposal_summary', 'client_report']
         })
         
@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-from api.utils.database import _pg_conn, release_pg_conn
+from api.utils.database import _pg_conn, release_pg_conn, get_table_columns
 from api.utils.decorators import token_required
+from api.utils.proposal_stages import PIPELINE_STAGES, codes_for, pipeline_stage, stage_code_for_status, stage_code_in_sql
 from api.utils.readiness import (
     score_proposal as _score_proposal,
     missing_section_names as _missing_section_names,
@@ -21,19 +22,7 @@ def _parse_date(s: str | None):
 
 
 def _stage_for_status(status: str | None) -> str | None:
-    s = (status or "").strip().lower()
-    if not s or "draft" in s:
-        return "Draft"
-    if "archiv" in s or "cancel" in s or "declin" in s or "lost" in s:
-        return "Archived"
-    if "signed" in s or "won" in s:
-        return "Signed"
-    if "sent to client" in s or "released" in s:
-        return "Released"
-    if "review" in s or ("pending" in s and "ceo" in s) or "approved" in s:
-        return "In Review"
-    return None
-
+    return pipeline_stage(stage_code_for_status(status))
 
 
 @bp.get("/analytics/proposal-pipeline")
@@ -60,16 +49,8 @@ def proposal_pipeline(username=None, user_id=None, email=None):
         if owner_filter is None:
             owner_filter = request.args.get("owner_id")
 
-        cursor.execute(
-            """
-            SELECT column_name, data_type
-            FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = 'proposals'
-            """
-        )
-        cols = cursor.fetchall()
-        existing_columns = {r[0] for r in cols}
-        col_types = {r[0]: r[1] for r in cols}
+        col_types = get_table_columns("proposals", cursor)
+        existing_columns = set(col_types)
 
         owner_col = None
         if "owner_id" in existing_columns:
@@ -248,6 +229,11 @@ def proposal_pipeline(username=None, user_id=None, email=None):
             where.append(f"p.{client_expr} ILIKE %s")
             params.append(f"%{client_filter}%")
 
+        # Only proposals on the board (or in the requested column); served by the
+        # stage_code indexes instead of classifying every row's status here.
+        board_stages = [stage_filter] if stage_filter else set(PIPELINE_STAGES.values())
+        where.append(stage_code_in_sql(codes_for(PIPELINE_STAGES, board_stages), "stage_code" in existing_columns))
+
         where_sql = " AND ".join(where)
 
         join_cond = f"u.id = p.{owner_col}"
@@ -355,16 +341,8 @@ def completion_rates(username=None, user_id=None, email=None):
         if owner_filter is None:
             owner_filter = request.args.get("owner_id")
 
-        cursor.execute(
-            """
-            SELECT column_name, data_type
-            FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = 'proposals'
-            """
-        )
-        cols = cursor.fetchall()
-        existing_columns = {r[0] for r in cols}
-        col_types = {r[0]: r[1] for r in cols}
+        col_types = get_table_columns("proposals", cursor)
+        existing_columns = set(col_types)
 
         owner_col = None
         if "owner_id" in existing_columns:
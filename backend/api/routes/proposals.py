@@ -16,136 +16,28 @@ import traceback
 from typing import Optional
 
 
-from api.utils.decorators import token_required, admin_required
-from api.utils.database import get_db_connection
-from api.utils.helpers import create_notification, resolve_user_id
-from api.utils.finance_audit import log_finance_audit_async, evaluate_proposal_compliance
+from api.utils.decorators import token_required, admin_required, get_request_identity
+from api.utils.database import get_db_connection, get_id_type, get_table_columns, get_table_names
 from api.utils.helpers import create_notification, resolve_user_id
+from api.utils.listing import (
+    SORT_KEY,
+    ListingError,
+    keyset_sql,
+    page_info,
+    paginate,
+    parse_listing_args,
+    proposal_recency_sql,
+)
 from api.utils.finance_audit import log_finance_audit_async, evaluate_proposal_compliance
+from api.utils.proposal_financials import (
+    extract_amount_from_content as _extract_amount_from_content,
+    refresh_proposal_financials_safe,
+)
 from api.utils.email import send_email
 
 bp = Blueprint('proposals', __name__)
 
 
-def _extract_amount_from_content(content_data):
-    if not content_data:
-        return 0.0
-
-    def _parse_num(v):
-        if v is None:
-            return 0.0
-        if isinstance(v, (int, float)):
-            return float(v)
-        cleaned = str(v).replace(',', '').replace('R', '').replace('$', '').strip()
-        try:
-            return float(cleaned)
-        except Exception:
-            return 0.0
-
-    if isinstance(content_data, dict):
-        for key in ['budget', 'amount', 'total', 'value', 'price']:
-            if key in content_data:
-                amount = _parse_num(content_data.get(key))
-                if amount > 0:
-                    return float(amount)
-
-    def _find_header_index(headers, needles):
-        if not isinstance(headers, list):
-            return None
-        for i, header in enumerate(headers):
-            try:
-                h = str(header).lower().strip()
-            except Exception:
-                continue
-            for n in needles:
-                if h == n or n in h:
-                    return i
-        return None
-
-    def _table_subtotal_from_cells(cells):
-        if not isinstance(cells, list) or not cells:
-            return 0.0
-        header_row = cells[0] if isinstance(cells[0], list) else None
-        if not isinstance(header_row, list):
-            return 0.0
-
-        total_col = _find_header_index(header_row, ['total', 'amount', 'line total'])
-        qty_col = _find_header_index(header_row, ['quantity', 'qty'])
-        unit_col = _find_header_index(header_row, ['unit price', 'price'])
-
-        subtotal = 0.0
-        for row in cells[1:]:
-            if not isinstance(row, list):
-                continue
-            row_total = 0.0
-            if total_col is not None and 0 <= total_col < len(row):
-                row_total = _parse_num(row[total_col])
-            if row_total == 0.0:
-                qty = _parse_num(row[qty_col]) if qty_col is not None and 0 <= qty_col < len(row) else 0.0
-                unit = _parse_num(row[unit_col]) if unit_col is not None and 0 <= unit_col < len(row) else 0.0
-                row_total = qty * unit
-            subtotal += float(row_total)
-        return float(subtotal)
-
-    def _sum_price_tables_from_tables_list(tables_any):
-        if not isinstance(tables_any, list):
-            return 0.0
-        total = 0.0
-        for t in tables_any:
-            if not isinstance(t, dict):
-                continue
-            if str(t.get('type') or '').lower().strip() != 'price':
-                continue
-            cells = t.get('cells')
-            subtotal = _table_subtotal_from_cells(cells)
-            vat_rate = _parse_num(t.get('vatRate'))
-            vat = subtotal * vat_rate if vat_rate > 0 else 0.0
-            total += (subtotal + vat)
-        return float(total)
-
-    def _sum_price_tables_from_section(section):
-        if not isinstance(section, dict):
-            return 0.0
-        total = 0.0
-        total += _sum_price_tables_from_tables_list(section.get('tables'))
-
-        positioned = section.get('positionedPricingTables')
-        if isinstance(positioned, list):
-            for p in positioned:
-                if not isinstance(p, dict):
-                    continue
-                table = p.get('table')
-                if isinstance(table, dict):
-                    total += _sum_price_tables_from_tables_list([table])
-
-        body = section.get('body') or section.get('content')
-        if isinstance(body, dict):
-            total += _sum_price_tables_from_tables_list(body.get('tables'))
-            positioned2 = body.get('positionedPricingTables')
-            if isinstance(positioned2, list):
-                for p in positioned2:
-                    if not isinstance(p, dict):
-                        continue
-                    table = p.get('table')
-                    if isinstance(table, dict):
-                        total += _sum_price_tables_from_tables_list([table])
-        return float(total)
-
-    sections_list = None
-    if isinstance(content_data, dict) and isinstance(content_data.get('sections'), list):
-        sections_list = content_data.get('sections')
-    elif isinstance(content_data, list):
-        sections_list = content_data
-
-    if isinstance(sections_list, list):
-        total = 0.0
-        for section in sections_list:
-            total += _sum_price_tables_from_section(section)
-        return float(total)
-
-    return 0.0
-
-
 def _role_key(raw_role: Optional[str]) -> str:
     return (raw_role or '').strip().lower()
 
@@ -349,14 +241,7 @@ def create_proposal(username=None, user_id=None, email=None, auto_created=False)
             timeline_days = data.get('timeline_days')
             
             # Insert
-            cursor.execute(
-                """
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'proposals'
-                """
-            )
-            existing_columns = [row[0] for row in cursor.fetchall()]
+            existing_columns = list(get_table_columns('proposals', cursor))
 
             insert_cols = ['title', 'content', 'status']
             values = [title, content, status]
@@ -437,6 +322,7 @@ def create_proposal(username=None, user_id=None, email=None, auto_created=False)
             except Exception as meta_err:
                 print(f"⚠️ Failed to set engagement metadata for proposal: {meta_err}")
 
+            refresh_proposal_financials_safe(cursor, row_dict.get('id'))
             conn.commit()
 
             new_proposal = {
@@ -522,26 +408,48 @@ def create_proposal(username=None, user_id=None, email=None, auto_created=False)
         return jsonify({'detail': str(e)}), 500
 
 
+# Keys a proposal listing can return; heavy JSON is left out of paged responses by default.
+PROPOSAL_LIST_FIELDS = (
+    'id', 'title', 'status', 'content', 'sections', 'owner_id', 'user_id', 'client', 'client_name',
+    'client_email', 'budget', 'timeline_days', 'created_at', 'updated_at', 'updatedAt',
+    'template_key', 'pdf_url',
+)
+PROPOSAL_HEAVY_FIELDS = ('content', 'sections')
+
+
+def _empty_listing(listing):
+    if listing.paginated:
+        return {
+            'proposals': [],
+            'page': {'limit': listing.limit, 'next_cursor': None, 'has_more': False,
+                     'total': 0, 'total_is_estimate': False},
+        }
+    return []
+
+
 @bp.get("/proposals")
 @token_required
 def get_proposals(username=None, user_id=None, email=None):
-    """Get all proposals for the current user"""
+    """Get all proposals for the current user
+
+    Supports `limit`/`cursor` keyset pages and `fields=` projection (see
+    api/utils/listing.py); without them the full list is returned as before.
+    """
     try:
+        try:
+            listing = parse_listing_args(request.args, PROPOSAL_LIST_FIELDS, heavy=PROPOSAL_HEAVY_FIELDS)
+        except ListingError as e:
+            return jsonify({'detail': str(e)}), 400
+
         with get_db_connection() as conn:
             cursor = conn.cursor()
             
             print(f"🔍 Looking for proposals for user {username} (user_id: {user_id}, email: {email})")
             
             # Determine requester role (to support finance/admin behaviours)
-            requester_role = None
-            try:
-                if user_id:
-                    cursor.execute('SELECT role FROM users WHERE id = %s', (user_id,))
-                    role_row = cursor.fetchone()
-                    if role_row:
-                        requester_role = role_row[0]
-            except Exception:
-                requester_role = None
+            # token_required already resolved the caller's identity (role included).
+            identity = get_request_identity(username, cursor)
+            requester_role = identity.role if identity is not None else None
 
             requester_role = (requester_role or '').strip().lower()
             is_finance = requester_role.startswith('finance') or requester_role in ['finance']
@@ -549,24 +457,16 @@ def get_proposals(username=None, user_id=None, email=None):
             is_manager = _is_manager_role(requester_role)
 
             if not user_id and not is_finance:
-                resolved_user_id = resolve_user_id(cursor, username or email)
-                user_id = resolved_user_id
-                if not user_id:
-                    print(f"⚠️ Could not resolve numeric ID for {username or email}, returning empty list")
-                    return jsonify([]), 200
-                resolved_user_id = resolve_user_id(cursor, username or email)
-                user_id = resolved_user_id
+                if identity is not None:
+                    user_id = identity.user_id
+                else:
+                    user_id = resolve_user_id(cursor, username or email)
                 if not user_id:
                     print(f"⚠️ Could not resolve numeric ID for {username or email}, returning empty list")
-                    return jsonify([]), 200
+                    return jsonify(_empty_listing(listing)), 200
             
             # Check what columns exist in proposals table
-            cursor.execute("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'proposals'
-            """)
-            existing_columns = [row[0] for row in cursor.fetchall()]
+            existing_columns = list(get_table_columns('proposals', cursor))
             print(f"📋 Available columns in proposals table: {existing_columns}")
 
             def _pick_first(existing, candidates):
@@ -621,10 +521,7 @@ def get_proposals(username=None, user_id=None, email=None):
                 if 'pdf_url' in existing_columns:
                     select_cols.append('pdf_url')
 
-                query = f'''SELECT {', '.join(select_cols)}
-                     FROM proposals
-                     ORDER BY created_at DESC'''
-                cursor.execute(query)
+                where_sql, where_params = '', []
 
             # Build query dynamically based on available columns for non-finance users
             elif 'owner_id' in existing_columns:
@@ -645,10 +542,7 @@ def get_proposals(username=None, user_id=None, email=None):
                 if 'pdf_url' in existing_columns:
                     select_cols.append('pdf_url')
                 
-                query = f'''SELECT {', '.join(select_cols)}
-                     FROM proposals WHERE owner_id = %s
-                     ORDER BY created_at DESC'''
-                cursor.execute(query, (user_id,))
+                where_sql, where_params = 'WHERE owner_id = %s', [user_id]
             elif 'user_id' in existing_columns:
                 select_cols = ['id', 'user_id', 'title', 'content', 'status']
                 if 'client' in existing_columns:
@@ -665,17 +559,49 @@ def get_proposals(username=None, user_id=None, email=None):
                 if 'updated_at' in existing_columns:
                     select_cols.append('updated_at')
 
-                # Handle legacy schemas where user_id may be stored as VARCHAR
-                query = f'''SELECT {', '.join(select_cols)}
-                   FROM proposals WHERE user_id::text = %s::text
-                     ORDER BY created_at DESC'''
-                cursor.execute(query, (str(user_id),))
+                # Legacy schemas store user_id as VARCHAR; bind it as the column's type
+                where_sql = 'WHERE user_id = %s'
+                where_params = [get_id_type('proposals', 'user_id', cursor).coerce(user_id)]
             else:
                 print(f"⚠️ No owner_id or user_id column found in proposals table")
-                return jsonify([]), 200
+                return jsonify(_empty_listing(listing)), 200
+
+            # Heavy JSON columns are only read when the projection asks for them.
+            # `sections` falls back to the sections stored inside content, so it needs content too.
+            select_cols = [
+                c for c in select_cols
+                if c not in PROPOSAL_HEAVY_FIELDS or listing.wants(c)
+                or (c == 'content' and listing.wants('sections'))
+            ]
+
+            if listing.paginated:
+                if 'updated_at' in existing_columns and 'created_at' in existing_columns:
+                    recency_sql = proposal_recency_sql()
+                else:
+                    recency_sql = "COALESCE(created_at, 'epoch')"
+                condition, tail, page_params = keyset_sql(listing, recency_sql)
+                if condition:
+                    page_where = f"{where_sql} AND {condition}" if where_sql else f"WHERE {condition}"
+                else:
+                    page_where = where_sql
+                query = f'''SELECT {', '.join(select_cols)}, {recency_sql} AS {SORT_KEY}
+                     FROM proposals {page_where}
+                     {tail}'''
+                cursor.execute(query, tuple(where_params + page_params))
+            else:
+                query = f'''SELECT {', '.join(select_cols)}
+                     FROM proposals {where_sql}
+                     ORDER BY created_at DESC'''
+                cursor.execute(query, tuple(where_params))
             
             rows = cursor.fetchall()
             column_names = [desc[0] for desc in cursor.description] if cursor.description else []
+            page = None
+            if listing.paginated:
+                rows, has_more, next_cursor = paginate(listing, [dict(zip(column_names, r)) for r in rows])
+                rows = [tuple(r.values()) for r in rows]
+                page = page_info(cursor, listing, len(rows), has_more, next_cursor,
+                                 f"FROM proposals {where_sql}", where_params)
             
             proposals = []
             for row in rows:
@@ -778,12 +704,14 @@ def get_proposals(username=None, user_id=None, email=None):
                     proposal['template_key'] = row_dict.get('template_key')
                     proposal['pdf_url'] = row_dict.get('pdf_url')
                     
-                    proposals.append(proposal)
+                    proposals.append(listing.project(proposal))
                 except Exception as row_error:
                     print(f"⚠️ Error processing proposal row: {row_error}")
                     continue
             
             print(f"✅ Found {len(proposals)} proposals for user {username}")
+            if page is not None:
+                return jsonify({'proposals': proposals, 'page': page}), 200
             return jsonify(proposals), 200
     except Exception as e:
         print(f"❌ Error getting proposals: {e}")
@@ -813,14 +741,7 @@ def update_proposal(username=None, proposal_id=None, user_id=None, email=None):
             cursor = conn.cursor()
 
             # Determine ownership column based on actual schema
-            cursor.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_name = 'proposals'
-                """
-            )
-            existing_columns = [row[0] for row in cursor.fetchall()]
+            existing_columns = list(get_table_columns('proposals', cursor))
 
             owner_col = None
             if 'owner_id' in existing_columns:
@@ -988,6 +909,7 @@ def update_proposal(username=None, proposal_id=None, user_id=None, email=None):
             
             params.append(proposal_id)
             cursor.execute(f'''UPDATE proposals SET {', '.join(updates)} WHERE id = %s''', params)
+            refresh_proposal_financials_safe(cursor, proposal_id)
             conn.commit()
 
             changes = []
@@ -1110,6 +1032,7 @@ def update_proposal_status(username=None, proposal_id=None, user_id=None, email=
                 '''UPDATE proposals SET status = %s, updated_at = NOW() WHERE id = %s''',
                 (status_to_store, proposal_id),
             )
+            refresh_proposal_financials_safe(cursor, proposal_id)
             conn.commit()
 
             log_finance_audit_async(
@@ -1154,14 +1077,7 @@ def delete_proposal(username=None, proposal_id=None, user_id=None, email=None):
             cursor = conn.cursor()
 
             # Detect proposals ownership column based on actual schema
-            cursor.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_name = 'proposals'
-                """
-            )
-            proposal_columns = [row[0] for row in cursor.fetchall()]
+            proposal_columns = list(get_table_columns('proposals', cursor))
             owner_col = 'owner_id' if 'owner_id' in proposal_columns else (
                 'user_id' if 'user_id' in proposal_columns else None
             )
@@ -1203,14 +1119,7 @@ def delete_proposal(username=None, proposal_id=None, user_id=None, email=None):
 
             # Best-effort cleanup of dependent rows for schemas without ON DELETE CASCADE.
             # Only run DELETEs for tables that actually exist.
-            cursor.execute(
-                """
-                SELECT table_name
-                FROM information_schema.tables
-                WHERE table_schema = 'public'
-                """
-            )
-            existing_tables = {row[0] for row in cursor.fetchall()}
+            existing_tables = get_table_names(cursor)
 
             dependent_tables = [
                 'approvals',
@@ -1285,14 +1194,7 @@ def get_proposal(username=None, proposal_id=None, user_id=None, email=None):
             is_manager = _is_manager_role(requester_role)
 
             # Detect proposals table schema
-            cursor.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_name = 'proposals'
-                """
-            )
-            existing_columns = [row[0] for row in cursor.fetchall()]
+            existing_columns = list(get_table_columns('proposals', cursor))
 
             owner_col = 'owner_id' if 'owner_id' in existing_columns else (
                 'user_id' if 'user_id' in existing_columns else None
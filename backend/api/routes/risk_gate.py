@@ -9,9 +9,17 @@ from decimal import Decimal
 from flask import Blueprint, request, jsonify
 from psycopg2.extras import RealDictCursor
 
-from api.utils.database import get_db_connection
+from api.utils.database import get_db_connection, get_table_columns
 from api.utils.ai_safety import AISafetyError, sanitize_for_external_ai, enforce_safe_for_external_ai
 from api.utils.decorators import token_required
+from api.utils.risk_gate_cache import (
+    RISK_GATE_CACHE_ENABLED,
+    cache_hit_rate,
+    content_hash,
+    lookup_cached_result,
+    make_cache_key,
+    store_cached_result,
+)
 
 bp = Blueprint("risk_gate", __name__, url_prefix="/api/risk-gate")
 
@@ -287,9 +295,68 @@ def analyze(username=None):
                 response_body["run_id"] = run_id
                 return response_body, 200
 
-            # Run AI analysis
+            # Reuse the last analysis of identical content unless the caller forces a rerun.
             from ai_service import ai_service
 
+            force = str(data.get("force") or request.args.get("force") or "").strip().lower() in ("1", "true", "yes")
+            payload_hash = content_hash(safety_result.sanitized)
+            model_id = ai_service.risk_analysis_model_id()
+            cache_key = make_cache_key(payload_hash, model_id)
+            redaction_summary = {
+                "blocked": False,
+                "reasons": [],
+                "sanitized_payload_hash": hashlib.sha256(
+                    json.dumps(safety_result.sanitized).encode()
+                ).hexdigest(),
+            }
+
+            cached = None
+            if RISK_GATE_CACHE_ENABLED and not force:
+                cached = lookup_cached_result(cursor, cache_key)
+            if cached:
+                analysis = cached.get("analysis") or {}
+                issues = cached.get("issues") or []
+                kb_citations = cached.get("kb_citations") or []
+                status = cached["status"]
+                risk_score = cached["risk_score"]
+                cursor.execute(
+                    """
+                    INSERT INTO risk_gate_runs (proposal_id, requested_by, status, risk_score, issues, kb_citations,
+                                                redaction_summary, cached, cache_key)
+                    VALUES (%s, %s, %s, %s, %s::jsonb, %s::jsonb, %s::jsonb, TRUE, %s)
+                    RETURNING id
+                    """,
+                    (
+                        proposal_id,
+                        username,
+                        status,
+                        int(risk_score or 0),
+                        json.dumps(issues),
+                        json.dumps(kb_citations),
+                        json.dumps(redaction_summary),
+                        cache_key,
+                    ),
+                )
+                run_id = cursor.fetchone()["id"]
+                conn.commit()
+                print(f"[RISK-GATE] Cache hit for proposal {proposal_id} (run {run_id}, source run {cached.get('source_run_id')})")
+                return {
+                    "run_id": run_id,
+                    "status": status,
+                    "risk_level": analysis.get("risk_level") or status,
+                    "risk_score": risk_score,
+                    "issues": issues,
+                    "recommendations": analysis.get("recommendations", []) or [],
+                    "can_release": analysis.get("can_release", status == "PASS"),
+                    "total_issues": analysis.get("total_issues", len(issues)),
+                    "priority_breakdown": analysis.get("priority_breakdown", {}) or {},
+                    "kb_citations": kb_citations,
+                    "redaction_summary": redaction_summary,
+                    "cached": True,
+                    "cached_at": cached["created_at"].isoformat() if cached.get("created_at") else None,
+                }, 200
+
+            # Run AI analysis
             ai_analysis = None
             try:
                 ai_analysis = ai_service.analyze_proposal_risks(proposal_dict)
@@ -326,19 +393,11 @@ def analyze(username=None):
             # Decision
             status = _map_score_to_status(int(risk_score or 0), issues)
 
-            # Redaction summary
-            redaction_summary = {
-                "blocked": False,
-                "reasons": [],
-                "sanitized_payload_hash": hashlib.sha256(
-                    json.dumps(safety_result.sanitized).encode()
-                ).hexdigest(),
-            }
-
             cursor.execute(
                 """
-                INSERT INTO risk_gate_runs (proposal_id, requested_by, status, risk_score, issues, kb_citations, redaction_summary)
-                VALUES (%s, %s, %s, %s, %s::jsonb, %s::jsonb, %s::jsonb)
+                INSERT INTO risk_gate_runs (proposal_id, requested_by, status, risk_score, issues, kb_citations,
+                                            redaction_summary, cache_key)
+                VALUES (%s, %s, %s, %s, %s::jsonb, %s::jsonb, %s::jsonb, %s)
                 RETURNING id
                 """,
                 (
@@ -349,10 +408,10 @@ def analyze(username=None):
                     json.dumps(issues),
                     json.dumps(kb_citations),
                     json.dumps(redaction_summary),
+                    cache_key,
                 ),
             )
             run_id = cursor.fetchone()["id"]
-            conn.commit()
 
             # Frontend expects risk_level, recommendations, can_release, total_issues, priority_breakdown (e.g. from HF)
             risk_level = (
@@ -364,6 +423,27 @@ def analyze(username=None):
             total_issues = ai_analysis.get("total_issues", len(issues))
             priority_breakdown = ai_analysis.get("priority_breakdown", {}) or {}
 
+            if RISK_GATE_CACHE_ENABLED:
+                store_cached_result(
+                    cursor,
+                    cache_key,
+                    payload_hash,
+                    model_id,
+                    status,
+                    int(risk_score or 0),
+                    issues,
+                    kb_citations,
+                    {
+                        "risk_level": risk_level,
+                        "recommendations": recommendations,
+                        "can_release": can_release,
+                        "total_issues": total_issues,
+                        "priority_breakdown": priority_breakdown,
+                    },
+                    run_id,
+                )
+            conn.commit()
+
             return {
                 "run_id": run_id,
                 "status": status,
@@ -376,6 +456,7 @@ def analyze(username=None):
                 "priority_breakdown": priority_breakdown,
                 "kb_citations": kb_citations,
                 "redaction_summary": redaction_summary,
+                "cached": False,
             }, 200
 
     except AISafetyError as e:
@@ -396,6 +477,26 @@ def analyze(username=None):
         return {"detail": "Internal error"}, 500
 
 
+@bp.get("/cache-stats")
+@token_required
+def cache_stats(username=None):
+    """Hit rate of the /analyze result cache over the last `days` days (default 30)."""
+    try:
+        days = max(1, min(int(request.args.get("days") or 30), 365))
+    except ValueError:
+        return {"detail": "days must be an integer"}, 400
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            stats = cache_hit_rate(cursor, days)
+        stats["enabled"] = RISK_GATE_CACHE_ENABLED
+        return stats, 200
+    except Exception as e:
+        print(f"❌ Risk Gate cache stats error: {e}")
+        traceback.print_exc()
+        return {"detail": "Internal error"}, 500
+
+
 @bp.post("/override")
 @token_required
 def override(username=None):
@@ -494,16 +595,8 @@ def summary(username=None, user_id=None, email=None):
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=RealDictCursor)
 
-            cursor.execute(
-                """
-                SELECT column_name, data_type
-                FROM information_schema.columns
-                WHERE table_schema = 'public' AND table_name = 'proposals'
-                """
-            )
-            cols = cursor.fetchall() or []
-            existing_columns = {r["column_name"] for r in cols}
-            col_types = {r["column_name"]: r["data_type"] for r in cols}
+            col_types = get_table_columns("proposals", cursor)
+            existing_columns = set(col_types)
 
             owner_col = None
             if "owner_id" in existing_columns:
@@ -765,16 +858,8 @@ def proposals(username=None, user_id=None, email=None):
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=RealDictCursor)
 
-            cursor.execute(
-                """
-                SELECT column_name, data_type
-                FROM information_schema.columns
-                WHERE table_schema = 'public' AND table_name = 'proposals'
-                """
-            )
-            cols = cursor.fetchall() or []
-            existing_columns = {r["column_name"] for r in cols}
-            col_types = {r["column_name"]: r["data_type"] for r in cols}
+            col_types = get_table_columns("proposals", cursor)
+            existing_columns = set(col_types)
 
             owner_col = None
             if "owner_id" in existing_columns:
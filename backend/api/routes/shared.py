@@ -1,25 +1,39 @@
 """
 Shared utility routes - Notifications, mentions, user search, DocuSign, etc.
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, make_response
 import os
 import traceback
-import difflib
 import base64
 import psycopg2.extras
 from datetime import datetime
+from io import BytesIO
 import xml.etree.ElementTree as ET
 import sys
 
-from api.utils.database import get_db_connection
-from api.utils.decorators import token_required
+from api.utils.database import get_db_connection, get_id_type, get_table_columns
+from api.utils.decorators import token_required, get_request_identity
 from api.utils.helpers import (
     log_activity,
     generate_proposal_pdf,
+    proposal_pdf_etag,
     create_docusign_envelope,
     notify_proposal_collaborators,
     create_notification,
 )
+from api.utils.email_outbox import get_email_status
+from api.utils.proposal_financials import refresh_proposal_financials_safe
+from api.utils.listing import (
+    NOTIFICATION_RECENCY_SQL,
+    SORT_KEY,
+    ListingError,
+    keyset_sql,
+    page_info,
+    paginate,
+    parse_listing_args,
+)
+from api.utils.pdf_cache import etag_matches
+from api.utils.version_diff import adjacent_diffs, compare_versions
 
 bp = Blueprint('shared', __name__)
 
@@ -99,19 +113,7 @@ def preview_proposal_pdf(username=None, proposal_id=None):
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
             def _get_table_columns(table_name: str):
-                cursor.execute(
-                    """
-                    SELECT column_name
-                    FROM information_schema.columns
-                    WHERE table_name = %s
-                    """,
-                    (table_name,),
-                )
-                cols = cursor.fetchall() or []
-                return [
-                    (c['column_name'] if isinstance(c, dict) else c[0])
-                    for c in cols
-                ]
+                return list(get_table_columns(table_name, cursor))
 
             cursor.execute('SELECT id, role FROM users WHERE username = %s', (username,))
             current_user = cursor.fetchone()
@@ -156,20 +158,26 @@ def preview_proposal_pdf(username=None, proposal_id=None):
             if not proposal:
                 return {'detail': 'Proposal not found or access denied'}, 404
 
-            pdf_content = generate_proposal_pdf(
+            pdf_args = dict(
                 proposal_id=proposal_id,
                 title=proposal.get('title') or f"Proposal {proposal_id}",
                 content=proposal.get('content', '') or '',
                 client_name=proposal.get('client_name'),
                 client_email=proposal.get('client_email'),
             )
-
-            return send_file(
-                BytesIO(pdf_content),
-                mimetype='application/pdf',
-                as_attachment=False,
-                download_name=f"Proposal_{proposal_id}.pdf",
-            )
+            etag = proposal_pdf_etag(**pdf_args)
+            if etag_matches(request.headers.get('If-None-Match'), etag):
+                resp = make_response('', 304)
+            else:
+                resp = send_file(
+                    BytesIO(generate_proposal_pdf(**pdf_args)),
+                    mimetype='application/pdf',
+                    as_attachment=False,
+                    download_name=f"Proposal_{proposal_id}.pdf",
+                )
+            resp.headers['ETag'] = f'"{etag}"'
+            resp.headers['Cache-Control'] = 'private, no-cache'
+            return resp
 
     except Exception as e:
         print(f"❌ Error previewing proposal PDF: {e}")
@@ -177,39 +185,35 @@ def preview_proposal_pdf(username=None, proposal_id=None):
         return {'detail': str(e)}, 500
 
 
+NOTIFICATION_LIST_FIELDS = (
+    'id', 'proposal_id', 'notification_type', 'title', 'message',
+    'metadata', 'is_read', 'created_at', 'read_at',
+)
+
+
 @bp.get("/notifications")
 @token_required
 def get_notifications(username=None, user_id=None, email=None):
-    """Get all notifications for the current user"""
+    """Get notifications for the current user
+
+    Without `limit`/`cursor` the newest 500 are returned as before; with them,
+    keyset pages ordered by (created_at, id) (see api/utils/listing.py).
+    """
     try:
+        try:
+            listing = parse_listing_args(request.args, NOTIFICATION_LIST_FIELDS, heavy=('metadata',))
+        except ListingError as e:
+            return {'detail': str(e)}, 400
+
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
             print(f"DEBUG: get_notifications called for user_id={user_id}, email={email}, username={username}")
             
-            # Use the same simple lookup pattern as the user profile endpoint (which works)
-            # Try email first (most reliable since it's unique and comes from Firebase)
-            found_user_id = None
-            
-            # If user_id was provided from decorator, trust it if it was just created
-            # The decorator verifies the user exists in the same connection after commit
-            if user_id:
-                print(f"🔍 Using user_id from decorator: {user_id} (trusting decorator verification)")
-                # Try to verify, but if it fails, still use the user_id since decorator verified it
-                try:
-                    cursor.execute('SELECT id FROM users WHERE id = %s', (user_id,))
-                    user = cursor.fetchone()
-                    if user:
-                        found_user_id = user['id']
-                        print(f"✅ Verified user_id {found_user_id} from decorator")
-                    else:
-                        # User not visible in this connection yet, but decorator verified it exists
-                        # Use the user_id anyway - it was verified in the creation connection
-                        print(f"⚠️ user_id {user_id} not visible in this connection yet, but trusting decorator verification")
-                        found_user_id = user_id
-                except Exception as e:
-                    print(f"⚠️ Error verifying user_id: {e}, but trusting decorator verification")
-                    found_user_id = user_id
-            
+            # token_required already resolved (and cached) the caller for this request,
+            # so no extra lookup is needed; email/username lookups remain as a fallback.
+            identity = get_request_identity(username, cursor)
+            found_user_id = identity.user_id if identity is not None else user_id
+
             # If not found, try email lookup (with retry for transaction visibility)
             if not found_user_id and email:
                 print(f"🔍 Looking up user by email: {email}")
@@ -250,20 +254,44 @@ def get_notifications(username=None, user_id=None, email=None):
             print(f"DEBUG: Final resolved user_id for query: {user_id}")
             
             # Get notifications
-            # Handle case where user_id might be VARCHAR in some databases
-            # Check if table exists and log it
-            cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = 'public' AND table_name IN ('notifications', 'notificationss')")
-            table_result = cursor.fetchall()
-            print(f"DEBUG: Found tables: {table_result}")
+            # user_id is VARCHAR in some databases: bind it as the column's own
+            # type so idx_notifications_user serves the filter and the ordering.
+            typed_user_id = get_id_type('notifications', 'user_id', cursor).coerce(user_id)
+            if listing.paginated:
+                condition, tail, page_params = keyset_sql(listing, NOTIFICATION_RECENCY_SQL)
+                cursor.execute(f"""
+                    SELECT id, proposal_id, notification_type, title, message,
+                           metadata, is_read, created_at, read_at,
+                           {NOTIFICATION_RECENCY_SQL} AS {SORT_KEY}
+                    FROM notifications
+                    WHERE user_id = %s{' AND ' + condition if condition else ''}
+                    {tail}
+                """, (typed_user_id, *page_params))
+                notifications, has_more, next_cursor = paginate(listing, [dict(n) for n in cursor.fetchall()])
+                page = page_info(cursor, listing, len(notifications), has_more, next_cursor,
+                                 'FROM notifications WHERE user_id = %s', (typed_user_id,))
+                # The badge counts every unread notification, not just this page.
+                cursor.execute(
+                    'SELECT COUNT(*) AS unread FROM notifications WHERE user_id = %s AND NOT is_read',
+                    (typed_user_id,),
+                )
+                unread_row = cursor.fetchone()
+                return {
+                    'notifications': [
+                        listing.project({k: v for k, v in n.items() if k != SORT_KEY}) for n in notifications
+                    ],
+                    'unread_count': int((unread_row or {}).get('unread') or 0),
+                    'page': page,
+                }, 200
 
             cursor.execute("""
                 SELECT id, proposal_id, notification_type, title, message, 
                        metadata, is_read, created_at, read_at
                 FROM notifications
-                WHERE user_id::text = %s::text
+                WHERE user_id = %s
                 ORDER BY created_at DESC
                 LIMIT 500
-            """, (str(user_id),))
+            """, (typed_user_id,))
 
             notifications = cursor.fetchall()
             print(f"DEBUG: Query result count: {len(notifications)}")
@@ -282,7 +310,7 @@ def get_notifications(username=None, user_id=None, email=None):
                     pass
 
             return {
-                'notifications': [dict(n) for n in notifications],
+                'notifications': [listing.project(dict(n)) for n in notifications],
                 'unread_count': int(unread_count),
             }, 200
             
@@ -447,6 +475,28 @@ def delete_all_notifications(username=None, user_id=None, email=None):
         return {'detail': str(e)}, 500
 
 
+@bp.get("/emails/<int:message_id>/status")
+@token_required
+def email_delivery_status(username=None, message_id=None):
+    """Delivery status of a queued email (queued, sending, sent or failed)"""
+    try:
+        status = get_email_status(message_id)
+        if not status:
+            return {'detail': 'Email not found'}, 404
+
+        requested_by = status.pop('requested_by', None)
+        if not requested_by or requested_by != username:
+            identity = get_request_identity(username)
+            if identity is None or identity.role_key not in ['admin', 'ceo', 'approver']:
+                return {'detail': 'Insufficient permissions'}, 403
+
+        status.pop('to_email', None)
+        return status, 200
+    except Exception as e:
+        print(f"❌ Error fetching email status: {e}")
+        return {'detail': str(e)}, 500
+
+
 @bp.get("/api/mentions")
 @token_required
 def get_user_mentions(username=None):
@@ -556,7 +606,7 @@ def get_activity_timeline(username=None, proposal_id=None):
 @bp.get("/proposals/<int:proposal_id>/versions/compare")
 @token_required
 def compare_proposal_versions(username=None, proposal_id=None):
-    """Compare two versions of a proposal"""
+    """Compare two versions of a proposal (structural diff, see version_diff)"""
     try:
         version1 = request.args.get('v1', type=int)
         version2 = request.args.get('v2', type=int)
@@ -566,74 +616,13 @@ def compare_proposal_versions(username=None, proposal_id=None):
         
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            result = compare_versions(cursor, proposal_id, version1, version2)
+            conn.commit()
             
-            # Get both versions
-            cursor.execute("""
-                SELECT id, version_number, content, created_at, created_by,
-                       u.full_name as created_by_name
-                FROM proposal_versions pv
-                LEFT JOIN users u ON pv.created_by = u.id
-                WHERE proposal_id = %s AND version_number IN (%s, %s)
-                ORDER BY version_number
-            """, (proposal_id, version1, version2))
-            
-            versions = cursor.fetchall()
-            
-            if len(versions) != 2:
+            if result is None:
                 return {'detail': 'One or both versions not found'}, 404
             
-            # Parse JSON content
-            import json
-            v1_content = json.loads(versions[0]['content']) if isinstance(versions[0]['content'], str) else versions[0]['content']
-            v2_content = json.loads(versions[1]['content']) if isinstance(versions[1]['content'], str) else versions[1]['content']
-            
-            # Convert to text for comparison
-            v1_text = json.dumps(v1_content, indent=2, sort_keys=True)
-            v2_text = json.dumps(v2_content, indent=2, sort_keys=True)
-            
-            # Generate diff
-            diff = difflib.unified_diff(
-                v1_text.splitlines(keepends=True),
-                v2_text.splitlines(keepends=True),
-                fromfile=f'Version {version1}',
-                tofile=f'Version {version2}',
-                lineterm=''
-            )
-            
-            # Generate HTML diff
-            html_diff = difflib.HtmlDiff()
-            html_diff_output = html_diff.make_table(
-                v1_text.splitlines(),
-                v2_text.splitlines(),
-                fromdesc=f'Version {version1} ({versions[0]["created_at"]})',
-                todesc=f'Version {version2} ({versions[1]["created_at"]})',
-                context=True,
-                numlines=3
-            )
-            
-            # Calculate statistics
-            changes = {'additions': 0, 'deletions': 0, 'modifications': 0}
-            for line in difflib.unified_diff(v1_text.splitlines(), v2_text.splitlines(), lineterm=''):
-                if line.startswith('+') and not line.startswith('+++'):
-                    changes['additions'] += 1
-                elif line.startswith('-') and not line.startswith('---'):
-                    changes['deletions'] += 1
-            
-            return {
-                'version1': {
-                    'version_number': versions[0]['version_number'],
-                    'created_at': versions[0]['created_at'].isoformat() if versions[0]['created_at'] else None,
-                    'created_by': versions[0]['created_by_name']
-                },
-                'version2': {
-                    'version_number': versions[1]['version_number'],
-                    'created_at': versions[1]['created_at'].isoformat() if versions[1]['created_at'] else None,
-                    'created_by': versions[1]['created_by_name']
-                },
-                'diff': '\n'.join(diff),
-                'html_diff': html_diff_output,
-                'changes': changes
-            }, 200
+            return result, 200
             
     except Exception as e:
         print(f"❌ Error comparing versions: {e}")
@@ -641,6 +630,22 @@ def compare_proposal_versions(username=None, proposal_id=None):
         return {'detail': str(e)}, 500
 
 
+@bp.get("/proposals/<int:proposal_id>/versions/diffs")
+@token_required
+def get_version_history_diffs(username=None, proposal_id=None):
+    """Diff of each version against the previous one, for the history view"""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            diffs = adjacent_diffs(cursor, proposal_id)
+            conn.commit()
+            return {'proposal_id': proposal_id, 'diffs': diffs}, 200
+    except Exception as e:
+        print(f"❌ Error getting version diffs: {e}")
+        traceback.print_exc()
+        return {'detail': str(e)}, 500
+
+
 @bp.post("/proposals/<int:proposal_id>/docusign/send")
 @token_required
 def send_for_signature(username=None, proposal_id=None):
@@ -663,19 +668,7 @@ def send_for_signature(username=None, proposal_id=None):
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
             def _get_table_columns(table_name: str):
-                cursor.execute(
-                    """
-                    SELECT column_name
-                    FROM information_schema.columns
-                    WHERE table_name = %s
-                    """,
-                    (table_name,),
-                )
-                cols = cursor.fetchall() or []
-                return [
-                    (c['column_name'] if isinstance(c, dict) else c[0])
-                    for c in cols
-                ]
+                return list(get_table_columns(table_name, cursor))
 
             cursor.execute('SELECT id FROM users WHERE username = %s', (username,))
             current_user = cursor.fetchone()
@@ -775,6 +768,7 @@ def send_for_signature(username=None, proposal_id=None):
                     updated_at = NOW()
                 WHERE id = %s
             """, (signer_email, proposal_id,))
+            refresh_proposal_financials_safe(cursor, proposal_id)
             conn.commit()
             
             return {
@@ -1073,8 +1067,10 @@ def create_suggestion(username=None, proposal_id=None):
                 'New Suggestion',
                 f"{current_user.get('full_name', current_user['email'])} suggested a change{' to ' + section_id if section_id else ''}",
                 exclude_user_id=current_user['id'],
-                metadata={'suggestion_id': result['id'], 'section_id': section_id}
+                metadata={'suggestion_id': result['id'], 'section_id': section_id},
+                cursor=cursor,
             )
+            conn.commit()
             
             return {
                 'id': result['id'],
@@ -1445,6 +1441,7 @@ def docusign_webhook():
                         SET status = 'Signed', updated_at = NOW()
                         WHERE id = %s
                     """, (signature['proposal_id'],))
+                    refresh_proposal_financials_safe(cursor, signature['proposal_id'])
                     
                     log_activity(
                         signature['proposal_id'],
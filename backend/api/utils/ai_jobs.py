@@ -0,0 +1,378 @@
+"""
+Durable AI job queue for the async generate-section / improve-area endpoints.
+
+The async endpoints used to run jobs on an in-process ThreadPoolExecutor and
+keep results in a module-level dict: a job polled on another gunicorn worker
+was "not found", every job was lost on restart, and the dict never shrank.
+Jobs now live in the `ai_jobs` table (migration 7):
+
+  - `enqueue_ai_job(action, payload, username)` inserts a row and returns its
+    id. Jobs are deduplicated by a hash of (action, username, payload): while
+    an identical job is pending, running or holding an unexpired result, its id
+    is returned instead of queueing the prompt again.
+  - Workers claim rows with `FOR UPDATE SKIP LOCKED`, so any number of worker
+    threads and processes can drain the table without running a job twice.
+    They normally run in their own process (backend/ai_job_worker.py); set
+    AI_JOBS_EMBEDDED_WORKERS to also run them inside the web process.
+  - Jobs whose worker died (running longer than AI_JOBS_STALE_LOCK_SECONDS)
+    are claimed again, up to AI_JOBS_MAX_ATTEMPTS.
+  - Results are kept for AI_JOBS_RESULT_TTL_SECONDS; workers delete expired
+    rows every AI_JOBS_EVICT_INTERVAL_SECONDS.
+  - `wait_for_ai_job(job_id, username, wait_seconds)` backs the long-polling
+    status endpoint.
+
+Handlers are registered per action with `register_job_handler`; a handler
+takes (payload, username) and returns the (body, http_status) pair the sync
+endpoint would have returned.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+AI_JOBS_RESULT_TTL_SECONDS = int(os.getenv('AI_JOBS_RESULT_TTL_SECONDS', '3600'))
+AI_JOBS_MAX_ATTEMPTS = int(os.getenv('AI_JOBS_MAX_ATTEMPTS', '2'))
+# Longer than the slowest upstream call (read timeout plus one lighter retry).
+AI_JOBS_STALE_LOCK_SECONDS = int(os.getenv('AI_JOBS_STALE_LOCK_SECONDS', '900'))
+AI_JOBS_POLL_SECONDS = float(os.getenv('AI_JOBS_POLL_SECONDS', '1'))
+AI_JOBS_EVICT_INTERVAL_SECONDS = float(os.getenv('AI_JOBS_EVICT_INTERVAL_SECONDS', '300'))
+AI_JOBS_EVICT_BATCH_SIZE = int(os.getenv('AI_JOBS_EVICT_BATCH_SIZE', '500'))
+# Upper bound for ?wait= on the status endpoint; keeps a web thread from being held too long.
+AI_JOBS_MAX_WAIT_SECONDS = float(os.getenv('AI_JOBS_MAX_WAIT_SECONDS', '25'))
+AI_JOBS_EMBEDDED_WORKERS = int(os.getenv('AI_JOBS_EMBEDDED_WORKERS', '0'))
+
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_ERROR = 'error'
+
+_handlers: Dict[str, Callable[[Dict[str, Any], Optional[str]], Tuple[Any, int]]] = {}
+
+
+def register_job_handler(action: str, handler: Callable[[Dict[str, Any], Optional[str]], Tuple[Any, int]]) -> None:
+    _handlers[action] = handler
+
+
+def make_job_key(action: str, payload: Dict[str, Any], username: Optional[str]) -> str:
+    """Dedupe key: identical prompts from the same user share one job."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    digest = hashlib.sha256()
+    for part in (action or '', username or '', canonical):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def poll_delays(wait_seconds: float, first: float = 0.25, maximum: float = 1.0):
+    """Sleep intervals for a long-poll of `wait_seconds`: short at first, then up to `maximum`."""
+    remaining = max(0.0, wait_seconds)
+    delay = first
+    while remaining > 0:
+        step = min(delay, remaining)
+        yield step
+        remaining -= step
+        delay = min(maximum, delay * 2)
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+# ---------------------------------------------------------------------------
+# Database access
+# ---------------------------------------------------------------------------
+
+def create_ai_jobs_table(cursor) -> None:
+    """DDL for migration 7."""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ai_jobs (
+            id TEXT PRIMARY KEY,
+            action TEXT NOT NULL,
+            dedupe_key TEXT NOT NULL,
+            username TEXT,
+            req_id TEXT,
+            payload JSONB NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            status_code INTEGER,
+            result JSONB,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            locked_at TIMESTAMPTZ,
+            finished_at TIMESTAMPTZ,
+            expires_at TIMESTAMPTZ NOT NULL
+        )
+        """
+    )
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_ai_jobs_dedupe ON ai_jobs (dedupe_key)")
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_ai_jobs_claim
+        ON ai_jobs (created_at)
+        WHERE status IN ('pending', 'running')
+        """
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_jobs_expires ON ai_jobs (expires_at)")
+
+
+def enqueue_ai_job(action: str, payload: Dict[str, Any], username: Optional[str] = None,
+                   req_id: Optional[str] = None) -> Dict[str, Any]:
+    """Queue a job (or find its live duplicate); returns {'id', 'status', 'deduplicated'}."""
+    from api.utils.database import get_db_connection
+
+    dedupe_key = make_job_key(action, payload, username)
+    job_id = f"job-{uuid.uuid4().hex}"
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        # A failed or expired job with the same key is queued again under its old id.
+        cursor.execute(
+            """
+            INSERT INTO ai_jobs (id, action, dedupe_key, username, req_id, payload, expires_at)
+            VALUES (%s, %s, %s, %s, %s, %s::jsonb, NOW() + (%s * INTERVAL '1 second'))
+            ON CONFLICT (dedupe_key) DO UPDATE
+                SET status = 'pending', payload = EXCLUDED.payload, req_id = EXCLUDED.req_id,
+                    status_code = NULL, result = NULL, attempts = 0, created_at = NOW(),
+                    locked_at = NULL, finished_at = NULL, expires_at = EXCLUDED.expires_at
+                WHERE ai_jobs.status = 'error' OR ai_jobs.expires_at < NOW()
+            RETURNING id, status
+            """,
+            (job_id, action, dedupe_key, username, req_id, json.dumps(payload), AI_JOBS_RESULT_TTL_SECONDS),
+        )
+        row = cursor.fetchone()
+        deduplicated = row is None
+        if deduplicated:
+            cursor.execute('SELECT id, status FROM ai_jobs WHERE dedupe_key = %s', (dedupe_key,))
+            row = cursor.fetchone()
+        conn.commit()
+    job = {'id': row[0], 'status': row[1], 'deduplicated': deduplicated}
+    if deduplicated:
+        print(f"[AI-JOBS] Duplicate {action} request; reusing job {job['id']} ({job['status']})")
+    else:
+        print(f"[AI-JOBS] Queued {action} job {job['id']}")
+    return job
+
+
+def get_ai_job(job_id: str, username: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """The job's status and result, or None if it does not exist (or belongs to another user)."""
+    import psycopg2.extras
+    from api.utils.database import get_db_connection
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute(
+            """
+            SELECT id, action, username, status, status_code, result, attempts,
+                   created_at, finished_at
+            FROM ai_jobs
+            WHERE id = %s AND expires_at > NOW()
+            """,
+            (job_id,),
+        )
+        row = cursor.fetchone()
+    if not row:
+        return None
+    job = dict(row)
+    if username is not None and job.get('username') not in (None, username):
+        return None
+    job['result'] = _json_value(job.get('result'))
+    return job
+
+
+def wait_for_ai_job(job_id: str, username: Optional[str] = None, wait_seconds: float = 0.0,
+                    sleep: Callable[[float], None] = time.sleep) -> Optional[Dict[str, Any]]:
+    """get_ai_job, re-checked until the job finishes or `wait_seconds` pass."""
+    wait_seconds = min(max(0.0, wait_seconds), AI_JOBS_MAX_WAIT_SECONDS)
+    job = get_ai_job(job_id, username)
+    for delay in poll_delays(wait_seconds):
+        if job is None or job['status'] in (STATUS_DONE, STATUS_ERROR):
+            break
+        sleep(delay)
+        job = get_ai_job(job_id, username)
+    return job
+
+
+def _claim_job() -> Optional[Dict[str, Any]]:
+    import psycopg2.extras
+    from api.utils.database import get_db_connection
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute(
+            """
+            UPDATE ai_jobs
+            SET status = 'running', locked_at = NOW(), attempts = attempts + 1
+            WHERE id = (
+                SELECT id FROM ai_jobs
+                WHERE ((status = 'pending')
+                    OR (status = 'running' AND locked_at < NOW() - (%s * INTERVAL '1 second')))
+                  AND attempts < %s
+                  AND expires_at > NOW()
+                ORDER BY created_at
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, action, username, payload, attempts
+            """,
+            (AI_JOBS_STALE_LOCK_SECONDS, AI_JOBS_MAX_ATTEMPTS),
+        )
+        row = cursor.fetchone()
+        conn.commit()
+    if not row:
+        return None
+    job = dict(row)
+    job['payload'] = _json_value(job.get('payload')) or {}
+    return job
+
+
+def _finish_job(job_id: str, status: str, status_code: int, result: Any) -> None:
+    from api.utils.database import get_db_connection
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE ai_jobs
+            SET status = %s, status_code = %s, result = %s::jsonb, locked_at = NULL,
+                finished_at = NOW(), expires_at = NOW() + (%s * INTERVAL '1 second')
+            WHERE id = %s
+            """,
+            (status, status_code, json.dumps(result, default=str), AI_JOBS_RESULT_TTL_SECONDS, job_id),
+        )
+        conn.commit()
+
+
+def evict_expired_jobs(batch_size: int = AI_JOBS_EVICT_BATCH_SIZE) -> int:
+    """Fail jobs abandoned after their last attempt and delete expired rows; returns rows deleted."""
+    from api.utils.database import get_db_connection
+
+    deleted = 0
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE ai_jobs
+            SET status = 'error', status_code = 504, locked_at = NULL, finished_at = NOW(),
+                result = '{"success": false, "error": "AI job worker stopped before finishing."}'::jsonb,
+                expires_at = NOW() + (%s * INTERVAL '1 second')
+            WHERE status = 'running'
+              AND locked_at < NOW() - (%s * INTERVAL '1 second')
+              AND attempts >= %s
+            """,
+            (AI_JOBS_RESULT_TTL_SECONDS, AI_JOBS_STALE_LOCK_SECONDS, AI_JOBS_MAX_ATTEMPTS),
+        )
+        conn.commit()
+        while True:
+            cursor.execute(
+                """
+                DELETE FROM ai_jobs
+                WHERE id IN (
+                    SELECT id FROM ai_jobs
+                    WHERE expires_at < NOW()
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                """,
+                (batch_size,),
+            )
+            count = cursor.rowcount or 0
+            conn.commit()
+            deleted += count
+            if count < batch_size:
+                break
+    if deleted:
+        print(f"[AI-JOBS] Evicted {deleted} expired jobs")
+    return deleted
+
+
+# ---------------------------------------------------------------------------
+# Workers
+# ---------------------------------------------------------------------------
+
+_workers_lock = threading.Lock()
+_workers: List[threading.Thread] = []
+_stop = threading.Event()
+_last_eviction = 0.0
+_eviction_lock = threading.Lock()
+
+
+def run_job(job: Dict[str, Any]) -> Tuple[str, int, Any]:
+    """Run one claimed job through its handler; returns (status, http_status, result)."""
+    handler = _handlers.get(job.get('action'))
+    if handler is None:
+        return STATUS_ERROR, 500, {'success': False, 'error': f"No handler for AI job action {job.get('action')!r}."}
+    try:
+        body, status_code = handler(job.get('payload') or {}, job.get('username'))
+    except Exception as exc:
+        traceback.print_exc()
+        return STATUS_ERROR, 500, {'success': False, 'error': f"{type(exc).__name__}: {exc}"}
+    status = STATUS_DONE if 200 <= int(status_code) <= 299 else STATUS_ERROR
+    return status, int(status_code), body
+
+
+def _maybe_evict() -> None:
+    global _last_eviction
+    with _eviction_lock:
+        if time.monotonic() - _last_eviction < AI_JOBS_EVICT_INTERVAL_SECONDS:
+            return
+        _last_eviction = time.monotonic()
+    try:
+        evict_expired_jobs()
+    except Exception as exc:
+        print(f"[WARN] AI job eviction failed: {exc}")
+
+
+def _worker_loop(name: str) -> None:
+    print(f"[AI-JOBS] Worker {name} started")
+    while not _stop.is_set():
+        _maybe_evict()
+        try:
+            job = _claim_job()
+        except Exception as exc:
+            print(f"[WARN] AI job claim failed: {exc}")
+            job = None
+        if job is None:
+            _stop.wait(AI_JOBS_POLL_SECONDS)
+            continue
+        started = time.monotonic()
+        status, status_code, result = run_job(job)
+        try:
+            _finish_job(job['id'], status, status_code, result)
+        except Exception:
+            traceback.print_exc()
+            continue
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        print(f"[AI-JOBS] {name} finished {job['action']} job {job['id']} status={status} "
+              f"http={status_code} attempt={job.get('attempts')} elapsed_ms={elapsed_ms}")
+
+
+def start_ai_job_workers(count: Optional[int] = None) -> int:
+    """Start worker threads once per process; returns how many are running."""
+    count = AI_JOBS_EMBEDDED_WORKERS if count is None else count
+    with _workers_lock:
+        alive = [t for t in _workers if t.is_alive()]
+        _workers[:] = alive
+        if _stop.is_set():
+            _stop.clear()
+        for i in range(len(alive), max(0, count)):
+            thread = threading.Thread(target=_worker_loop, args=(f"ai-jobs-{i}",), name=f"ai-jobs-{i}", daemon=True)
+            thread.start()
+            _workers.append(thread)
+        return len(_workers)
+
+
+def stop_ai_job_workers(timeout: float = 5.0) -> None:
+    _stop.set()
+    with _workers_lock:
+        threads = list(_workers)
+        _workers.clear()
+    for thread in threads:
+        thread.join(timeout)
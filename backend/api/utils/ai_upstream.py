@@ -0,0 +1,275 @@
+"""
+Pooled, bounded client for the AI assistant upstream (the Hugging Face Space).
+
+`ai_assistant_proxy._call_upstream` used to hold one process-wide lock around
+every authenticated POST and open a fresh connection per call with
+`requests.request`, so every generate-section / improve-area request queued
+behind a single model inference of up to 120s, and a degraded Space made each
+of them wait for the full timeout. This module provides:
+
+  - `get_upstream_session()`: one keep-alive `requests.Session` per process,
+    with a connection pool sized for AI_ASSISTANT_MAX_IN_FLIGHT
+  - `UpstreamGate`: at most `max_in_flight` calls run at once. Callers wait in
+    a per-endpoint queue of at most `max_queue` entries, for at most
+    `queue_timeout` seconds, and then get `UpstreamBusy` instead of blocking a
+    worker indefinitely. Queue depth, in-flight count and wait times are
+    tracked per endpoint.
+  - `CircuitBreaker`: after `failure_threshold` consecutive upstream failures
+    (5xx, timeouts, network errors) calls fail fast with `CircuitOpen` for
+    `reset_timeout` seconds; then one trial call is let through, and its
+    outcome closes or re-opens the circuit.
+
+Small Spaces run out of memory with concurrent inferences; set
+AI_ASSISTANT_MAX_IN_FLIGHT=1 there to get the old one-at-a-time behaviour
+(with the queue limits and breaker still applied).
+
+Counters are available from `ai_upstream_stats()` (also on /health).
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+REQUESTS_AVAILABLE = False
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    requests = None
+    HTTPAdapter = None
+
+
+AI_ASSISTANT_MAX_IN_FLIGHT = max(1, int(os.getenv('AI_ASSISTANT_MAX_IN_FLIGHT', '2')))
+# Waiting callers allowed per endpoint before new ones are turned away.
+AI_ASSISTANT_MAX_QUEUE = max(0, int(os.getenv('AI_ASSISTANT_MAX_QUEUE', '8')))
+AI_ASSISTANT_QUEUE_TIMEOUT_S = float(os.getenv('AI_ASSISTANT_QUEUE_TIMEOUT_S', '60'))
+AI_ASSISTANT_BREAKER_THRESHOLD = max(1, int(os.getenv('AI_ASSISTANT_BREAKER_THRESHOLD', '5')))
+AI_ASSISTANT_BREAKER_RESET_S = float(os.getenv('AI_ASSISTANT_BREAKER_RESET_S', '30'))
+
+
+class UpstreamBusy(Exception):
+    """Raised by UpstreamGate when the endpoint queue is full or the wait timed out."""
+
+    def __init__(self, endpoint: str, reason: str):
+        super().__init__(f"{endpoint}: {reason}")
+        self.endpoint = endpoint
+        self.reason = reason
+
+
+class CircuitOpen(Exception):
+    """Raised by CircuitBreaker.before_call while the circuit is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"circuit open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class _EndpointStats:
+    __slots__ = ('queued', 'max_queued', 'in_flight', 'calls', 'rejected', 'timed_out',
+                 'wait_total_s', 'wait_max_s')
+
+    def __init__(self):
+        self.queued = 0
+        self.max_queued = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'queued': self.queued,
+            'max_queued': self.max_queued,
+            'in_flight': self.in_flight,
+            'calls': self.calls,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'avg_wait_ms': int(self.wait_total_s / self.calls * 1000) if self.calls else 0,
+            'max_wait_ms': int(self.wait_max_s * 1000),
+        }
+
+
+class UpstreamGate:
+    """Bounds in-flight upstream calls; callers queue per endpoint with a depth and wait limit."""
+
+    def __init__(self, max_in_flight: int = AI_ASSISTANT_MAX_IN_FLIGHT, max_queue: int = AI_ASSISTANT_MAX_QUEUE,
+                 queue_timeout: float = AI_ASSISTANT_QUEUE_TIMEOUT_S, clock: Callable[[], float] = time.monotonic):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._clock = clock
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, _EndpointStats] = {}
+
+    def _stats(self, endpoint: str) -> _EndpointStats:
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = _EndpointStats()
+        return stats
+
+    @contextmanager
+    def slot(self, endpoint: str, timeout: Optional[float] = None) -> Iterator[float]:
+        """Hold one in-flight slot for `endpoint`; yields the seconds spent waiting."""
+        timeout = self.queue_timeout if timeout is None else timeout
+        started = self._clock()
+        # Fast path: a free slot needs no queue entry.
+        acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                stats = self._stats(endpoint)
+                if stats.queued >= self.max_queue:
+                    stats.rejected += 1
+                    raise UpstreamBusy(endpoint, 'queue full')
+                stats.queued += 1
+                stats.max_queued = max(stats.max_queued, stats.queued)
+            try:
+                acquired = self._slots.acquire(timeout=timeout)
+            finally:
+                with self._lock:
+                    stats.queued -= 1
+                    if not acquired:
+                        stats.timed_out += 1
+            if not acquired:
+                raise UpstreamBusy(endpoint, f'no slot within {timeout:.0f}s')
+
+        waited = self._clock() - started
+        with self._lock:
+            stats = self._stats(endpoint)
+            stats.in_flight += 1
+            stats.calls += 1
+            stats.wait_total_s += waited
+            stats.wait_max_s = max(stats.wait_max_s, waited)
+        try:
+            yield waited
+        finally:
+            with self._lock:
+                stats.in_flight -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = {name: s.as_dict() for name, s in self._endpoints.items()}
+        return {
+            'max_in_flight': self.max_in_flight,
+            'max_queue': self.max_queue,
+            'in_flight': sum(e['in_flight'] for e in endpoints.values()),
+            'queued': sum(e['queued'] for e in endpoints.values()),
+            'endpoints': endpoints,
+        }
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker: closed -> open -> half-open (one trial) -> closed."""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = AI_ASSISTANT_BREAKER_THRESHOLD,
+                 reset_timeout: float = AI_ASSISTANT_BREAKER_RESET_S, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.opened_count = 0
+        self.short_circuited = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def before_call(self) -> None:
+        """Raise CircuitOpen unless a call may go upstream now."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self.short_circuited += 1
+            if state == self.OPEN:
+                retry_after = self.reset_timeout - (self._clock() - self._opened_at)
+            else:
+                retry_after = self.reset_timeout
+            raise CircuitOpen(max(0.0, retry_after))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened_count += 1
+                    print(f"[AI Upstream] circuit opened after {self._failures} consecutive failures")
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._trial_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'consecutive_failures': self._failures,
+                'opened_count': self.opened_count,
+                'short_circuited': self.short_circuited,
+            }
+
+
+_session = None
+_session_lock = threading.Lock()
+_gate = UpstreamGate()
+_breaker = CircuitBreaker()
+
+
+def get_upstream_session():
+    """Process-wide keep-alive requests.Session for the AI upstream (None without requests)."""
+    global _session
+    if not REQUESTS_AVAILABLE:
+        return None
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                pool_size = AI_ASSISTANT_MAX_IN_FLIGHT + 2  # room for /health alongside the gated calls
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def get_upstream_gate() -> UpstreamGate:
+    return _gate
+
+
+def get_upstream_breaker() -> CircuitBreaker:
+    return _breaker
+
+
+def ai_upstream_stats() -> Dict[str, Any]:
+    return {
+        'gate': _gate.stats(),
+        'breaker': _breaker.stats(),
+    }
@@ -0,0 +1,279 @@
+"""
+Cached downloads of remote assets (cover images, logos, KB documents).
+
+PDF rendering and KB imports used to download the same Cloudinary URLs with a
+fresh urllib/requests connection on every call. This module provides:
+
+  - `get_http_session()`: one pooled keep-alive `requests.Session` per process
+    (falls back to urllib when requests is not installed)
+  - `AssetCache`: an on-disk LRU keyed by URL. Entries remember the response
+    ETag / Last-Modified, are served without any network call for
+    ASSET_CACHE_FRESH_SECONDS, and are revalidated with a conditional GET after
+    that. A failed revalidation serves the stale copy instead of failing.
+  - image variants: `fetch_image_bytes(url, max_px)` returns the image decoded
+    and downscaled to at most `max_px` on its longest side (cached per URL
+    version), so ReportLab does not decode full-size uploads for a logo.
+    Requires Pillow; without it the original bytes are returned.
+"""
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from api.utils.disk_cache import DiskLRUCache
+
+REQUESTS_AVAILABLE = False
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    requests = None
+    HTTPAdapter = None
+
+PIL_AVAILABLE = False
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    Image = None
+
+
+ASSET_CACHE_DIR = os.getenv('ASSET_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'lukens_asset_cache')
+ASSET_CACHE_MAX_BYTES = int(os.getenv('ASSET_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+ASSET_CACHE_MAX_ENTRIES = int(os.getenv('ASSET_CACHE_MAX_ENTRIES', '5000'))
+ASSET_CACHE_FRESH_SECONDS = float(os.getenv('ASSET_CACHE_FRESH_SECONDS', '3600'))
+ASSET_FETCH_TIMEOUT_SECONDS = float(os.getenv('ASSET_FETCH_TIMEOUT_SECONDS', '10'))
+ASSET_HTTP_POOL_SIZE = int(os.getenv('ASSET_HTTP_POOL_SIZE', '10'))
+
+# Longest side, in pixels, of the image variants used by the PDF renderer.
+COVER_IMAGE_MAX_PX = int(os.getenv('PDF_COVER_IMAGE_MAX_PX', '2000'))
+LOGO_IMAGE_MAX_PX = int(os.getenv('PDF_LOGO_IMAGE_MAX_PX', '600'))
+
+
+class AssetFetchError(Exception):
+    """Raised when an asset cannot be downloaded and no cached copy exists."""
+
+
+class Asset:
+    __slots__ = ('content', 'content_type', 'etag', 'last_modified', 'fetched_at')
+
+    def __init__(self, content: bytes, content_type: Optional[str] = None, etag: Optional[str] = None,
+                 last_modified: Optional[str] = None, fetched_at: Optional[float] = None):
+        self.content = content
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+
+    def encode(self) -> bytes:
+        header = {
+            'content_type': self.content_type,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'fetched_at': self.fetched_at,
+        }
+        return json.dumps(header).encode('utf-8') + b'\n' + self.content
+
+    @classmethod
+    def decode(cls, blob: Optional[bytes]) -> Optional['Asset']:
+        if not blob:
+            return None
+        header, sep, content = blob.partition(b'\n')
+        if not sep:
+            return None
+        try:
+            meta = json.loads(header.decode('utf-8'))
+        except ValueError:
+            return None
+        return cls(content, meta.get('content_type'), meta.get('etag'), meta.get('last_modified'), meta.get('fetched_at') or 0.0)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """Process-wide pooled requests.Session (None when requests is not installed)."""
+    global _session
+    if not REQUESTS_AVAILABLE:
+        return None
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=ASSET_HTTP_POOL_SIZE, pool_maxsize=ASSET_HTTP_POOL_SIZE)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers.update({'User-Agent': 'Lukens-AssetFetcher/1.0'})
+                _session = session
+    return _session
+
+
+def _lower_headers(headers: Any) -> Dict[str, str]:
+    try:
+        return {str(k).lower(): v for k, v in headers.items()}
+    except Exception:
+        return {}
+
+
+def http_get(url: str, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None) -> Tuple[int, bytes, Dict[str, str]]:
+    """GET through the shared session; returns (status, body, lower-cased headers)."""
+    timeout = ASSET_FETCH_TIMEOUT_SECONDS if timeout is None else timeout
+    headers = dict(headers or {})
+    session = get_http_session()
+    if session is not None:
+        resp = session.get(url, headers=headers, timeout=timeout)
+        return resp.status_code, resp.content, _lower_headers(resp.headers)
+
+    import urllib.error
+    import urllib.request
+
+    req = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, resp.read(), _lower_headers(resp.headers)
+    except urllib.error.HTTPError as exc:
+        return exc.code, b'', _lower_headers(exc.headers or {})
+
+
+def _key(*parts: str) -> str:
+    return hashlib.sha256('\x00'.join(parts).encode('utf-8')).hexdigest()
+
+
+def resize_image(data: bytes, max_px: int) -> bytes:
+    """Downscale image bytes so the longest side is <= max_px (PNG keeps alpha, JPEG otherwise)."""
+    if not PIL_AVAILABLE or not data or max_px <= 0:
+        return data
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            if max(img.size) <= max_px and img.format in ('PNG', 'JPEG'):
+                return data
+            img.load()
+            img.thumbnail((max_px, max_px), Image.LANCZOS)
+            out = io.BytesIO()
+            if img.mode in ('RGBA', 'LA', 'P'):
+                img.save(out, format='PNG', optimize=True)
+            else:
+                img.convert('RGB').save(out, format='JPEG', quality=88, optimize=True)
+            return out.getvalue()
+    except Exception as exc:
+        print(f"[WARN] Could not resize image variant: {exc}")
+        return data
+
+
+class AssetCache(DiskLRUCache):
+    """LRU of downloaded assets (`<key>.asset`) and their resized image variants."""
+
+    SUFFIX = '.asset'
+
+    def __init__(self, directory: str, max_bytes: int = ASSET_CACHE_MAX_BYTES, max_entries: int = ASSET_CACHE_MAX_ENTRIES):
+        super().__init__(directory, max_bytes, max_entries)
+        self.fetches = 0
+        self.revalidated = 0
+        self.stale_served = 0
+
+    def fetch(self, url: str, timeout: Optional[float] = None, max_age: Optional[float] = None) -> Asset:
+        max_age = ASSET_CACHE_FRESH_SECONDS if max_age is None else max_age
+        key = _key('asset', url)
+        cached = Asset.decode(self.get(key))
+        if cached is not None and time.time() - cached.fetched_at < max_age:
+            return cached
+
+        with self._lock:
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                # Another thread may have refreshed the entry while we waited.
+                latest = Asset.decode(self.get(key))
+                if latest is not None and time.time() - latest.fetched_at < max_age:
+                    return latest
+                return self._download(key, url, latest or cached, timeout)
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is key_lock and not key_lock.locked():
+                    self._inflight.pop(key, None)
+
+    def _download(self, key: str, url: str, cached: Optional[Asset], timeout: Optional[float]) -> Asset:
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+
+        try:
+            status, body, resp_headers = http_get(url, headers=headers, timeout=timeout)
+            self.fetches += 1
+        except Exception as exc:
+            if cached is not None:
+                self.stale_served += 1
+                print(f"[WARN] Asset fetch failed ({exc}); serving cached copy of {url}")
+                return cached
+            raise AssetFetchError(f"Failed to download {url}: {exc}") from exc
+
+        if status == 304 and cached is not None:
+            self.revalidated += 1
+            refreshed = Asset(cached.content, cached.content_type, cached.etag, cached.last_modified)
+            self.put(key, refreshed.encode())
+            return refreshed
+
+        if status >= 400 or status == 304:
+            if cached is not None:
+                self.stale_served += 1
+                print(f"[WARN] Asset fetch returned HTTP {status}; serving cached copy of {url}")
+                return cached
+            raise AssetFetchError(f"Failed to download {url}: HTTP {status}")
+
+        asset = Asset(body, resp_headers.get('content-type'), resp_headers.get('etag'), resp_headers.get('last-modified'))
+        self.put(key, asset.encode())
+        return asset
+
+    def image_variant(self, url: str, max_px: int, timeout: Optional[float] = None) -> bytes:
+        asset = self.fetch(url, timeout=timeout)
+        if not PIL_AVAILABLE or max_px <= 0:
+            return asset.content
+        version = asset.etag or hashlib.sha256(asset.content).hexdigest()
+        variant_key = _key('variant', str(max_px), url, version)
+        return self.get_or_create(variant_key, lambda: resize_image(asset.content, max_px))
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats.update({'fetches': self.fetches, 'revalidated': self.revalidated, 'stale_served': self.stale_served})
+        return stats
+
+
+_cache: Optional[AssetCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_asset_cache() -> AssetCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AssetCache(ASSET_CACHE_DIR)
+    return _cache
+
+
+def fetch_asset(url: str, timeout: Optional[float] = None) -> Asset:
+    """Download (or serve from cache) an asset; raises AssetFetchError on failure."""
+    return get_asset_cache().fetch(url, timeout=timeout)
+
+
+def fetch_image_bytes(url: str, max_px: int = 0, timeout: Optional[float] = None) -> Optional[bytes]:
+    """Image bytes for the PDF renderer (resized when max_px > 0), or None on any failure."""
+    if not url or not isinstance(url, str):
+        return None
+    url = url.strip()
+    if not (url.startswith('http://') or url.startswith('https://')):
+        return None
+    try:
+        return get_asset_cache().image_variant(url, max_px, timeout=timeout)
+    except Exception as exc:
+        print(f"[WARN] Image fetch failed for {url}: {exc}")
+        return None
@@ -2,20 +2,35 @@
 Database connection and schema utilities
 """
 import os
+import threading
+import time
+import uuid
 from pathlib import Path
 import psycopg2
 import psycopg2.extras
-import psycopg2.pool
+import psycopg2.extensions
 from contextlib import contextmanager
 
 from urllib.parse import urlparse, parse_qs
 
 from dotenv import load_dotenv
 
+from api.utils.db_pool import ConnectionPool, PoolTimeoutError
+
 # PostgreSQL connection pool
 _pg_pool = None
 _db_initialized = False
 
+# Process-wide schema catalog: table name -> {column name: data type}.
+# Routes used to probe information_schema on every request to pick between legacy
+# column names (owner_id/user_id, client/client_name, ...); they now read this instead.
+SCHEMA_CATALOG_TTL_SECONDS = float(os.getenv('SCHEMA_CATALOG_TTL_SECONDS', '300'))
+SCHEMA_CATALOG_MISS_TTL_SECONDS = float(os.getenv('SCHEMA_CATALOG_MISS_TTL_SECONDS', '30'))
+_schema_catalog_lock = threading.Lock()
+_schema_catalog = {}
+_schema_catalog_loaded_at = 0.0
+_schema_catalog_misses = {}
+
 # Load .env from backend directory so DB_HOST / DATABASE_URL_EXTERNAL are always found
 _backend_dir = Path(__file__).resolve().parent.parent.parent
 load_dotenv(dotenv_path=_backend_dir / ".env")
@@ -106,103 +121,114 @@ def _build_db_config_from_env():
     }
 
 
+PG_POOL_MIN = int(os.getenv('PG_POOL_MIN', '1'))
+PG_POOL_MAX = int(os.getenv('PG_POOL_MAX', '20'))
+PG_POOL_MAX_OVERFLOW = int(os.getenv('PG_POOL_MAX_OVERFLOW', '5'))
+PG_POOL_TIMEOUT_SECONDS = float(os.getenv('PG_POOL_TIMEOUT_SECONDS', '10'))
+PG_POOL_IDLE_CHECK_SECONDS = float(os.getenv('PG_POOL_IDLE_CHECK_SECONDS', '30'))
+PG_POOL_MAX_LIFETIME_SECONDS = float(os.getenv('PG_POOL_MAX_LIFETIME_SECONDS', '1800'))
+_pg_pool_lock = threading.Lock()
+
+
+def _pg_conn_is_alive(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    finally:
+        cursor.close()
+    return True
+
+
+def _pg_conn_reset(conn):
+    """Leave the connection idle and in its default mode before it is pooled again.
+
+    rollback() is only sent when a transaction is open, so a clean return costs no
+    round-trip.
+    """
+    if conn.status != psycopg2.extensions.STATUS_READY:
+        conn.rollback()
+    if conn.autocommit:
+        conn.autocommit = False
+
+
 def get_pg_pool():
     """Get or create PostgreSQL connection pool"""
     global _pg_pool
-    if _pg_pool is None:
-        try:
-            db_config = _build_db_config_from_env()
-            
-            # Add SSL mode for external connections (like Render)
-            # Check if host contains 'render.com' or SSL is explicitly required
-            if 'sslmode' in db_config:
-                print(f"[*] Using SSL mode: {db_config['sslmode']} for external connection")
-            
-            print(f"[*] Connecting to PostgreSQL: {db_config['host']}:{db_config['port']}/{db_config['database']}")
-            _pg_pool = psycopg2.pool.SimpleConnectionPool(
-                minconn=1,
-                maxconn=20,
-                **db_config,
-            )
-            print("[OK] PostgreSQL connection pool created successfully")
-        except Exception as exc:
-            print(f"[ERROR] Error creating PostgreSQL connection pool: {exc}")
-            raise
+    if _pg_pool is not None:
+        return _pg_pool
+    with _pg_pool_lock:
+        if _pg_pool is None:
+            try:
+                db_config = _build_db_config_from_env()
+
+                # Add SSL mode for external connections (like Render)
+                # Check if host contains 'render.com' or SSL is explicitly required
+                if 'sslmode' in db_config:
+                    print(f"[*] Using SSL mode: {db_config['sslmode']} for external connection")
+
+                print(f"[*] Connecting to PostgreSQL: {db_config['host']}:{db_config['port']}/{db_config['database']}")
+                _pg_pool = ConnectionPool(
+                    connect=lambda: psycopg2.connect(**db_config),
+                    minconn=PG_POOL_MIN,
+                    maxconn=PG_POOL_MAX,
+                    max_overflow=PG_POOL_MAX_OVERFLOW,
+                    timeout=PG_POOL_TIMEOUT_SECONDS,
+                    idle_check_after=PG_POOL_IDLE_CHECK_SECONDS,
+                    max_lifetime=PG_POOL_MAX_LIFETIME_SECONDS,
+                    is_alive=_pg_conn_is_alive,
+                    reset=_pg_conn_reset,
+                )
+                print("[OK] PostgreSQL connection pool created successfully")
+            except Exception as exc:
+                print(f"[ERROR] Error creating PostgreSQL connection pool: {exc}")
+                raise
     return _pg_pool
 
 
+def get_pg_pool_stats():
+    """Connection pool counters (size, in use, wait time, checkouts/sec, ...)."""
+    if _pg_pool is None:
+        return {'configured': False}
+    return {'configured': True, **_pg_pool.stats()}
+
+
 def _pg_conn():
-    """Get a connection from the pool with retry logic for SSL errors"""
+    """Get a connection from the pool with retry logic for SSL errors.
+
+    Liveness is checked by the pool only for connections that sat idle longer than
+    PG_POOL_IDLE_CHECK_SECONDS, so a warm checkout costs no extra round-trip.
+    """
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            conn = get_pg_pool().getconn()
-            # Test the connection is still alive
-            cursor = conn.cursor()
-            cursor.execute('SELECT 1')
-            cursor.close()
-            return conn
+            return get_pg_pool().getconn()
         except (psycopg2.OperationalError, psycopg2.InterfaceError) as exc:
             if attempt < max_retries - 1:
                 print(f"[WARN] Connection error (attempt {attempt + 1}/{max_retries}): {exc}. Retrying...")
-                import time
                 time.sleep(0.1)
-                # Try to close the bad connection if we got one
-                try:
-                    if 'conn' in locals():
-                        conn.close()
-                except:
-                    pass
             else:
                 print(f"[ERROR] Error getting PostgreSQL connection after {max_retries} attempts: {exc}")
                 raise
+        except PoolTimeoutError as exc:
+            print(f"[ERROR] {exc}")
+            raise
         except Exception as exc:
             print(f"[ERROR] Error getting PostgreSQL connection: {exc}")
             raise
 
 
 def release_pg_conn(conn):
-    """Return a connection to the pool, resetting its state and closing it if corrupted"""
+    """Return a connection to the pool; the pool resets it or closes it if corrupted"""
+    if not conn:
+        return
     try:
-        if conn:
-            # Check if connection is still valid and reset its state before returning to pool
-            try:
-                # Always rollback unconditionally - clears aborted transactions and is safe when idle
-                try:
-                    conn.rollback()
-                except Exception:
-                    pass  # If rollback fails, connection may be corrupted; we'll close it below
-                
-                # Reset autocommit to default state (False)
-                conn.autocommit = False
-                
-                # Verify connection is still alive
-                cursor = conn.cursor()
-                cursor.execute('SELECT 1')
-                cursor.close()
-                
-                # Connection is clean and valid, return to pool
-                try:
-                    get_pg_pool().putconn(conn)
-                except psycopg2.pool.PoolError:
-                    try:
-                        conn.close()
-                    except Exception:
-                        pass
-            except (psycopg2.OperationalError, psycopg2.InterfaceError):
-                # Connection is corrupted, close it instead of returning to pool
-                print(f"[WARN] Connection corrupted, closing instead of returning to pool")
-                try:
-                    conn.close()
-                except:
-                    pass
+        get_pg_pool().putconn(conn)
     except Exception as exc:
         print(f"[WARN] Error releasing PostgreSQL connection: {exc}")
-        # Try to close the connection if we can't return it
         try:
-            if conn:
-                conn.close()
-        except:
+            conn.close()
+        except Exception:
             pass
 
 
@@ -218,6 +244,204 @@ def get_db_connection():
             release_pg_conn(conn)
 
 
+def _row_value(row, key, index):
+    if isinstance(row, dict):
+        return row.get(key)
+    return row[index]
+
+
+def _fetch_schema_catalog(cursor, table_name=None):
+    sql = """
+        SELECT table_name, column_name, data_type
+        FROM information_schema.columns
+        WHERE table_schema = 'public'
+    """
+    params = None
+    if table_name is not None:
+        sql += " AND table_name = %s"
+        params = (table_name,)
+    cursor.execute(sql + " ORDER BY table_name, ordinal_position", params)
+
+    tables = {}
+    for row in cursor.fetchall() or []:
+        table = _row_value(row, 'table_name', 0)
+        column = _row_value(row, 'column_name', 1)
+        data_type = _row_value(row, 'data_type', 2)
+        tables.setdefault(table, {})[column] = (data_type or '').lower()
+    return tables
+
+
+def load_schema_catalog(cursor=None):
+    """(Re)load the schema catalog with a single information_schema query.
+
+    Uses the caller's cursor when given so no extra pooled connection is taken.
+    """
+    global _schema_catalog, _schema_catalog_loaded_at
+    if cursor is None:
+        with get_db_connection() as conn:
+            return load_schema_catalog(conn.cursor())
+
+    tables = _fetch_schema_catalog(cursor)
+    with _schema_catalog_lock:
+        _schema_catalog = tables
+        _schema_catalog_loaded_at = time.monotonic()
+        _schema_catalog_misses.clear()
+    return tables
+
+
+def invalidate_schema_catalog(table_name=None):
+    """Drop cached schema info so the next lookup reloads it.
+
+    Call this after DDL that runs outside init_pg_schema (ALTER TABLE / CREATE TABLE).
+    """
+    global _schema_catalog_loaded_at
+    with _schema_catalog_lock:
+        if table_name is None:
+            _schema_catalog_loaded_at = 0.0
+            _schema_catalog_misses.clear()
+        else:
+            _schema_catalog.pop(table_name, None)
+            _schema_catalog_misses.pop(table_name, None)
+
+
+def _lookup_table_columns(table_name, cursor=None):
+    if time.monotonic() - _schema_catalog_loaded_at > SCHEMA_CATALOG_TTL_SECONDS:
+        load_schema_catalog(cursor)
+
+    columns = _schema_catalog.get(table_name)
+    if columns is not None:
+        return columns
+
+    # Tables created lazily after the catalog was loaded: check once, and remember
+    # misses briefly so absent optional tables don't cost a probe per request.
+    missed_at = _schema_catalog_misses.get(table_name)
+    if missed_at is not None and time.monotonic() - missed_at < SCHEMA_CATALOG_MISS_TTL_SECONDS:
+        return None
+
+    if cursor is None:
+        with get_db_connection() as conn:
+            found = _fetch_schema_catalog(conn.cursor(), table_name)
+    else:
+        found = _fetch_schema_catalog(cursor, table_name)
+
+    columns = found.get(table_name)
+    with _schema_catalog_lock:
+        if columns is None:
+            _schema_catalog_misses[table_name] = time.monotonic()
+        else:
+            _schema_catalog[table_name] = columns
+            _schema_catalog_misses.pop(table_name, None)
+    return columns
+
+
+def get_table_columns(table_name, cursor=None):
+    """Return {column_name: data_type} for a public table ({} if it does not exist)."""
+    return dict(_lookup_table_columns(table_name, cursor) or {})
+
+
+def table_exists(table_name, cursor=None):
+    """Return True if the public table exists, using the cached schema catalog."""
+    return _lookup_table_columns(table_name, cursor) is not None
+
+
+def column_exists(table_name, column_name, cursor=None):
+    return column_name in (_lookup_table_columns(table_name, cursor) or {})
+
+
+def pick_column(table_name, candidates, cursor=None):
+    """Return the first of `candidates` that exists on the table, or None."""
+    columns = _lookup_table_columns(table_name, cursor) or {}
+    for candidate in candidates:
+        if candidate in columns:
+            return candidate
+    return None
+
+
+def get_table_names(cursor=None):
+    """Return the set of public table names known to the schema catalog."""
+    if time.monotonic() - _schema_catalog_loaded_at > SCHEMA_CATALOG_TTL_SECONDS:
+        load_schema_catalog(cursor)
+    return set(_schema_catalog)
+
+
+# ---------------------------------------------------------------------------
+# Typed ids
+#
+# Some deployments have integer keys, some UUIDs, and some legacy VARCHAR
+# foreign keys, so queries used to compare `col::text = %s::text` /
+# `col::text = ANY(%s)`. Casting the column defeats its index. Instead, the
+# column's real type is read from the schema catalog and parameters are
+# converted to it (`IdType.coerce` / `coerce_many`), so the column is compared
+# as-is: `col = %s`, or `IdType.any_sql('col')` for arrays.
+# ---------------------------------------------------------------------------
+
+_INT_TYPES = {'smallint': 'smallint', 'integer': 'integer', 'bigint': 'bigint'}
+
+
+class IdType:
+    """The Postgres type of an id column and how to bind parameters for it."""
+
+    __slots__ = ('pg_type',)
+
+    def __init__(self, pg_type):
+        self.pg_type = pg_type
+
+    @classmethod
+    def from_data_type(cls, data_type):
+        data_type = (data_type or '').lower()
+        if data_type in _INT_TYPES:
+            return cls(_INT_TYPES[data_type])
+        if data_type == 'uuid':
+            return cls('uuid')
+        return cls('text')
+
+    @property
+    def is_int(self):
+        return self.pg_type in _INT_TYPES.values()
+
+    def coerce(self, value):
+        """`value` as the column's Python type, or None if it can't be such an id."""
+        if value is None or isinstance(value, bool):
+            return None
+        if self.is_int:
+            if isinstance(value, int):
+                return value
+            text = str(value).strip()
+            return int(text) if text.lstrip('-').isdigit() else None
+        if self.pg_type == 'uuid':
+            # Canonical string form: psycopg2 has no UUID adapter registered here.
+            try:
+                return str(uuid.UUID(str(value).strip()))
+            except ValueError:
+                return None
+        text = str(value).strip()
+        return text or None
+
+    def coerce_many(self, values):
+        """Coerced ids in order, without duplicates or values of the wrong shape."""
+        out = []
+        seen = set()
+        for value in values or []:
+            coerced = self.coerce(value)
+            if coerced is not None and coerced not in seen:
+                seen.add(coerced)
+                out.append(coerced)
+        return out
+
+    def any_sql(self, column_expr):
+        """`column = ANY(%s::<type>[])`; bind a list from coerce_many()."""
+        return f"{column_expr} = ANY(%s::{self.pg_type}[])"
+
+    def __repr__(self):
+        return f"IdType({self.pg_type!r})"
+
+
+def get_id_type(table_name, column='id', cursor=None):
+    """IdType of `table_name.column` from the schema catalog (text if unknown)."""
+    columns = _lookup_table_columns(table_name, cursor) or {}
+    return IdType.from_data_type(columns.get(column))
+
+
 def init_pg_schema():
     """Initialize PostgreSQL schema"""
     conn = None
@@ -424,6 +648,28 @@ def init_pg_schema():
                ON proposal_compliance(status, evaluated_at DESC)'''
         )
 
+        # Derived per-proposal financials, maintained on write by
+        # api/utils/proposal_financials.py so finance reads avoid parsing content JSON.
+        cursor.execute(
+            '''CREATE TABLE IF NOT EXISTS proposal_financials (
+            proposal_id INTEGER PRIMARY KEY,
+            amount NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            subtotal NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            vat_amount NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            discount_lines JSONB NOT NULL DEFAULT '[]'::jsonb,
+            max_discount NUMERIC(7, 2) NOT NULL DEFAULT 0,
+            currency VARCHAR(8) NOT NULL DEFAULT 'ZAR',
+            stage VARCHAR(32),
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (proposal_id) REFERENCES proposals(id) ON DELETE CASCADE
+            )'''
+        )
+
+        cursor.execute(
+            '''CREATE INDEX IF NOT EXISTS idx_proposal_financials_stage
+               ON proposal_financials(stage, amount DESC)'''
+        )
+
         # Update the status check constraint safely.
         # If existing rows violate the new constraint, we must NOT leave the table with
         # the old constraint dropped, and we must not abort the overall init transaction.
@@ -875,6 +1121,32 @@ def init_pg_schema():
         cursor.execute('''CREATE INDEX IF NOT EXISTS idx_activity_log_proposal 
                          ON activity_log(proposal_id, created_at DESC)''')
 
+        # Serves "latest event of type X per proposal" lookups (e.g. finance deal aging).
+        cursor.execute('''CREATE INDEX IF NOT EXISTS idx_activity_log_proposal_action
+                         ON activity_log(proposal_id, action_type, created_at DESC)''')
+
+        # Denormalized timestamp of the latest status change, maintained by
+        # log_status_change(). Backfilled once from activity_log.
+        try:
+            _exec_with_savepoint('''
+                ALTER TABLE proposals
+                ADD COLUMN IF NOT EXISTS last_status_change_at TIMESTAMP
+            ''')
+            _exec_with_savepoint('''
+                UPDATE proposals p
+                SET last_status_change_at = al.created_at
+                FROM (
+                    SELECT DISTINCT ON (proposal_id) proposal_id, created_at
+                    FROM activity_log
+                    WHERE action_type = 'status_changed'
+                    ORDER BY proposal_id, created_at DESC
+                ) al
+                WHERE al.proposal_id = p.id
+                  AND p.last_status_change_at IS NULL
+            ''')
+        except Exception as e:
+            print(f"[WARN] Could not add/backfill last_status_change_at on proposals: {e}")
+
         # Notifications table
         cursor.execute('''CREATE TABLE IF NOT EXISTS notifications (
         id SERIAL PRIMARY KEY,
@@ -935,6 +1207,43 @@ def init_pg_schema():
         cursor.execute('''CREATE INDEX IF NOT EXISTS idx_comment_mentions_user
                          ON comment_mentions(mentioned_user_id, is_read, created_at DESC)''')
 
+        # Durable outbox drained by the email workers (api/utils/email_outbox.py).
+        cursor.execute('''CREATE TABLE IF NOT EXISTS email_outbox (
+        id BIGSERIAL PRIMARY KEY,
+        dedupe_key VARCHAR(128) UNIQUE NOT NULL,
+        to_email VARCHAR(320) NOT NULL,
+        subject TEXT NOT NULL,
+        html_content TEXT NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 5,
+        next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        locked_at TIMESTAMP,
+        last_error TEXT,
+        context JSONB,
+        requested_by VARCHAR(255),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        sent_at TIMESTAMP
+        )''')
+
+        cursor.execute('''ALTER TABLE email_outbox
+                         ADD COLUMN IF NOT EXISTS requested_by VARCHAR(255)''')
+
+        cursor.execute('''CREATE INDEX IF NOT EXISTS idx_email_outbox_pending
+                         ON email_outbox(next_attempt_at)
+                         WHERE status IN ('queued', 'sending')''')
+
+        # Legacy bearer-token sessions (api/utils/session_store.py); tokens are stored hashed
+        cursor.execute('''CREATE TABLE IF NOT EXISTS auth_sessions (
+        token_hash CHAR(64) PRIMARY KEY,
+        username VARCHAR(255) NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        expires_at TIMESTAMPTZ NOT NULL
+        )''')
+
+        cursor.execute('''CREATE INDEX IF NOT EXISTS idx_auth_sessions_expires_at
+                         ON auth_sessions(expires_at)''')
+
         # Comment reactions table (emoji reactions like Google Docs)
         cursor.execute('''CREATE TABLE IF NOT EXISTS comment_reactions (
         id SERIAL PRIMARY KEY,
@@ -1043,6 +1352,13 @@ def init_pg_schema():
         )''')
 
         conn.commit()
+
+        try:
+            load_schema_catalog(cursor)
+        except Exception as e:
+            print(f"[WARN] Could not load schema catalog (will load lazily): {e}")
+            invalidate_schema_catalog()
+
         release_pg_conn(conn)
         print("[OK] PostgreSQL schema initialized successfully")
     except Exception as exc:
@@ -1055,6 +1371,15 @@ def init_pg_schema():
         raise
 
 
+def _apply_migrations():
+    from api.utils.migrations import ensure_migrations
+
+    try:
+        ensure_migrations()
+    except Exception as exc:
+        print(f"[WARN] Schema migrations incomplete: {exc}")
+
+
 def init_database():
     """Initialize database schema on first request"""
     global _db_initialized
@@ -1064,6 +1389,7 @@ def init_database():
     try:
         print("[*] Initializing PostgreSQL schema...")
         init_pg_schema()
+        _apply_migrations()
         _db_initialized = True
         print("[OK] Database schema initialized successfully")
     except Exception as exc:
@@ -0,0 +1,230 @@
+"""
+Thread-safe PostgreSQL connection pool.
+
+psycopg2's SimpleConnectionPool is not safe to share between threads and fails
+immediately when exhausted. Gunicorn runs several threads per worker (plus the
+ASGI bridge), so the API uses this pool instead:
+
+  - blocking checkout with a timeout (PoolTimeoutError when it expires)
+  - liveness check only for connections idle longer than `idle_check_after`
+  - connections older than `max_lifetime` are recycled
+  - up to `max_overflow` extra connections beyond `maxconn` under bursts; they
+    are closed on return instead of being kept idle
+  - counters exposed through `stats()`
+
+The pool is driver-agnostic: it is given a `connect` callable and optional
+`is_alive` / `reset` callables.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from api.utils.pool_stats import PoolStats
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class _Entry:
+    __slots__ = ('conn', 'created_at', 'last_used_at')
+
+    def __init__(self, conn: Any, now: float):
+        self.conn = conn
+        self.created_at = now
+        self.last_used_at = now
+
+
+def _is_closed(conn: Any) -> bool:
+    try:
+        closed = getattr(conn, 'closed', False)
+        if callable(closed):
+            closed = closed()
+        return bool(closed)
+    except Exception:
+        return False
+
+
+def _close_quietly(conn: Any) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        minconn: int = 1,
+        maxconn: int = 20,
+        max_overflow: int = 0,
+        timeout: float = 10.0,
+        idle_check_after: float = 30.0,
+        max_lifetime: float = 1800.0,
+        is_alive: Optional[Callable[[Any], bool]] = None,
+        reset: Optional[Callable[[Any], None]] = None,
+    ):
+        if minconn < 0 or maxconn <= 0 or minconn > maxconn or max_overflow < 0:
+            raise ValueError("Invalid minconn/maxconn/max_overflow for ConnectionPool")
+
+        self._connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.idle_check_after = idle_check_after
+        self.max_lifetime = max_lifetime
+        self._is_alive = is_alive
+        self._reset = reset
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle: List[_Entry] = []
+        self._in_use: Dict[int, _Entry] = {}
+        self._size = 0  # open connections (idle + in use + being created)
+        self._closed = False
+
+        self._stats = PoolStats()
+        self._waiting = 0
+        self._health_check_failures = 0
+        self._overflow_closed = 0
+
+        for _ in range(minconn):
+            conn = self._connect()
+            with self._cond:
+                self._size += 1
+                self._idle.append(_Entry(conn, time.monotonic()))
+
+    @property
+    def capacity(self) -> int:
+        return self.maxconn + self.max_overflow
+
+    def _discard(self, entry: _Entry) -> None:
+        """Close a connection that will not return to the pool (lock not held)."""
+        _close_quietly(entry.conn)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _usable(self, entry: _Entry, now: float) -> bool:
+        if _is_closed(entry.conn):
+            return False
+        if self.max_lifetime and now - entry.created_at >= self.max_lifetime:
+            with self._cond:
+                self._stats.recycled += 1
+            return False
+        if self._is_alive and now - entry.last_used_at >= self.idle_check_after:
+            try:
+                alive = self._is_alive(entry.conn)
+            except Exception:
+                alive = False
+            if not alive:
+                with self._cond:
+                    self._health_check_failures += 1
+                return False
+        return True
+
+    def getconn(self, timeout: Optional[float] = None) -> Any:
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            entry = None
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeoutError("Connection pool is closed")
+                self._waiting += 1
+                try:
+                    while not self._idle and self._size >= self.capacity:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._stats.timeouts += 1
+                            raise PoolTimeoutError(
+                                f"Timed out after {timeout:.1f}s waiting for a database connection "
+                                f"({self._size} open, {len(self._in_use)} in use)"
+                            )
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+                if self._idle:
+                    # LIFO keeps a small set of warm connections busy; the rest age out.
+                    entry = self._idle.pop()
+                else:
+                    self._size += 1
+
+            now = time.monotonic()
+            if entry is None:
+                try:
+                    entry = _Entry(self._connect(), now)
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._usable(entry, now):
+                self._discard(entry)
+                continue
+
+            waited = now - started
+            with self._cond:
+                self._in_use[id(entry.conn)] = entry
+                self._stats.record_checkout(now, waited)
+            return entry.conn
+
+    def putconn(self, conn: Any, close: bool = False) -> None:
+        with self._cond:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            # Not ours (or returned twice): never pool a connection we don't track.
+            _close_quietly(conn)
+            return
+
+        if close or self._closed or _is_closed(conn):
+            self._discard(entry)
+            return
+
+        if self._reset is not None:
+            try:
+                self._reset(conn)
+            except Exception:
+                self._discard(entry)
+                return
+
+        with self._cond:
+            # Connections beyond maxconn are overflow: close them once the burst passes.
+            if self._size > self.maxconn:
+                self._overflow_closed += 1
+                overflow = True
+            else:
+                overflow = False
+                entry.last_used_at = time.monotonic()
+                self._idle.append(entry)
+                self._cond.notify()
+        if overflow:
+            self._discard(entry)
+
+    def closeall(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            _close_quietly(entry.conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'waiting': self._waiting,
+                'maxconn': self.maxconn,
+                'max_overflow': self.max_overflow,
+                'overflow_in_use': max(0, self._size - self.maxconn),
+                **self._stats.snapshot(),
+                'health_check_failures': self._health_check_failures,
+                'overflow_closed': self._overflow_closed,
+            }
@@ -6,17 +6,64 @@ import os
 import psycopg2
 import psycopg2.extensions
 import base64
+import inspect
 import json
 from functools import wraps
-from flask import request
+from flask import g, request
 from api.utils.firebase_auth import verify_firebase_token, get_user_from_token
 from api.utils.database import get_db_connection
 from api.utils.auth import verify_token
+from api.utils.identity_cache import IDENTITY_COLUMNS, Identity, get_identity_cache, load_identity
 
 
-# Simple in-memory cache to avoid re-querying the DB for the same Firebase user
-# on every request. Keyed by email → (user_id, username).
-USER_CACHE_BY_EMAIL = {}
+_SIGNATURES = {}
+
+
+def _accepted_params(f):
+    params = _SIGNATURES.get(f)
+    if params is None:
+        params = frozenset(inspect.signature(f).parameters)
+        _SIGNATURES[f] = params
+    return params
+
+
+def _call_with_identity(f, identity, email, args, kwargs):
+    """Publish the identity on flask.g and call the handler with user_id/email when it accepts them."""
+    g.identity = identity
+    accepted = _accepted_params(f)
+    clean_kwargs = {
+        k: v
+        for k, v in kwargs.items()
+        if k not in ['firebase_user', 'firebase_uid', 'user_id', 'email']
+    }
+    if 'user_id' in accepted:
+        clean_kwargs['user_id'] = identity.user_id
+    if 'email' in accepted:
+        clean_kwargs['email'] = email
+    return f(username=identity.username, *args, **clean_kwargs)
+
+
+def get_request_identity(username=None, cursor=None):
+    """Identity of the authenticated caller, resolved at most once per request.
+
+    token_required stores it on flask.g for Firebase requests; legacy-token requests
+    resolve it here on first use (identity cache, then one SELECT by username on
+    `cursor` when given, otherwise on a pooled connection).
+    """
+    identity = getattr(g, 'identity', None)
+    if identity is not None and (username is None or identity.username == username):
+        return identity
+    if not username:
+        return None
+    identity = get_identity_cache().get('username', username)
+    if identity is None and cursor is not None:
+        identity = load_identity(cursor, username=username)
+    elif identity is None:
+        with get_db_connection() as conn:
+            identity = load_identity(conn.cursor(), username=username)
+    if identity is not None:
+        g.identity = identity
+    return identity
 
 
 def _verify_user_readable(conn, user_id, max_retries=10):
@@ -46,6 +93,109 @@ def _verify_user_readable(conn, user_id, max_retries=10):
     return False
 
 
+def _auto_create_firebase_user(conn, cursor, firebase_user, email, uid, name):
+    """Create (or find, after taking the per-email lock) the user for a valid Firebase token.
+
+    Returns the caller's Identity.
+    """
+    # Use an advisory lock + re-check to avoid concurrent duplicate
+    # auto-creates for the same email across parallel requests.
+    cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', (email,))
+    cursor.execute(
+        f'''SELECT {IDENTITY_COLUMNS}
+           FROM users
+           WHERE email = %s
+           ORDER BY
+               CASE
+                   WHEN role IN ('admin', 'ceo', 'approver') THEN 0
+                   WHEN role LIKE 'finance%%' THEN 1
+                   ELSE 2
+               END,
+               id DESC
+           LIMIT 1''',
+        (email,)
+    )
+    existing_after_lock = cursor.fetchone()
+
+    if existing_after_lock:
+        identity = Identity.from_row(existing_after_lock)
+        print(
+            f"[FIREBASE] ✅ Found existing user after lock for {email}: "
+            f"{identity.username} (id: {identity.user_id})"
+        )
+        return identity
+
+    print(f"[FIREBASE] Valid token but user not found in database: {email}. Auto-creating user...")
+
+    try:
+        username = email.split('@')[0]
+        base_username = username
+        counter = 1
+        while True:
+            cursor.execute('SELECT id FROM users WHERE username = %s', (username,))
+            if cursor.fetchone() is None:
+                break
+            username = f"{base_username}{counter}"
+            counter += 1
+
+        role = 'manager'
+        dummy_password_hash = f"firebase:{uid}:{email}"
+
+        try:
+            cursor.execute(
+                '''INSERT INTO users (username, email, password_hash, full_name, role, is_active, is_email_verified)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s)
+                   RETURNING id, username''',
+                (username, email, dummy_password_hash, name, role, True, firebase_user.get('email_verified', False))
+            )
+            new_user = cursor.fetchone()
+            user_id = new_user[0]
+            username = new_user[1]
+
+            try:
+                cursor.execute(
+                    '''UPDATE users SET firebase_uid = %s WHERE email = %s''',
+                    (uid, email)
+                )
+            except Exception:
+                pass
+
+            try:
+                conn.commit()
+                print(f"[FIREBASE] ✅ Auto-created user committed: {username} (id: {user_id})")
+            except Exception as commit_error:
+                print(f"[FIREBASE] ERROR during commit: {commit_error}")
+                try:
+                    conn.rollback()
+                except:
+                    pass
+                raise
+
+            # Verify user is readable with retries
+            if _verify_user_readable(conn, user_id, max_retries=10):
+                print(f"[FIREBASE] ✅ User {user_id} verified readable after creation")
+            else:
+                print(f"[FIREBASE] ⚠️ WARNING: User {user_id} not readable after verification attempts, but proceeding with caution")
+            return Identity(user_id, username, email, role)
+        except psycopg2.IntegrityError:
+            conn.rollback()
+            import time
+            for retry_attempt in range(3):
+                cursor.execute(f'SELECT {IDENTITY_COLUMNS} FROM users WHERE email = %s', (email,))
+                existing_user = cursor.fetchone()
+                if existing_user:
+                    return Identity.from_row(existing_user)
+                if retry_attempt < 2:
+                    time.sleep(0.1)
+
+            print(f"[FIREBASE] ERROR: IntegrityError but user still not found after retries!")
+            raise
+    except Exception as e:
+        conn.rollback()
+        print(f"[FIREBASE] Error creating user: {e}")
+        raise
+
+
 def token_required(f):
     """
     Decorator to require valid authentication token.
@@ -97,32 +247,13 @@ def token_required(f):
                     uid = firebase_user['uid']
                     name = firebase_user.get('name') or email.split('@')[0]
 
-                    # Fast path: reuse cached user to avoid a DB round-trip,
-                    # but verify it actually exists in the DB with retries.
-                    cached = USER_CACHE_BY_EMAIL.get(email)
-                    if cached:
-                        cached_user_id, cached_username = cached
-                        with get_db_connection() as verify_conn:
-                            if _verify_user_readable(verify_conn, cached_user_id, max_retries=5):
-                                print(f"[FIREBASE] Using cached user_id {cached_user_id} for {email}")
-                                import inspect
-                                sig = inspect.signature(f)
-                                clean_kwargs = {
-                                    k: v
-                                    for k, v in kwargs.items()
-                                    if k not in ['firebase_user', 'firebase_uid', 'user_id', 'email']
-                                }
-                                if 'user_id' in sig.parameters:
-                                    clean_kwargs['user_id'] = cached_user_id
-                                if 'email' in sig.parameters:
-                                    clean_kwargs['email'] = email
-                                return f(username=cached_username, *args, **clean_kwargs)
-                            else:
-                                print(f"[FIREBASE] ⚠️ Cached user_id {cached_user_id} for {email} not found in DB; invalidating cache")
-                                USER_CACHE_BY_EMAIL.pop(email, None)
+                    # Fast path: identity cached by uid/email, no DB round-trip.
+                    cache = get_identity_cache()
+                    identity = cache.get('uid', uid) or cache.get('email', email)
+                    if identity is not None and (identity.email or '').lower() == email.lower():
+                        return _call_with_identity(f, identity, email, args, kwargs)
 
                     with get_db_connection() as conn:
-                        original_autocommit = conn.autocommit
                         if conn.autocommit:
                             conn.autocommit = False
 
@@ -130,160 +261,15 @@ def token_required(f):
                             conn.commit()
 
                         cursor = conn.cursor()
-                        cursor.execute('SELECT id, username FROM users WHERE email = %s', (email,))
-                        result = cursor.fetchone()
-
-                        if result:
-                            user_id = result[0]
-                            username = result[1]
-
-                            cursor.execute('SELECT id FROM users WHERE id = %s', (user_id,))
-                            verify = cursor.fetchone()
-                            if not verify:
-                                print(f"[FIREBASE] WARNING: user_id {user_id} not found on verification!")
-
-                            USER_CACHE_BY_EMAIL[email] = (user_id, username)
-
-                            import inspect
-                            sig = inspect.signature(f)
-                            clean_kwargs = {
-                                k: v
-                                for k, v in kwargs.items()
-                                if k not in ['firebase_user', 'firebase_uid', 'user_id', 'email']
-                            }
-                            if 'user_id' in sig.parameters:
-                                clean_kwargs['user_id'] = user_id
-                            if 'email' in sig.parameters:
-                                clean_kwargs['email'] = email
-                            return f(username=username, *args, **clean_kwargs)
-                        else:
-                            # Auto-create user for a valid Firebase token not yet in DB.
-                            # Use an advisory lock + re-check to avoid concurrent duplicate
-                            # auto-creates for the same email across parallel requests.
-                            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', (email,))
-                            cursor.execute(
-                                '''SELECT id, username
-                                   FROM users
-                                   WHERE email = %s
-                                   ORDER BY
-                                       CASE
-                                           WHEN role IN ('admin', 'ceo', 'approver') THEN 0
-                                           WHEN role LIKE 'finance%%' THEN 1
-                                           ELSE 2
-                                       END,
-                                       id DESC
-                                   LIMIT 1''',
-                                (email,)
-                            )
-                            existing_after_lock = cursor.fetchone()
-
-                            if existing_after_lock:
-                                user_id = existing_after_lock[0]
-                                username = existing_after_lock[1]
-                                print(
-                                    f"[FIREBASE] ✅ Found existing user after lock for {email}: "
-                                    f"{username} (id: {user_id})"
-                                )
-                            else:
-                                print(f"[FIREBASE] Valid token but user not found in database: {email}. Auto-creating user...")
-
-                                try:
-                                    username = email.split('@')[0]
-                                    base_username = username
-                                    counter = 1
-                                    while True:
-                                        cursor.execute('SELECT id FROM users WHERE username = %s', (username,))
-                                        if cursor.fetchone() is None:
-                                            break
-                                        username = f"{base_username}{counter}"
-                                        counter += 1
-
-                                    role = 'manager'
-                                    dummy_password_hash = f"firebase:{uid}:{email}"
-
-                                    try:
-                                        cursor.execute(
-                                            '''INSERT INTO users (username, email, password_hash, full_name, role, is_active, is_email_verified)
-                                               VALUES (%s, %s, %s, %s, %s, %s, %s)
-                                               RETURNING id, username''',
-                                            (username, email, dummy_password_hash, name, role, True, firebase_user.get('email_verified', False))
-                                        )
-                                        new_user = cursor.fetchone()
-                                        user_id = new_user[0]
-                                        username = new_user[1]
-
-                                        try:
-                                            cursor.execute(
-                                                '''UPDATE users SET firebase_uid = %s WHERE email = %s''',
-                                                (uid, email)
-                                            )
-                                        except Exception:
-                                            pass
-
-                                        try:
-                                            conn.commit()
-                                            print(f"[FIREBASE] ✅ Auto-created user committed: {username} (id: {user_id})")
-                                        except Exception as commit_error:
-                                            print(f"[FIREBASE] ERROR during commit: {commit_error}")
-                                            try:
-                                                conn.rollback()
-                                            except:
-                                                pass
-                                            raise
-
-                                        # Verify user is readable with retries
-                                        import time
-                                        if _verify_user_readable(conn, user_id, max_retries=10):
-                                            print(f"[FIREBASE] ✅ User {user_id} verified readable after creation")
-                                        else:
-                                            print(f"[FIREBASE] ⚠️ WARNING: User {user_id} not readable after verification attempts, but proceeding with caution")
-                                        
-                                        # Close old cursor and create fresh one from the committed state
-                                        try:
-                                            cursor.close()
-                                        except:
-                                            pass
-                                        cursor = conn.cursor()
-                                    except psycopg2.IntegrityError:
-                                        conn.rollback()
-                                        import time
-                                        for retry_attempt in range(3):
-                                            cursor.execute('SELECT id, username FROM users WHERE email = %s', (email,))
-                                            existing_user = cursor.fetchone()
-                                            if existing_user:
-                                                user_id = existing_user[0]
-                                                username = existing_user[1]
-                                                break
-                                            if retry_attempt < 2:
-                                                time.sleep(0.1)
-
-                                        if not existing_user:
-                                            print(f"[FIREBASE] ERROR: IntegrityError but user still not found after retries!")
-                                            raise
-                                except Exception as e:
-                                    conn.rollback()
-                                    print(f"[FIREBASE] Error creating user: {e}")
-                                    raise
-
-                            import time
-                            time.sleep(0.1)
-
+                        identity = load_identity(cursor, email=email, uid=uid)
+                        if identity is None:
+                            identity = _auto_create_firebase_user(conn, cursor, firebase_user, email, uid, name)
                             # Cache the verified user
-                            USER_CACHE_BY_EMAIL[email] = (user_id, username)
-                            print(f"[FIREBASE] ✅ User cached for {email}: {username} (id: {user_id})")
-
-                            import inspect
-                            sig = inspect.signature(f)
-                            clean_kwargs = {
-                                k: v
-                                for k, v in kwargs.items()
-                                if k not in ['firebase_user', 'firebase_uid', 'user_id', 'email']
-                            }
-                            if 'user_id' in sig.parameters:
-                                clean_kwargs['user_id'] = user_id
-                            if 'email' in sig.parameters:
-                                clean_kwargs['email'] = email
-                            return f(username=username, *args, **clean_kwargs)
+                            cache.put(identity, uid=uid)
+                            print(f"[FIREBASE] ✅ User cached for {email}: {identity.username} (id: {identity.user_id})")
+
+                    # The connection is back in the pool before the handler runs.
+                    return _call_with_identity(f, identity, email, args, kwargs)
             else:
                 # Firebase verification failed — fall back to legacy DB token
                 username = verify_token(token)
@@ -306,12 +292,8 @@ def admin_required(f):
     """Decorator to require admin role"""
     @wraps(f)
     def decorated(username=None, *args, **kwargs):
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT role FROM users WHERE username = %s', (username,))
-            result = cursor.fetchone()
-
-        if not result or result[0] != 'admin':
+        identity = get_request_identity(username)
+        if identity is None or identity.role != 'admin':
             return {'detail': 'Admin access required'}, 403
 
         return f(username=username, *args, **kwargs)
@@ -323,16 +305,11 @@ def finance_audit_required(f):
     """Decorator to require finance_manager role or admin/ceo for audit/compliance access."""
     @wraps(f)
     def decorated(username=None, *args, **kwargs):
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT role FROM users WHERE username = %s', (username,))
-            result = cursor.fetchone()
-
-        if not result:
+        identity = get_request_identity(username)
+        if identity is None:
             return {'detail': 'User not found'}, 403
 
-        role = (result[0] or '').strip().lower()
-        if role not in ['finance_manager', 'admin', 'ceo']:
+        if identity.role_key not in ['finance_manager', 'admin', 'ceo']:
             return {'detail': 'Finance manager access required'}, 403
 
         return f(username=username, *args, **kwargs)
@@ -344,17 +321,11 @@ def finance_required(f):
     """Decorator to require finance role or admin"""
     @wraps(f)
     def decorated(username=None, *args, **kwargs):
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT role FROM users WHERE username = %s', (username,))
-            result = cursor.fetchone()
-
-        if not result:
+        identity = get_request_identity(username)
+        if identity is None:
             return {'detail': 'User not found'}, 403
 
-        role = (result[0] or '').strip().lower()
-        is_finance = role.startswith('finance') or role in ['finance_manager', 'finance']
-        if role not in ['admin', 'ceo'] and not is_finance:
+        if not identity.is_admin and not identity.is_finance:
             return {'detail': 'Finance access required'}, 403
 
         return f(username=username, *args, **kwargs)
@@ -0,0 +1,187 @@
+"""
+Size-bounded, least-recently-used byte cache on local disk.
+
+Each entry is one file named after its key; writes go through a temp file and
+os.replace so readers never see partial files. Recency is tracked in memory and
+through the file mtime (touched on every hit), so the order survives restarts
+and gunicorn workers sharing a directory see each other's hits. Used by the PDF
+render cache and the asset fetch cache.
+"""
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+class DiskLRUCache:
+    """Size-bounded LRU of byte blobs stored as `<key><suffix>` files in one directory."""
+
+    SUFFIX = '.bin'
+
+    def __init__(self, directory: str, max_bytes: int, max_entries: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> size, oldest first.
+        self._index: 'OrderedDict[str, int]' = OrderedDict()
+        self._total_bytes = 0
+        self._loaded = False
+        self._inflight: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def _load_index(self) -> None:
+        """Rebuild the LRU order from files already on disk (lock held)."""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            entries = []
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(self.SUFFIX):
+                        st = entry.stat()
+                        entries.append((st.st_mtime, entry.name[:-len(self.SUFFIX)], st.st_size))
+        except OSError as exc:
+            print(f"[WARN] Cache directory unavailable ({self.directory}): {exc}")
+            return
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _forget(self, key: str) -> None:
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self) -> None:
+        while self._index and (self._total_bytes > self.max_bytes or len(self._index) > self.max_entries):
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as fh:
+                data = fh.read()
+        except OSError:
+            with self._lock:
+                self._load_index()
+                self._forget(key)
+                self.misses += 1
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        with self._lock:
+            self._load_index()
+            self._forget(key)
+            self._index[key] = len(data)
+            self._total_bytes += len(data)
+            self.hits += 1
+            self._evict()
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if not data or len(data) > self.max_bytes:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as fh:
+                    fh.write(data)
+                os.replace(tmp_path, self._path(key))
+            except Exception:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+        except OSError as exc:
+            print(f"[WARN] Could not write cache entry {key[:12]} in {self.directory}: {exc}")
+            return
+        with self._lock:
+            self._load_index()
+            self._forget(key)
+            self._index[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def get_or_create(
+        self,
+        key: str,
+        create: Callable[[], bytes],
+        accept: Optional[Callable[[bytes], bool]] = None,
+    ) -> bytes:
+        """Return cached bytes for `key`, calling `create` (once across threads) on a miss.
+
+        The result is stored only when `accept(result)` is true (default: non-empty).
+        """
+        data = self.get(key)
+        if data is not None:
+            return data
+        with self._lock:
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                # Another thread may have created it while we waited.
+                data = self.get(key)
+                if data is not None:
+                    return data
+                data = create()
+                if data and (accept is None or accept(data)):
+                    self.put(key, bytes(data))
+                return data
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is key_lock and not key_lock.locked():
+                    self._inflight.pop(key, None)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._load_index()
+            self._forget(key)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._load_index()
+            keys = list(self._index)
+            self._index.clear()
+            self._total_bytes = 0
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._load_index()
+            return {
+                'entries': len(self._index),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
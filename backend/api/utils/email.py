@@ -206,81 +206,120 @@ def send_email(to_email, subject, html_content):
     return False
 
 
-def send_email_via_smtp(to_email, subject, html_content):
+_EMAIL_RE = r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"
+
+
+def _extract_email(raw: str | None) -> str:
+    """Return a single clean address from a header-ish value ('' when none)."""
+    if not raw:
+        return ''
+    raw = str(raw).strip()
+    _, parsed = parseaddr(raw)
+    parsed = (parsed or '').strip()
+    if parsed and re.fullmatch(_EMAIL_RE, parsed):
+        return parsed
+    # Some env vars accidentally contain extra text after the email.
+    # Extract the first email-like token.
+    m = re.search(_EMAIL_RE, raw)
+    return (m.group(0).strip() if m else '')
+
+
+def smtp_settings():
+    """SMTP configuration from the environment (shared by one-off sends and the outbox workers)."""
+    smtp_port = int((os.getenv('SMTP_PORT') or '587').strip())
+    smtp_pass = os.getenv('SMTP_PASS')
+    smtp_user = (os.getenv('SMTP_USER') or '').strip()
+    use_ssl_env = (os.getenv('SMTP_USE_SSL') or '').strip().lower() in ('1', 'true', 'yes')
+    return {
+        'host': (os.getenv('SMTP_HOST') or '').strip(),
+        'port': smtp_port,
+        'user': smtp_user,
+        'password': smtp_pass.strip() if isinstance(smtp_pass, str) else smtp_pass,
+        'from_email': (os.getenv('SMTP_FROM_EMAIL') or smtp_user).strip(),
+        'from_name': os.getenv('SMTP_FROM_NAME', 'Khonology'),
+        'timeout': int((os.getenv('SMTP_TIMEOUT_SECONDS') or '20').strip()),
+        'use_ssl': use_ssl_env or smtp_port == 465,
+    }
+
+
+def build_smtp_message(to_email, subject, html_content, settings=None):
+    """Build the MIME message for an SMTP send, or return None if addresses are invalid."""
+    settings = settings or smtp_settings()
+    smtp_from_email = settings['from_email']
+    smtp_from_name = settings['from_name']
+
+    # Sanitize the From header to avoid malformed values (multiple emails, stray text, etc.)
+    # Some SMTP relays will silently drop or reject messages with invalid From headers.
+    safe_to_email = _extract_email(to_email)
+    if not safe_to_email:
+        print(f"[ERROR] Invalid recipient email for SMTP: {to_email}")
+        return None
+
+    parsed_name, parsed_email = parseaddr(f"{smtp_from_name} <{smtp_from_email}>")
+    parsed_email = (parsed_email or '').strip()
+    parsed_email = _extract_email(parsed_email) or _extract_email(smtp_from_email)
+    if not parsed_email and settings['user']:
+        parsed_email = _extract_email(settings['user'])
+    if not parsed_email:
+        print('[ERROR] SMTP_FROM_EMAIL invalid and SMTP_USER missing; cannot send email')
+        return None
+    safe_from_name = (parsed_name or smtp_from_name or 'Khonology').replace('\r', ' ').replace('\n', ' ').strip()
+
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = formataddr((safe_from_name, parsed_email))
+    msg['To'] = safe_to_email
+    msg.attach(MIMEText(html_content, 'html'))
+    return msg
+
+
+def open_smtp_connection(settings=None):
+    """Open and authenticate an SMTP connection (SSL on 465 / SMTP_USE_SSL, STARTTLS otherwise)."""
+    settings = settings or smtp_settings()
+    context = ssl.create_default_context()
+    if settings['use_ssl']:
+        server = smtplib.SMTP_SSL(settings['host'], settings['port'], timeout=settings['timeout'], context=context)
+    else:
+        server = smtplib.SMTP(settings['host'], settings['port'], timeout=settings['timeout'])
     try:
-        smtp_host = (os.getenv('SMTP_HOST') or '').strip()
-        smtp_port = int((os.getenv('SMTP_PORT') or '587').strip())
-        smtp_user = (os.getenv('SMTP_USER') or '').strip()
-        smtp_pass = os.getenv('SMTP_PASS')
-        smtp_pass = smtp_pass.strip() if isinstance(smtp_pass, str) else smtp_pass
-        smtp_from_email = (os.getenv('SMTP_FROM_EMAIL') or smtp_user).strip()
-        smtp_from_name = os.getenv('SMTP_FROM_NAME', 'Khonology')
-
-        # Sanitize the From header to avoid malformed values (multiple emails, stray text, etc.)
-        # Some SMTP relays will silently drop or reject messages with invalid From headers.
-        def _extract_email(raw: str | None) -> str:
-            if not raw:
-                return ''
-            raw = str(raw).strip()
-            _, parsed = parseaddr(raw)
-            parsed = (parsed or '').strip()
-            if parsed and re.fullmatch(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}", parsed):
-                return parsed
-            # Some env vars accidentally contain extra text after the email.
-            # Extract the first email-like token.
-            m = re.search(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}", raw)
-            return (m.group(0).strip() if m else '')
+        server.ehlo()
+        if not settings['use_ssl']:
+            server.starttls(context=context)
+            server.ehlo()
+        server.login(settings['user'], settings['password'])
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
+        raise
+    return server
 
-        safe_to_email = _extract_email(to_email)
-        if not safe_to_email:
-            print(f"[ERROR] Invalid recipient email for SMTP: {to_email}")
-            return False
 
-        parsed_name, parsed_email = parseaddr(f"{smtp_from_name} <{smtp_from_email}>")
-        parsed_email = (parsed_email or '').strip()
-        parsed_email = _extract_email(parsed_email) or _extract_email(smtp_from_email)
-        if not parsed_email:
-            parsed_email = _extract_email(smtp_from_email)
-        if not parsed_email and smtp_user:
-            parsed_email = _extract_email(smtp_user)
-        if not parsed_email:
-            print('[ERROR] SMTP_FROM_EMAIL invalid and SMTP_USER missing; cannot send email')
+def send_email_via_smtp(to_email, subject, html_content):
+    try:
+        settings = smtp_settings()
+        if not all([settings['host'], settings['user'], settings['password'], settings['from_email']]):
+            print('[ERROR] SMTP configuration incomplete')
             return False
-        safe_from_name = (parsed_name or smtp_from_name or 'Khonology').replace('\r', ' ').replace('\n', ' ').strip()
-        safe_from = formataddr((safe_from_name, parsed_email))
 
-        if not all([smtp_host, smtp_user, smtp_pass, smtp_from_email]):
-            print('[ERROR] SMTP configuration incomplete')
+        msg = build_smtp_message(to_email, subject, html_content, settings)
+        if msg is None:
             return False
 
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = safe_from
-        msg['To'] = safe_to_email
-        msg.attach(MIMEText(html_content, 'html'))
-
-        print(f"[EMAIL] Using SMTP to send email to {safe_to_email}")
-        print(f"[EMAIL] SMTP Host: {smtp_host}, Port: {smtp_port}, User: {smtp_user}")
-        print(f"[EMAIL] From: {safe_from}")
-
-        timeout_s = int((os.getenv('SMTP_TIMEOUT_SECONDS') or '20').strip())
-        use_ssl_env = (os.getenv('SMTP_USE_SSL') or '').strip().lower() in ('1', 'true', 'yes')
-        use_ssl = use_ssl_env or smtp_port == 465
-        context = ssl.create_default_context()
-
-        if use_ssl:
-            with smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=timeout_s, context=context) as server:
-                server.ehlo()
-                server.login(smtp_user, smtp_pass)
-                server.send_message(msg)
-        else:
-            with smtplib.SMTP(smtp_host, smtp_port, timeout=timeout_s) as server:
-                server.ehlo()
-                server.starttls(context=context)
-                server.ehlo()
-                server.login(smtp_user, smtp_pass)
-                server.send_message(msg)
-        print(f"[SUCCESS] Email sent via SMTP to {safe_to_email}")
+        print(f"[EMAIL] Using SMTP to send email to {msg['To']}")
+        print(f"[EMAIL] SMTP Host: {settings['host']}, Port: {settings['port']}, User: {settings['user']}")
+        print(f"[EMAIL] From: {msg['From']}")
+
+        server = open_smtp_connection(settings)
+        try:
+            server.send_message(msg)
+        finally:
+            try:
+                server.quit()
+            except Exception:
+                server.close()
+        print(f"[SUCCESS] Email sent via SMTP to {msg['To']}")
         return True
     except Exception as e:
         print(f"[ERROR] SMTP email error: {e}")
@@ -324,8 +363,8 @@ def send_password_reset_email(email, reset_token):
 # ----------------------------------------------------------
 # EMAIL VERIFICATION EMAIL
 # ----------------------------------------------------------
-def send_verification_email(email, verification_token, username=None):
-    """Send email verification email"""
+def verification_email_content(verification_token, username=None):
+    """Subject and HTML body of the email verification email"""
     from api.utils.helpers import get_frontend_url
     frontend_url = get_frontend_url()
     verification_link = f"{frontend_url}/verify-email?token={verification_token}"
@@ -354,6 +393,12 @@ def send_verification_email(email, verification_token, username=None):
         </body>
     </html>
     """
+    return subject, html_content
+
+
+def send_verification_email(email, verification_token, username=None):
+    """Send email verification email"""
+    subject, html_content = verification_email_content(verification_token, username)
     return send_email(email, subject, html_content)
 
 
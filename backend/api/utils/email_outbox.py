@@ -0,0 +1,486 @@
+"""
+Durable email outbox.
+
+Request handlers call `enqueue_email(...)`, which inserts a row into the
+`email_outbox` table and returns immediately with the message id. A small pool
+of background worker threads drains the table:
+
+  - rows are claimed with `FOR UPDATE SKIP LOCKED`, so several workers (and
+    several gunicorn processes) can drain the same table without double sends
+  - each worker keeps one SMTP connection open between messages (NOOP-checked
+    and reopened when the server drops it) instead of a new SSL handshake per email
+  - failures are retried with exponential backoff + jitter up to `max_attempts`
+  - sends are deduplicated by `dedupe_key` (recipient + subject + body within
+    EMAIL_OUTBOX_DEDUPE_WINDOW_SECONDS unless the caller passes its own key);
+    explicit resends pass `dedupe=False` and are always queued
+  - `get_email_status(id)` reports queued / sending / sent / failed
+
+Transport selection follows `send_email`: when SMTP is the active provider the
+workers use persistent connections, otherwise each message goes through
+`send_email` (SendGrid). EMAIL_OUTBOX_TRANSPORT=log prints messages instead of
+sending them (local development and tests).
+
+If the outbox table cannot be written, `enqueue_email` falls back to sending
+synchronously so no email is lost.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from api.utils.email import build_smtp_message, open_smtp_connection, send_email, smtp_settings
+
+EMAIL_OUTBOX_WORKERS = int(os.getenv('EMAIL_OUTBOX_WORKERS', '2'))
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', '10'))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '5'))
+EMAIL_OUTBOX_POLL_SECONDS = float(os.getenv('EMAIL_OUTBOX_POLL_SECONDS', '5'))
+EMAIL_OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv('EMAIL_OUTBOX_BACKOFF_BASE_SECONDS', '30'))
+EMAIL_OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv('EMAIL_OUTBOX_BACKOFF_MAX_SECONDS', '3600'))
+EMAIL_OUTBOX_DEDUPE_WINDOW_SECONDS = int(os.getenv('EMAIL_OUTBOX_DEDUPE_WINDOW_SECONDS', '600'))
+# Rows stuck in 'sending' longer than this (worker died mid-send) are claimed again.
+EMAIL_OUTBOX_STALE_LOCK_SECONDS = int(os.getenv('EMAIL_OUTBOX_STALE_LOCK_SECONDS', '300'))
+# SMTP connections idle longer than this are closed rather than NOOP-checked.
+EMAIL_OUTBOX_SMTP_IDLE_SECONDS = float(os.getenv('EMAIL_OUTBOX_SMTP_IDLE_SECONDS', '60'))
+
+STATUS_QUEUED = 'queued'
+STATUS_SENDING = 'sending'
+STATUS_SENT = 'sent'
+STATUS_FAILED = 'failed'
+
+
+def make_dedupe_key(
+    to_email: str,
+    subject: str,
+    html_content: str,
+    now: Optional[float] = None,
+    nonce: Optional[str] = None,
+) -> str:
+    """Key identical messages to the same recipient within one dedupe window.
+
+    A `nonce` replaces the window, so the key only matches the same request.
+    """
+    if nonce is None:
+        window = max(1, EMAIL_OUTBOX_DEDUPE_WINDOW_SECONDS)
+        scope = str(int((time.time() if now is None else now) // window))
+    else:
+        scope = f"nonce:{nonce}"
+    digest = hashlib.sha256()
+    for part in ((to_email or '').strip().lower(), subject or '', html_content or '', scope):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def backoff_seconds(attempts: int, rng: Callable[[], float] = random.random) -> float:
+    """Delay before the next attempt: base * 2^(attempts-1), capped, with +/-20% jitter."""
+    exp = max(0, attempts - 1)
+    delay = min(EMAIL_OUTBOX_BACKOFF_MAX_SECONDS, EMAIL_OUTBOX_BACKOFF_BASE_SECONDS * (2 ** exp))
+    return delay * (0.8 + 0.4 * rng())
+
+
+# ---------------------------------------------------------------------------
+# Transports
+# ---------------------------------------------------------------------------
+
+def _smtp_is_active_provider() -> bool:
+    """Mirror send_email's provider choice: SMTP unless SendGrid is configured first."""
+    provider = (os.getenv('EMAIL_PROVIDER') or 'auto').strip().lower()
+    if (os.getenv('DISABLE_SMTP') or '').strip().lower() in ('1', 'true', 'yes'):
+        return False
+    settings = smtp_settings()
+    smtp_ready = bool(settings['host'] and settings['user'] and settings['password'])
+    if provider == 'smtp':
+        return smtp_ready
+    if provider == 'sendgrid':
+        return False
+    sendgrid_ready = bool((os.getenv('SENDGRID_API_KEY') or '').strip() and (os.getenv('SENDGRID_FROM_EMAIL') or '').strip())
+    return smtp_ready and not sendgrid_ready
+
+
+class SMTPTransport:
+    """One persistent SMTP connection, reopened when stale or broken.
+
+    Not thread-safe: each outbox worker owns its own transport.
+    """
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None, connect: Optional[Callable[[], Any]] = None):
+        self._settings = settings or smtp_settings()
+        self._connect = connect or (lambda: open_smtp_connection(self._settings))
+        self._server = None
+        self._last_used = 0.0
+        self.connections_opened = 0
+
+    def _close(self) -> None:
+        server, self._server = self._server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _ensure_connection(self):
+        if self._server is not None:
+            idle = time.monotonic() - self._last_used
+            if idle >= EMAIL_OUTBOX_SMTP_IDLE_SECONDS:
+                self._close()
+            else:
+                try:
+                    code = self._server.noop()[0]
+                except Exception:
+                    code = None
+                if code != 250:
+                    self._close()
+        if self._server is None:
+            self._server = self._connect()
+            self.connections_opened += 1
+        return self._server
+
+    def send(self, to_email: str, subject: str, html_content: str) -> None:
+        msg = build_smtp_message(to_email, subject, html_content, self._settings)
+        if msg is None:
+            raise ValueError(f"Invalid sender or recipient address for {to_email}")
+        server = self._ensure_connection()
+        try:
+            server.send_message(msg)
+        except Exception:
+            # The connection state is unknown after a failed send; start fresh next time.
+            self._close()
+            raise
+        self._last_used = time.monotonic()
+
+    def close(self) -> None:
+        self._close()
+
+
+class ProviderTransport:
+    """Delegates to send_email (SendGrid, or SMTP fallback when configured)."""
+
+    def send(self, to_email: str, subject: str, html_content: str) -> None:
+        if not send_email(to_email, subject, html_content):
+            raise RuntimeError('send_email returned false')
+
+    def close(self) -> None:
+        pass
+
+
+class LogTransport:
+    """Local stand-in that records messages instead of sending them."""
+
+    def __init__(self):
+        self.sent: List[Dict[str, str]] = []
+
+    def send(self, to_email: str, subject: str, html_content: str) -> None:
+        print(f"[EMAIL-OUTBOX] (log transport) to={to_email} subject={subject!r}")
+        self.sent.append({'to_email': to_email, 'subject': subject, 'html_content': html_content})
+
+    def close(self) -> None:
+        pass
+
+
+def make_transport():
+    mode = (os.getenv('EMAIL_OUTBOX_TRANSPORT') or 'auto').strip().lower()
+    if mode == 'log':
+        return LogTransport()
+    if mode == 'smtp' or (mode == 'auto' and _smtp_is_active_provider()):
+        return SMTPTransport()
+    return ProviderTransport()
+
+
+# ---------------------------------------------------------------------------
+# Database access
+# ---------------------------------------------------------------------------
+
+def _row_get(row: Any, key: str, index: int) -> Any:
+    if row is None:
+        return None
+    if isinstance(row, dict):
+        return row.get(key)
+    return row[index]
+
+
+def _insert_outbox_row(cursor, to_email, subject, html_content, dedupe_key, max_attempts, context, requested_by):
+    """Insert (or find the deduplicated) outbox row; returns (id, status, deduplicated).
+
+    A duplicate of a message that already failed for good is queued again.
+    """
+    cursor.execute(
+        """
+        INSERT INTO email_outbox (dedupe_key, to_email, subject, html_content, max_attempts, context, requested_by)
+        VALUES (%s, %s, %s, %s, %s, %s::jsonb, %s)
+        ON CONFLICT (dedupe_key) DO UPDATE
+            SET status = 'queued', attempts = 0, next_attempt_at = NOW(), last_error = NULL
+            WHERE email_outbox.status = 'failed'
+        RETURNING id, status
+        """,
+        (dedupe_key, to_email, subject, html_content, max_attempts, json.dumps(context) if context else None, requested_by),
+    )
+    row = cursor.fetchone()
+    if row is not None:
+        return _row_get(row, 'id', 0), _row_get(row, 'status', 1), False
+    cursor.execute('SELECT id, status FROM email_outbox WHERE dedupe_key = %s', (dedupe_key,))
+    row = cursor.fetchone()
+    return _row_get(row, 'id', 0), _row_get(row, 'status', 1), True
+
+
+def enqueue_email(
+    to_email: str,
+    subject: str,
+    html_content: str,
+    dedupe_key: Optional[str] = None,
+    context: Optional[Dict[str, Any]] = None,
+    max_attempts: Optional[int] = None,
+    cursor=None,
+    requested_by: Optional[str] = None,
+    dedupe: bool = True,
+) -> Dict[str, Any]:
+    """Queue an email for background delivery and return {'id', 'status', 'deduplicated'}.
+
+    When `cursor` is given the row is inserted in the caller's transaction (and is
+    only picked up after the caller commits). `context` is stored with the row;
+    `collaboration_invitation_id` in it makes the worker record the final delivery
+    status on that invitation. `requested_by` is the username of the sender, who
+    (with admins) may read the message's delivery status. `dedupe=False` queues
+    the message even if an identical one went out within the dedupe window
+    (explicit resends).
+    """
+    dedupe_key = dedupe_key or make_dedupe_key(
+        to_email, subject, html_content, nonce=None if dedupe else uuid.uuid4().hex
+    )
+    max_attempts = max_attempts or EMAIL_OUTBOX_MAX_ATTEMPTS
+    try:
+        if cursor is not None:
+            message_id, status, deduplicated = _insert_outbox_row(
+                cursor, to_email, subject, html_content, dedupe_key, max_attempts, context, requested_by
+            )
+        else:
+            from api.utils.database import get_db_connection
+
+            with get_db_connection() as conn:
+                cur = conn.cursor()
+                message_id, status, deduplicated = _insert_outbox_row(
+                    cur, to_email, subject, html_content, dedupe_key, max_attempts, context, requested_by
+                )
+                conn.commit()
+    except Exception as exc:
+        print(f"[WARN] Email outbox unavailable ({exc}); sending synchronously")
+        try:
+            ok = send_email(to_email, subject, html_content)
+        except Exception as send_exc:
+            print(f"[WARN] Synchronous email send failed: {send_exc}")
+            ok = False
+        return {'id': None, 'status': STATUS_SENT if ok else STATUS_FAILED, 'deduplicated': False}
+
+    if deduplicated:
+        print(f"[EMAIL-OUTBOX] Duplicate of message {message_id} to {to_email}; not queued again")
+    else:
+        print(f"[EMAIL-OUTBOX] Queued message {message_id} to {to_email}")
+    start_email_workers()
+    wake_email_workers()
+    return {'id': message_id, 'status': status, 'deduplicated': deduplicated}
+
+
+def get_email_status(message_id: int) -> Optional[Dict[str, Any]]:
+    """Delivery status for an outbox message, or None when it does not exist."""
+    import psycopg2.extras
+    from api.utils.database import get_db_connection
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute(
+            """
+            SELECT id, to_email, subject, status, attempts, max_attempts,
+                   next_attempt_at, last_error, requested_by, created_at, sent_at
+            FROM email_outbox
+            WHERE id = %s
+            """,
+            (message_id,),
+        )
+        row = cursor.fetchone()
+    if not row:
+        return None
+    result = dict(row)
+    for key in ('next_attempt_at', 'created_at', 'sent_at'):
+        if result.get(key) is not None:
+            result[key] = result[key].isoformat()
+    return result
+
+
+def _claim_batch(limit: int) -> List[Dict[str, Any]]:
+    import psycopg2.extras
+    from api.utils.database import get_db_connection
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute(
+            """
+            UPDATE email_outbox
+            SET status = 'sending', locked_at = NOW(), attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM email_outbox
+                WHERE (status = 'queued' AND next_attempt_at <= NOW())
+                   OR (status = 'sending' AND locked_at < NOW() - (%s * INTERVAL '1 second'))
+                ORDER BY next_attempt_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, to_email, subject, html_content, attempts, max_attempts, context
+            """,
+            (EMAIL_OUTBOX_STALE_LOCK_SECONDS, limit),
+        )
+        rows = [dict(r) for r in cursor.fetchall()]
+        conn.commit()
+    return rows
+
+
+def _record_invitation_status(cursor, context: Any, status: str, error: Optional[str]) -> None:
+    if isinstance(context, str):
+        try:
+            context = json.loads(context)
+        except ValueError:
+            context = None
+    invitation_id = (context or {}).get('collaboration_invitation_id')
+    if not invitation_id:
+        return
+    cursor.execute('SAVEPOINT email_outbox_invitation')
+    try:
+        cursor.execute(
+            """
+            UPDATE collaboration_invitations
+            SET last_email_sent_at = NOW(),
+                last_email_status = %s,
+                last_email_error = %s
+            WHERE id = %s
+            """,
+            (status, error, invitation_id),
+        )
+        cursor.execute('RELEASE SAVEPOINT email_outbox_invitation')
+    except Exception as exc:
+        cursor.execute('ROLLBACK TO SAVEPOINT email_outbox_invitation')
+        print(f"[WARN] Could not record email status on invitation {invitation_id}: {exc}")
+
+
+def _finish(row: Dict[str, Any], error: Optional[str]) -> str:
+    """Persist the outcome of one delivery attempt; returns the new status."""
+    from api.utils.database import get_db_connection
+
+    attempts = int(row.get('attempts') or 1)
+    max_attempts = int(row.get('max_attempts') or EMAIL_OUTBOX_MAX_ATTEMPTS)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        if error is None:
+            status = STATUS_SENT
+            cursor.execute(
+                """
+                UPDATE email_outbox
+                SET status = 'sent', sent_at = NOW(), locked_at = NULL, last_error = NULL
+                WHERE id = %s
+                """,
+                (row['id'],),
+            )
+        elif attempts >= max_attempts:
+            status = STATUS_FAILED
+            cursor.execute(
+                "UPDATE email_outbox SET status = 'failed', locked_at = NULL, last_error = %s WHERE id = %s",
+                (error[:2000], row['id']),
+            )
+        else:
+            status = STATUS_QUEUED
+            cursor.execute(
+                """
+                UPDATE email_outbox
+                SET status = 'queued', locked_at = NULL, last_error = %s,
+                    next_attempt_at = NOW() + (%s * INTERVAL '1 second')
+                WHERE id = %s
+                """,
+                (error[:2000], backoff_seconds(attempts), row['id']),
+            )
+        if status != STATUS_QUEUED:
+            _record_invitation_status(cursor, row.get('context'), status, error)
+        conn.commit()
+    return status
+
+
+# ---------------------------------------------------------------------------
+# Worker pool
+# ---------------------------------------------------------------------------
+
+_workers_lock = threading.Lock()
+_workers: List[threading.Thread] = []
+_wake = threading.Event()
+_stop = threading.Event()
+
+
+def deliver(row: Dict[str, Any], transport) -> Optional[str]:
+    """Send one claimed row through `transport`; returns the error text or None."""
+    try:
+        transport.send(row['to_email'], row['subject'], row['html_content'])
+        return None
+    except Exception as exc:
+        return f"{type(exc).__name__}: {exc}"
+
+
+def _worker_loop(name: str) -> None:
+    transport = make_transport()
+    print(f"[EMAIL-OUTBOX] Worker {name} started ({type(transport).__name__})")
+    try:
+        while not _stop.is_set():
+            # Clear before claiming so an enqueue racing with this batch still wakes us.
+            _wake.clear()
+            try:
+                rows = _claim_batch(EMAIL_OUTBOX_BATCH_SIZE)
+            except Exception as exc:
+                print(f"[WARN] Email outbox claim failed: {exc}")
+                rows = []
+            for row in rows:
+                error = deliver(row, transport)
+                try:
+                    status = _finish(row, error)
+                except Exception:
+                    traceback.print_exc()
+                    continue
+                if status == STATUS_SENT:
+                    print(f"[EMAIL-OUTBOX] Sent message {row['id']} to {row['to_email']}")
+                else:
+                    print(f"[WARN] Email outbox message {row['id']} attempt {row.get('attempts')} failed ({status}): {error}")
+            if len(rows) < EMAIL_OUTBOX_BATCH_SIZE:
+                _wake.wait(EMAIL_OUTBOX_POLL_SECONDS)
+    finally:
+        transport.close()
+
+
+def start_email_workers(count: Optional[int] = None) -> int:
+    """Start the background workers once per process; returns how many are running."""
+    count = EMAIL_OUTBOX_WORKERS if count is None else count
+    with _workers_lock:
+        alive = [t for t in _workers if t.is_alive()]
+        _workers[:] = alive
+        if _stop.is_set():
+            _stop.clear()
+        for i in range(len(alive), max(0, count)):
+            thread = threading.Thread(target=_worker_loop, args=(f"email-outbox-{i}",), name=f"email-outbox-{i}", daemon=True)
+            thread.start()
+            _workers.append(thread)
+        return len(_workers)
+
+
+def wake_email_workers() -> None:
+    _wake.set()
+
+
+def stop_email_workers(timeout: float = 5.0) -> None:
+    _stop.set()
+    _wake.set()
+    with _workers_lock:
+        threads = list(_workers)
+        _workers.clear()
+    for thread in threads:
+        thread.join(timeout)
@@ -0,0 +1,229 @@
+"""
+Columnar snapshot + cache used by the finance analytics endpoints.
+
+The finance dashboard requests every KPI at once. Instead of each endpoint loading
+and walking all proposals, one `FinanceSnapshot` (column arrays of amount,
+probability, stage code, month indexes, ...) is built per (year, scope) and every
+KPI is a reduction over those columns.
+
+Snapshots are cached per process for FINANCE_SNAPSHOT_TTL_SECONDS and dropped
+immediately by `invalidate_finance_snapshots()` (called when proposal financials
+are refreshed on write). Concurrent requests for a cold key share one build.
+
+NumPy is used for the reductions when installed; otherwise the same helpers fall
+back to plain Python lists.
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence
+
+NUMPY_AVAILABLE = False
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+
+
+FINANCE_SNAPSHOT_TTL_SECONDS = float(os.getenv('FINANCE_SNAPSHOT_TTL_SECONDS', '30'))
+
+# Stage codes used in the snapshot's `stage_code` column.
+FINANCE_STAGES = ['Draft', 'In Review', 'Sent', 'Viewed', 'Negotiation', 'Signed', 'Archived', 'Other']
+FINANCE_STAGE_CODES = {name: code for code, name in enumerate(FINANCE_STAGES)}
+
+
+def column(values: Iterable[Any], dtype: str = 'float'):
+    """Build a snapshot column (NumPy array when available, list otherwise)."""
+    values = list(values)
+    if NUMPY_AVAILABLE:
+        np_dtype = {'float': np.float64, 'int': np.int64, 'bool': np.bool_}[dtype]
+        return np.asarray(values, dtype=np_dtype)
+    if dtype == 'float':
+        return [float(v) for v in values]
+    if dtype == 'int':
+        return [int(v) for v in values]
+    return [bool(v) for v in values]
+
+
+def mask_and(*masks):
+    if NUMPY_AVAILABLE:
+        return np.logical_and.reduce(masks)
+    return [all(t) for t in zip(*masks)]
+
+
+def mask_eq(col, value):
+    if NUMPY_AVAILABLE:
+        return col == value
+    return [v == value for v in col]
+
+
+def mask_isin(col, values: Iterable[Any]):
+    values = list(values)
+    if NUMPY_AVAILABLE:
+        return np.isin(col, values)
+    lookup = set(values)
+    return [v in lookup for v in col]
+
+
+def mask_lt(col, value):
+    if NUMPY_AVAILABLE:
+        return col < value
+    return [v < value for v in col]
+
+
+def mask_le(col, value):
+    if NUMPY_AVAILABLE:
+        return col <= value
+    return [v <= value for v in col]
+
+
+def mask_ge(col, value):
+    if NUMPY_AVAILABLE:
+        return col >= value
+    return [v >= value for v in col]
+
+
+def masked_sum(values, mask=None) -> float:
+    if NUMPY_AVAILABLE:
+        return float(values.sum() if mask is None else values[mask].sum())
+    if mask is None:
+        return float(sum(values))
+    return float(sum(v for v, m in zip(values, mask) if m))
+
+
+def masked_count(mask) -> int:
+    if NUMPY_AVAILABLE:
+        return int(np.count_nonzero(mask))
+    return int(sum(1 for m in mask if m))
+
+
+def multiply(a, b):
+    if NUMPY_AVAILABLE:
+        return a * b
+    return [x * y for x, y in zip(a, b)]
+
+
+def group_totals(codes, weights, mask, length: int) -> List[float]:
+    """Sum `weights` per integer code in [0, length) for rows where `mask` is true.
+
+    With weights=None this counts rows per code.
+    """
+    if NUMPY_AVAILABLE:
+        idx = codes[mask]
+        w = None if weights is None else weights[mask]
+        ok = (idx >= 0) & (idx < length)
+        totals = np.bincount(idx[ok], weights=None if w is None else w[ok], minlength=length)
+        return [float(v) for v in totals[:length]]
+    totals = [0.0] * length
+    if weights is None:
+        weights = [1.0] * len(codes)
+    for c, w, m in zip(codes, weights, mask):
+        if m and 0 <= c < length:
+            totals[c] += float(w)
+    return totals
+
+
+def top_indices(values, mask, limit: int) -> List[int]:
+    """Indices of the `limit` largest values among masked rows, descending."""
+    if NUMPY_AVAILABLE:
+        candidates = np.flatnonzero(mask)
+        if candidates.size == 0:
+            return []
+        order = np.argsort(-values[candidates], kind='stable')
+        return [int(i) for i in candidates[order][:limit]]
+    candidates = [i for i, m in enumerate(mask) if m]
+    candidates.sort(key=lambda i: -values[i])
+    return candidates[:limit]
+
+
+def indices(mask) -> List[int]:
+    if NUMPY_AVAILABLE:
+        return [int(i) for i in np.flatnonzero(mask)]
+    return [i for i, m in enumerate(mask) if m]
+
+
+class FinanceSnapshot:
+    """Column-oriented view of every proposal relevant to the finance KPIs.
+
+    `rows` keeps the original row objects (titles, client names, timestamps) for
+    endpoints that list individual proposals; every other attribute is a column
+    aligned with `rows`.
+    """
+
+    COLUMNS = {
+        'amount': 'float',
+        'probability': 'float',
+        'stage_code': 'int',
+        'is_sent': 'bool',
+        'is_signed': 'bool',
+        'is_open': 'bool',
+        # Year/month of the last update (or creation); month is 1-12, 0 when unknown.
+        'activity_year': 'int',
+        'activity_month': 'int',
+        # Year/month of the expected close used by the forecast.
+        'forecast_year': 'int',
+        'forecast_month': 'int',
+        # Epoch seconds, -1 when unknown.
+        'activity_ts': 'float',
+        'client_code': 'int',
+    }
+
+    def __init__(self, rows: Sequence[Any], records: Sequence[Dict[str, Any]], client_names: List[str]):
+        self.rows = list(rows)
+        self.client_names = list(client_names)
+        self.size = len(self.rows)
+        self.built_at = time.time()
+        self.generation = 0
+        for name, dtype in self.COLUMNS.items():
+            setattr(self, name, column((r[name] for r in records), dtype))
+
+    def all_rows_mask(self):
+        return column([True] * self.size, 'bool')
+
+
+_snapshot_lock = threading.Lock()
+_snapshots: Dict[Hashable, FinanceSnapshot] = {}
+_build_locks: Dict[Hashable, threading.Lock] = {}
+_snapshot_generation = 0
+
+
+def _fresh(snapshot: Optional[FinanceSnapshot]) -> bool:
+    return (
+        snapshot is not None
+        and snapshot.generation == _snapshot_generation
+        and (time.time() - snapshot.built_at) < FINANCE_SNAPSHOT_TTL_SECONDS
+    )
+
+
+def get_finance_snapshot(key: Hashable, builder: Callable[[], FinanceSnapshot]) -> FinanceSnapshot:
+    """Return the cached snapshot for `key`, building it at most once concurrently."""
+    with _snapshot_lock:
+        snapshot = _snapshots.get(key)
+        if _fresh(snapshot):
+            return snapshot
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+
+    with build_lock:
+        with _snapshot_lock:
+            snapshot = _snapshots.get(key)
+            if _fresh(snapshot):
+                return snapshot
+            generation = _snapshot_generation
+
+        snapshot = builder()
+        snapshot.generation = generation
+
+        with _snapshot_lock:
+            # Only publish if no invalidation happened while we were building.
+            if generation == _snapshot_generation:
+                _snapshots[key] = snapshot
+        return snapshot
+
+
+def invalidate_finance_snapshots() -> None:
+    """Drop every cached snapshot (call after proposal financial data changes)."""
+    global _snapshot_generation
+    with _snapshot_lock:
+        _snapshot_generation += 1
+        _snapshots.clear()
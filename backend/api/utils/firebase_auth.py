@@ -9,9 +9,17 @@ import firebase_admin
 from firebase_admin import credentials, auth
 from functools import wraps
 from flask import request, jsonify
+from api.utils.firebase_token_cache import (
+    TokenExpiredError,
+    TokenVerificationError,
+    get_token_cache,
+    make_local_verifier,
+)
 
 # Initialize Firebase Admin SDK
 _firebase_app = None
+_local_verifier = None
+_local_verifier_checked = False
 
 def initialize_firebase():
     """Initialize Firebase Admin SDK"""
@@ -71,10 +79,52 @@ def initialize_firebase():
     return _firebase_app
 
 
+def _get_local_verifier():
+    """Cert-cached RS256 verifier for this project (None -> use auth.verify_id_token)."""
+    global _local_verifier, _local_verifier_checked
+    if not _local_verifier_checked:
+        project_id = os.getenv('FIREBASE_PROJECT_ID') or getattr(_firebase_app, 'project_id', None)
+        _local_verifier = make_local_verifier(project_id)
+        _local_verifier_checked = True
+        if _local_verifier is not None:
+            print(f"[FIREBASE] Verifying ID tokens locally with cached certs (project: {project_id})")
+    return _local_verifier
+
+
+def _accept_unverified_dev_token(id_token):
+    """Local dev: accept token when aud mismatch (e.g. frontend project vs backend project)"""
+    if os.getenv('LOCAL_ACCEPT_FRONTEND_FIREBASE_TOKEN', '').strip().lower() not in ('1', 'true', 'yes'):
+        return None
+    try:
+        parts = id_token.split('.')
+        if len(parts) >= 2:
+            payload_b64 = parts[1]
+            payload_b64 += '=' * (4 - len(payload_b64) % 4)
+            payload_json = base64.urlsafe_b64decode(payload_b64)
+            payload = json.loads(payload_json)
+            uid = payload.get('user_id') or payload.get('sub')
+            email = payload.get('email')
+            if uid or email:
+                print("[FIREBASE] [DEV] Accepting token (LOCAL_ACCEPT_FRONTEND_FIREBASE_TOKEN); no signature verification.")
+                return {
+                    'uid': uid or (email and email.replace('@', '_at_')),
+                    'email': email or '',
+                    'name': payload.get('name'),
+                    'email_verified': payload.get('email_verified', False),
+                    'firebase_claims': payload,
+                }
+    except Exception as local_err:
+        print(f"[FIREBASE] [DEV] Local accept decode failed: {local_err}")
+    return None
+
+
 def verify_firebase_token(id_token):
     """
     Verify a Firebase ID token and return the decoded token
-    
+
+    Verified tokens are cached (keyed by token hash) until their `exp`, so a token
+    reused across requests is only signature-checked once.
+
     Args:
         id_token: Firebase ID token string from the frontend
         
@@ -82,50 +132,52 @@ def verify_firebase_token(id_token):
         dict: Decoded token with user info (uid, email, etc.) or None if invalid
     """
     try:
+        # Check if token looks like a Firebase ID token (JWT format: three parts separated by dots)
+        if not id_token or len(id_token.split('.')) != 3:
+            print(f"[FIREBASE] WARNING: Token doesn't look like a Firebase ID token (JWT format required)")
+            return None
+
+        token_cache = get_token_cache()
+        if token_cache is not None:
+            cached = token_cache.get(id_token)
+            if cached is not None:
+                return cached
+
         if _firebase_app is None:
             initialize_firebase()
         
         if _firebase_app is None:
             print("[FIREBASE] WARNING: Firebase not initialized, cannot verify token")
             return None
-        
-        # Check if token looks like a Firebase ID token (JWT format: three parts separated by dots)
-        if not id_token or len(id_token.split('.')) != 3:
-            print(f"[FIREBASE] WARNING: Token doesn't look like a Firebase ID token (JWT format required)")
-            return None
-        
-        # Verify the ID token
-        decoded_token = auth.verify_id_token(id_token)
+
+        decoded_token = None
+        verifier = _get_local_verifier()
+        if verifier is not None:
+            try:
+                decoded_token = verifier.verify(id_token)
+            except TokenExpiredError as e:
+                print(f"[FIREBASE] ERROR: Expired Firebase ID token: {str(e)}")
+                return None
+            except TokenVerificationError as e:
+                print(f"[FIREBASE] ERROR: Invalid Firebase ID token: {str(e)}")
+                return _accept_unverified_dev_token(id_token)
+            except Exception as e:
+                # Cert endpoint unreachable etc. -- let firebase_admin try.
+                print(f"[FIREBASE] WARNING: Local token verification unavailable ({e}); using firebase_admin")
+
+        if decoded_token is None:
+            decoded_token = auth.verify_id_token(id_token)
         print(f"✅ Firebase ID token verified successfully")
+        if token_cache is not None:
+            token_cache.put(id_token, decoded_token)
         return decoded_token
-    except auth.InvalidIdTokenError as e:
-        print(f"[FIREBASE] ERROR: Invalid Firebase ID token: {str(e)}")
-        # Local dev: accept token when aud mismatch (e.g. frontend project vs backend project)
-        if os.getenv('LOCAL_ACCEPT_FRONTEND_FIREBASE_TOKEN', '').strip().lower() in ('1', 'true', 'yes'):
-            try:
-                parts = id_token.split('.')
-                if len(parts) >= 2:
-                    payload_b64 = parts[1]
-                    payload_b64 += '=' * (4 - len(payload_b64) % 4)
-                    payload_json = base64.urlsafe_b64decode(payload_b64)
-                    payload = json.loads(payload_json)
-                    uid = payload.get('user_id') or payload.get('sub')
-                    email = payload.get('email')
-                    if uid or email:
-                        print("[FIREBASE] [DEV] Accepting token (LOCAL_ACCEPT_FRONTEND_FIREBASE_TOKEN); no signature verification.")
-                        return {
-                            'uid': uid or (email and email.replace('@', '_at_')),
-                            'email': email or '',
-                            'name': payload.get('name'),
-                            'email_verified': payload.get('email_verified', False),
-                            'firebase_claims': payload,
-                        }
-            except Exception as local_err:
-                print(f"[FIREBASE] [DEV] Local accept decode failed: {local_err}")
-        return None
     except auth.ExpiredIdTokenError as e:
+        # Subclass of InvalidIdTokenError: must not reach the dev fallback below.
         print(f"[FIREBASE] ERROR: Expired Firebase ID token: {str(e)}")
         return None
+    except auth.InvalidIdTokenError as e:
+        print(f"[FIREBASE] ERROR: Invalid Firebase ID token: {str(e)}")
+        return _accept_unverified_dev_token(id_token)
     except ValueError as e:
         # Token format errors
         print(f"[FIREBASE] WARNING: Token format error (likely not a Firebase token): {str(e)}")
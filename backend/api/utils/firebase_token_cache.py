@@ -0,0 +1,300 @@
+"""
+Verified Firebase ID token cache and locally cached signing certificates.
+
+The Flutter client reuses one ID token for up to an hour across dozens of
+dashboard calls, and `auth.verify_id_token` repeats the RSA signature check
+(and possibly a fetch of Google's certs) for each of them. This module provides:
+
+  - `VerifiedTokenCache`: bounded LRU of decoded claims keyed by sha256(token);
+    each entry expires at the token's own `exp`, so a cached token is never
+    accepted for longer than Firebase itself would accept it
+  - `CertStore`: Google's securetoken x509 certs, fetched through the shared
+    HTTP session, kept for the response's Cache-Control max-age and refreshed
+    in a background thread before they go stale. An unknown `kid` (key
+    rotation) triggers one synchronous, rate-limited refresh.
+  - `LocalTokenVerifier`: RS256 verification against the CertStore with the
+    same checks firebase_admin applies (aud, iss, exp/iat, non-empty sub).
+    Needs PyJWT + cryptography; without them, or without a project id,
+    `verify_firebase_token` keeps using firebase_admin.
+
+Hit/miss counters are available from `token_cache_stats()`.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+JWT_AVAILABLE = False
+try:
+    import jwt
+    from cryptography import x509
+    JWT_AVAILABLE = True
+except ImportError:
+    jwt = None
+    x509 = None
+
+
+FIREBASE_TOKEN_CACHE_ENABLED = (os.getenv('FIREBASE_TOKEN_CACHE_ENABLED', 'true').strip().lower() not in ('0', 'false', 'no'))
+FIREBASE_TOKEN_CACHE_MAX_ENTRIES = int(os.getenv('FIREBASE_TOKEN_CACHE_MAX_ENTRIES', '10000'))
+FIREBASE_CERTS_URL = os.getenv(
+    'FIREBASE_CERTS_URL',
+    'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com',
+)
+# Used when the cert response has no Cache-Control max-age.
+FIREBASE_CERTS_DEFAULT_TTL_SECONDS = float(os.getenv('FIREBASE_CERTS_DEFAULT_TTL_SECONDS', '3600'))
+# Minimum gap between forced refreshes triggered by an unknown key id.
+FIREBASE_CERTS_MIN_REFRESH_SECONDS = float(os.getenv('FIREBASE_CERTS_MIN_REFRESH_SECONDS', '60'))
+# The background thread refetches certs this long before they expire.
+FIREBASE_CERTS_REFRESH_AHEAD_SECONDS = float(os.getenv('FIREBASE_CERTS_REFRESH_AHEAD_SECONDS', '300'))
+FIREBASE_TOKEN_CLOCK_SKEW_SECONDS = int(os.getenv('FIREBASE_TOKEN_CLOCK_SKEW_SECONDS', '0'))
+
+_MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class TokenVerificationError(Exception):
+    """Raised by LocalTokenVerifier for tokens Firebase would reject."""
+
+
+class TokenExpiredError(TokenVerificationError):
+    """Raised by LocalTokenVerifier for a correctly signed token past its `exp`."""
+
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class VerifiedTokenCache:
+    """LRU of verified token claims; an entry lives until the token's `exp`."""
+
+    def __init__(self, max_entries: int = FIREBASE_TOKEN_CACHE_MAX_ENTRIES, clock: Callable[[], float] = time.time):
+        self.max_entries = max(1, max_entries)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Tuple[Dict[str, Any], float]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = token_key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._clock() >= entry[1]:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[0])
+
+    def put(self, token: str, claims: Dict[str, Any]) -> None:
+        try:
+            expires_at = float(claims.get('exp'))
+        except (TypeError, ValueError):
+            return  # never cache a token without a usable expiry
+        if expires_at <= self._clock():
+            return
+        key = token_key(token)
+        with self._lock:
+            self._entries[key] = (dict(claims), expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _default_fetch(url: str) -> Tuple[int, bytes, Dict[str, str]]:
+    from api.utils.asset_cache import http_get
+
+    return http_get(url, timeout=10)
+
+
+class CertStore:
+    """kid -> public key for Firebase ID tokens, refreshed from FIREBASE_CERTS_URL."""
+
+    def __init__(self, url: str = FIREBASE_CERTS_URL,
+                 fetch: Callable[[str], Tuple[int, bytes, Dict[str, str]]] = _default_fetch,
+                 clock: Callable[[], float] = time.time):
+        self.url = url
+        self._fetch = fetch
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._keys: Dict[str, Any] = {}
+        self._expires_at = 0.0
+        self._last_refresh = 0.0
+        self._refresher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.refreshes = 0
+
+    def _load(self) -> None:
+        status, body, headers = self._fetch(self.url)
+        if status != 200:
+            raise RuntimeError(f"Could not fetch Firebase certs: HTTP {status}")
+        certs = json.loads(body.decode('utf-8'))
+        keys = {kid: x509.load_pem_x509_certificate(pem.encode('utf-8')).public_key() for kid, pem in certs.items()}
+        match = _MAX_AGE_RE.search((headers or {}).get('cache-control', '') or '')
+        ttl = float(match.group(1)) if match else FIREBASE_CERTS_DEFAULT_TTL_SECONDS
+        now = self._clock()
+        with self._lock:
+            self._keys = keys
+            self._expires_at = now + ttl
+            self._last_refresh = now
+            self.refreshes += 1
+
+    def refresh(self, force: bool = False) -> None:
+        with self._lock:
+            now = self._clock()
+            fresh = now < self._expires_at
+            recent = now - self._last_refresh < FIREBASE_CERTS_MIN_REFRESH_SECONDS
+        # Stale certs are always refetched; fresh ones only on a forced (rate-limited) refresh.
+        if fresh and (not force or recent):
+            return
+        self._load()
+
+    def get_key(self, kid: Optional[str]):
+        with self._lock:
+            stale = self._clock() >= self._expires_at
+            key = self._keys.get(kid)
+        if key is None or stale:
+            try:
+                self.refresh(force=key is None)
+            except Exception as exc:
+                if key is None:
+                    raise
+                print(f"[WARN] Firebase cert refresh failed, using cached certs: {exc}")
+            with self._lock:
+                key = self._keys.get(kid)
+        if key is None:
+            raise TokenVerificationError(f"Unknown Firebase signing key id: {kid}")
+        return key
+
+    def seconds_until_stale(self) -> float:
+        with self._lock:
+            return self._expires_at - self._clock()
+
+    def start_background_refresh(self) -> None:
+        """Refresh certs ahead of expiry so request threads rarely fetch them."""
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        self._stop.clear()
+
+        def _loop():
+            while not self._stop.is_set():
+                if self.seconds_until_stale() <= FIREBASE_CERTS_REFRESH_AHEAD_SECONDS:
+                    try:
+                        self._load()
+                    except Exception as exc:
+                        print(f"[WARN] Firebase cert background refresh failed: {exc}")
+                # Sleep until shortly before the certs go stale (30s..1h; retry in 30s after a failure).
+                wait = self.seconds_until_stale() - FIREBASE_CERTS_REFRESH_AHEAD_SECONDS
+                self._stop.wait(min(3600.0, max(30.0, wait)))
+
+        self._refresher = threading.Thread(target=_loop, name='firebase-cert-refresh', daemon=True)
+        self._refresher.start()
+
+    def stop_background_refresh(self) -> None:
+        self._stop.set()
+
+
+class LocalTokenVerifier:
+    """RS256 Firebase ID token verification against a CertStore."""
+
+    def __init__(self, project_id: str, certs: CertStore, clock: Callable[[], float] = time.time):
+        self.project_id = project_id
+        self.certs = certs
+        self._clock = clock
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError as exc:
+            raise TokenVerificationError(f"Malformed token: {exc}") from exc
+        if header.get('alg') != 'RS256':
+            raise TokenVerificationError(f"Unexpected token algorithm: {header.get('alg')}")
+
+        key = self.certs.get_key(header.get('kid'))
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=['RS256'],
+                audience=self.project_id,
+                issuer=f"https://securetoken.google.com/{self.project_id}",
+                leeway=FIREBASE_TOKEN_CLOCK_SKEW_SECONDS,
+                options={'require': ['exp', 'iat', 'sub']},
+            )
+        except jwt.ExpiredSignatureError as exc:
+            raise TokenExpiredError('Token expired') from exc
+        except jwt.PyJWTError as exc:
+            raise TokenVerificationError(str(exc)) from exc
+
+        sub = claims.get('sub')
+        if not isinstance(sub, str) or not sub or len(sub) > 128:
+            raise TokenVerificationError('Token has an invalid subject')
+        auth_time = claims.get('auth_time')
+        if auth_time is not None and float(auth_time) > self._clock() + FIREBASE_TOKEN_CLOCK_SKEW_SECONDS:
+            raise TokenVerificationError('Token auth_time is in the future')
+        claims['uid'] = sub
+        return claims
+
+
+_token_cache: Optional[VerifiedTokenCache] = None
+_cert_store: Optional[CertStore] = None
+_singleton_lock = threading.Lock()
+
+
+def get_token_cache() -> Optional[VerifiedTokenCache]:
+    """Process-wide verified-token cache, or None when FIREBASE_TOKEN_CACHE_ENABLED is off."""
+    global _token_cache
+    if not FIREBASE_TOKEN_CACHE_ENABLED:
+        return None
+    if _token_cache is None:
+        with _singleton_lock:
+            if _token_cache is None:
+                _token_cache = VerifiedTokenCache()
+    return _token_cache
+
+
+def get_cert_store() -> CertStore:
+    global _cert_store
+    if _cert_store is None:
+        with _singleton_lock:
+            if _cert_store is None:
+                _cert_store = CertStore()
+                _cert_store.start_background_refresh()
+    return _cert_store
+
+
+def make_local_verifier(project_id: Optional[str]) -> Optional[LocalTokenVerifier]:
+    """Local verifier for `project_id`, or None when PyJWT/cryptography are missing."""
+    if not JWT_AVAILABLE or not project_id:
+        return None
+    return LocalTokenVerifier(project_id, get_cert_store())
+
+
+def token_cache_stats() -> Dict[str, Any]:
+    cache = get_token_cache()
+    stats = cache.stats() if cache is not None else {'enabled': False}
+    if _cert_store is not None:
+        stats['cert_refreshes'] = _cert_store.refreshes
+    return stats
@@ -6,12 +6,16 @@ import json
 import html
 import traceback
 import sys
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import psycopg2
 import psycopg2.extras
 
-from api.utils.database import get_db_connection
+from api.utils.asset_cache import COVER_IMAGE_MAX_PX, LOGO_IMAGE_MAX_PX, fetch_image_bytes
+from api.utils.database import get_db_connection, get_table_columns, table_exists
 from api.utils.email import send_email
+from api.utils.pdf_cache import get_pdf_cache, pdf_cache_key, run_in_background
+from api.utils.proposal_financials import refresh_proposal_financials, refresh_proposal_financials_safe
 
 # Import PDF and DocuSign utilities if available
 PDF_AVAILABLE = False
@@ -148,7 +152,7 @@ def get_frontend_url(origin: str | None = None):
     return frontend_url
 
 
-def log_activity(proposal_id, user_id, action_type, description, metadata=None):
+def log_activity(proposal_id, user_id, action_type, description, metadata=None, cursor=None):
     """
     Log an activity to the activity timeline
     
@@ -158,28 +162,147 @@ def log_activity(proposal_id, user_id, action_type, description, metadata=None):
         action_type: Type of action (e.g., 'comment_added', 'suggestion_created', 'proposal_edited')
         description: Human-readable description of the action
         metadata: Optional dict with additional data
+        cursor: Optional caller cursor; the row is then written inside a savepoint
+            and commits or rolls back with the caller's transaction
     """
+    sql = """
+        INSERT INTO activity_log (proposal_id, user_id, action_type, action_description, metadata)
+        VALUES (%s, %s, %s, %s, %s)
+    """
+    params = (proposal_id, user_id, action_type, description, json.dumps(metadata) if metadata else None)
     try:
+        if cursor is not None:
+            cursor.execute("SAVEPOINT activity_log_insert")
+            try:
+                cursor.execute(sql, params)
+                cursor.execute("RELEASE SAVEPOINT activity_log_insert")
+            except Exception:
+                cursor.execute("ROLLBACK TO SAVEPOINT activity_log_insert")
+                cursor.execute("RELEASE SAVEPOINT activity_log_insert")
+                raise
+            return
         with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO activity_log (proposal_id, user_id, action_type, action_description, metadata)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (proposal_id, user_id, action_type, description, json.dumps(metadata) if metadata else None))
+            own_cursor = conn.cursor()
+            own_cursor.execute(sql, params)
             conn.commit()
     except Exception as e:
         print(f"⚠️ Failed to log activity: {e}")
 
 
-def log_status_change(proposal_id, user_id, from_status, to_status):
+def _stamp_status_change(cursor, proposal_id):
+    if 'last_status_change_at' in get_table_columns('proposals', cursor):
+        cursor.execute(
+            "UPDATE proposals SET last_status_change_at = NOW() WHERE id = %s",
+            (proposal_id,),
+        )
+
+
+def log_status_change(proposal_id, user_id, from_status, to_status, cursor=None):
+    """Record a status transition.
+
+    Callers that have not committed their status UPDATE yet must pass their
+    cursor: the proposal row is locked by that transaction, so the audit row,
+    the stamp and the finance projection refresh run on it and the caller
+    commits (or rolls back) all of them together.
+    """
     log_activity(
         proposal_id,
         user_id,
         "status_changed",
         f"Status changed: {from_status} → {to_status}",
         {"from": from_status, "to": to_status},
+        cursor=cursor,
     )
 
+    # Keep last_status_change_at (finance deal aging) and the finance projection's
+    # stage in step with status transitions made outside api/routes/proposals.py.
+    if cursor is not None:
+        try:
+            cursor.execute("SAVEPOINT status_change_stamp")
+            try:
+                _stamp_status_change(cursor, proposal_id)
+                cursor.execute("RELEASE SAVEPOINT status_change_stamp")
+            except Exception:
+                cursor.execute("ROLLBACK TO SAVEPOINT status_change_stamp")
+                cursor.execute("RELEASE SAVEPOINT status_change_stamp")
+                raise
+        except Exception as e:
+            print(f"⚠️ Failed to stamp last_status_change_at: {e}")
+        # Reads the caller's uncommitted status, so the projection gets the new stage
+        refresh_proposal_financials_safe(cursor, proposal_id)
+        return
+
+    try:
+        with get_db_connection() as conn:
+            own_cursor = conn.cursor()
+            _stamp_status_change(own_cursor, proposal_id)
+            refresh_proposal_financials(own_cursor, proposal_id)
+            conn.commit()
+    except Exception as e:
+        print(f"⚠️ Failed to refresh proposal status metadata: {e}")
+
+
+NOTIFICATION_INSERT_BATCH_SIZE = 500
+
+
+def _notification_table(cursor):
+    """Return (table_name, column_names) for the notifications table, or (None, set())."""
+    table_name = next(
+        (t for t in ('notifications', 'notificationss') if table_exists(t, cursor)),
+        None,
+    )
+    if not table_name:
+        return None, set()
+    return table_name, set(get_table_columns(table_name, cursor))
+
+
+def _notification_columns(column_names):
+    """Columns written for one notification, in insert order."""
+    columns = ['user_id']
+    for col in ('notification_type', 'type', 'title', 'message', 'proposal_id', 'metadata', 'is_read'):
+        if col in column_names:
+            columns.append(col)
+    return columns
+
+
+def _notification_values(columns, user_id, notification_type, title, message, proposal_id, metadata_json):
+    by_column = {
+        'user_id': user_id,
+        'notification_type': notification_type,
+        'type': notification_type,
+        'title': title,
+        'message': message,
+        'proposal_id': proposal_id,
+        'metadata': metadata_json,
+        'is_read': False,
+    }
+    return [by_column[col] for col in columns]
+
+
+def _send_notification_email(recipient, title, message, proposal_id=None, email_subject=None, email_body=None):
+    recipient_email = recipient.get('email') if recipient else None
+    if not recipient_email:
+        return
+    recipient_name = recipient.get('full_name') or recipient_email
+    subject = email_subject or title
+
+    html_content = email_body or f"""
+    <html>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6;">
+            <p>Hi {recipient_name},</p>
+            <p>{message}</p>
+            {f'<p><strong>Proposal ID:</strong> {proposal_id}</p>' if proposal_id else ''}
+            <p style="font-size: 12px; color: #888;">You received this notification because you are part of a proposal on ProposalHub.</p>
+        </body>
+    </html>
+    """
+
+    try:
+        send_email(recipient_email, subject, html_content)
+        print(f"📧 Notification email sent to {recipient_email}")
+    except Exception as email_err:
+        print(f"⚠️ Failed to send notification email to {recipient_email}: {email_err}")
+
 
 def create_notification(
     user_id,
@@ -206,57 +329,22 @@ def create_notification(
                 return
 
             # Determine which notifications table/columns exist
-            cursor.execute("""
-                SELECT table_name 
-                FROM information_schema.tables 
-                WHERE table_schema = 'public' 
-                AND table_name IN ('notifications', 'notificationss')
-            """)
-            table_rows = cursor.fetchall()
-            if not table_rows:
+            table_name, column_names = _notification_table(cursor)
+            if not table_name:
                 print("⚠️ [NOTIFICATIONS] No notifications table found; skipping create_notification")
                 return
 
-            table_names = {row['table_name'] for row in table_rows}
-            table_name = 'notifications' if 'notifications' in table_names else table_rows[0]['table_name']
-
             print(
                 f"✅ [NOTIFICATIONS] Creating notification for user_id={resolved_user_id} "
                 f"type={notification_type} table={table_name} proposal_id={proposal_id}"
             )
 
-            cursor.execute("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_schema = 'public' AND table_name = %s
-            """, (table_name,))
-            column_names = {row['column_name'] for row in cursor.fetchall()}
-
             metadata_json = json.dumps(metadata) if metadata else None
 
-            columns = []
-            values = []
-
-            def add_column(col_name, value):
-                columns.append(col_name)
-                values.append(value)
-
-            add_column('user_id', resolved_user_id)
-
-            if 'notification_type' in column_names:
-                add_column('notification_type', notification_type)
-            if 'type' in column_names:
-                add_column('type', notification_type)
-            if 'title' in column_names:
-                add_column('title', title)
-            if 'message' in column_names:
-                add_column('message', message)
-            if 'proposal_id' in column_names:
-                add_column('proposal_id', proposal_id)
-            if 'metadata' in column_names:
-                add_column('metadata', metadata_json)
-            if 'is_read' in column_names:
-                add_column('is_read', False)
+            columns = _notification_columns(column_names)
+            values = _notification_values(
+                columns, resolved_user_id, notification_type, title, message, proposal_id, metadata_json
+            )
 
             placeholders = ', '.join(['%s'] * len(columns))
             columns_sql = ', '.join(columns)
@@ -282,33 +370,87 @@ def create_notification(
 
             conn.commit()
 
-        if send_email_flag and recipient_info and recipient_info.get('email'):
-            recipient_email = recipient_info['email']
-            recipient_name = recipient_info.get('full_name') or recipient_email
-            subject = email_subject or title
-
-            html_content = email_body or f"""
-            <html>
-                <body style="font-family: Arial, sans-serif; line-height: 1.6;">
-                    <p>Hi {recipient_name},</p>
-                    <p>{message}</p>
-                    {f'<p><strong>Proposal ID:</strong> {proposal_id}</p>' if proposal_id else ''}
-                    <p style="font-size: 12px; color: #888;">You received this notification because you are part of a proposal on ProposalHub.</p>
-                </body>
-            </html>
-            """
-
-            try:
-                send_email(recipient_email, subject, html_content)
-                print(f"📧 Notification email sent to {recipient_email}")
-            except Exception as email_err:
-                print(f"⚠️ Failed to send notification email to {recipient_email}: {email_err}")
+        if send_email_flag and recipient_info:
+            _send_notification_email(
+                recipient_info, title, message, proposal_id,
+                email_subject=email_subject, email_body=email_body,
+            )
 
     except Exception as e:
         print(f"⚠️ Failed to create notification: {e}")
         traceback.print_exc()
 
 
+def create_notifications_bulk(cursor, user_ids, notification_type, title, message, proposal_id=None, metadata=None):
+    """
+    Insert one notification per user id with multi-row INSERTs on the caller's
+    cursor. Nothing is committed here: the caller's transaction owns the rows.
+
+    Returns the number of notifications inserted.
+    """
+    recipients = [uid for uid in dict.fromkeys(user_ids) if uid is not None]
+    if not recipients:
+        return 0
+
+    table_name, column_names = _notification_table(cursor)
+    if not table_name:
+        print("⚠️ [NOTIFICATIONS] No notifications table found; skipping create_notifications_bulk")
+        return 0
+
+    metadata_json = json.dumps(metadata) if metadata else None
+    columns = _notification_columns(column_names)
+    row_sql = '(' + ', '.join(['%s'] * len(columns)) + ')'
+
+    for start in range(0, len(recipients), NOTIFICATION_INSERT_BATCH_SIZE):
+        chunk = recipients[start:start + NOTIFICATION_INSERT_BATCH_SIZE]
+        params = []
+        for uid in chunk:
+            params.extend(
+                _notification_values(columns, uid, notification_type, title, message, proposal_id, metadata_json)
+            )
+        cursor.execute(
+            f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES {', '.join([row_sql] * len(chunk))}",
+            params,
+        )
+
+    print(
+        f"✅ [NOTIFICATIONS] Inserted {len(recipients)} notifications "
+        f"type={notification_type} table={table_name} proposal_id={proposal_id}"
+    )
+    return len(recipients)
+
+
+@contextmanager
+def _notification_cursor(cursor=None):
+    """RealDictCursor for the notification helpers.
+
+    Without `cursor`, a pooled connection that is committed when the block ends.
+    With `cursor`, the caller's transaction inside a savepoint, so a failure
+    here only undoes the notification rows. The caller commits.
+    """
+    if cursor is None:
+        with get_db_connection() as conn:
+            yield conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            conn.commit()
+        return
+
+    dict_cursor = cursor.connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    dict_cursor.execute("SAVEPOINT notifications_bulk")
+    try:
+        yield dict_cursor
+    except Exception:
+        dict_cursor.execute("ROLLBACK TO SAVEPOINT notifications_bulk")
+        dict_cursor.execute("RELEASE SAVEPOINT notifications_bulk")
+        raise
+    dict_cursor.execute("RELEASE SAVEPOINT notifications_bulk")
+
+
+def _row_get(row, key, index):
+    if isinstance(row, dict):
+        return row.get(key)
+    return row[index]
+
+
 def notify_proposal_collaborators(
     proposal_id,
     notification_type,
@@ -319,32 +461,29 @@ def notify_proposal_collaborators(
     send_email_flag=False,
     email_subject=None,
     email_body=None,
+    cursor=None,
 ):
     """
     Notify all collaborators on a proposal
+
+    The owner and accepted collaborators are resolved in one query and all
+    notifications are written in a single transaction: the caller's when
+    `cursor` is given (the caller commits), otherwise a pooled connection's.
     """
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
+        recipients = []
+        with _notification_cursor(cursor) as cursor:
             # Fetch proposal details
-            cursor.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_schema = 'public' AND table_name = 'proposals'
-                """
-            )
-            cols = {r.get('column_name') for r in cursor.fetchall() or []}
+            cols = set(get_table_columns('proposals', cursor))
             owner_col = 'user_id' if 'user_id' in cols else ('owner_id' if 'owner_id' in cols else None)
             if owner_col:
                 cursor.execute(
-                    f"SELECT {owner_col} AS owner_id, title FROM proposals WHERE id = %s",
+                    f"SELECT {owner_col}::text AS owner_id, title FROM proposals WHERE id = %s",
                     (proposal_id,),
                 )
             else:
                 cursor.execute(
-                    "SELECT title FROM proposals WHERE id = %s",
+                    "SELECT NULL::text AS owner_id, title FROM proposals WHERE id = %s",
                     (proposal_id,),
                 )
             proposal = cursor.fetchone()
@@ -361,64 +500,51 @@ def notify_proposal_collaborators(
             if isinstance(metadata, dict):
                 base_metadata.update(metadata)
 
-            def _resolve_user_row(identifier):
-                if identifier is None:
-                    return None
-                if isinstance(identifier, int):
-                    cursor.execute("SELECT id FROM users WHERE id = %s", (identifier,))
-                    return cursor.fetchone()
-                try:
-                    numeric_id = int(identifier)
-                    cursor.execute("SELECT id FROM users WHERE id = %s", (numeric_id,))
-                    row = cursor.fetchone()
-                    if row:
-                        return row
-                except (TypeError, ValueError):
-                    pass
-                cursor.execute("SELECT id FROM users WHERE username = %s", (identifier,))
-                return cursor.fetchone()
-
-            owner = _resolve_user_row(proposal.get('owner_id'))
-            if owner and owner['id'] != exclude_user_id:
-                create_notification(
-                    owner['id'],
-                    notification_type,
-                    title,
-                    message,
-                    proposal_id,
-                    base_metadata,
-                    send_email_flag=send_email_flag,
-                    email_subject=email_subject,
-                    email_body=email_body,
-                )
-
-            # Get accepted collaborators
+            # Owner is stored either as a numeric user id or (legacy) a username.
+            # A numeric reference that matches no user id may still be a username.
+            owner_ref = (proposal.get('owner_id') or '').strip()
+            owner_id = int(owner_ref) if owner_ref.isdigit() else None
+            owner_match = """
+                (u.id = %(owner_id)s
+                 OR (u.username = %(owner_ref)s
+                     AND NOT EXISTS (SELECT 1 FROM users o WHERE o.id = %(owner_id)s)))
+            """
             cursor.execute(
-                """
-                SELECT DISTINCT u.id
-                FROM collaboration_invitations ci
-                JOIN users u ON ci.invited_email = u.email
-                WHERE ci.proposal_id = %s AND ci.status = 'accepted'
+                f"""
+                SELECT u.id, u.email, u.full_name, COALESCE({owner_match}, FALSE) AS is_owner
+                FROM users u
+                WHERE {owner_match}
+                   OR u.email IN (
+                        SELECT ci.invited_email
+                        FROM collaboration_invitations ci
+                        WHERE ci.proposal_id = %(proposal_id)s AND ci.status = 'accepted'
+                   )
+                ORDER BY is_owner DESC, u.id
                 """,
-                (proposal_id,),
+                {'owner_id': owner_id, 'owner_ref': owner_ref, 'proposal_id': proposal_id},
+            )
+            recipients = [
+                r for r in (cursor.fetchall() or [])
+                if r.get('id') is not None and r.get('id') != exclude_user_id
+            ]
+
+            create_notifications_bulk(
+                cursor,
+                [r['id'] for r in recipients],
+                notification_type,
+                title,
+                message,
+                proposal_id,
+                base_metadata,
             )
 
-            collaborators = cursor.fetchall()
-            for collab in collaborators:
-                collab_id = collab.get('id') if isinstance(collab, dict) else collab[0]
-                if collab_id and collab_id != exclude_user_id:
-                    create_notification(
-                        collab_id,
-                        notification_type,
-                        title,
-                        message,
-                        proposal_id,
-                        base_metadata,
-                        send_email_flag=send_email_flag,
-                        email_subject=email_subject,
-                        email_body=email_body,
-                    )
-                    
+        if send_email_flag:
+            for recipient in recipients:
+                _send_notification_email(
+                    recipient, title, message, proposal_id,
+                    email_subject=email_subject, email_body=email_body,
+                )
+
     except Exception as e:
         print(f"⚠️ Failed to notify collaborators: {e}")
 
@@ -434,54 +560,130 @@ def extract_mentions(text):
     return list(set(mentions))  # Remove duplicates
 
 
-def process_mentions(comment_id, comment_text, mentioned_by_user_id, proposal_id):
+def resolve_mentioned_users(cursor, mentions):
+    """
+    Resolve @mention handles to user rows with one query.
+
+    Each handle matches, in order of preference: a persona tag such as
+    "@jane-admin" (username + role), an exact username or email, an email local
+    part ("@jane" -> jane@...), then the username part of a persona tag.
+
+    Returns {handle: {'id', 'full_name', 'email'}} for the handles that resolved.
+    """
+    handles = [m.strip() for m in mentions if m and m.strip()]
+    if not handles:
+        return {}
+
+    personas = {}
+    for handle in handles:
+        if '@' not in handle and '-' in handle:
+            base_candidate, role_candidate = handle.rsplit('-', 1)
+            if base_candidate and role_candidate:
+                personas[handle] = (base_candidate, role_candidate.replace('_', ' ').lower().strip())
+
+    usernames = list(dict.fromkeys(handles + [base for base, _ in personas.values()]))
+    cursor.execute(
+        """
+        SELECT id, full_name, email, username, LOWER(COALESCE(role, '')) AS role_key
+        FROM users
+        WHERE username = ANY(%s) OR email = ANY(%s) OR email LIKE ANY(%s)
+        ORDER BY id
+        """,
+        (usernames, handles, [f'{h}@%' for h in handles]),
+    )
+    rows = cursor.fetchall() or []
+
+    def _first(predicate):
+        for row in rows:
+            if predicate(row):
+                return row
+        return None
+
+    resolved = {}
+    for handle in handles:
+        user = None
+        persona = personas.get(handle)
+        if persona:
+            base, role = persona
+            user = _first(lambda r: _row_get(r, 'username', 3) == base
+                          and _row_get(r, 'role_key', 4) in (role, role.replace('_', ' ')))
+        if not user:
+            user = _first(lambda r: _row_get(r, 'username', 3) == handle or _row_get(r, 'email', 2) == handle)
+        if not user:
+            prefix = f'{handle}@'
+            user = _first(lambda r: (_row_get(r, 'email', 2) or '').startswith(prefix))
+        if not user and persona:
+            user = _first(lambda r: _row_get(r, 'username', 3) == persona[0])
+        if user:
+            resolved[handle] = {
+                'id': _row_get(user, 'id', 0),
+                'full_name': _row_get(user, 'full_name', 1),
+                'email': _row_get(user, 'email', 2),
+            }
+    return resolved
+
+
+def process_mentions(comment_id, comment_text, mentioned_by_user_id, proposal_id, send_email_flag=True, cursor=None):
     """
     Process @mentions in a comment
+
+    Mentioned users are resolved in one query; comment_mentions rows and
+    notifications are written with multi-row INSERTs in one transaction: the
+    caller's when `cursor` is given (the caller commits), otherwise a pooled
+    connection's.
     """
     mentions = extract_mentions(comment_text)
     if not mentions:
         return
     
+    recipients = {}
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            
+        with _notification_cursor(cursor) as cursor:
             cursor.execute("SELECT full_name FROM users WHERE id = %s", (mentioned_by_user_id,))
             commenter = cursor.fetchone()
             commenter_name = commenter['full_name'] if commenter else 'Someone'
-            
-            for mention in mentions:
-                cursor.execute("""
-                    SELECT id, full_name, email FROM users 
-                    WHERE username = %s OR email = %s OR email LIKE %s
-                """, (mention, mention, f'{mention}@%'))
-                
-                mentioned_user = cursor.fetchone()
-                if not mentioned_user:
-                    continue
-                
-                if mentioned_user['id'] == mentioned_by_user_id:
-                    continue
-                
-                cursor.execute("""
-                    INSERT INTO comment_mentions 
-                    (comment_id, mentioned_user_id, mentioned_by_user_id)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT DO NOTHING
-                """, (comment_id, mentioned_user['id'], mentioned_by_user_id))
-                
-                create_notification(
-                    mentioned_user['id'],
-                    'mentioned',
-                    'You were mentioned',
-                    f"{commenter_name} mentioned you in a comment",
-                    proposal_id,
-                    {'comment_id': comment_id, 'mentioned_by': mentioned_by_user_id},
-                    send_email_flag=True,
+
+            resolved = resolve_mentioned_users(cursor, mentions)
+            for handle in mentions:
+                if handle.strip() not in resolved:
+                    print(f"⚠️ Mentioned user not found: @{handle}")
+
+            # Don't mention yourself; one row per user even if mentioned by several handles.
+            for user in resolved.values():
+                if user['id'] != mentioned_by_user_id:
+                    recipients.setdefault(user['id'], user)
+            if not recipients:
+                return
+
+            user_ids = list(recipients.keys())
+            cursor.execute(
+                f"""
+                INSERT INTO comment_mentions
+                (comment_id, mentioned_user_id, mentioned_by_user_id)
+                VALUES {', '.join(['(%s, %s, %s)'] * len(user_ids))}
+                ON CONFLICT DO NOTHING
+                """,
+                [v for uid in user_ids for v in (comment_id, uid, mentioned_by_user_id)],
+            )
+
+            title = 'You were mentioned'
+            message = f"{commenter_name} mentioned you in a comment"
+            create_notifications_bulk(
+                cursor,
+                user_ids,
+                'mentioned',
+                title,
+                message,
+                proposal_id,
+                {'comment_id': comment_id, 'mentioned_by': mentioned_by_user_id},
+            )
+
+        if send_email_flag and recipients:
+            for user in recipients.values():
+                _send_notification_email(
+                    user, title, message, proposal_id,
                     email_subject=f"[ProposalHub] {commenter_name} mentioned you",
                 )
-            
-            conn.commit()
     except Exception as e:
         print(f"⚠️ Failed to process mentions: {e}")
 
@@ -496,7 +698,109 @@ def generate_proposal_pdf(
     signer_title=None,
     signed_date=None,
 ):
-    """Generate PDF from proposal content"""
+    """Generate PDF from proposal content (served from the render cache when unchanged)"""
+    if not PDF_AVAILABLE:
+        raise Exception("ReportLab not installed. PDF generation unavailable.")
+
+    def _render():
+        return _render_proposal_pdf(
+            proposal_id, title, content, client_name, client_email, signer_name, signer_title, signed_date
+        )
+
+    cache = get_pdf_cache()
+    if cache is None:
+        return _render()
+    key = pdf_cache_key(proposal_id, title, content, client_name, client_email, signer_name, signer_title, signed_date)
+    return cache.get_or_render(key, _render)
+
+
+def proposal_pdf_etag(proposal_id, title, content, client_name=None, client_email=None):
+    """ETag of the PDF generate_proposal_pdf would return for these inputs (no rendering)."""
+    return pdf_cache_key(proposal_id, title, content, client_name, client_email)
+
+
+def proposal_pdf_variants(proposal, columns, invited_email=None):
+    """(client_name, client_email) pairs the preview and signing paths render a proposal with.
+
+    `proposal` holds the `client`, `client_name` and `client_email` values and
+    `columns` the proposals columns. The preview and the sender's DocuSign request
+    use the proposal's own client fields, preferring the `client` column. The
+    client portal signing paths prefer `client_name` ('Client' when neither column
+    exists) and use the invited client's email.
+    """
+    preview_col = 'client' if 'client' in columns else ('client_name' if 'client_name' in columns else None)
+    variants = [(proposal.get(preview_col) if preview_col else None, proposal.get('client_email'))]
+    if invited_email:
+        portal_col = 'client_name' if 'client_name' in columns else ('client' if 'client' in columns else None)
+        variants.append((proposal.get(portal_col) if portal_col else 'Client', invited_email))
+    return list(dict.fromkeys(variants))
+
+
+def prewarm_proposal_pdf(proposal_id):
+    """Render a proposal's PDF into the cache in the background (e.g. right after it is sent).
+
+    Warms every variant in proposal_pdf_variants, so both the preview and the
+    client's signing request hit the cache.
+    """
+    if not PDF_AVAILABLE or get_pdf_cache() is None:
+        return None
+
+    def _warm():
+        invited_email = None
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cols = get_table_columns('proposals', cursor)
+            client_expr = 'client' if 'client' in cols else 'NULL::text'
+            client_name_expr = 'client_name' if 'client_name' in cols else 'NULL::text'
+            email_expr = 'client_email' if 'client_email' in cols else 'NULL::text'
+            cursor.execute(
+                f"""
+                SELECT id, title, content, {client_expr} AS client, {client_name_expr} AS client_name,
+                       {email_expr} AS client_email
+                FROM proposals
+                WHERE id = %s
+                """,
+                (proposal_id,),
+            )
+            proposal = cursor.fetchone()
+            inv_cols = get_table_columns('collaboration_invitations', cursor)
+            if proposal and 'invited_email' in inv_cols and 'proposal_id' in inv_cols:
+                order_col = 'id' if 'id' in inv_cols else 'invited_email'
+                cursor.execute(
+                    f"""
+                    SELECT invited_email FROM collaboration_invitations
+                    WHERE proposal_id = %s
+                    ORDER BY {order_col} DESC
+                    LIMIT 1
+                    """,
+                    (proposal_id,),
+                )
+                row = cursor.fetchone()
+                invited_email = row['invited_email'] if row else None
+        if not proposal:
+            return
+        for client_name, client_email in proposal_pdf_variants(proposal, cols, invited_email):
+            generate_proposal_pdf(
+                proposal_id=proposal_id,
+                title=proposal.get('title') or f"Proposal {proposal_id}",
+                content=proposal.get('content', '') or '',
+                client_name=client_name,
+                client_email=client_email,
+            )
+
+    return run_in_background(_warm, name=f"pdf-prewarm-{proposal_id}")
+
+
+def _render_proposal_pdf(
+    proposal_id,
+    title,
+    content,
+    client_name=None,
+    client_email=None,
+    signer_name=None,
+    signer_title=None,
+    signed_date=None,
+):
     if not PDF_AVAILABLE:
         raise Exception("ReportLab not installed. PDF generation unavailable.")
     created_at = datetime.now()
@@ -596,20 +900,6 @@ def generate_proposal_pdf(
             return None
         return None
 
-    def _fetch_cover_bytes(url: str):
-        if not url or not isinstance(url, str):
-            return None
-        url = url.strip()
-        if not (url.startswith('http://') or url.startswith('https://')):
-            return None
-        try:
-            import urllib.request
-
-            with urllib.request.urlopen(url, timeout=10) as resp:
-                return resp.read()
-        except Exception:
-            return None
-
     def _get_meta_dict(structured):
         if not isinstance(structured, dict):
             return {}
@@ -891,12 +1181,12 @@ def generate_proposal_pdf(
     t_parse_ms = (time.perf_counter() - t_parse0) * 1000.0
 
     cover_url = _find_cover_image_url(structured)
-    cover_bytes = _fetch_cover_bytes(cover_url) if cover_url else None
+    cover_bytes = fetch_image_bytes(cover_url, COVER_IMAGE_MAX_PX) if cover_url else None
 
     metadata = _get_meta_dict(structured)
     header_logo_url, footer_logo_url, header_logo_pos, footer_logo_pos = _extract_logo_config(metadata)
-    header_logo_bytes = _fetch_cover_bytes(header_logo_url) if header_logo_url else None
-    footer_logo_bytes = _fetch_cover_bytes(footer_logo_url) if footer_logo_url else None
+    header_logo_bytes = fetch_image_bytes(header_logo_url, LOGO_IMAGE_MAX_PX) if header_logo_url else None
+    footer_logo_bytes = fetch_image_bytes(footer_logo_url, LOGO_IMAGE_MAX_PX) if footer_logo_url else None
 
     buffer = BytesIO()
     doc = SimpleDocTemplate(
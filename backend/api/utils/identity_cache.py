@@ -0,0 +1,199 @@
+"""
+Process-wide cache of resolved user identities (user_id, username, email, role, department).
+
+Every authenticated request used to resolve the caller several times: token_required
+looked the user up (with retries and sleeps), finance_required / admin_required /
+finance_audit_required opened another connection for the role, and handlers such
+as get_proposals queried the role again. Identities are now loaded with a single
+SELECT, kept here for IDENTITY_CACHE_TTL_SECONDS and looked up by email, username,
+Firebase uid or user id.
+
+The cache is bounded (IDENTITY_CACHE_MAX_ENTRIES, least-recently-used evicted) and
+shared by all request threads. Code that changes a user's role or username must
+call `invalidate_identity(...)`; other gunicorn workers pick the change up when
+their entry expires, so keep the TTL short.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+IDENTITY_CACHE_TTL_SECONDS = float(os.getenv('IDENTITY_CACHE_TTL_SECONDS', '120'))
+IDENTITY_CACHE_MAX_ENTRIES = int(os.getenv('IDENTITY_CACHE_MAX_ENTRIES', '5000'))
+
+IDENTITY_COLUMNS = 'id, username, email, role, department'
+
+
+class Identity:
+    __slots__ = ('user_id', 'username', 'email', 'role', 'department')
+
+    def __init__(self, user_id, username: Optional[str], email: Optional[str] = None,
+                 role: Optional[str] = None, department: Optional[str] = None):
+        self.user_id = user_id
+        self.username = username
+        self.email = email
+        self.role = role
+        self.department = department
+
+    @property
+    def role_key(self) -> str:
+        """Role lower-cased and stripped, as the role checks compare it."""
+        return (self.role or '').strip().lower()
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role_key in ('admin', 'ceo')
+
+    @property
+    def is_finance(self) -> bool:
+        return self.role_key.startswith('finance')
+
+    @classmethod
+    def from_row(cls, row) -> 'Identity':
+        if isinstance(row, dict):
+            return cls(row.get('id'), row.get('username'), row.get('email'), row.get('role'), row.get('department'))
+        return cls(row[0], row[1], row[2], row[3], row[4])
+
+    def __repr__(self) -> str:
+        return f"Identity(user_id={self.user_id!r}, username={self.username!r}, role={self.role!r})"
+
+
+def _norm(kind: str, value: Any) -> Tuple[str, str]:
+    text = str(value).strip()
+    if kind == 'email':
+        text = text.lower()
+    return kind, text
+
+
+class IdentityCache:
+    """Bounded TTL cache of identities, indexed by user id plus email/username/uid aliases."""
+
+    def __init__(self, ttl_seconds: float = IDENTITY_CACHE_TTL_SECONDS,
+                 max_entries: int = IDENTITY_CACHE_MAX_ENTRIES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._clock = clock
+        self._lock = threading.Lock()
+        # user_id -> (identity, expires_at, alias keys)
+        self._entries: 'OrderedDict[str, Tuple[Identity, float, Tuple[Tuple[str, str], ...]]]' = OrderedDict()
+        self._aliases: Dict[Tuple[str, str], str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, kind: str, value: Any) -> Optional[Identity]:
+        """Look up by 'email', 'username', 'uid' or 'id'; None when missing or expired."""
+        if value is None or value == '':
+            return None
+        key = _norm(kind, value)
+        with self._lock:
+            entry_id = key[1] if kind == 'id' else self._aliases.get(key)
+            entry = self._entries.get(entry_id) if entry_id is not None else None
+            if entry is None:
+                self.misses += 1
+                return None
+            identity, expires_at, _ = entry
+            if self._clock() >= expires_at:
+                self._drop(entry_id)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            return identity
+
+    def put(self, identity: Identity, uid: Optional[str] = None) -> Identity:
+        entry_id = str(identity.user_id)
+        aliases = []
+        if identity.email:
+            aliases.append(_norm('email', identity.email))
+        if identity.username:
+            aliases.append(_norm('username', identity.username))
+        if uid:
+            aliases.append(_norm('uid', uid))
+        with self._lock:
+            previous = self._entries.get(entry_id)
+            if previous is not None and uid is None:
+                # Keep a uid alias learned from an earlier Firebase request.
+                aliases.extend(a for a in previous[2] if a[0] == 'uid' and a not in aliases)
+            self._drop(entry_id)
+            for alias in aliases:
+                owner = self._aliases.get(alias)
+                if owner is not None and owner != entry_id:
+                    self._drop(owner)
+                self._aliases[alias] = entry_id
+            self._entries[entry_id] = (identity, self._clock() + self.ttl_seconds, tuple(aliases))
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+        return identity
+
+    def invalidate(self, user_id=None, email: Optional[str] = None, username: Optional[str] = None) -> None:
+        with self._lock:
+            if user_id is not None:
+                self._drop(str(user_id))
+            for kind, value in (('email', email), ('username', username)):
+                if value:
+                    owner = self._aliases.get(_norm(kind, value))
+                    if owner is not None:
+                        self._drop(owner)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._aliases.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'ttl_seconds': self.ttl_seconds,
+            }
+
+    def _drop(self, entry_id: str) -> None:
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for alias in entry[2]:
+            if self._aliases.get(alias) == entry_id:
+                del self._aliases[alias]
+
+
+_cache: Optional[IdentityCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_identity_cache() -> IdentityCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = IdentityCache()
+    return _cache
+
+
+def invalidate_identity(user_id=None, email: Optional[str] = None, username: Optional[str] = None) -> None:
+    """Forget a cached identity; call after changing a user's role or username."""
+    get_identity_cache().invalidate(user_id=user_id, email=email, username=username)
+
+
+def load_identity(cursor, email: Optional[str] = None, username: Optional[str] = None,
+                  user_id=None, uid: Optional[str] = None) -> Optional[Identity]:
+    """Load one identity with a single SELECT (by email, username or id) and cache it."""
+    if email:
+        cursor.execute(f'SELECT {IDENTITY_COLUMNS} FROM users WHERE email = %s', (email,))
+    elif username:
+        cursor.execute(f'SELECT {IDENTITY_COLUMNS} FROM users WHERE username = %s', (username,))
+    elif user_id is not None:
+        cursor.execute(f'SELECT {IDENTITY_COLUMNS} FROM users WHERE id = %s', (user_id,))
+    else:
+        return None
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return get_identity_cache().put(Identity.from_row(row), uid=uid)
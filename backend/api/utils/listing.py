@@ -0,0 +1,208 @@
+"""
+Shared keyset pagination and field projection for list endpoints.
+
+Proposal, approval and notification listings returned every row (or up to 500)
+with the full `content`/`sections` JSON, while the dashboard's first screen only
+needs titles, statuses and timestamps. List endpoints now parse their query
+string with `parse_listing_args`:
+
+  - `?limit=N` turns on keyset pagination ordered by (recency, id) descending,
+    where recency is COALESCE(updated_at, created_at) for proposals and
+    created_at for notifications. `?cursor=` continues from a page's
+    `next_cursor`. Keyset pages stay cheap however deep the client scrolls,
+    and rows inserted meanwhile do not shift later pages.
+  - `?fields=a,b` limits the keys returned (`fields=all` for every key). Once
+    a request is paginated, heavy JSON fields are left out unless asked for.
+  - Paged responses carry `page: {limit, next_cursor, has_more, total,
+    total_is_estimate}`. The total is exact when everything fit on the first
+    page, otherwise the planner's row estimate (EXPLAIN), so no COUNT(*) runs.
+
+Requests without `limit`, `cursor` or `fields` get the old unpaged response
+with every field, so existing clients keep working.
+
+Migration 11 (`create_listing_indexes`) adds the matching indexes.
+"""
+import base64
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LIST_DEFAULT_PAGE_SIZE = int(os.getenv('LIST_DEFAULT_PAGE_SIZE', '50'))
+LIST_MAX_PAGE_SIZE = int(os.getenv('LIST_MAX_PAGE_SIZE', '200'))
+
+# Sort expressions; migration 11 indexes exactly these.
+PROPOSAL_RECENCY_SQL = "COALESCE({p}updated_at, {p}created_at, 'epoch')"
+NOTIFICATION_RECENCY_SQL = "COALESCE(created_at, 'epoch')"
+
+SORT_KEY = '_sort_key'
+
+
+class ListingError(ValueError):
+    """Bad pagination or projection arguments (reported as HTTP 400)."""
+
+
+def proposal_recency_sql(alias: str = '') -> str:
+    return PROPOSAL_RECENCY_SQL.format(p=f'{alias}.' if alias else '')
+
+
+def create_listing_indexes(cursor) -> None:
+    """DDL for migration 11: (owner, recency, id) and (recency, id) indexes for keyset pages."""
+    recency = proposal_recency_sql()
+    cursor.execute(
+        f"""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = 'proposals' AND column_name = 'owner_id') THEN
+                CREATE INDEX IF NOT EXISTS idx_proposals_owner_recency
+                ON proposals (owner_id, ({recency}) DESC, id DESC);
+            ELSIF EXISTS (SELECT 1 FROM information_schema.columns
+                          WHERE table_name = 'proposals' AND column_name = 'user_id') THEN
+                CREATE INDEX IF NOT EXISTS idx_proposals_user_recency
+                ON proposals (user_id, ({recency}) DESC, id DESC);
+            END IF;
+            CREATE INDEX IF NOT EXISTS idx_proposals_recency
+            ON proposals (({recency}) DESC, id DESC);
+        EXCEPTION WHEN others THEN
+            RAISE NOTICE 'Skipped proposal listing indexes: %', SQLERRM;
+        END
+        $$
+        """
+    )
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_notifications_user_recency
+        ON notifications (user_id, (COALESCE(created_at, 'epoch')) DESC, id DESC)
+        """
+    )
+
+
+class ListingArgs:
+    """Parsed pagination/projection arguments for one request."""
+
+    __slots__ = ('paginated', 'limit', 'after', 'fields')
+
+    def __init__(self, paginated: bool, limit: Optional[int], after: Optional[Tuple[Any, Any]],
+                 fields: Optional[frozenset]):
+        self.paginated = paginated
+        self.limit = limit
+        self.after = after
+        self.fields = fields
+
+    def wants(self, field: str) -> bool:
+        return self.fields is None or field in self.fields
+
+    def project(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        if self.fields is None:
+            return item
+        return {k: v for k, v in item.items() if k in self.fields}
+
+
+def encode_cursor(sort_value: Any, row_id: Any) -> str:
+    if hasattr(sort_value, 'isoformat'):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], default=str, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str) -> Tuple[Any, Any]:
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError) as exc:
+        raise ListingError('Invalid cursor') from exc
+    if not isinstance(row_id, (int, str)) or (sort_value is not None and not isinstance(sort_value, str)):
+        raise ListingError('Invalid cursor')
+    return sort_value, row_id
+
+
+def parse_listing_args(args, fields: Sequence[str], heavy: Iterable[str] = (),
+                       default_limit: int = LIST_DEFAULT_PAGE_SIZE) -> ListingArgs:
+    """Read `limit`, `cursor` and `fields` from request args.
+
+    `fields` lists every key the endpoint can return; `heavy` are left out of
+    paged responses unless requested. Raises ListingError on bad input.
+    """
+    limit_raw = (args.get('limit') or '').strip()
+    cursor_raw = (args.get('cursor') or '').strip()
+    fields_raw = (args.get('fields') or '').strip()
+    paginated = bool(limit_raw or cursor_raw)
+
+    limit = None
+    if paginated:
+        try:
+            limit = int(limit_raw) if limit_raw else default_limit
+        except ValueError as exc:
+            raise ListingError('limit must be an integer') from exc
+        if limit < 1:
+            raise ListingError('limit must be at least 1')
+        limit = min(limit, LIST_MAX_PAGE_SIZE)
+
+    selected: Optional[frozenset] = None
+    if fields_raw and fields_raw.lower() not in ('all', '*'):
+        requested = {f.strip() for f in fields_raw.split(',') if f.strip()}
+        unknown = requested - set(fields)
+        if unknown:
+            raise ListingError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        selected = frozenset(requested | {'id'})
+    elif paginated and not fields_raw:
+        selected = frozenset(set(fields) - set(heavy))
+
+    return ListingArgs(paginated, limit, decode_cursor(cursor_raw) if cursor_raw else None, selected)
+
+
+def keyset_sql(listing: ListingArgs, sort_expr: str, id_expr: str = 'id') -> Tuple[str, str, List[Any]]:
+    """(condition, ORDER BY/LIMIT tail, params) for a keyset page; condition is '' on the first page.
+
+    The condition is meant to be ANDed into the WHERE clause; params cover the
+    condition and then the LIMIT, in that order.
+    """
+    condition = ''
+    params: List[Any] = []
+    if listing.after is not None:
+        condition = f'({sort_expr}, {id_expr}) < (%s, %s)'
+        params.extend(listing.after)
+    tail = f'ORDER BY {sort_expr} DESC, {id_expr} DESC LIMIT %s'
+    params.append(listing.limit + 1)
+    return condition, tail, params
+
+
+def paginate(listing: ListingArgs, rows: List[Dict[str, Any]], id_key: str = 'id'):
+    """Drop the probe row fetched by LIMIT n+1; returns (rows, has_more, next_cursor).
+
+    Rows must carry the sort value under SORT_KEY.
+    """
+    has_more = len(rows) > listing.limit
+    rows = rows[:listing.limit]
+    next_cursor = encode_cursor(rows[-1].get(SORT_KEY), rows[-1].get(id_key)) if has_more and rows else None
+    return rows, has_more, next_cursor
+
+
+def estimate_rows(cursor, from_where_sql: str, params: Sequence[Any] = ()) -> int:
+    """Planner row estimate for `SELECT 1 <from_where_sql>` (no rows are counted)."""
+    cursor.execute(f'EXPLAIN (FORMAT JSON) SELECT 1 {from_where_sql}', tuple(params))
+    row = cursor.fetchone()
+    plan = row.get('QUERY PLAN') if isinstance(row, dict) else row[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def page_info(cursor, listing: ListingArgs, returned: int, has_more: bool, next_cursor: Optional[str],
+              from_where_sql: str, params: Sequence[Any] = ()) -> Dict[str, Any]:
+    """The `page` object of a paged response. `from_where_sql`/`params` describe the unpaged listing."""
+    if not has_more and listing.after is None:
+        total, estimated = returned, False
+    else:
+        try:
+            total, estimated = estimate_rows(cursor, from_where_sql, params), True
+        except Exception as exc:
+            print(f"[WARN] Could not estimate listing total: {exc}")
+            total, estimated = None, True
+    return {
+        'limit': listing.limit,
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+        'total': total,
+        'total_is_estimate': estimated,
+    }
@@ -0,0 +1,334 @@
+"""
+Versioned schema migrations, applied once at startup.
+
+Several routes used to run their own `_ensure_*_schema(cursor)` helpers on every
+request (client portal endpoints called up to three per page view), repeating
+CREATE TABLE / CREATE INDEX IF NOT EXISTS statements and information_schema
+probes that take catalog locks and cost round-trips. That DDL now lives here
+as numbered migrations:
+
+  - `run_migrations()` takes a session advisory lock on one pooled connection,
+    so gunicorn workers starting together apply migrations one at a time, then
+    applies every version missing from `schema_migrations`. Each migration and
+    its `schema_migrations` row commit in the same transaction.
+  - A migration that fails is rolled back and logged. It is not recorded, so
+    the next startup retries it, and the migrations after it still run.
+  - A migration may name a `backfill` callable: a data fill that runs in
+    batches after the lock is released, only in the process that applied the
+    migration. Backfills must be safe to re-run (see proposal_stages). They
+    also run for the migrations that succeeded when another one failed.
+  - `ensure_migrations()` is the per-process entry point used by app startup.
+    After the first successful run it returns immediately.
+
+To add schema, append a `Migration` with the next version number. Do not
+renumber or edit migrations that have already shipped; write a new one.
+Statements should stay idempotent (IF NOT EXISTS) because databases that
+predate this runner already have some of these objects.
+"""
+import threading
+from collections import namedtuple
+from typing import Iterable, List, Optional, Set
+
+from api.utils.ai_jobs import create_ai_jobs_table
+from api.utils.listing import create_listing_indexes
+from api.utils.proposal_stages import backfill_stage_codes, create_stage_code_objects, reclassify_stage_codes
+from api.utils.risk_gate_cache import create_risk_gate_cache_objects
+from api.utils.version_diff import create_version_diff_objects
+from api.utils.version_store import compact_versions, create_version_store_objects
+
+# Arbitrary constant for pg_advisory_lock so only one worker migrates at a time.
+_MIGRATIONS_LOCK_KEY = 0x5C4E_3A01
+
+
+class MigrationError(RuntimeError):
+    """Some migrations failed; `applied` lists the versions that still went in."""
+
+    def __init__(self, failed: List[int], applied: List[int]):
+        super().__init__(f"Migrations failed: {failed} (applied: {applied})")
+        self.failed = failed
+        self.applied = applied
+
+Migration = namedtuple('Migration', ['version', 'name', 'apply', 'backfill'], defaults=(None,))
+
+
+def _reference_column(table, cursor):
+    """Column definition for a key to `table`.id, typed like that id.
+
+    proposals.id and clients.id are SERIAL in init_pg_schema but UUID in some
+    older databases. Without the table there is nothing to reference.
+    """
+    from api.utils.database import get_id_type, table_exists
+
+    if not table_exists(table, cursor):
+        return 'INTEGER'
+    return f"{get_id_type(table, 'id', cursor).pg_type.upper()} REFERENCES {table}(id) ON DELETE CASCADE"
+
+
+def _client_portal_activity(cursor):
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS proposal_client_activity (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            proposal_id {_reference_column('proposals', cursor)},
+            client_id {_reference_column('clients', cursor)},
+            event_type VARCHAR(50) NOT NULL,
+            metadata JSONB,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_activity_client_created
+        ON proposal_client_activity(client_id, created_at DESC)
+        """
+    )
+
+
+def _client_device_sessions(cursor):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS client_trusted_devices (
+            invitation_token TEXT NOT NULL,
+            device_id TEXT NOT NULL,
+            first_seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            last_seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (invitation_token, device_id)
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS client_device_otp_challenges (
+            id TEXT PRIMARY KEY,
+            invitation_token TEXT NOT NULL,
+            device_id TEXT NOT NULL,
+            challenge_salt TEXT NOT NULL,
+            otp_hash TEXT NOT NULL,
+            mojo_state_id TEXT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            expires_at TIMESTAMPTZ NOT NULL,
+            verified_at TIMESTAMPTZ NULL
+        )
+        """
+    )
+    # Tables created before MojoAuth support lack this column.
+    cursor.execute("ALTER TABLE client_device_otp_challenges ADD COLUMN IF NOT EXISTS mojo_state_id TEXT")
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS client_device_sessions (
+            id TEXT PRIMARY KEY,
+            invitation_token TEXT NOT NULL,
+            device_id TEXT NOT NULL,
+            session_token_hash TEXT NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            last_seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            expires_at TIMESTAMPTZ NOT NULL,
+            revoked_at TIMESTAMPTZ NULL
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS client_device_sessions_invitation_device_idx
+        ON client_device_sessions(invitation_token, device_id)
+        """
+    )
+
+
+def _client_identity_access(cursor):
+    cursor.execute("ALTER TABLE proposals ADD COLUMN IF NOT EXISTS identity_last4_hash TEXT")
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS client_identity_access (
+            invitation_token TEXT PRIMARY KEY,
+            proposal_id INTEGER,
+            attempts INTEGER DEFAULT 0,
+            locked_at TIMESTAMP NULL,
+            verified_at TIMESTAMP NULL,
+            last_attempt_at TIMESTAMP NULL,
+            unlocked_token TEXT NULL,
+            unlocked_expires_at TIMESTAMP NULL
+        )
+        """
+    )
+
+
+def _invitation_email_tracking(cursor):
+    cursor.execute(
+        """
+        ALTER TABLE collaboration_invitations
+        ADD COLUMN IF NOT EXISTS last_email_sent_at TIMESTAMPTZ,
+        ADD COLUMN IF NOT EXISTS last_email_status TEXT,
+        ADD COLUMN IF NOT EXISTS last_email_error TEXT,
+        ADD COLUMN IF NOT EXISTS last_email_attempts INTEGER DEFAULT 0
+        """
+    )
+
+
+def _finance_alert_events(cursor):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS finance_alert_events (
+            id SERIAL PRIMARY KEY,
+            alert_type TEXT NOT NULL,
+            proposal_id INTEGER NOT NULL,
+            severity TEXT,
+            details JSONB,
+            proposal_title TEXT,
+            client_name TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT (timezone('utc', now())),
+            resolved_at TIMESTAMPTZ NULL
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_finance_alert_events_open_unique
+        ON finance_alert_events (alert_type, proposal_id)
+        WHERE resolved_at IS NULL
+        """
+    )
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_finance_alert_events_created
+        ON finance_alert_events (created_at DESC)
+        """
+    )
+
+
+MIGRATIONS = [
+    Migration(1, 'client_portal_activity', _client_portal_activity),
+    Migration(2, 'client_device_sessions', _client_device_sessions),
+    Migration(3, 'client_identity_access', _client_identity_access),
+    Migration(4, 'invitation_email_tracking', _invitation_email_tracking),
+    Migration(5, 'finance_alert_events', _finance_alert_events),
+    Migration(6, 'proposal_stage_code', create_stage_code_objects, backfill_stage_codes),
+    Migration(7, 'ai_jobs', create_ai_jobs_table),
+    Migration(8, 'risk_gate_result_cache', create_risk_gate_cache_objects),
+    Migration(9, 'proposal_version_deltas', create_version_store_objects, compact_versions),
+    Migration(10, 'proposal_version_diffs', create_version_diff_objects),
+    Migration(11, 'listing_indexes', create_listing_indexes),
+    Migration(12, 'proposal_stage_code_rules', create_stage_code_objects, reclassify_stage_codes),
+]
+
+
+def _validate(migrations: Iterable[Migration]) -> List[Migration]:
+    ordered = sorted(migrations, key=lambda m: m.version)
+    versions = [m.version for m in ordered]
+    if len(set(versions)) != len(versions):
+        raise ValueError(f"Duplicate migration versions: {versions}")
+    return ordered
+
+
+def applied_versions(cursor) -> Set[int]:
+    cursor.execute('SELECT version FROM schema_migrations')
+    return {int(r['version'] if isinstance(r, dict) else r[0]) for r in cursor.fetchall() or []}
+
+
+def apply_pending(conn, migrations: Iterable[Migration] = MIGRATIONS) -> List[int]:
+    """Apply migrations missing from schema_migrations on `conn`; returns the versions applied.
+
+    The caller must hold the migrations advisory lock (see `run_migrations`).
+    Raises MigrationError naming the failed versions after trying all of them.
+    """
+    ordered = _validate(migrations)
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """
+    )
+    conn.commit()
+
+    done = applied_versions(cursor)
+    conn.commit()
+
+    applied: List[int] = []
+    failed: List[int] = []
+    for migration in ordered:
+        if migration.version in done:
+            continue
+        try:
+            migration.apply(cursor)
+            cursor.execute(
+                'INSERT INTO schema_migrations (version, name) VALUES (%s, %s)',
+                (migration.version, migration.name),
+            )
+            conn.commit()
+            applied.append(migration.version)
+            print(f"[OK] Applied migration {migration.version:04d}_{migration.name}")
+        except Exception as exc:
+            conn.rollback()
+            failed.append(migration.version)
+            print(f"[ERROR] Migration {migration.version:04d}_{migration.name} failed: {exc}")
+
+    if failed:
+        raise MigrationError(failed, applied)
+    return applied
+
+
+def run_migrations(migrations: Iterable[Migration] = MIGRATIONS) -> List[int]:
+    """Apply pending migrations under a Postgres advisory lock; returns the versions applied."""
+    from api.utils.database import get_db_connection, invalidate_schema_catalog
+
+    migrations = list(migrations)
+    applied: List[int] = []
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            # Session-level lock: it survives the per-migration commits below.
+            cursor.execute('SELECT pg_advisory_lock(%s)', (_MIGRATIONS_LOCK_KEY,))
+            try:
+                applied = apply_pending(conn, migrations)
+            except MigrationError as exc:
+                applied = exc.applied
+                raise
+            finally:
+                try:
+                    conn.rollback()
+                    cursor.execute('SELECT pg_advisory_unlock(%s)', (_MIGRATIONS_LOCK_KEY,))
+                    conn.commit()
+                except Exception as exc:
+                    print(f"[WARN] Could not release migrations lock: {exc}")
+    finally:
+        # Migrations that went in get their backfills even when a later one failed;
+        # they are recorded, so no later startup would run them.
+        if applied:
+            invalidate_schema_catalog()
+        run_backfills(migrations, applied)
+    return applied
+
+
+def run_backfills(migrations: Iterable[Migration], versions: Iterable[int]) -> None:
+    """Run the backfill of each migration in `versions`; failures are logged, not raised."""
+    wanted = set(versions)
+    for migration in _validate(migrations):
+        if migration.version not in wanted or migration.backfill is None:
+            continue
+        try:
+            migration.backfill()
+        except Exception as exc:
+            print(f"[WARN] Backfill for migration {migration.version:04d}_{migration.name} failed: {exc}")
+
+
+_migrated = False
+_migrate_lock = threading.Lock()
+
+
+def ensure_migrations() -> Optional[List[int]]:
+    """Run migrations once per process; later calls return None without touching the database."""
+    global _migrated
+    if _migrated:
+        return None
+    with _migrate_lock:
+        if _migrated:
+            return None
+        applied = run_migrations()
+        _migrated = True
+        return applied
@@ -0,0 +1,145 @@
+"""
+Content-addressed cache for rendered proposal PDFs.
+
+`generate_proposal_pdf` is expensive (content JSON parsing, cover/logo downloads
+and a full ReportLab layout), while previews, DocuSign sends and client exports
+ask for the same bytes over and over. Renders are cached on local disk under a
+key derived from everything that affects the output:
+
+    sha256(renderer version, proposal id, title, content, client, signer fields)
+
+so an edit produces a new key and stale entries simply age out. The same key is
+used as the HTTP ETag, which lets preview endpoints answer If-None-Match with a
+304 without touching the renderer or the disk.
+
+The directory is bounded by PDF_CACHE_MAX_BYTES / PDF_CACHE_MAX_ENTRIES and
+evicts least-recently-used files (access time is tracked through the file mtime,
+so gunicorn workers sharing the directory see each other's hits). Concurrent
+requests for the same key share one render.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from api.utils.disk_cache import DiskLRUCache
+
+# Bump when the PDF layout changes so previously cached renders are not served.
+PDF_RENDERER_VERSION = '1'
+
+PDF_CACHE_ENABLED = (os.getenv('PDF_CACHE_ENABLED', 'true').strip().lower() not in ('0', 'false', 'no'))
+PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'lukens_pdf_cache')
+PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+PDF_CACHE_MAX_ENTRIES = int(os.getenv('PDF_CACHE_MAX_ENTRIES', '2000'))
+
+
+def _hash_part(digest, value: Any) -> None:
+    if value is None:
+        data = b'\x01'
+    elif isinstance(value, bytes):
+        data = value
+    elif isinstance(value, str):
+        data = value.encode('utf-8', 'surrogatepass')
+    elif isinstance(value, (dict, list, tuple)):
+        data = json.dumps(value, sort_keys=True, default=str, separators=(',', ':')).encode('utf-8')
+    elif hasattr(value, 'isoformat'):
+        data = value.isoformat().encode('utf-8')
+    else:
+        data = str(value).encode('utf-8')
+    # Length-prefix each field so ("ab", "c") and ("a", "bc") hash differently.
+    digest.update(str(len(data)).encode('ascii'))
+    digest.update(b':')
+    digest.update(data)
+
+
+def pdf_cache_key(
+    proposal_id,
+    title,
+    content,
+    client_name=None,
+    client_email=None,
+    signer_name=None,
+    signer_title=None,
+    signed_date=None,
+) -> str:
+    """Stable key (and ETag) for one render of a proposal PDF."""
+    digest = hashlib.sha256()
+    for part in (
+        PDF_RENDERER_VERSION,
+        proposal_id,
+        title,
+        content,
+        client_name,
+        client_email,
+        signer_name,
+        signer_title,
+        signed_date,
+    ):
+        _hash_part(digest, part)
+    return digest.hexdigest()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True when an If-None-Match header value matches `etag`."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+    return False
+
+
+class PdfRenderCache(DiskLRUCache):
+    """LRU of rendered PDFs stored as `<key>.pdf` files."""
+
+    SUFFIX = '.pdf'
+
+    def __init__(self, directory: str, max_bytes: int = PDF_CACHE_MAX_BYTES, max_entries: int = PDF_CACHE_MAX_ENTRIES):
+        super().__init__(directory, max_bytes, max_entries)
+
+    def get_or_render(self, key: str, render: Callable[[], bytes]) -> bytes:
+        """Return cached bytes for `key`, rendering (once across threads) on a miss."""
+        return self.get_or_create(
+            key,
+            render,
+            accept=lambda data: isinstance(data, (bytes, bytearray)) and bytes(data[:4]) == b'%PDF',
+        )
+
+
+_cache: Optional[PdfRenderCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_pdf_cache() -> Optional[PdfRenderCache]:
+    """Process-wide cache instance, or None when PDF_CACHE_ENABLED is off."""
+    global _cache
+    if not PDF_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PdfRenderCache(PDF_CACHE_DIR)
+    return _cache
+
+
+def run_in_background(fn: Callable[[], Any], name: str = 'pdf-prewarm') -> threading.Thread:
+    """Fire-and-forget helper used to pre-warm renders off the request thread."""
+    def _runner():
+        started = time.perf_counter()
+        try:
+            fn()
+            print(f"[PDF_CACHE] {name} done ms={(time.perf_counter() - started) * 1000:.0f}")
+        except Exception as exc:
+            print(f"[WARN] {name} failed: {exc}")
+
+    thread = threading.Thread(target=_runner, name=name, daemon=True)
+    thread.start()
+    return thread
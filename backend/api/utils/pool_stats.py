@@ -0,0 +1,61 @@
+"""
+Checkout counters for the API connection pool (api/utils/db_pool.py).
+
+The psycopg2 shim pool (psycopg2/pool.py) keeps its own copy so that it imports
+without the application package. The checkout rate is kept as one counter per
+second over the last RATE_WINDOW_SECONDS, so memory stays bounded however busy
+the pool is and whether or not anyone reads `stats()`.
+
+Not thread-safe on its own: the pools update it under their own lock.
+"""
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+class PoolStats:
+    RATE_WINDOW_SECONDS = 60.0
+
+    def __init__(self, window: Optional[float] = None):
+        self.window = self.RATE_WINDOW_SECONDS if window is None else window
+        self.started_at = time.monotonic()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.recycled = 0
+        # [second, checkouts in that second], oldest first
+        self._per_second: Deque[List[int]] = deque()
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.window
+        while self._per_second and self._per_second[0][0] + 1 <= cutoff:
+            self._per_second.popleft()
+
+    def record_checkout(self, now: float, waited: float) -> None:
+        self.checkouts += 1
+        self.wait_total += waited
+        if waited > self.wait_max:
+            self.wait_max = waited
+        second = int(now)
+        if self._per_second and self._per_second[-1][0] == second:
+            self._per_second[-1][1] += 1
+        else:
+            self._per_second.append([second, 1])
+            self._prune(now)
+
+    def checkouts_per_sec(self, now: float) -> float:
+        self._prune(now)
+        window = min(self.window, max(now - self.started_at, 1e-6))
+        return sum(count for _, count in self._per_second) / window
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, Any]:
+        now = time.monotonic() if now is None else now
+        return {
+            'checkouts_total': self.checkouts,
+            'checkouts_per_sec': round(self.checkouts_per_sec(now), 3),
+            'wait_ms_avg': round((self.wait_total / self.checkouts) * 1000.0, 3) if self.checkouts else 0.0,
+            'wait_ms_max': round(self.wait_max * 1000.0, 3),
+            'timeouts': self.timeouts,
+            'recycled': self.recycled,
+        }
@@ -0,0 +1,343 @@
+"""
+Materialized per-proposal financial projection (`proposal_financials`).
+
+Finance analytics and exports used to select every proposal's full `content` /
+`sections` JSON and walk the pricing tables on every request. The projection
+stores the derived figures (amount, VAT, discount lines, currency, stage) and is
+refreshed on write, so readers only need a narrow indexed SELECT.
+
+Refresh points:
+  - create_proposal / update_proposal / update_proposal_status (api/routes/proposals.py)
+  - log_status_change (api/utils/helpers.py) for other status transitions
+  - every raw `UPDATE proposals SET status` in the route modules and app.py,
+    via refresh_proposal_financials_safe before the transaction commits
+  - backfill_proposal_financials() / backend/backfill_proposal_financials.py
+"""
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import psycopg2.extras
+
+from api.utils.database import get_db_connection, get_table_columns, pick_column
+from api.utils.finance_engine import invalidate_finance_snapshots
+from api.utils.finance_audit import _iter_discount_values
+from api.utils.proposal_stages import finance_stage, stage_code_for_status
+
+
+DEFAULT_CURRENCY = os.getenv('DEFAULT_CURRENCY', 'ZAR')
+
+# Proposal columns that may carry an explicit deal value, in priority order.
+AMOUNT_COLUMN_CANDIDATES = ['budget', 'amount', 'total_amount', 'value', 'total', 'price']
+
+
+def _parse_num(v: Any) -> float:
+    if v is None:
+        return 0.0
+    if isinstance(v, (int, float)):
+        return float(v)
+    cleaned = str(v).replace(',', '').replace('R', '').replace('$', '').strip()
+    try:
+        return float(cleaned)
+    except Exception:
+        return 0.0
+
+
+def _parse_amount_field(v: Any) -> Optional[float]:
+    if v is None:
+        return None
+    if isinstance(v, (int, float)):
+        return float(v) if v > 0 else None
+    cleaned = ''.join(ch for ch in str(v) if (ch.isdigit() or ch in '.-'))
+    try:
+        num = float(cleaned)
+    except Exception:
+        return None
+    return num if num > 0 else None
+
+
+def _safe_json_load(value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        return value
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except Exception:
+            return None
+    return None
+
+
+def _find_header_index(headers, needles):
+    if not isinstance(headers, list):
+        return None
+    for i, header in enumerate(headers):
+        try:
+            h = str(header).lower().strip()
+        except Exception:
+            continue
+        for n in needles:
+            if h == n or n in h:
+                return i
+    return None
+
+
+def _table_subtotal_from_cells(cells) -> float:
+    if not isinstance(cells, list) or not cells:
+        return 0.0
+    header_row = cells[0] if isinstance(cells[0], list) else None
+    if not isinstance(header_row, list):
+        return 0.0
+
+    total_col = _find_header_index(header_row, ['total', 'amount', 'line total'])
+    qty_col = _find_header_index(header_row, ['quantity', 'qty'])
+    unit_col = _find_header_index(header_row, ['unit price', 'price'])
+
+    subtotal = 0.0
+    for row in cells[1:]:
+        if not isinstance(row, list):
+            continue
+        row_total = 0.0
+        if total_col is not None and 0 <= total_col < len(row):
+            row_total = _parse_num(row[total_col])
+        if row_total == 0.0:
+            qty = _parse_num(row[qty_col]) if qty_col is not None and 0 <= qty_col < len(row) else 0.0
+            unit = _parse_num(row[unit_col]) if unit_col is not None and 0 <= unit_col < len(row) else 0.0
+            row_total = qty * unit
+        subtotal += float(row_total)
+    return float(subtotal)
+
+
+def _iter_price_tables(content_data: Any) -> Iterable[Dict[str, Any]]:
+    """Yield every `type == 'price'` table in a proposal content/sections document."""
+    sections_list = None
+    if isinstance(content_data, dict) and isinstance(content_data.get('sections'), list):
+        sections_list = content_data.get('sections')
+    elif isinstance(content_data, list):
+        sections_list = content_data
+    if not isinstance(sections_list, list):
+        return
+
+    def _tables_from(container):
+        if not isinstance(container, dict):
+            return
+        tables = container.get('tables')
+        if isinstance(tables, list):
+            for t in tables:
+                yield t
+        positioned = container.get('positionedPricingTables')
+        if isinstance(positioned, list):
+            for p in positioned:
+                if isinstance(p, dict) and isinstance(p.get('table'), dict):
+                    yield p.get('table')
+
+    for section in sections_list:
+        if not isinstance(section, dict):
+            continue
+        candidates = list(_tables_from(section))
+        body = section.get('body') or section.get('content')
+        if isinstance(body, dict):
+            candidates.extend(_tables_from(body))
+        for t in candidates:
+            if isinstance(t, dict) and str(t.get('type') or '').lower().strip() == 'price':
+                yield t
+
+
+def pricing_breakdown(content_data: Any) -> Dict[str, Any]:
+    """Return {subtotal, vat, currency} summed over all price tables."""
+    subtotal = 0.0
+    vat = 0.0
+    currency = None
+    for t in _iter_price_tables(content_data):
+        table_subtotal = _table_subtotal_from_cells(t.get('cells'))
+        vat_rate = _parse_num(t.get('vatRate'))
+        subtotal += table_subtotal
+        vat += table_subtotal * vat_rate if vat_rate > 0 else 0.0
+        if currency is None and t.get('currency'):
+            currency = str(t.get('currency')).strip().upper()[:8] or None
+    return {'subtotal': float(subtotal), 'vat': float(vat), 'currency': currency}
+
+
+def extract_amount_from_content(content_data: Any) -> float:
+    """Extract the deal amount from proposal content (direct fields, then price tables incl. VAT)."""
+    if not content_data:
+        return 0.0
+
+    if isinstance(content_data, dict):
+        for key in ['budget', 'amount', 'total', 'value', 'price']:
+            if key in content_data:
+                amount = _parse_num(content_data[key])
+                if amount > 0:
+                    return float(amount)
+
+    breakdown = pricing_breakdown(content_data)
+    return float(breakdown['subtotal'] + breakdown['vat'])
+
+
+def finance_stage_for_status(status: Any) -> str:
+    """Map a free-form proposal status to a finance dashboard stage."""
+    return finance_stage(stage_code_for_status(status))
+
+
+def compute_financials(
+    content: Any,
+    sections: Any = None,
+    amount_field: Any = None,
+    status: Any = None,
+) -> Dict[str, Any]:
+    """Derive the projection row for a proposal from its raw columns.
+
+    Amount priority matches the finance dashboard: an explicit amount column wins,
+    then the content JSON, then the `sections` column.
+    """
+    content_obj = _safe_json_load(content)
+    sections_obj = _safe_json_load(sections)
+
+    breakdown = pricing_breakdown(content_obj)
+    if breakdown['subtotal'] <= 0 and sections_obj is not None:
+        breakdown = pricing_breakdown(sections_obj)
+
+    explicit = _parse_amount_field(amount_field)
+    if explicit is not None:
+        amount = explicit
+    else:
+        amount = extract_amount_from_content(content_obj)
+        if amount <= 0 and sections_obj is not None:
+            amount = extract_amount_from_content(sections_obj)
+
+    currency = breakdown['currency']
+    if not currency and isinstance(content_obj, dict) and content_obj.get('currency'):
+        currency = str(content_obj.get('currency')).strip().upper()[:8]
+
+    discount_lines = [
+        {'path': path, 'value': value}
+        for path, value in _iter_discount_values(content_obj if content_obj is not None else sections_obj)
+    ]
+
+    return {
+        'amount': round(float(amount or 0.0), 2),
+        'subtotal': round(float(breakdown['subtotal']), 2),
+        'vat_amount': round(float(breakdown['vat']), 2),
+        'discount_lines': discount_lines,
+        'max_discount': max([d['value'] for d in discount_lines], default=0.0),
+        'currency': currency or DEFAULT_CURRENCY,
+        'stage': finance_stage_for_status(status),
+    }
+
+
+_UPSERT_SQL = """
+    INSERT INTO proposal_financials (
+        proposal_id, amount, subtotal, vat_amount, discount_lines, max_discount,
+        currency, stage, computed_at
+    ) VALUES (%s, %s, %s, %s, %s::jsonb, %s, %s, %s, CURRENT_TIMESTAMP)
+    ON CONFLICT (proposal_id) DO UPDATE SET
+        amount = EXCLUDED.amount,
+        subtotal = EXCLUDED.subtotal,
+        vat_amount = EXCLUDED.vat_amount,
+        discount_lines = EXCLUDED.discount_lines,
+        max_discount = EXCLUDED.max_discount,
+        currency = EXCLUDED.currency,
+        stage = EXCLUDED.stage,
+        computed_at = CURRENT_TIMESTAMP
+"""
+
+
+def _source_select_sql(cursor) -> str:
+    cols = get_table_columns('proposals', cursor)
+    amount_col = pick_column('proposals', AMOUNT_COLUMN_CANDIDATES, cursor)
+    content_expr = 'content' if 'content' in cols else 'NULL::text'
+    sections_expr = 'sections' if 'sections' in cols else 'NULL::text'
+    amount_expr = f"{amount_col}::text" if amount_col else 'NULL::text'
+    return f"""
+        SELECT id, status, {content_expr} AS content, {sections_expr} AS sections,
+               {amount_expr} AS amount_field
+        FROM proposals
+    """
+
+
+def _upsert_rows(cursor, rows: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    computed: Dict[int, Dict[str, Any]] = {}
+    params: List[Tuple[Any, ...]] = []
+    for r in rows:
+        fin = compute_financials(r.get('content'), r.get('sections'), r.get('amount_field'), r.get('status'))
+        pid = int(r['id'])
+        computed[pid] = fin
+        params.append((
+            pid,
+            fin['amount'],
+            fin['subtotal'],
+            fin['vat_amount'],
+            json.dumps(fin['discount_lines']),
+            fin['max_discount'],
+            fin['currency'],
+            fin['stage'],
+        ))
+    if params:
+        cursor.executemany(_UPSERT_SQL, params)
+    return computed
+
+
+def refresh_proposal_financials(cursor, proposal_ids) -> Dict[int, Dict[str, Any]]:
+    """Recompute and upsert projection rows inside the caller's transaction.
+
+    Accepts a single id or an iterable of ids. The caller commits.
+    """
+    if isinstance(proposal_ids, (int, str)):
+        proposal_ids = [proposal_ids]
+    ids = [int(pid) for pid in proposal_ids if pid is not None]
+    if not ids:
+        return {}
+
+    dict_cursor = cursor.connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    dict_cursor.execute(_source_select_sql(dict_cursor) + " WHERE id = ANY(%s)", (ids,))
+    computed = _upsert_rows(dict_cursor, dict_cursor.fetchall() or [])
+    invalidate_finance_snapshots()
+    return computed
+
+
+def refresh_proposal_financials_safe(cursor, proposal_ids) -> None:
+    """Best-effort refresh that never aborts the caller's transaction."""
+    try:
+        cursor.execute("SAVEPOINT proposal_financials_refresh")
+        try:
+            refresh_proposal_financials(cursor, proposal_ids)
+            cursor.execute("RELEASE SAVEPOINT proposal_financials_refresh")
+        except Exception:
+            cursor.execute("ROLLBACK TO SAVEPOINT proposal_financials_refresh")
+            cursor.execute("RELEASE SAVEPOINT proposal_financials_refresh")
+            raise
+    except Exception as e:
+        print(f"[FINANCIALS] Failed to refresh proposal_financials for {proposal_ids}: {e}")
+
+
+def backfill_proposal_financials(batch_size: int = 200, only_missing: bool = False) -> int:
+    """(Re)build the projection for every proposal in id-ordered batches.
+
+    Returns the number of rows written.
+    """
+    written = 0
+    last_id = 0
+    with get_db_connection() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        base_sql = _source_select_sql(cursor)
+        missing_sql = (
+            " AND NOT EXISTS (SELECT 1 FROM proposal_financials pf WHERE pf.proposal_id = proposals.id)"
+            if only_missing
+            else ""
+        )
+        while True:
+            cursor.execute(
+                base_sql + " WHERE id > %s" + missing_sql + " ORDER BY id LIMIT %s",
+                (last_id, batch_size),
+            )
+            rows = cursor.fetchall() or []
+            if not rows:
+                break
+            _upsert_rows(cursor, rows)
+            conn.commit()
+            invalidate_finance_snapshots()
+            written += len(rows)
+            last_id = int(rows[-1]['id'])
+            print(f"[FINANCIALS] Backfilled {written} proposals (last id {last_id})")
+    return written
@@ -0,0 +1,279 @@
+"""
+Canonical proposal stage codes (`proposals.stage_code`).
+
+Proposal status is free-form text ("Sent to Client", "Client Signed",
+"Pending CEO Approval", ...). The client portal, the pipeline report and finance
+analytics each classified it separately, in SQL with chains of
+`LOWER(COALESCE(p.status,'')) LIKE '%...%'`, which no index can serve. Each status
+is now classified once, on write, into a small-int `stage_code`:
+
+  - `STAGE_RULES` is the single ordered mapping (first match wins). Python uses
+    it through `stage_code_for_status()`, and migration 6
+    (api/utils/migrations.py) compiles it into the SQL function
+    `proposal_stage_code(text)` with `stage_code_case_sql()`.
+  - A BEFORE INSERT / UPDATE OF status trigger on `proposals` keeps `stage_code`
+    in step with every status write, including the raw UPDATEs in app.py.
+  - Existing rows are filled by `backfill_stage_codes()` (run once after the
+    migration, and by backend/backfill_proposal_stage_codes.py).
+  - Each view (finance, pipeline, client portal) maps codes to its own labels
+    below. Dashboard filters become `p.stage_code IN (...)`, which is served by
+    idx_proposals_stage_code_updated / idx_proposals_owner_stage_code.
+
+Changing STAGE_RULES needs a new migration that re-creates
+`proposal_stage_code` and re-runs the backfill over every row
+(`reclassify_stage_codes()`, as migration 12 does).
+"""
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+STAGE_OTHER = 0
+STAGE_DRAFT = 1
+STAGE_IN_REVIEW = 2
+STAGE_APPROVED = 3
+STAGE_CHANGES_REQUESTED = 4
+STAGE_RELEASED = 5
+STAGE_SENT_FOR_SIGNATURE = 6
+STAGE_SENT = 7
+STAGE_VIEWED = 8
+STAGE_NEGOTIATION = 9
+STAGE_SIGNED = 10
+STAGE_DECLINED = 11
+STAGE_ARCHIVED = 12
+STAGE_CLIENT_CHANGES_REQUESTED = 13
+STAGE_REJECTED = 14
+STAGE_SUBMITTED = 15
+STAGE_PENDING = 16
+STAGE_WON = 17
+
+# Ordered (code, LIKE fragments) on the lower-cased, trimmed status; '%' inside a
+# fragment matches any run of characters. An empty status is a draft.
+# 'review' must precede 'view', and declined/changes-requested must precede
+# signed/sent so that e.g. "Signature Declined" is not read as sent. "Changes
+# Requested" is the internal approver state; "request ... change" wording comes
+# from the client side and is the only one shown in the client portal.
+# Rejected, submitted, pending (other than CEO approval) and won keep codes of
+# their own because the views label them differently from declined, in-review
+# and signed proposals.
+STAGE_RULES: Tuple[Tuple[int, Tuple[str, ...]], ...] = (
+    (STAGE_DRAFT, ('draft',)),
+    (STAGE_CLIENT_CHANGES_REQUESTED, ('request%change',)),
+    (STAGE_CHANGES_REQUESTED, ('change%request',)),
+    (STAGE_DECLINED, ('declin',)),
+    (STAGE_REJECTED, ('reject',)),
+    (STAGE_SIGNED, ('signed',)),
+    (STAGE_WON, ('won',)),
+    (STAGE_ARCHIVED, ('archiv', 'cancel', 'lost')),
+    (STAGE_NEGOTIATION, ('negotiat',)),
+    (STAGE_SENT_FOR_SIGNATURE, ('sent for signature',)),
+    (STAGE_RELEASED, ('sent to client', 'released')),
+    (STAGE_IN_REVIEW, ('review', 'pending%ceo', 'ceo%pending')),
+    (STAGE_APPROVED, ('approved',)),
+    (STAGE_PENDING, ('pending',)),
+    (STAGE_SUBMITTED, ('submitted',)),
+    (STAGE_VIEWED, ('view', 'opened')),
+    (STAGE_SENT, ('sent',)),
+)
+
+# Finance analytics labels (proposal_financials.stage and the finance dashboard).
+FINANCE_STAGES = {
+    STAGE_OTHER: 'Other',
+    STAGE_DRAFT: 'Draft',
+    STAGE_IN_REVIEW: 'In Review',
+    STAGE_APPROVED: 'In Review',
+    STAGE_CHANGES_REQUESTED: 'Other',
+    STAGE_RELEASED: 'Sent',
+    STAGE_SENT_FOR_SIGNATURE: 'Sent',
+    STAGE_SENT: 'Sent',
+    STAGE_VIEWED: 'Viewed',
+    STAGE_NEGOTIATION: 'Negotiation',
+    STAGE_SIGNED: 'Signed',
+    STAGE_WON: 'Signed',
+    STAGE_DECLINED: 'Archived',
+    STAGE_ARCHIVED: 'Archived',
+    STAGE_CLIENT_CHANGES_REQUESTED: 'Other',
+    STAGE_REJECTED: 'Other',
+    STAGE_SUBMITTED: 'Other',
+    STAGE_PENDING: 'In Review',
+}
+
+# /analytics/proposal-pipeline columns; codes not listed are left off the board.
+PIPELINE_STAGES = {
+    STAGE_DRAFT: 'Draft',
+    STAGE_IN_REVIEW: 'In Review',
+    STAGE_APPROVED: 'In Review',
+    STAGE_RELEASED: 'Released',
+    STAGE_SIGNED: 'Signed',
+    STAGE_WON: 'Signed',
+    STAGE_DECLINED: 'Archived',
+    STAGE_ARCHIVED: 'Archived',
+}
+
+# Client dashboard KPI groups; every other code counts as 'active'.
+CLIENT_GROUPS = {
+    STAGE_CHANGES_REQUESTED: 'requested_changes',
+    STAGE_CLIENT_CHANGES_REQUESTED: 'requested_changes',
+    STAGE_DECLINED: 'rejected',
+    STAGE_REJECTED: 'rejected',
+    STAGE_SIGNED: 'signed',
+    STAGE_APPROVED: 'signed',
+}
+
+# Proposals listed in the client portal (released to the client or signed).
+CLIENT_PORTAL_CODES = (STAGE_RELEASED, STAGE_SENT_FOR_SIGNATURE, STAGE_SIGNED)
+# The client dashboard also keeps proposals the client declined or sent back.
+CLIENT_DASHBOARD_CODES = CLIENT_PORTAL_CODES + (STAGE_DECLINED, STAGE_REJECTED, STAGE_CLIENT_CHANGES_REQUESTED)
+
+
+def _matches(text: str, fragment: str) -> bool:
+    pos = 0
+    for part in fragment.split('%'):
+        found = text.find(part, pos)
+        if found < 0:
+            return False
+        pos = found + len(part)
+    return True
+
+
+def stage_code_for_status(status: Any) -> int:
+    s = str(status or '').strip().lower()
+    if not s:
+        return STAGE_DRAFT
+    for code, fragments in STAGE_RULES:
+        if any(_matches(s, f) for f in fragments):
+            return code
+    return STAGE_OTHER
+
+
+def finance_stage(code: Optional[int]) -> str:
+    return FINANCE_STAGES.get(code, 'Other')
+
+
+def pipeline_stage(code: Optional[int]) -> Optional[str]:
+    return PIPELINE_STAGES.get(code)
+
+
+def client_group(code: Optional[int]) -> str:
+    return CLIENT_GROUPS.get(code, 'active')
+
+
+def codes_for(labels: Dict[int, str], wanted: Iterable[str]) -> Tuple[int, ...]:
+    """Codes whose label in `labels` is one of `wanted` (case-insensitive)."""
+    wanted_keys = {str(w).strip().lower() for w in wanted}
+    return tuple(sorted(code for code, label in labels.items() if label.lower() in wanted_keys))
+
+
+def stage_code_case_sql(status_expr: str = 'status', for_params: bool = False) -> str:
+    """SQL CASE equivalent of stage_code_for_status() over `status_expr`.
+
+    With `for_params=True`, '%' is doubled for queries executed with parameters.
+    """
+    pct = '%%' if for_params else '%'
+    s = f"LOWER(BTRIM(COALESCE({status_expr}, '')))"
+    whens = [f"WHEN {s} = '' THEN {STAGE_DRAFT}"]
+    for code, fragments in STAGE_RULES:
+        likes = ' OR '.join(f"{s} LIKE '{pct}{f.replace('%', pct)}{pct}'" for f in fragments)
+        whens.append(f"WHEN {likes} THEN {code}")
+    return 'CASE ' + ' '.join(whens) + f' ELSE {STAGE_OTHER} END'
+
+
+def stage_code_in_sql(codes: Iterable[int], has_column: bool = True, alias: str = 'p') -> str:
+    """Predicate for proposals (aliased `alias`) whose stage is one of `codes`.
+
+    Uses the indexed `stage_code` column; without it (migration not applied yet)
+    falls back to classifying `status` inline. Codes are inlined as integer
+    literals so callers' parameter lists are unaffected.
+    """
+    code_list = ', '.join(str(int(c)) for c in sorted(set(codes))) or 'NULL'
+    if has_column:
+        return f"{alias}.stage_code IN ({code_list})"
+    return f"({stage_code_case_sql(f'{alias}.status', for_params=True)}) IN ({code_list})"
+
+
+def create_stage_code_objects(cursor) -> None:
+    """DDL for migration 6: column, classifier function, trigger and indexes."""
+    cursor.execute("ALTER TABLE proposals ADD COLUMN IF NOT EXISTS stage_code SMALLINT")
+    cursor.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION proposal_stage_code(status TEXT) RETURNS SMALLINT
+        LANGUAGE sql IMMUTABLE AS $fn$
+            SELECT ({stage_code_case_sql('status')})::smallint
+        $fn$
+        """
+    )
+    cursor.execute(
+        """
+        CREATE OR REPLACE FUNCTION proposals_set_stage_code() RETURNS TRIGGER AS $fn$
+        BEGIN
+            NEW.stage_code := proposal_stage_code(NEW.status);
+            RETURN NEW;
+        END;
+        $fn$ LANGUAGE plpgsql
+        """
+    )
+    cursor.execute("DROP TRIGGER IF EXISTS trg_proposals_stage_code ON proposals")
+    cursor.execute(
+        """
+        CREATE TRIGGER trg_proposals_stage_code
+        BEFORE INSERT OR UPDATE OF status ON proposals
+        FOR EACH ROW EXECUTE PROCEDURE proposals_set_stage_code()
+        """
+    )
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_proposals_stage_code_updated
+        ON proposals (stage_code, updated_at DESC)
+        """
+    )
+    cursor.execute(
+        """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'proposals'
+          AND column_name IN ('owner_id', 'user_id')
+        """
+    )
+    owner_cols = {r['column_name'] if isinstance(r, dict) else r[0] for r in cursor.fetchall() or []}
+    owner_col = 'owner_id' if 'owner_id' in owner_cols else ('user_id' if 'user_id' in owner_cols else None)
+    if owner_col:
+        cursor.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS idx_proposals_owner_stage_code
+            ON proposals ({owner_col}, stage_code)
+            """
+        )
+
+
+def backfill_stage_codes(batch_size: int = 1000, only_missing: bool = True) -> int:
+    """Set stage_code on existing proposals in id-ordered batches; returns rows updated."""
+    from api.utils.database import get_db_connection
+
+    updated = 0
+    last_id = 0
+    missing_sql = " AND stage_code IS NULL" if only_missing else ""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        while True:
+            cursor.execute(
+                f"""
+                UPDATE proposals SET stage_code = proposal_stage_code(status)
+                WHERE id IN (
+                    SELECT id FROM proposals
+                    WHERE id > %s{missing_sql}
+                    ORDER BY id
+                    LIMIT %s
+                )
+                RETURNING id
+                """,
+                (last_id, batch_size),
+            )
+            ids = [int(r[0]) for r in cursor.fetchall() or []]
+            conn.commit()
+            if not ids:
+                break
+            updated += len(ids)
+            last_id = max(ids)
+            print(f"[STAGES] Backfilled stage_code for {updated} proposals (last id {last_id})")
+    return updated
+
+
+def reclassify_stage_codes(batch_size: int = 1000) -> int:
+    """Re-run the backfill over every proposal after STAGE_RULES changed."""
+    return backfill_stage_codes(batch_size=batch_size, only_missing=False)
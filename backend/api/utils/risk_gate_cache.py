@@ -0,0 +1,175 @@
+"""
+Result cache for Risk Gate /analyze runs.
+
+Each analysis sends the whole proposal to the Risk Gate engine (HF Space or the
+external API) and can take up to 120s, even when nothing in the proposal
+changed since the last run. Results are now cached in
+`risk_gate_result_cache`, next to `risk_gate_runs` (migration 8):
+
+  - the key is sha256(payload hash, model id, prompt version). The payload hash
+    covers the sanitized proposal minus bookkeeping fields (timestamps, status,
+    stage_code) that change without changing what the engine sees.
+    `model_id` identifies the engine endpoint; bump RISK_GATE_PROMPT_VERSION
+    when the engine's prompt or scoring changes to invalidate every entry.
+  - a hit reuses the stored issues, score and KB citations. /analyze still
+    inserts a `risk_gate_runs` row for the audit trail, with `cached = TRUE`
+    and the cache key, so overrides keep working against it.
+  - entries older than RISK_GATE_CACHE_TTL_SECONDS are ignored and replaced
+    by the next fresh run. `force=true` on /analyze always runs the engine.
+
+`cache_hit_rate(cursor, days)` reports hits vs engine runs from risk_gate_runs.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional
+
+RISK_GATE_CACHE_ENABLED = (os.getenv('RISK_GATE_CACHE_ENABLED', 'true').strip().lower() not in ('0', 'false', 'no'))
+RISK_GATE_CACHE_TTL_SECONDS = int(os.getenv('RISK_GATE_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+RISK_GATE_PROMPT_VERSION = os.getenv('RISK_GATE_PROMPT_VERSION', '1')
+
+# Proposal columns that change on every save or workflow step but are not analysed.
+_VOLATILE_KEYS = frozenset({'status', 'stage_code'})
+
+
+def _is_volatile(key: str) -> bool:
+    return key in _VOLATILE_KEYS or key.endswith('_at')
+
+
+def content_hash(sanitized_payload: Any) -> str:
+    """sha256 of the sanitized proposal, ignoring timestamps and workflow status."""
+    if isinstance(sanitized_payload, dict):
+        sanitized_payload = {k: v for k, v in sanitized_payload.items() if not _is_volatile(str(k))}
+    encoded = json.dumps(sanitized_payload, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def make_cache_key(payload_hash: str, model_id: str, prompt_version: str = RISK_GATE_PROMPT_VERSION) -> str:
+    digest = hashlib.sha256()
+    for part in (payload_hash or '', model_id or '', prompt_version or ''):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+def create_risk_gate_cache_objects(cursor) -> None:
+    """DDL for migration 8: the cache table and run audit columns."""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS risk_gate_result_cache (
+            cache_key TEXT PRIMARY KEY,
+            payload_hash TEXT NOT NULL,
+            model_id TEXT NOT NULL,
+            prompt_version TEXT NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            risk_score INTEGER NOT NULL,
+            issues JSONB NOT NULL DEFAULT '[]'::jsonb,
+            kb_citations JSONB NOT NULL DEFAULT '[]'::jsonb,
+            analysis JSONB NOT NULL DEFAULT '{}'::jsonb,
+            source_run_id INTEGER,
+            hit_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            last_hit_at TIMESTAMPTZ
+        )
+        """
+    )
+    cursor.execute(
+        """
+        ALTER TABLE risk_gate_runs
+        ADD COLUMN IF NOT EXISTS cached BOOLEAN NOT NULL DEFAULT FALSE,
+        ADD COLUMN IF NOT EXISTS cache_key TEXT
+        """
+    )
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_risk_gate_runs_created_cached
+        ON risk_gate_runs (created_at, cached)
+        """
+    )
+
+
+def lookup_cached_result(cursor, cache_key: str) -> Optional[Dict[str, Any]]:
+    """The cached analysis for `cache_key` if it is within the TTL (counts the hit), else None."""
+    cursor.execute(
+        """
+        UPDATE risk_gate_result_cache
+        SET hit_count = hit_count + 1, last_hit_at = NOW()
+        WHERE cache_key = %s
+          AND created_at > NOW() - (%s * INTERVAL '1 second')
+        RETURNING status, risk_score, issues, kb_citations, analysis, source_run_id, created_at
+        """,
+        (cache_key, RISK_GATE_CACHE_TTL_SECONDS),
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None
+    result = dict(row)
+    for key in ('issues', 'kb_citations', 'analysis'):
+        result[key] = _json_value(result.get(key))
+    return result
+
+
+def store_cached_result(cursor, cache_key: str, payload_hash: str, model_id: str, status: str,
+                        risk_score: int, issues: Any, kb_citations: Any, analysis: Dict[str, Any],
+                        source_run_id: Optional[int]) -> None:
+    """Insert or refresh the cache entry for a fresh engine run."""
+    cursor.execute(
+        """
+        INSERT INTO risk_gate_result_cache (
+            cache_key, payload_hash, model_id, prompt_version, status, risk_score,
+            issues, kb_citations, analysis, source_run_id
+        )
+        VALUES (%s, %s, %s, %s, %s, %s, %s::jsonb, %s::jsonb, %s::jsonb, %s)
+        ON CONFLICT (cache_key) DO UPDATE
+            SET status = EXCLUDED.status, risk_score = EXCLUDED.risk_score,
+                issues = EXCLUDED.issues, kb_citations = EXCLUDED.kb_citations,
+                analysis = EXCLUDED.analysis, source_run_id = EXCLUDED.source_run_id,
+                hit_count = 0, created_at = NOW(), last_hit_at = NULL
+        """,
+        (
+            cache_key,
+            payload_hash,
+            model_id,
+            RISK_GATE_PROMPT_VERSION,
+            status,
+            int(risk_score or 0),
+            json.dumps(issues, default=str),
+            json.dumps(kb_citations, default=str),
+            json.dumps(analysis, default=str),
+            source_run_id,
+        ),
+    )
+
+
+def cache_hit_rate(cursor, days: int = 30) -> Dict[str, Any]:
+    """Cached vs engine-run analyses over the last `days` days (blocked runs never reach either)."""
+    cursor.execute(
+        """
+        SELECT COUNT(*) FILTER (WHERE cached) AS hits,
+               COUNT(*) FILTER (WHERE NOT cached AND cache_key IS NOT NULL) AS misses
+        FROM risk_gate_runs
+        WHERE created_at >= NOW() - (%s * INTERVAL '1 day')
+        """,
+        (int(days),),
+    )
+    row = cursor.fetchone()
+    if isinstance(row, dict):
+        hits, misses = row.get('hits') or 0, row.get('misses') or 0
+    else:
+        hits, misses = (row[0] or 0, row[1] or 0) if row else (0, 0)
+    total = hits + misses
+    return {
+        'days': int(days),
+        'hits': int(hits),
+        'misses': int(misses),
+        'hit_rate': round(hits / total, 4) if total else 0.0,
+    }
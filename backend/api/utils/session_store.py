@@ -0,0 +1,263 @@
+"""
+Session store for legacy bearer tokens (generate_token / verify_token).
+
+Tokens used to live in a dict mirrored to auth_tokens.json: every login and
+every expired lookup rewrote the whole file, and every cache miss re-read it,
+racing with the other gunicorn workers. Sessions now go through a
+`SessionStore` with O(1) insert/lookup/delete:
+
+  - `PostgresSessionStore`: the `auth_sessions` table, keyed by sha256(token)
+    so raw tokens are never stored, with an index on `expires_at`. Every worker
+    sees the same sessions; lookups ignore expired rows, so expiry never needs
+    an inline write.
+  - `MemorySessionStore`: dict + expiry heap, for tests and single-process dev
+    (SESSION_STORE_BACKEND=memory).
+
+Expired rows are removed by `start_session_sweeper()`, a daemon thread that runs
+`sweep()` every SESSION_SWEEP_INTERVAL_SECONDS. With Postgres only one worker
+sweeps at a time (pg_try_advisory_xact_lock), in bounded batches.
+"""
+import hashlib
+import heapq
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+SESSION_STORE_BACKEND = os.getenv('SESSION_STORE_BACKEND', 'postgres').strip().lower()
+SESSION_SWEEP_INTERVAL_SECONDS = float(os.getenv('SESSION_SWEEP_INTERVAL_SECONDS', '300'))
+SESSION_SWEEP_BATCH_SIZE = int(os.getenv('SESSION_SWEEP_BATCH_SIZE', '5000'))
+
+# Arbitrary constant for pg_try_advisory_xact_lock so only one worker sweeps.
+_SWEEP_LOCK_KEY = 0x5E55_1057
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class SessionStore:
+    """Backend interface; `ttl_seconds` is relative to now."""
+
+    def put(self, token: str, username: str, ttl_seconds: float) -> None:
+        raise NotImplementedError
+
+    def get(self, token: str) -> Optional[str]:
+        """Username for a live session, else None."""
+        raise NotImplementedError
+
+    def delete(self, token: str) -> None:
+        raise NotImplementedError
+
+    def sweep(self) -> int:
+        """Remove expired sessions; returns how many were removed."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Tuple[str, float]] = {}
+        self._expiry: List[Tuple[float, str]] = []
+
+    def put(self, token: str, username: str, ttl_seconds: float) -> None:
+        key = hash_token(token)
+        expires_at = self._clock() + ttl_seconds
+        with self._lock:
+            self._sessions[key] = (username, expires_at)
+            heapq.heappush(self._expiry, (expires_at, key))
+
+    def get(self, token: str) -> Optional[str]:
+        with self._lock:
+            session = self._sessions.get(hash_token(token))
+        if session is None or self._clock() >= session[1]:
+            return None
+        return session[0]
+
+    def delete(self, token: str) -> None:
+        with self._lock:
+            self._sessions.pop(hash_token(token), None)
+
+    def sweep(self) -> int:
+        now = self._clock()
+        removed = 0
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                expires_at, key = heapq.heappop(self._expiry)
+                session = self._sessions.get(key)
+                # Skip heap entries superseded by a later put() of the same token.
+                if session is not None and session[1] == expires_at:
+                    del self._sessions[key]
+                    removed += 1
+        return removed
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+class PostgresSessionStore(SessionStore):
+    def put(self, token: str, username: str, ttl_seconds: float) -> None:
+        from api.utils.database import get_db_connection
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO auth_sessions (token_hash, username, expires_at)
+                VALUES (%s, %s, NOW() + make_interval(secs => %s))
+                ON CONFLICT (token_hash) DO UPDATE
+                   SET username = EXCLUDED.username, expires_at = EXCLUDED.expires_at
+                """,
+                (hash_token(token), username, float(ttl_seconds)),
+            )
+            conn.commit()
+
+    def get(self, token: str) -> Optional[str]:
+        from api.utils.database import get_db_connection
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT username FROM auth_sessions WHERE token_hash = %s AND expires_at > NOW()',
+                (hash_token(token),),
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def delete(self, token: str) -> None:
+        from api.utils.database import get_db_connection
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM auth_sessions WHERE token_hash = %s', (hash_token(token),))
+            conn.commit()
+
+    def sweep(self) -> int:
+        from api.utils.database import get_db_connection
+
+        removed = 0
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            while True:
+                cursor.execute('SELECT pg_try_advisory_xact_lock(%s)', (_SWEEP_LOCK_KEY,))
+                if not cursor.fetchone()[0]:
+                    conn.rollback()
+                    break  # another worker is sweeping
+                cursor.execute(
+                    """
+                    DELETE FROM auth_sessions
+                     WHERE token_hash IN (
+                        SELECT token_hash FROM auth_sessions
+                         WHERE expires_at <= NOW()
+                         LIMIT %s
+                     )
+                    """,
+                    (SESSION_SWEEP_BATCH_SIZE,),
+                )
+                batch = cursor.rowcount or 0
+                conn.commit()
+                removed += batch
+                if batch < SESSION_SWEEP_BATCH_SIZE:
+                    break
+        return removed
+
+    def count(self) -> int:
+        from api.utils.database import get_db_connection
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM auth_sessions WHERE expires_at > NOW()')
+            return int(cursor.fetchone()[0])
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MemorySessionStore() if SESSION_STORE_BACKEND == 'memory' else PostgresSessionStore()
+    return _store
+
+
+def set_session_store(store: Optional[SessionStore]) -> None:
+    """Swap the process-wide store (tests use MemorySessionStore)."""
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def import_token_file(path: str, store: Optional[SessionStore] = None) -> int:
+    """One-off import of a legacy auth_tokens.json so existing logins survive the switch.
+
+    The file is renamed to `<path>.imported` afterwards; with several workers
+    starting at once, whichever renames it first wins and the rest skip it.
+    """
+    if not os.path.exists(path):
+        return 0
+    store = store or get_session_store()
+    try:
+        with open(path, 'r', encoding='utf-8') as token_file:
+            data = json.load(token_file)
+    except Exception as exc:
+        print(f"[WARN] Could not read legacy token file {path}: {exc}")
+        return 0
+
+    imported = 0
+    now = datetime.now()
+    for token, token_data in (data or {}).items():
+        try:
+            ttl = (datetime.fromisoformat(token_data['expires_at']) - now).total_seconds()
+            if ttl > 0:
+                store.put(token, token_data['username'], ttl)
+                imported += 1
+        except Exception as exc:
+            print(f"[WARN] Skipping legacy token entry: {exc}")
+
+    try:
+        os.replace(path, path + '.imported')
+    except OSError:
+        pass
+    print(f"[INFO] Imported {imported} legacy tokens from {path}")
+    return imported
+
+
+_sweeper: Optional[threading.Thread] = None
+_sweeper_stop = threading.Event()
+
+
+def start_session_sweeper(interval_seconds: Optional[float] = None) -> threading.Thread:
+    """Start (once per process) the daemon thread that deletes expired sessions."""
+    global _sweeper
+    interval = SESSION_SWEEP_INTERVAL_SECONDS if interval_seconds is None else interval_seconds
+    with _store_lock:
+        if _sweeper is not None and _sweeper.is_alive():
+            return _sweeper
+        _sweeper_stop.clear()
+
+        def _loop():
+            while not _sweeper_stop.wait(interval):
+                try:
+                    removed = get_session_store().sweep()
+                    if removed:
+                        print(f"[SESSIONS] Swept {removed} expired sessions")
+                except Exception as exc:
+                    print(f"[WARN] Session sweep failed: {exc}")
+
+        _sweeper = threading.Thread(target=_loop, name='session-sweeper', daemon=True)
+        _sweeper.start()
+        return _sweeper
+
+
+def stop_session_sweeper() -> None:
+    _sweeper_stop.set()
@@ -0,0 +1,233 @@
+"""
+Constant-memory building blocks for finance / audit exports.
+
+Exports used to `fetchall()` every row, build the whole CSV/PDF in a BytesIO and
+hand it to send_file, so memory grew with the size of the report. The helpers
+here keep memory flat:
+
+  - `iter_query()`: rows from a named (server-side) cursor, fetched
+    EXPORT_ITERSIZE at a time instead of all at once
+  - `iter_csv()`: CSV encoded in ~64KB chunks for a generator Response
+  - `write_xlsx()`: openpyxl write-only workbook saved to a spooled temp file
+  - `write_pdf()` / `PagedPdfWriter`: ReportLab text table drawn row by row,
+    one page at a time, into a spooled temp file
+  - `iter_file()`: streams a spooled file back out and closes it
+  - `export_headers()`: attachment + row-count headers; CSV streams have no
+    Content-Length, so X-Export-Row-Count lets the frontend show progress
+
+Spooled files stay in memory up to EXPORT_SPOOL_MAX_BYTES and roll over to disk
+after that.
+"""
+import csv
+import io
+import os
+import tempfile
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+OPENPYXL_AVAILABLE = False
+try:
+    from openpyxl import Workbook
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    Workbook = None
+
+
+EXPORT_ITERSIZE = int(os.getenv('EXPORT_ITERSIZE', '2000'))
+EXPORT_SPOOL_MAX_BYTES = int(os.getenv('EXPORT_SPOOL_MAX_BYTES', str(8 * 1024 * 1024)))
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+UTF8_BOM = b'\xef\xbb\xbf'
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'pdf': 'application/pdf',
+}
+
+
+def _ensure_str(v) -> str:
+    if v is None:
+        return ''
+    return str(v)
+
+
+def iter_query(conn, query: str, params: Optional[Sequence[Any]] = None, itersize: Optional[int] = None,
+               name: str = 'export') -> Iterator[Dict[str, Any]]:
+    """Yield dict rows through a server-side cursor, `itersize` rows per round-trip.
+
+    Must run inside a transaction (pooled connections are not in autocommit mode);
+    committing on `conn` while iterating closes the cursor.
+    """
+    import psycopg2.extras
+
+    cursor = conn.cursor(name=f"{name}_{uuid.uuid4().hex[:12]}", cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.itersize = itersize or EXPORT_ITERSIZE
+    try:
+        cursor.execute(query, params)
+        for row in cursor:
+            yield row
+    finally:
+        try:
+            cursor.close()
+        except Exception:
+            pass
+
+
+def iter_csv(headers: Sequence[str], rows: Iterable[Sequence[Any]], bom: bool = True,
+             chunk_bytes: int = EXPORT_CHUNK_BYTES) -> Iterator[bytes]:
+    """Excel-friendly CSV (UTF-8 BOM, CRLF) yielded in chunks of roughly `chunk_bytes`."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\r\n')
+    writer.writerow(headers)
+    first = buf.getvalue().encode('utf-8')
+    buf.seek(0)
+    buf.truncate()
+    yield (UTF8_BOM + first) if bom else first
+
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= chunk_bytes:
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0)
+            buf.truncate()
+
+    tail = buf.getvalue()
+    if tail:
+        yield tail.encode('utf-8')
+
+
+def spooled_file():
+    return tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES, mode='w+b')
+
+
+def file_size(fileobj) -> int:
+    pos = fileobj.tell()
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(pos)
+    return size
+
+
+def iter_file(fileobj, chunk_bytes: int = EXPORT_CHUNK_BYTES) -> Iterator[bytes]:
+    """Stream a (spooled) file from the start and close it once exhausted or abandoned."""
+    try:
+        fileobj.seek(0)
+        while True:
+            chunk = fileobj.read(chunk_bytes)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def write_xlsx(sheet_title: str, headers: Sequence[str], rows: Iterable[Sequence[Any]]) -> Tuple[Any, int]:
+    """Write rows with openpyxl's write-only mode; returns (spooled file, row count)."""
+    if not OPENPYXL_AVAILABLE:
+        raise RuntimeError('Excel export not available (openpyxl missing)')
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title[:31])
+    ws.append(list(headers))
+    count = 0
+    for row in rows:
+        ws.append(list(row))
+        count += 1
+
+    out = spooled_file()
+    try:
+        wb.save(out)
+    except Exception:
+        out.close()
+        raise
+    out.seek(0)
+    return out, count
+
+
+class PagedPdfWriter:
+    """Text-table PDF drawn one row at a time; each page is finished as soon as it fills.
+
+    Page streams are compressed when the page is closed, so a finished page costs a
+    few KB rather than its uncompressed drawing operators.
+    """
+
+    def __init__(self, fileobj, title: str, headers: Optional[Sequence[str]] = None,
+                 max_chars: int = 140, line_height: int = 12):
+        try:
+            from reportlab.lib.pagesizes import letter
+            from reportlab.pdfgen import canvas
+        except Exception:
+            raise RuntimeError('PDF export not available (reportlab missing)')
+
+        self._canvas = canvas.Canvas(fileobj, pagesize=letter, pageCompression=1)
+        self._width, self._height = letter
+        self._title = title
+        self._headers = list(headers or [])
+        self._max_chars = max_chars
+        self._line_height = line_height
+        self.rows = 0
+        self.pages = 0
+        self._start_page(first=True)
+
+    def _start_page(self, first: bool = False) -> None:
+        c = self._canvas
+        self._y = self._height - 40
+        if first:
+            c.setFont('Helvetica-Bold', 12)
+            c.drawString(40, self._y, self._title[:120])
+            self._y -= 18
+            c.setFont('Helvetica', 8)
+            c.drawString(40, self._y, 'Generated: ' + datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC'))
+            self._y -= 18
+        if self._headers:
+            c.setFont('Helvetica-Bold', 8)
+            c.drawString(40, self._y, ' | '.join([h[:28] for h in self._headers])[:self._max_chars])
+            self._y -= 14
+        c.setFont('Helvetica', 8)
+
+    def add_row(self, values: Sequence[Any]) -> None:
+        line = ' | '.join([_ensure_str(v) for v in values])
+        self._canvas.drawString(40, self._y, line[:self._max_chars])
+        self._y -= self._line_height
+        self.rows += 1
+        if self._y < 60:
+            self._canvas.showPage()
+            self.pages += 1
+            self._start_page()
+
+    def close(self) -> None:
+        self._canvas.showPage()
+        self.pages += 1
+        self._canvas.save()
+
+
+def write_pdf(title: str, headers: Optional[Sequence[str]], rows: Iterable[Sequence[Any]]) -> Tuple[Any, int]:
+    """Render rows page by page into a spooled file; returns (spooled file, row count)."""
+    out = spooled_file()
+    try:
+        writer = PagedPdfWriter(out, title, headers)
+        for row in rows:
+            writer.add_row(row)
+        writer.close()
+    except Exception:
+        out.close()
+        raise
+    out.seek(0)
+    return out, writer.rows
+
+
+def export_headers(filename: str, format_type: str, row_count: Optional[int] = None,
+                   content_length: Optional[int] = None) -> Dict[str, str]:
+    """Attachment headers plus X-Export-Row-Count (exposed to the browser in the CORS config)."""
+    headers = {
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Cache-Control': 'no-store',
+        'X-Export-Format': format_type,
+    }
+    if row_count is not None:
+        headers['X-Export-Row-Count'] = str(int(row_count))
+    if content_length is not None:
+        headers['Content-Length'] = str(int(content_length))
+    return headers
@@ -0,0 +1,425 @@
+"""
+Structural diff between proposal versions.
+
+The compare endpoints used to pretty-print both versions and run
+difflib.unified_diff twice plus HtmlDiff.make_table over the whole text, which
+is quadratic in the worst case and took seconds on proposals with large pricing
+tables. `diff_documents` walks the two JSON trees instead:
+
+  - every subtree is hashed once (bottom-up), and subtrees whose hashes match
+    are skipped without being compared
+  - lists of objects with unique `id`s (proposal sections, tables, images) are
+    matched by id, so inserting a section reports one addition rather than a
+    change to every section after it; reordering is reported as `moved`
+  - other lists are aligned on element hashes; changed dict fields recurse
+  - strings that differ are diffed word by word after trimming the common
+    prefix and suffix; long unchanged runs are elided to `["~", n]`
+
+The result is a JSON-ready dict of `changes` plus `stats` (see diff_documents).
+Results are cached in `proposal_version_diffs` by (from id, to id) because
+version contents never change; save_version stores the diff against the
+previous version as it writes each new one, so the history view reads stored
+diffs (`adjacent_diffs`). Bump DIFF_FORMAT when the output changes.
+"""
+import hashlib
+import json
+import re
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional
+
+from api.utils.version_store import _dict_rows, reconstruct_content
+
+DIFF_FORMAT = 1
+
+# Unchanged text longer than twice this is elided, keeping this much context on each side.
+CONTEXT_CHARS = 40
+# Above this many differing tokens on both sides, report a block replace instead of a word diff.
+MAX_WORD_DIFF_TOKENS = 5000
+
+_TOKEN_RE = re.compile(r'\s+|\w+|[^\w\s]', re.UNICODE)
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def create_version_diff_objects(cursor) -> None:
+    """DDL for migration 10: the diff cache."""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS proposal_version_diffs (
+            from_version_id INTEGER NOT NULL,
+            to_version_id INTEGER NOT NULL,
+            format SMALLINT NOT NULL,
+            diff JSONB NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (from_version_id, to_version_id)
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_proposal_version_diffs_to
+        ON proposal_version_diffs (to_version_id)
+        """
+    )
+
+
+# ---------------------------------------------------------------------------
+# Tree diff
+# ---------------------------------------------------------------------------
+
+class _Differ:
+    def __init__(self):
+        self._hashes: Dict[int, str] = {}
+        self.changes: List[Dict[str, Any]] = []
+        self.stats = {
+            'added': 0, 'removed': 0, 'changed': 0, 'moved': 0,
+            'words_added': 0, 'words_removed': 0,
+            'sections_added': 0, 'sections_removed': 0, 'sections_changed': 0,
+        }
+
+    def digest(self, value: Any) -> str:
+        if isinstance(value, dict):
+            key = id(value)
+            cached = self._hashes.get(key)
+            if cached is None:
+                h = hashlib.sha1(b'{')
+                for k in sorted(value):
+                    h.update(json.dumps(k).encode('utf-8'))
+                    h.update(self.digest(value[k]).encode('ascii'))
+                cached = self._hashes[key] = h.hexdigest()
+            return cached
+        if isinstance(value, list):
+            key = id(value)
+            cached = self._hashes.get(key)
+            if cached is None:
+                h = hashlib.sha1(b'[')
+                for item in value:
+                    h.update(self.digest(item).encode('ascii'))
+                cached = self._hashes[key] = h.hexdigest()
+            return cached
+        return hashlib.sha1(json.dumps(value, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def _emit(self, op: str, path: list, **fields) -> None:
+        change = {'op': op, 'path': path, 'label': format_path(path)}
+        change.update(fields)
+        self.changes.append(change)
+        self.stats[op] = self.stats.get(op, 0) + 1
+        if _is_section_path(path):
+            if len(path) == 2 and op in ('added', 'removed'):
+                self.stats[f'sections_{op}'] += 1
+
+    def diff(self, old: Any, new: Any, path: list) -> None:
+        if self.digest(old) == self.digest(new):
+            return
+        if isinstance(old, dict) and isinstance(new, dict):
+            self._diff_dict(old, new, path)
+        elif isinstance(old, list) and isinstance(new, list):
+            if _id_keyed(old) and _id_keyed(new):
+                self._diff_keyed_list(old, new, path)
+            else:
+                self._diff_list(old, new, path)
+        elif isinstance(old, str) and isinstance(new, str):
+            self._diff_text(old, new, path)
+        else:
+            self._emit('changed', path, old=old, new=new)
+
+    def _diff_dict(self, old: dict, new: dict, path: list) -> None:
+        for key, value in new.items():
+            if key not in old:
+                self._emit('added', path + [key], value=value)
+            else:
+                self.diff(old[key], value, path + [key])
+        for key, value in old.items():
+            if key not in new:
+                self._emit('removed', path + [key], value=value)
+
+    def _diff_keyed_list(self, old: list, new: list, path: list) -> None:
+        old_by_id = {item['id']: item for item in old}
+        new_ids = [item['id'] for item in new]
+        new_id_set = set(new_ids)
+        common_old = [item['id'] for item in old if item['id'] in new_id_set]
+        common_new = [i for i in new_ids if i in old_by_id]
+        if common_old != common_new:
+            matcher = SequenceMatcher(None, common_old, common_new, autojunk=False)
+            kept = set()
+            for block in matcher.get_matching_blocks():
+                kept.update(common_new[block.b:block.b + block.size])
+            for index, item_id in enumerate(new_ids):
+                if item_id in old_by_id and item_id not in kept:
+                    self._emit('moved', path + [{'id': item_id}], index=index)
+        for index, item in enumerate(new):
+            item_path = path + [{'id': item['id']}]
+            if item['id'] not in old_by_id:
+                self._emit('added', item_path, index=index, value=item)
+                continue
+            before = len(self.changes)
+            self.diff(old_by_id[item['id']], item, item_path)
+            if len(self.changes) > before and _is_section_path(item_path):
+                self.stats['sections_changed'] += 1
+        for item in old:
+            if item['id'] not in new_id_set:
+                self._emit('removed', path + [{'id': item['id']}], value=item)
+
+    def _diff_list(self, old: list, new: list, path: list) -> None:
+        old_hashes = [self.digest(v) for v in old]
+        new_hashes = [self.digest(v) for v in new]
+        matcher = SequenceMatcher(None, old_hashes, new_hashes, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                continue
+            paired = min(i2 - i1, j2 - j1) if tag == 'replace' else 0
+            for offset in range(paired):
+                self.diff(old[i1 + offset], new[j1 + offset], path + [j1 + offset])
+            for offset in range(i1 + paired, i2):
+                self._emit('removed', path + [offset], value=old[offset])
+            for offset in range(j1 + paired, j2):
+                self._emit('added', path + [offset], value=new[offset])
+
+    def _diff_text(self, old: str, new: str, path: list) -> None:
+        segments, added, removed = diff_words(old, new)
+        self.stats['words_added'] += added
+        self.stats['words_removed'] += removed
+        self._emit('changed', path, segments=segments, words_added=added, words_removed=removed)
+
+
+def _id_keyed(items: list) -> bool:
+    """True for a list of objects whose `id`s are present, hashable and unique."""
+    if not items or not all(isinstance(i, dict) and isinstance(i.get('id'), (str, int)) for i in items):
+        return False
+    return len({i['id'] for i in items}) == len(items)
+
+
+def _is_section_path(path: list) -> bool:
+    return len(path) >= 2 and path[0] == 'sections' and isinstance(path[1], (dict, int))
+
+
+def format_path(path: list) -> str:
+    """Readable form of a diff path, e.g. `sections[id=s2].content`."""
+    text = ''
+    for key in path:
+        if isinstance(key, dict):
+            text += f"[id={key['id']}]"
+        elif isinstance(key, int):
+            text += f'[{key}]'
+        else:
+            text += f'.{key}' if text else str(key)
+    return text or '(document)'
+
+
+# ---------------------------------------------------------------------------
+# Word diff
+# ---------------------------------------------------------------------------
+
+def _count_words(tokens: List[str]) -> int:
+    return sum(1 for t in tokens if _WORD_RE.match(t))
+
+
+def _equal_segments(text: str, first: bool, last: bool) -> List[list]:
+    """An unchanged run, elided to its edges when long."""
+    if len(text) <= 2 * CONTEXT_CHARS:
+        return [['=', text]] if text else []
+    head = '' if first else text[:CONTEXT_CHARS]
+    tail = '' if last else text[-CONTEXT_CHARS:]
+    out: List[list] = []
+    if head:
+        out.append(['=', head])
+    out.append(['~', len(text) - len(head) - len(tail)])
+    if tail:
+        out.append(['=', tail])
+    return out
+
+
+def diff_words(old: str, new: str):
+    """Word-level diff of two strings.
+
+    Returns (segments, words_added, words_removed). Segments are `["=", text]`,
+    `["-", text]`, `["+", text]` or `["~", n]` for n unchanged characters left
+    out; concatenating the "=", "-" and skipped text gives `old`, and "=", "+"
+    and skipped text gives `new`.
+    """
+    a = _TOKEN_RE.findall(old)
+    b = _TOKEN_RE.findall(new)
+    prefix = 0
+    while prefix < len(a) and prefix < len(b) and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < len(a) - prefix and suffix < len(b) - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    a_mid = a[prefix:len(a) - suffix]
+    b_mid = b[prefix:len(b) - suffix]
+
+    raw: List[list] = []
+    if len(a_mid) > MAX_WORD_DIFF_TOKENS and len(b_mid) > MAX_WORD_DIFF_TOKENS:
+        raw = [['-', ''.join(a_mid)], ['+', ''.join(b_mid)]]
+    else:
+        matcher = SequenceMatcher(None, a_mid, b_mid, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                raw.append(['=', ''.join(a_mid[i1:i2])])
+                continue
+            if i2 > i1:
+                raw.append(['-', ''.join(a_mid[i1:i2])])
+            if j2 > j1:
+                raw.append(['+', ''.join(b_mid[j1:j2])])
+
+    segments: List[list] = []
+    segments.extend(_equal_segments(''.join(a[:prefix]), first=True, last=False))
+    for op, text in raw:
+        if op == '=':
+            segments.extend(_equal_segments(text, first=False, last=False))
+        else:
+            segments.append([op, text])
+    segments.extend(_equal_segments(''.join(a[len(a) - suffix:]), first=False, last=True))
+
+    added = sum(_count_words(_TOKEN_RE.findall(t)) for op, t in raw if op == '+')
+    removed = sum(_count_words(_TOKEN_RE.findall(t)) for op, t in raw if op == '-')
+    return segments, added, removed
+
+
+def diff_documents(old: Any, new: Any) -> Dict[str, Any]:
+    """Structural diff of two parsed proposal documents.
+
+    Returns `{"format", "changes", "stats"}`. Each change has `op` (added,
+    removed, changed, moved), `path` (keys, list indices, or `{"id": ...}` for
+    id-matched items) and a readable `label`; text changes carry word
+    `segments`, other changes the `old`/`new` or added/removed `value`.
+    """
+    differ = _Differ()
+    differ.diff(old, new, [])
+    return {'format': DIFF_FORMAT, 'changes': differ.changes, 'stats': differ.stats}
+
+
+def diff_texts(old_text: Optional[str], new_text: Optional[str]) -> Dict[str, Any]:
+    """diff_documents on stored version contents; text that is not JSON is diffed as a string."""
+    return diff_documents(_parse(old_text), _parse(new_text))
+
+
+def _parse(text: Optional[str]) -> Any:
+    if text is None:
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def legacy_change_counts(diff: Dict[str, Any]) -> Dict[str, int]:
+    """The additions/deletions/modifications summary the compare endpoint always returned."""
+    stats = diff.get('stats') or {}
+    return {
+        'additions': int(stats.get('words_added', 0)) + int(stats.get('added', 0)),
+        'deletions': int(stats.get('words_removed', 0)) + int(stats.get('removed', 0)),
+        'modifications': int(stats.get('changed', 0)) + int(stats.get('moved', 0)),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+def load_cached_diff(cursor, from_version_id: int, to_version_id: int) -> Optional[Dict[str, Any]]:
+    cursor.execute(
+        """
+        SELECT diff FROM proposal_version_diffs
+        WHERE from_version_id = %s AND to_version_id = %s AND format = %s
+        """,
+        (from_version_id, to_version_id, DIFF_FORMAT),
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None
+    diff = row['diff'] if isinstance(row, dict) else row[0]
+    return json.loads(diff) if isinstance(diff, str) else diff
+
+
+def store_diff(cursor, from_version_id: int, to_version_id: int, diff: Dict[str, Any]) -> None:
+    cursor.execute(
+        """
+        INSERT INTO proposal_version_diffs (from_version_id, to_version_id, format, diff)
+        VALUES (%s, %s, %s, %s::jsonb)
+        ON CONFLICT (from_version_id, to_version_id) DO UPDATE
+            SET format = EXCLUDED.format, diff = EXCLUDED.diff, created_at = NOW()
+        """,
+        (from_version_id, to_version_id, DIFF_FORMAT, json.dumps(diff, ensure_ascii=False)),
+    )
+
+
+def diff_versions(cursor, from_version_id: int, to_version_id: int) -> Dict[str, Any]:
+    """Diff between two proposal_versions rows, from the cache or computed and stored."""
+    cached = load_cached_diff(cursor, from_version_id, to_version_id)
+    if cached is not None:
+        return cached
+    diff = diff_texts(reconstruct_content(cursor, from_version_id), reconstruct_content(cursor, to_version_id))
+    store_diff(cursor, from_version_id, to_version_id, diff)
+    return diff
+
+
+def compare_versions(cursor, proposal_id, version1: int, version2: int) -> Optional[Dict[str, Any]]:
+    """Compare response for two version numbers of a proposal, older first; None if either is missing.
+
+    The caller commits (a computed diff is inserted into the cache).
+    """
+    cursor.execute(
+        """
+        SELECT DISTINCT ON (version_number)
+               pv.id, pv.version_number, pv.created_at, u.full_name AS created_by_name
+        FROM proposal_versions pv
+        LEFT JOIN users u ON pv.created_by = u.id
+        WHERE pv.proposal_id = %s AND pv.version_number IN (%s, %s)
+        ORDER BY pv.version_number, pv.id DESC
+        """,
+        (proposal_id, version1, version2),
+    )
+    versions = _dict_rows(cursor, cursor.fetchall())
+    if len(versions) != 2:
+        return None
+    diff = diff_versions(cursor, versions[0]['id'], versions[1]['id'])
+
+    def _meta(row):
+        created_at = row.get('created_at')
+        return {
+            'version_number': row['version_number'],
+            'created_at': created_at.isoformat() if created_at else None,
+            'created_by': row.get('created_by_name'),
+        }
+
+    return {
+        'version1': _meta(versions[0]),
+        'version2': _meta(versions[1]),
+        'diff': diff,
+        'changes': legacy_change_counts(diff),
+    }
+
+
+def adjacent_diffs(cursor, proposal_id) -> List[Dict[str, Any]]:
+    """Diff of every version against the one before it, oldest first (missing ones are computed and stored)."""
+    cursor.execute(
+        """
+        SELECT pv.id, pv.version_number, d.diff
+        FROM proposal_versions pv
+        LEFT JOIN LATERAL (
+            SELECT prev.id FROM proposal_versions prev
+            WHERE prev.proposal_id = pv.proposal_id AND prev.id < pv.id
+            ORDER BY prev.id DESC
+            LIMIT 1
+        ) p ON TRUE
+        LEFT JOIN proposal_version_diffs d
+               ON d.from_version_id = p.id AND d.to_version_id = pv.id AND d.format = %s
+        WHERE pv.proposal_id = %s
+        ORDER BY pv.id
+        """,
+        (DIFF_FORMAT, proposal_id),
+    )
+    rows = _dict_rows(cursor, cursor.fetchall())
+    out: List[Dict[str, Any]] = []
+    for prev, row in zip(rows, rows[1:]):
+        diff = row.get('diff')
+        if diff is None:
+            diff = diff_versions(cursor, prev['id'], row['id'])
+        elif isinstance(diff, str):
+            diff = json.loads(diff)
+        out.append({
+            'from_version': prev['version_number'],
+            'to_version': row['version_number'],
+            'diff': diff,
+        })
+    return out
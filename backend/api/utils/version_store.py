@@ -0,0 +1,598 @@
+"""
+Delta-compressed storage for proposal_versions.
+
+create_version used to insert the full proposal JSON for every autosave and
+GET /versions returned every version's content, so a long-lived proposal grew
+the table by one full copy per save and the history panel downloaded all of
+them. Versions are now stored as a chain per proposal:
+
+  - full snapshots keep the text in `content`, as before. A version is a
+    snapshot when it is the first one, when its chain would reach
+    PROPOSAL_VERSION_SNAPSHOT_INTERVAL, or when a delta would not be much
+    smaller than the text.
+  - deltas leave `content` NULL and store in `delta` a zlib-compressed JSON list
+    of structural edits (dict keys, list splices, string splices) against
+    `base_version_id`, the proposal's previous version. A delta is only written
+    when replaying it reproduces the new text byte for byte; content that is
+    not JSON, or formatting we cannot reproduce, is stored in full.
+  - `reconstruct_content` follows base_version_id back to the snapshot with one
+    recursive query (fewer than SNAPSHOT_INTERVAL hops) and replays the deltas.
+  - `list_versions` returns number, author, timestamp, sizes and a change
+    summary without reading `content` or `delta`.
+
+Migration 9 adds the columns. Rows written before it are full snapshots with
+`chain_length` NULL; its backfill (`compact_versions`, also run by
+compact_proposal_versions.py) rewrites them into chains.
+"""
+import json
+import os
+import zlib
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Tuple
+
+PROPOSAL_VERSION_SNAPSHOT_INTERVAL = max(1, int(os.getenv('PROPOSAL_VERSION_SNAPSHOT_INTERVAL', '20')))
+# Store a snapshot instead when the compressed delta is at least this share of the text.
+PROPOSAL_VERSION_MAX_DELTA_RATIO = float(os.getenv('PROPOSAL_VERSION_MAX_DELTA_RATIO', '0.5'))
+
+KIND_FULL = 'full'
+KIND_DELTA = 'delta'
+
+# Strings shorter than this are replaced whole rather than spliced.
+_MIN_SPLICE_LENGTH = 64
+
+# json.dumps settings tried when checking that a text can be re-serialized exactly.
+_DUMP_STYLES = {
+    'c': {'separators': (',', ':'), 'ensure_ascii': False},
+    'ca': {'separators': (',', ':'), 'ensure_ascii': True},
+    'p': {'separators': (', ', ': '), 'ensure_ascii': False},
+    'pa': {'separators': (', ', ': '), 'ensure_ascii': True},
+}
+
+_METADATA_COLUMNS = """pv.id, pv.proposal_id, pv.version_number, pv.created_by, pv.created_at,
+                       pv.change_description, pv.change_summary, pv.storage_kind,
+                       pv.content_size, pv.stored_size"""
+
+
+class VersionChainError(RuntimeError):
+    """A delta chain does not end in a full snapshot."""
+
+
+def create_version_store_objects(cursor) -> None:
+    """DDL for migration 9: delta columns on proposal_versions."""
+    cursor.execute(
+        """
+        ALTER TABLE proposal_versions
+        ADD COLUMN IF NOT EXISTS change_description VARCHAR(500),
+        ADD COLUMN IF NOT EXISTS storage_kind VARCHAR(10) NOT NULL DEFAULT 'full',
+        ADD COLUMN IF NOT EXISTS base_version_id INTEGER,
+        ADD COLUMN IF NOT EXISTS delta BYTEA,
+        ADD COLUMN IF NOT EXISTS chain_length INTEGER,
+        ADD COLUMN IF NOT EXISTS content_size INTEGER,
+        ADD COLUMN IF NOT EXISTS stored_size INTEGER,
+        ADD COLUMN IF NOT EXISTS change_summary TEXT
+        """
+    )
+    cursor.execute('ALTER TABLE IF EXISTS proposal_versions ALTER COLUMN content DROP NOT NULL')
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_proposal_versions_proposal_number
+        ON proposal_versions (proposal_id, version_number DESC)
+        """
+    )
+
+
+# ---------------------------------------------------------------------------
+# Structural JSON deltas
+#
+# An op is a list:
+#   ["r", path, value]              replace the value at path (or add a dict key)
+#   ["d", path]                     delete a dict key
+#   ["s", path, start, end, text]   string splice: s[:start] + text + s[end:]
+#   ["l", path, start, end, items]  list splice: l[start:end] = items
+# Ops apply in order; list edits are emitted back to front so indices hold.
+# ---------------------------------------------------------------------------
+
+def _element_key(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+
+def _diff_string(old: str, new: str, path: list, ops: list) -> None:
+    if len(old) < _MIN_SPLICE_LENGTH and len(new) < _MIN_SPLICE_LENGTH:
+        ops.append(['r', path, new])
+        return
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    ops.append(['s', path, prefix, len(old) - suffix, new[prefix:len(new) - suffix]])
+
+
+def _diff_list(old: list, new: list, path: list, ops: list) -> None:
+    matcher = SequenceMatcher(None, [_element_key(v) for v in old], [_element_key(v) for v in new], autojunk=False)
+    for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+        if tag == 'equal':
+            continue
+        if tag == 'replace' and i2 - i1 == j2 - j1:
+            # Same number of elements changed in place (e.g. one section edited): recurse.
+            for offset in reversed(range(i2 - i1)):
+                _diff_value(old[i1 + offset], new[j1 + offset], path + [i1 + offset], ops)
+        else:
+            ops.append(['l', path, i1, i2, new[j1:j2]])
+
+
+def _diff_dict(old: dict, new: dict, path: list, ops: list) -> None:
+    expected_order = [k for k in old if k in new] + [k for k in new if k not in old]
+    if expected_order != list(new):
+        ops.append(['r', path, new])
+        return
+    for key in old:
+        if key not in new:
+            ops.append(['d', path + [key]])
+    for key, value in new.items():
+        if key in old:
+            _diff_value(old[key], value, path + [key], ops)
+        else:
+            ops.append(['r', path + [key], value])
+
+
+def _diff_value(old: Any, new: Any, path: list, ops: list) -> None:
+    if type(old) is not type(new):
+        ops.append(['r', path, new])
+    elif isinstance(new, dict):
+        _diff_dict(old, new, path, ops)
+    elif isinstance(new, list):
+        if old != new:
+            _diff_list(old, new, path, ops)
+    elif isinstance(new, str):
+        if old != new:
+            _diff_string(old, new, path, ops)
+    elif old != new:
+        ops.append(['r', path, new])
+
+
+def diff_json(old: Any, new: Any) -> List[list]:
+    """Ops that turn the parsed JSON value `old` into `new` (see apply_ops)."""
+    ops: List[list] = []
+    _diff_value(old, new, [], ops)
+    return ops
+
+
+def apply_ops(value: Any, ops: List[list]) -> Any:
+    """Apply diff_json ops to `value` (mutated in place where possible); returns the result."""
+    for op in ops:
+        kind, path = op[0], op[1]
+        if not path:
+            if kind == 'r':
+                value = op[2]
+            elif kind == 's':
+                value = value[:op[2]] + op[4] + value[op[3]:]
+            elif kind == 'l':
+                value[op[2]:op[3]] = op[4]
+            continue
+        parent = value
+        for key in path[:-1]:
+            parent = parent[key]
+        last = path[-1]
+        if kind == 'r':
+            parent[last] = op[2]
+        elif kind == 'd':
+            del parent[last]
+        elif kind == 's':
+            parent[last] = parent[last][:op[2]] + op[4] + parent[last][op[3]:]
+        elif kind == 'l':
+            parent[last][op[2]:op[3]] = op[4]
+        else:
+            raise ValueError(f"Unknown delta op {kind!r}")
+    return value
+
+
+def _format_path(path: list) -> str:
+    text = ''
+    for key in path:
+        text += f'[{key}]' if isinstance(key, int) else (f'.{key}' if text else str(key))
+    return text or '(document)'
+
+
+def summarize_ops(ops: List[list], limit: int = 3) -> str:
+    """Short human-readable summary of a delta, e.g. '2 changes: title, sections[1].content'."""
+    if not ops:
+        return 'No changes'
+    paths: List[str] = []
+    for op in ops:
+        label = _format_path(op[1])
+        if op[0] == 'l':
+            label += ' (items added/removed)'
+        elif op[0] == 'd':
+            label += ' (removed)'
+        if label not in paths:
+            paths.append(label)
+    shown = ', '.join(paths[:limit])
+    more = f' and {len(paths) - limit} more' if len(paths) > limit else ''
+    noun = 'change' if len(ops) == 1 else 'changes'
+    return f'{len(ops)} {noun}: {shown}{more}'
+
+
+def _dump(value: Any, style: str) -> str:
+    return json.dumps(value, **_DUMP_STYLES[style])
+
+
+def _dump_style(text: str, value: Any) -> Optional[str]:
+    """The _DUMP_STYLES key that re-serializes `value` to exactly `text`, if any."""
+    for style in _DUMP_STYLES:
+        try:
+            if _dump(value, style) == text:
+                return style
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def _parse(text: Optional[str]) -> Tuple[bool, Any]:
+    if not text:
+        return False, None
+    try:
+        return True, json.loads(text)
+    except ValueError:
+        return False, None
+
+
+def encode_delta(ops: List[list], style: str) -> bytes:
+    return zlib.compress(json.dumps({'f': style, 'ops': ops}, ensure_ascii=False).encode('utf-8'), 6)
+
+
+def decode_delta(data: Any) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(bytes(data)).decode('utf-8'))
+
+
+def plan_version(base_text: Optional[str], base_chain_length: Optional[int], text: str) -> Dict[str, Any]:
+    """How to store `text` after a version whose content is `base_text`.
+
+    Returns storage_kind, delta (bytes or None), chain_length, content_size,
+    stored_size and change_summary.
+    """
+    text = text or ''
+    content_size = len(text.encode('utf-8'))
+    plan = {
+        'storage_kind': KIND_FULL,
+        'delta': None,
+        'chain_length': 0,
+        'content_size': content_size,
+        'stored_size': content_size,
+        'change_summary': 'Initial version' if base_text is None else 'Content replaced',
+    }
+    if base_text is None:
+        return plan
+
+    base_ok, base_value = _parse(base_text)
+    new_ok, new_value = _parse(text)
+    if not (base_ok and new_ok):
+        plan['change_summary'] = 'No changes' if base_text == text else 'Content replaced'
+        return plan
+
+    ops = diff_json(base_value, new_value)
+    plan['change_summary'] = summarize_ops(ops)
+    chain_length = (base_chain_length or 0) + 1
+    style = _dump_style(text, new_value)
+    if style is None or chain_length >= PROPOSAL_VERSION_SNAPSHOT_INTERVAL:
+        return plan
+
+    delta = encode_delta(ops, style)
+    if len(delta) >= content_size * PROPOSAL_VERSION_MAX_DELTA_RATIO:
+        return plan
+    # Only keep the delta if replaying it gives back exactly this text.
+    if _dump(apply_ops(json.loads(base_text), ops), style) != text:
+        return plan
+
+    plan.update({
+        'storage_kind': KIND_DELTA,
+        'delta': delta,
+        'chain_length': chain_length,
+        'stored_size': len(delta),
+    })
+    return plan
+
+
+def replay_chain(rows: List[Dict[str, Any]]) -> str:
+    """Content of the last row of a chain ordered snapshot first."""
+    if not rows or rows[0].get('storage_kind') == KIND_DELTA or rows[0].get('content') is None:
+        raise VersionChainError('Version chain does not start with a full snapshot')
+    text = rows[0]['content']
+    value = None
+    style = None
+    for row in rows[1:]:
+        if row.get('storage_kind') != KIND_DELTA:
+            text, value, style = row['content'], None, None
+            continue
+        payload = decode_delta(row['delta'])
+        if value is None:
+            value = json.loads(text)
+        value = apply_ops(value, payload['ops'])
+        style = payload['f']
+    return _dump(value, style) if style is not None else text
+
+
+# ---------------------------------------------------------------------------
+# Database access
+# ---------------------------------------------------------------------------
+
+def _dict_rows(cursor, rows) -> List[Dict[str, Any]]:
+    if not rows:
+        return []
+    if isinstance(rows[0], dict):
+        return [dict(r) for r in rows]
+    names = [d[0] for d in cursor.description]
+    return [dict(zip(names, r)) for r in rows]
+
+
+def reconstruct_content(cursor, version_id: int) -> Optional[str]:
+    """Full content of a proposal_versions row, replaying its delta chain; None if missing."""
+    cursor.execute(
+        """
+        WITH RECURSIVE chain AS (
+            SELECT id, base_version_id, storage_kind, content, delta, 0 AS depth
+            FROM proposal_versions
+            WHERE id = %s
+            UNION ALL
+            SELECT pv.id, pv.base_version_id, pv.storage_kind, pv.content, pv.delta, chain.depth + 1
+            FROM proposal_versions pv
+            JOIN chain ON pv.id = chain.base_version_id
+            WHERE chain.storage_kind = 'delta' AND chain.depth < %s
+        )
+        SELECT id, storage_kind, content, delta FROM chain ORDER BY depth DESC
+        """,
+        (version_id, PROPOSAL_VERSION_SNAPSHOT_INTERVAL * 4),
+    )
+    rows = _dict_rows(cursor, cursor.fetchall())
+    if not rows:
+        return None
+    return replay_chain(rows)
+
+
+def _latest_version(cursor, proposal_id) -> Optional[Dict[str, Any]]:
+    cursor.execute(
+        """
+        SELECT id, version_number, chain_length
+        FROM proposal_versions
+        WHERE proposal_id = %s
+        ORDER BY id DESC
+        LIMIT 1
+        FOR UPDATE
+        """,
+        (proposal_id,),
+    )
+    rows = _dict_rows(cursor, [r for r in [cursor.fetchone()] if r])
+    return rows[0] if rows else None
+
+
+def save_version(cursor, proposal_id, content: str, created_by=None, version_number: Optional[int] = None,
+                 change_description: Optional[str] = None) -> Dict[str, Any]:
+    """Insert a version as a snapshot or a delta on the proposal's latest version.
+
+    Locks the latest version row so concurrent saves of one proposal chain in
+    order. The caller commits. Returns the stored row's metadata.
+    """
+    content = content or ''
+    latest = _latest_version(cursor, proposal_id)
+    if version_number is None:
+        cursor.execute(
+            'SELECT COALESCE(MAX(version_number), 0) + 1 FROM proposal_versions WHERE proposal_id = %s',
+            (proposal_id,),
+        )
+        row = cursor.fetchone()
+        version_number = (row[0] if not isinstance(row, dict) else list(row.values())[0]) or 1
+
+    base_text = reconstruct_content(cursor, latest['id']) if latest else None
+    plan = plan_version(base_text, latest.get('chain_length') if latest else None, content)
+    is_delta = plan['storage_kind'] == KIND_DELTA
+
+    cursor.execute(
+        f"""
+        INSERT INTO proposal_versions
+            (proposal_id, version_number, content, created_by, change_description,
+             storage_kind, base_version_id, delta, chain_length, content_size, stored_size, change_summary)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        RETURNING {_METADATA_COLUMNS.replace('pv.', '')}
+        """,
+        (
+            proposal_id,
+            version_number,
+            None if is_delta else content,
+            created_by,
+            change_description,
+            plan['storage_kind'],
+            latest['id'] if is_delta else None,
+            plan['delta'],
+            plan['chain_length'],
+            plan['content_size'],
+            plan['stored_size'],
+            plan['change_summary'],
+        ),
+    )
+    saved = _dict_rows(cursor, [cursor.fetchone()])[0]
+    if base_text is not None:
+        _store_adjacent_diff(cursor, latest['id'], saved['id'], base_text, content)
+    return saved
+
+
+def _store_adjacent_diff(cursor, from_version_id: int, to_version_id: int, base_text: str, text: str) -> None:
+    """Cache the diff against the previous version so the history view can read it back."""
+    # Imported here: version_diff builds on this module.
+    from api.utils.version_diff import diff_texts, store_diff
+
+    try:
+        diff = diff_texts(base_text, text)
+    except Exception as exc:
+        print(f"[WARN] Could not diff version {to_version_id} against {from_version_id}: {exc}")
+        return
+    cursor.execute('SAVEPOINT version_diff')
+    try:
+        store_diff(cursor, from_version_id, to_version_id, diff)
+        cursor.execute('RELEASE SAVEPOINT version_diff')
+    except Exception as exc:
+        cursor.execute('ROLLBACK TO SAVEPOINT version_diff')
+        print(f"[WARN] Could not cache diff for version {to_version_id}: {exc}")
+
+
+def serialize_version(row: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-ready version metadata (timestamps as ISO strings)."""
+    out = dict(row)
+    created_at = out.get('created_at')
+    if created_at is not None and hasattr(created_at, 'isoformat'):
+        out['created_at'] = created_at.isoformat()
+    return out
+
+
+def list_versions(cursor, proposal_id) -> List[Dict[str, Any]]:
+    """Version metadata for a proposal, newest first; never reads content or deltas."""
+    cursor.execute(
+        f"""
+        SELECT {_METADATA_COLUMNS},
+               u.full_name AS created_by_name, u.email AS created_by_email
+        FROM proposal_versions pv
+        LEFT JOIN users u ON pv.created_by = u.id
+        WHERE pv.proposal_id = %s
+        ORDER BY pv.version_number DESC, pv.id DESC
+        """,
+        (proposal_id,),
+    )
+    return [serialize_version(r) for r in _dict_rows(cursor, cursor.fetchall())]
+
+
+def load_all_contents(cursor, proposal_id) -> Dict[int, str]:
+    """Content of every version of a proposal keyed by id, replaying each delta once."""
+    cursor.execute(
+        """
+        SELECT id, base_version_id, storage_kind, content, delta
+        FROM proposal_versions
+        WHERE proposal_id = %s
+        ORDER BY id
+        """,
+        (proposal_id,),
+    )
+    texts: Dict[int, str] = {}
+    last_id, last_value = None, None
+    for row in _dict_rows(cursor, cursor.fetchall()):
+        if row['storage_kind'] != KIND_DELTA:
+            texts[row['id']] = row['content']
+            last_id, last_value = None, None
+            continue
+        base_id = row['base_version_id']
+        if base_id == last_id and last_value is not None:
+            value = last_value
+        elif base_id in texts:
+            value = json.loads(texts[base_id])
+        else:
+            texts[row['id']] = reconstruct_content(cursor, row['id'])
+            last_id, last_value = None, None
+            continue
+        payload = decode_delta(row['delta'])
+        value = apply_ops(value, payload['ops'])
+        texts[row['id']] = _dump(value, payload['f'])
+        last_id, last_value = row['id'], value
+    return texts
+
+
+def get_version_by_number(cursor, proposal_id, version_number: int) -> Optional[Dict[str, Any]]:
+    """Metadata and reconstructed content of one version (the latest row if numbers repeat)."""
+    cursor.execute(
+        f"""
+        SELECT {_METADATA_COLUMNS}
+        FROM proposal_versions pv
+        WHERE pv.proposal_id = %s AND pv.version_number = %s
+        ORDER BY pv.id DESC
+        LIMIT 1
+        """,
+        (proposal_id, version_number),
+    )
+    rows = _dict_rows(cursor, [r for r in [cursor.fetchone()] if r])
+    if not rows:
+        return None
+    version = serialize_version(rows[0])
+    version['content'] = reconstruct_content(cursor, version['id'])
+    return version
+
+
+def compact_versions(batch_size: int = 100, proposal_id=None) -> int:
+    """Rewrite pre-migration full versions into snapshot + delta chains; returns rows updated.
+
+    Works one proposal per transaction, in proposal_id order. Legacy rows still
+    used as the base of a newer delta stay full, so existing chains stay valid.
+    Safe to re-run: only rows with chain_length NULL are touched.
+    """
+    from api.utils.database import get_db_connection
+
+    updated = 0
+    last_proposal = None
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        while True:
+            if proposal_id is not None:
+                proposal_ids = [proposal_id] if last_proposal is None else []
+            else:
+                cursor.execute(
+                    """
+                    SELECT DISTINCT proposal_id FROM proposal_versions
+                    WHERE chain_length IS NULL AND (%s::integer IS NULL OR proposal_id > %s::integer)
+                    ORDER BY proposal_id
+                    LIMIT %s
+                    """,
+                    (last_proposal, last_proposal, batch_size),
+                )
+                proposal_ids = [r[0] for r in cursor.fetchall() or []]
+            conn.commit()
+            if not proposal_ids:
+                break
+            for pid in proposal_ids:
+                updated += _compact_proposal(cursor, pid)
+                conn.commit()
+                last_proposal = pid
+            print(f"[VERSIONS] Compacted {updated} versions (last proposal {last_proposal})")
+    return updated
+
+
+def _compact_proposal(cursor, proposal_id) -> int:
+    cursor.execute(
+        """
+        SELECT pv.id, pv.content,
+               EXISTS (SELECT 1 FROM proposal_versions d WHERE d.base_version_id = pv.id) AS is_base
+        FROM proposal_versions pv
+        WHERE pv.proposal_id = %s AND pv.chain_length IS NULL
+        ORDER BY pv.id
+        FOR UPDATE
+        """,
+        (proposal_id,),
+    )
+    rows = _dict_rows(cursor, cursor.fetchall())
+    prev_id, prev_text, prev_chain = None, None, None
+    for row in rows:
+        text = row['content'] or ''
+        plan = plan_version(prev_text, prev_chain, text)
+        if row['is_base'] and plan['storage_kind'] == KIND_DELTA:
+            plan.update({'storage_kind': KIND_FULL, 'delta': None, 'chain_length': 0,
+                         'stored_size': plan['content_size']})
+        is_delta = plan['storage_kind'] == KIND_DELTA
+        cursor.execute(
+            """
+            UPDATE proposal_versions
+            SET storage_kind = %s, base_version_id = %s, delta = %s, content = %s,
+                chain_length = %s, content_size = %s, stored_size = %s,
+                change_summary = COALESCE(change_summary, %s)
+            WHERE id = %s
+            """,
+            (
+                plan['storage_kind'],
+                prev_id if is_delta else None,
+                plan['delta'],
+                None if is_delta else text,
+                plan['chain_length'],
+                plan['content_size'],
+                plan['stored_size'],
+                plan['change_summary'],
+                row['id'],
+            ),
+        )
+        prev_id, prev_text, prev_chain = row['id'], text, plan['chain_length']
+    return len(rows)
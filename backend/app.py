@@ -7,7 +7,6 @@ import hashlib
 import hmac
 import secrets
 import smtplib
-import difflib
 import inspect
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -60,7 +59,7 @@ except ImportError:
     # DocuSign SDK missing: warn user (emoji-friendly message)
     print("⚠️ DocuSign SDK not installed. Run: pip install docusign-esign")
 from cryptography.fernet import Fernet
-from flask import Flask, request, jsonify, send_file, Response, send_from_directory, has_request_context, render_template, redirect, url_for, session
+from flask import Flask, request, jsonify, send_file, Response, send_from_directory, has_request_context, render_template, redirect, url_for, session, make_response
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -70,7 +69,24 @@ from asgiref.wsgi import WsgiToAsgi
 import openai
 from dotenv import load_dotenv
 from api.utils.ai_safety import AISafetyError
-from api.utils.decorators import token_required as firebase_token_required
+from api.utils.email_outbox import start_email_workers
+from api.utils.ai_jobs import start_ai_job_workers
+from api.utils.decorators import token_required as firebase_token_required, get_request_identity
+from api.utils.identity_cache import get_identity_cache
+from api.utils.auth import generate_token, verify_token, import_legacy_tokens
+from api.utils.session_store import start_session_sweeper
+from api.utils.migrations import ensure_migrations
+from api.utils.firebase_token_cache import token_cache_stats
+from api.utils.ai_upstream import ai_upstream_stats
+from api.utils.version_diff import compare_versions
+from api.utils.proposal_financials import refresh_proposal_financials_safe
+from api.utils.version_store import load_all_contents, reconstruct_content, save_version, serialize_version
+from api.utils.database import (
+    get_pg_pool as _shared_get_pg_pool,
+    _pg_conn as _shared_pg_conn,
+    release_pg_conn as _shared_release_pg_conn,
+    get_pg_pool_stats,
+)
 from api.utils.profile_avatar import (
     fetch_user_profile_dict_by_username,
     patch_user_profile_avatar,
@@ -337,7 +353,14 @@ CORS(
         "X-Device-Id",
     ],
     methods=["GET", "HEAD", "POST", "OPTIONS", "PUT", "PATCH", "DELETE"],
-    expose_headers=["Content-Type", "Authorization"],
+    expose_headers=[
+        "Content-Type",
+        "Authorization",
+        "Content-Disposition",
+        "Content-Length",
+        "X-Export-Row-Count",
+        "X-Export-Format",
+    ],
 )
 
 # Register API blueprints first so GET/OPTIONS on /api/finance/export/* match blueprint, not catch-all
@@ -384,7 +407,13 @@ def root():
 
 @app.route("/health", methods=["GET", "HEAD"])
 def health():
-    return {"status": "ok"}, 200
+    return {
+        "status": "ok",
+        "db_pool": get_pg_pool_stats(),
+        "identity_cache": get_identity_cache().stats(),
+        "firebase_token_cache": token_cache_stats(),
+        "ai_upstream": ai_upstream_stats(),
+    }, 200
 
 # Catch-all OPTIONS after blueprints so specific routes (e.g. finance export) handle their path first
 @app.route("/", methods=["OPTIONS"])
@@ -564,71 +593,18 @@ def _build_db_config_from_env():
     }
 
 def get_pg_pool():
+    # Share the API's thread-safe pool instead of opening a second one per process.
     global _pg_pool
     if _pg_pool is None:
-        import psycopg2.pool
-        try:
-            db_config = _build_db_config_from_env()
-            # Helpful hint for a common Render misconfiguration:
-            # Render "Internal Database URL" hosts often look like "dpg-xxxx-a" (no dots).
-            # That value won't resolve outside Render's internal network; in that case you
-            # must use the External Database URL / full host like "dpg-xxxx-a.<region>-postgres.render.com".
-            host = (db_config.get('host') or '').strip()
-            if host.startswith('dpg-') and '.' not in host:
-                print(
-                    "[WARN] DB host looks like a Render internal hostname without a domain "
-                    f"({host!r}). If this service is not on Render's private network, "
-                    "set DATABASE_URL to the External Database URL (with a full *.render.com hostname) "
-                    "or set DB_HOST to the full hostname."
-                )
-            if 'sslmode' in db_config:
-                print(f"[*] Using SSL mode: {db_config['sslmode']} for external connection")
-            print(f"[*] Connecting to PostgreSQL: {db_config['host']}:{db_config['port']}/{db_config['database']}")
-            _pg_pool = psycopg2.pool.SimpleConnectionPool(
-                minconn=1,
-                maxconn=20,  # Increased max connections
-                **db_config
-            )
-            print("[OK] PostgreSQL connection pool created successfully")
-        except Exception as e:
-            print(f"[ERROR] Error creating PostgreSQL connection pool: {e}")
-            raise
+        _pg_pool = _shared_get_pg_pool()
     return _pg_pool
 
 def _pg_conn():
-    try:
-        return get_pg_pool().getconn()
-    except Exception as e:
-        print(f"[ERROR] Error getting PostgreSQL connection: {e}")
-        raise
+    get_pg_pool()
+    return _shared_pg_conn()
 
 def release_pg_conn(conn):
-    try:
-        if conn:
-            try:
-                import psycopg2.extensions as ext
-                tx_status = conn.get_transaction_status()
-                if tx_status in (
-                    ext.TRANSACTION_STATUS_INTRANS,
-                    ext.TRANSACTION_STATUS_INERROR,
-                ):
-                    conn.rollback()
-            except Exception:
-                pass
-            try:
-                conn.autocommit = False
-            except Exception:
-                pass
-            try:
-                get_pg_pool().putconn(conn)
-            except psycopg2.pool.PoolError:
-                try:
-                    conn.close()
-                except Exception:
-                    pass
-                return
-    except Exception as e:
-        print(f"[WARN] Error releasing PostgreSQL connection: {e}")
+    _shared_release_pg_conn(conn)
 
 # Context manager for automatic connection cleanup
 from contextlib import contextmanager
@@ -1109,6 +1085,13 @@ def init_pg_schema():
                 pass
         raise
 
+def _apply_migrations():
+    """Versioned migrations (api/utils/migrations.py); a failed one is retried next startup."""
+    try:
+        ensure_migrations()
+    except Exception as e:
+        print(f"[WARN] Schema migrations incomplete: {e}")
+
 # Initialize database schema on first request
 @app.before_request
 def init_db():
@@ -1121,6 +1104,7 @@ def init_db():
             return
         print("[*] Initializing PostgreSQL schema (no request context)...")
         init_pg_schema()
+        _apply_migrations()
         _db_initialized = True
         print("[OK] Database schema initialized successfully")
         return
@@ -1144,50 +1128,23 @@ def init_db():
     try:
         print("[*] Initializing PostgreSQL schema...")
         init_pg_schema()
+        _apply_migrations()
         _db_initialized = True
         print("[OK] Database schema initialized successfully")
     except Exception as e:
         print(f"[ERROR] Database initialization error: {e}")
         raise
-
-# Auth token storage (in production, use Redis or session manager)
-# File-based persistence to survive restarts
-TOKEN_FILE = os.path.join(os.path.dirname(__file__), 'auth_tokens.json')
-
-def load_tokens():
-    """Load tokens from file"""
+    # Drain emails left queued by a previous process.
+    start_email_workers()
+    # AI jobs normally run in ai_job_worker.py; AI_JOBS_EMBEDDED_WORKERS runs them here too.
+    start_ai_job_workers()
+    # Legacy auth tokens live in the auth_sessions table now; carry over any left
+    # in the old auth_tokens.json and start the expired-session sweeper.
     try:
-        if os.path.exists(TOKEN_FILE):
-            with open(TOKEN_FILE, 'r') as f:
-                data = json.load(f)
-                # Convert string timestamps back to datetime objects
-                for token, token_data in data.items():
-                    token_data['created_at'] = datetime.fromisoformat(token_data['created_at'])
-                    token_data['expires_at'] = datetime.fromisoformat(token_data['expires_at'])
-                print(f"[INFO] Loaded {len(data)} tokens from file")
-                return data
+        import_legacy_tokens()
     except Exception as e:
-        print(f"[WARN] Could not load tokens from file: {e}")
-    return {}
-
-def save_tokens():
-    """Save tokens to file"""
-    try:
-        # Convert datetime objects to strings for JSON serialization
-        data = {}
-        for token, token_data in valid_tokens.items():
-            data[token] = {
-                'username': token_data['username'],
-                'created_at': token_data['created_at'].isoformat(),
-                'expires_at': token_data['expires_at'].isoformat()
-            }
-        with open(TOKEN_FILE, 'w') as f:
-            json.dump(data, f, indent=2)
-        print(f"[INFO] Saved {len(data)} tokens to file")
-    except Exception as e:
-        print(f"[WARN] Could not save tokens to file: {e}")
-
-valid_tokens = load_tokens()
+        print(f"[WARN] Could not import legacy auth tokens: {e}")
+    start_session_sweeper()
 
 # ============================================================================
 # ACTIVITY LOG HELPER
@@ -1245,7 +1202,7 @@ def create_notification(user_id, notification_type, title, message, proposal_id=
         print(f"⚠️ Failed to create notification: {e}")
         # Don't raise - notification should not break main functionality
 
-def notify_proposal_collaborators(proposal_id, notification_type, title, message, exclude_user_id=None, metadata=None):
+def notify_proposal_collaborators(proposal_id, notification_type, title, message, exclude_user_id=None, metadata=None, cursor=None):
     """
     Notify all collaborators on a proposal
     
@@ -1256,38 +1213,19 @@ def notify_proposal_collaborators(proposal_id, notification_type, title, message
         message: Notification message
         exclude_user_id: Optional user ID to exclude from notifications (e.g., the person who made the change)
         metadata: Optional dict with additional data
+        cursor: Optional cursor whose transaction receives the notifications (the caller commits)
     """
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            
-            # Get proposal owner
-            cursor.execute("SELECT user_id FROM proposals WHERE id = %s", (proposal_id,))
-            proposal = cursor.fetchone()
-            if not proposal:
-                return
-            
-            # Get owner's user ID
-            cursor.execute("SELECT id FROM users WHERE username = %s", (proposal['user_id'],))
-            owner = cursor.fetchone()
-            if owner and owner['id'] != exclude_user_id:
-                create_notification(owner['id'], notification_type, title, message, proposal_id, metadata)
-            
-            # Get all collaborators
-            cursor.execute("""
-                SELECT DISTINCT u.id
-                FROM collaboration_invitations ci
-                JOIN users u ON ci.invited_email = u.email
-                WHERE ci.proposal_id = %s AND ci.status = 'accepted'
-            """, (proposal_id,))
-            
-            collaborators = cursor.fetchall()
-            for collab in collaborators:
-                if collab['id'] != exclude_user_id:
-                    create_notification(collab['id'], notification_type, title, message, proposal_id, metadata)
-                    
-    except Exception as e:
-        print(f"⚠️ Failed to notify collaborators: {e}")
+    # Recipients are resolved in one query and notified in one transaction.
+    from api.utils.helpers import notify_proposal_collaborators as _shared_notify_proposal_collaborators
+    _shared_notify_proposal_collaborators(
+        proposal_id,
+        notification_type,
+        title,
+        message,
+        exclude_user_id=exclude_user_id,
+        metadata=metadata,
+        cursor=cursor,
+    )
 
 # ============================================================================
 # MENTION HELPER
@@ -1307,7 +1245,7 @@ def extract_mentions(text):
     mentions = re.findall(pattern, text)
     return list(set(mentions))  # Remove duplicates
 
-def process_mentions(comment_id, comment_text, mentioned_by_user_id, proposal_id):
+def process_mentions(comment_id, comment_text, mentioned_by_user_id, proposal_id, cursor=None):
     """
     Process @mentions in a comment
     - Extract mentions from text
@@ -1320,92 +1258,19 @@ def process_mentions(comment_id, comment_text, mentioned_by_user_id, proposal_id
         comment_text: Text of the comment
         mentioned_by_user_id: ID of user who created the comment
         proposal_id: ID of the proposal
+        cursor: Optional cursor whose transaction receives the mentions (the caller commits)
     """
-    try:
-        mentions = extract_mentions(comment_text)
-        if not mentions:
-            return
-        
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            
-            # Get the commenter's name
-            cursor.execute("SELECT full_name FROM users WHERE id = %s", (mentioned_by_user_id,))
-            commenter = cursor.fetchone()
-            commenter_name = commenter['full_name'] if commenter else 'Someone'
-            
-            for mention in mentions:
-                mention_value = mention.strip()
-                mention_base = mention_value
-                mention_role = None
-
-                # Support persona-tag mentions such as "@yohyoh-admin"
-                # by resolving username + role combination first.
-                if '@' not in mention_value and '-' in mention_value:
-                    base_candidate, role_candidate = mention_value.rsplit('-', 1)
-                    if base_candidate and role_candidate:
-                        mention_base = base_candidate
-                        mention_role = role_candidate.replace('_', ' ').lower().strip()
-
-                if mention_role:
-                    cursor.execute("""
-                        SELECT id, full_name, email FROM users
-                        WHERE username = %s
-                          AND LOWER(COALESCE(role, '')) IN (%s, %s)
-                    """, (mention_base, mention_role, mention_role.replace('_', ' ')))
-                    mentioned_user = cursor.fetchone()
-                else:
-                    mentioned_user = None
-
-                if not mentioned_user:
-                    # Try to find user by username or email
-                    cursor.execute("""
-                        SELECT id, full_name, email FROM users 
-                        WHERE username = %s OR email = %s OR email LIKE %s
-                    """, (mention_value, mention_value, f'{mention_value}@%'))
-                    mentioned_user = cursor.fetchone()
-
-                if not mentioned_user and mention_base != mention_value:
-                    # Fallback to username-only for persona-tag format
-                    cursor.execute("""
-                        SELECT id, full_name, email FROM users
-                        WHERE username = %s
-                    """, (mention_base,))
-                    mentioned_user = cursor.fetchone()
-
-                if not mentioned_user:
-                    print(f"⚠️ Mentioned user not found: @{mention_value}")
-                    continue
-                
-                # Don't mention yourself
-                if mentioned_user['id'] == mentioned_by_user_id:
-                    continue
-                
-                # Create mention record
-                cursor.execute("""
-                    INSERT INTO comment_mentions 
-                    (comment_id, mentioned_user_id, mentioned_by_user_id)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT DO NOTHING
-                """, (comment_id, mentioned_user['id'], mentioned_by_user_id))
-                
-                # Send notification
-                create_notification(
-                    mentioned_user['id'],
-                    'mentioned',
-                    'You were mentioned',
-                    f"{commenter_name} mentioned you in a comment",
-                    proposal_id,
-                    {'comment_id': comment_id, 'mentioned_by': mentioned_by_user_id}
-                )
-                
-                print(f"✅ Notified @{mentioned_user['email']} about mention")
-            
-            conn.commit()
-            
-    except Exception as e:
-        print(f"⚠️ Failed to process mentions: {e}")
-        traceback.print_exc()
+    # Handles (including "@name-role" persona tags) are resolved in one query and
+    # mention rows + notifications are written with multi-row INSERTs.
+    from api.utils.helpers import process_mentions as _shared_process_mentions
+    _shared_process_mentions(
+        comment_id,
+        comment_text,
+        mentioned_by_user_id,
+        proposal_id,
+        send_email_flag=False,
+        cursor=cursor,
+    )
 
 # ============================================================================
 # DOCUSIGN HELPER FUNCTIONS
@@ -1801,34 +1666,6 @@ def hash_password(password):
 def verify_password(stored_hash, password):
     return check_password_hash(stored_hash, password)
 
-def generate_token(username):
-    token = secrets.token_urlsafe(32)
-    valid_tokens[token] = {
-        'username': username,
-        'created_at': datetime.now(),
-        'expires_at': datetime.now() + timedelta(days=7)
-    }
-    save_tokens()  # Persist to file
-    print(f"[TOKEN] Generated new token for user '{username}': {token[:20]}...{token[-10:]}")
-    print(f"[TOKEN] Total valid tokens: {len(valid_tokens)}")
-    return token
-
-def verify_token(token):
-    # Dev bypass for testing
-    if token == 'dev-bypass-token':
-        print("[DEV] Using dev-bypass-token for username: admin")
-        return 'admin'
-    
-    if token not in valid_tokens:
-        return None
-    token_data = valid_tokens[token]
-    if datetime.now() > token_data['expires_at']:
-        del valid_tokens[token]
-        save_tokens()  # Persist after deleting expired token
-        return None
-    return token_data['username']
-
-
 def send_email(to_email, subject, html_content):
     """Send email using SMTP"""
     try:
@@ -1921,11 +1758,9 @@ def token_required(f):
             print(f"[ERROR] No token found in Authorization header")
             return {'detail': 'Token is missing'}, 401
         
-        print(f"[TOKEN] Validating token... (valid_tokens has {len(valid_tokens)} tokens)")
         username = verify_token(token)
         if not username:
             print(f"[ERROR] Token validation failed - token not found or expired")
-            print(f"[TOKEN] Current valid tokens: {list(valid_tokens.keys())[:3]}...")
             return {'detail': 'Invalid or expired token'}, 401
         
         print(f"[OK] Token validated for user: {username}")
@@ -1935,13 +1770,8 @@ def token_required(f):
 def admin_required(f):
     @wraps(f)
     def decorated(username=None, *args, **kwargs):
-        conn = _pg_conn()
-        cursor = conn.cursor()
-        cursor.execute('SELECT role FROM users WHERE username = %s', (username,))
-        result = cursor.fetchone()
-        release_pg_conn(conn)
-        
-        if not result or result[0] != 'admin':
+        identity = get_request_identity(username)
+        if identity is None or identity.role != 'admin':
             return {'detail': 'Admin access required'}, 403
         
         return f(username=username, *args, **kwargs)
@@ -2507,6 +2337,7 @@ def submit_for_review(username, proposal_id):
             (proposal_id,)
         )
         result = cursor.fetchone()
+        refresh_proposal_financials_safe(cursor, proposal_id)
         conn.commit()
         release_pg_conn(conn)
         return {'detail': 'Proposal submitted'}, 200
@@ -2556,6 +2387,7 @@ def send_for_approval(username, proposal_id):
                 ('Pending CEO Approval', proposal_id)
             )
             result = cursor.fetchone()
+            refresh_proposal_financials_safe(cursor, proposal_id)
             conn.commit()
             
             print(f"✅ Proposal {proposal_id} sent for approval")
@@ -2602,6 +2434,7 @@ def approve_proposal(username, proposal_id):
                 ('Sent to Client', proposal_id)
             )
             result = cursor.fetchone()
+            refresh_proposal_financials_safe(cursor, proposal_id)
             conn.commit()
             
             if result:
@@ -2711,6 +2544,7 @@ def reject_proposal(username, proposal_id):
                 ('draft', proposal_id)
             )
             result = cursor.fetchone()
+            refresh_proposal_financials_safe(cursor, proposal_id)
             conn.commit()
             
             if result:
@@ -2745,6 +2579,7 @@ def update_proposal_status(username, proposal_id):
             '''UPDATE proposals SET status = %s WHERE id = %s''',
             (status, proposal_id)
         )
+        refresh_proposal_financials_safe(cursor, proposal_id)
         conn.commit()
         release_pg_conn(conn)
         return {'detail': 'Status updated'}, 200
@@ -2761,6 +2596,7 @@ def send_to_client(username, proposal_id):
             '''UPDATE proposals SET status = 'Sent to Client' WHERE id = %s''',
             (proposal_id,)
         )
+        refresh_proposal_financials_safe(cursor, proposal_id)
         conn.commit()
         release_pg_conn(conn)
         return {'detail': 'Proposal sent to client'}, 200
@@ -2779,6 +2615,7 @@ def client_decline_proposal(username, proposal_id):
             '''UPDATE proposals SET status = 'Client Declined' WHERE id = %s''',
             (proposal_id,)
         )
+        refresh_proposal_financials_safe(cursor, proposal_id)
         conn.commit()
         release_pg_conn(conn)
         return {'detail': 'Proposal declined'}, 200
@@ -2863,6 +2700,7 @@ def sign_off(username, proposal_id):
             '''UPDATE proposals SET status = 'Signed' WHERE id = %s''',
             (proposal_id,)
         )
+        refresh_proposal_financials_safe(cursor, proposal_id)
         conn.commit()
         release_pg_conn(conn)
         return {'detail': 'Proposal signed'}, 200
@@ -2885,6 +2723,7 @@ def approve_stage(username, proposal_id):
             '''UPDATE proposals SET status = %s WHERE id = %s''',
             (f'Approved - {stage}', proposal_id)
         )
+        refresh_proposal_financials_safe(cursor, proposal_id)
         conn.commit()
         release_pg_conn(conn)
         return {'detail': 'Stage approved'}, 200
@@ -2972,6 +2811,7 @@ def client_sign_proposal(username, proposal_id):
             '''UPDATE proposals SET status = 'Client Signed' WHERE id = %s''',
             (proposal_id,)
         )
+        refresh_proposal_financials_safe(cursor, proposal_id)
         conn.commit()
         release_pg_conn(conn)
         return {'detail': 'Proposal signed by client'}, 200
@@ -3090,18 +2930,19 @@ def create_comment(username, proposal_id):
                 {'comment_id': result['id'], 'section_index': section_index}
             )
             
-            # Notify proposal owner and collaborators
+            # Notify proposal owner and collaborators, and process @mentions,
+            # on this request's connection
             notify_proposal_collaborators(
                 proposal_id,
                 'comment_added',
                 'New Comment',
                 f"{user['full_name']} commented{section_text}",
                 exclude_user_id=user_id,
-                metadata={'comment_id': result['id'], 'section_index': section_index}
+                metadata={'comment_id': result['id'], 'section_index': section_index},
+                cursor=cursor,
             )
-            
-            # Process @mentions in the comment
-            process_mentions(result['id'], comment_text, user_id, proposal_id)
+            process_mentions(result['id'], comment_text, user_id, proposal_id, cursor=cursor)
+            conn.commit()
             
             return {
                 'id': result['id'],
@@ -3192,35 +3033,24 @@ def create_version(username, proposal_id):
             user_row = cursor.fetchone()
             user_id = user_row[0] if user_row else None
             
-            cursor.execute(
-                '''INSERT INTO proposal_versions 
-                   (proposal_id, version_number, content, created_by, change_description)
-                   VALUES (%s, %s, %s, %s, %s)
-                   RETURNING id, proposal_id, version_number, content, created_by, created_at, change_description''',
-                (
-                    proposal_id,
-                    data.get('version_number', 1),
-                    data.get('content', ''),
-                    user_id,
-                    data.get('change_description', 'Version created')
-                )
+            content = data.get('content', '')
+            result = save_version(
+                cursor,
+                proposal_id,
+                content,
+                created_by=user_id,
+                version_number=data.get('version_number', 1),
+                change_description=data.get('change_description', 'Version created'),
             )
-            result = cursor.fetchone()
             conn.commit()
             
-            version = {
-                'id': result[0],
-                'proposal_id': result[1],
-                'version_number': result[2],
-                'content': result[3],
-                'created_by': result[4],
-                'created_by_name': None,
-                'created_by_email': None,
-                'created_at': result[5].isoformat() if result[5] else None,
-                'change_description': result[6]
-            }
+            version = serialize_version(result)
+            version['content'] = content
+            version['created_by_name'] = None
+            version['created_by_email'] = None
             
-            print(f"✅ Version {result[2]} created for proposal {proposal_id}")
+            print(f"✅ Version {version['version_number']} created for proposal {proposal_id} "
+                  f"({version['storage_kind']}, {version['stored_size']} of {version['content_size']} bytes)")
             # Try to populate creator name/email
             try:
                 cursor.execute('SELECT full_name, email FROM users WHERE id = %s', (version['created_by'],))
@@ -3255,6 +3085,7 @@ def get_versions(username, proposal_id):
                 (proposal_id,)
             )
             rows = cursor.fetchall()
+            contents = load_all_contents(cursor, proposal_id) if rows else {}
 
             versions = []
             for row in rows:
@@ -3262,7 +3093,7 @@ def get_versions(username, proposal_id):
                     'id': row[0],
                     'proposal_id': row[1],
                     'version_number': row[2],
-                    'content': row[3],
+                    'content': contents.get(row[0], row[3]),
                     'created_by': row[4],
                     'created_by_name': row[7],
                     'created_by_email': row[8],
@@ -3302,7 +3133,7 @@ def get_version(username, proposal_id, version_number):
                 'id': row[0],
                 'proposal_id': row[1],
                 'version_number': row[2],
-                'content': row[3],
+                'content': row[3] if row[3] is not None else reconstruct_content(cursor, row[0]),
                 'created_by': row[4],
                 'created_by_name': row[7],
                 'created_by_email': row[8],
@@ -4464,105 +4295,33 @@ def client_export_proposal_pdf(proposal_id):
             if err_body:
                 return err_body, err_code
 
-            # Compute a lightweight cache key/etag from the proposal version.
-            # This allows fast 304 responses and avoids regenerating heavy PDFs.
-            import hashlib
+            # The shared generator caches renders on disk keyed by a content hash; the same
+            # hash is the ETag, so unchanged proposals get a 304 without rendering.
             import time
-            proposal_title = (proposal.get('title') or f"Proposal {proposal_id}")
-            proposal_content = proposal.get('content', '') or ''
-            proposal_updated_at = proposal.get('updated_at')
-            updated_label = (
-                proposal_updated_at.isoformat() if hasattr(proposal_updated_at, 'isoformat') else str(proposal_updated_at or '')
+            from api.utils.helpers import (
+                generate_proposal_pdf as _shared_generate_proposal_pdf,
+                proposal_pdf_etag,
             )
-            # IMPORTANT: Do NOT hash the entire proposal content here. For large JSON payloads,
-            # that can take minutes and defeats caching.
-            # We rely on proposals.updated_at being updated whenever content changes.
-            content_len = len(str(proposal_content))
-            cache_key_material = f"{proposal_id}|{updated_label}|{content_len}".encode('utf-8')
-            etag = hashlib.sha256(cache_key_material).hexdigest()
+            from api.utils.pdf_cache import etag_matches
 
-            t0 = time.perf_counter()
+            pdf_args = dict(
+                proposal_id=proposal_id,
+                title=(proposal.get('title') or f"Proposal {proposal_id}"),
+                content=proposal.get('content', '') or '',
+                client_name=proposal.get('client_name'),
+                client_email=proposal.get('client_email'),
+            )
+            etag = proposal_pdf_etag(**pdf_args)
 
-            inm = (request.headers.get('If-None-Match') or '').strip('"')
-            if not download and inm and inm == etag:
+            if not download and etag_matches(request.headers.get('If-None-Match'), etag):
                 resp = make_response('', 304)
                 resp.headers['ETag'] = f'"{etag}"'
                 resp.headers['Cache-Control'] = 'private, max-age=300'
                 return resp
 
-            # Best-effort server-side cache table.
-            # Using BYTEA keeps this self-contained (no extra storage service).
-            global _pdf_cache_table_ready
-            try:
-                _pdf_cache_table_ready
-            except NameError:
-                _pdf_cache_table_ready = False
-
-            if not _pdf_cache_table_ready:
-                try:
-                    cursor.execute(
-                        """
-                        CREATE TABLE IF NOT EXISTS proposal_pdf_cache (
-                            proposal_id INTEGER NOT NULL,
-                            cache_key VARCHAR(64) NOT NULL,
-                            pdf_bytes BYTEA NOT NULL,
-                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                            PRIMARY KEY (proposal_id, cache_key)
-                        )
-                        """
-                    )
-                    conn.commit()
-                    _pdf_cache_table_ready = True
-                except Exception:
-                    # Cache is optional; never break export.
-                    _pdf_cache_table_ready = False
-
-            cached_pdf = None
-            try:
-                cursor.execute(
-                    """
-                    SELECT pdf_bytes
-                    FROM proposal_pdf_cache
-                    WHERE proposal_id = %s AND cache_key = %s
-                    """,
-                    (proposal_id, etag),
-                )
-                row = cursor.fetchone()
-                if row and (row.get('pdf_bytes') if isinstance(row, dict) else row[0]):
-                    cached_pdf = row.get('pdf_bytes') if isinstance(row, dict) else row[0]
-            except Exception:
-                cached_pdf = None
-
-            if cached_pdf:
-                print(f"[PDF] cache_hit proposal_id={proposal_id} etag={etag[:12]} ms={(time.perf_counter()-t0)*1000:.0f}")
-                resp = send_file(
-                    BytesIO(cached_pdf),
-                    mimetype='application/pdf',
-                    as_attachment=download,
-                    download_name=f"Proposal_{proposal_id}.pdf",
-                )
-                if download:
-                    resp.headers['Cache-Control'] = 'no-store'
-                else:
-                    resp.headers['ETag'] = f'"{etag}"'
-                    resp.headers['Cache-Control'] = 'private, max-age=300'
-                return resp
-
-            print(f"[PDF] cache_miss proposal_id={proposal_id} etag={etag[:12]} ms={(time.perf_counter()-t0)*1000:.0f}")
             gen0 = time.perf_counter()
-
-            # Use the shared PDF generator (clean, paginated, DocuSign anchor-aware)
-            from api.utils.helpers import generate_proposal_pdf as _shared_generate_proposal_pdf
-
-            pdf_bytes = _shared_generate_proposal_pdf(
-                proposal_id=proposal_id,
-                title=proposal_title,
-                content=proposal_content,
-                client_name=proposal.get('client_name'),
-                client_email=proposal.get('client_email'),
-            )
-
-            print(f"[PDF] generated proposal_id={proposal_id} bytes={len(pdf_bytes) if pdf_bytes else 0} ms={(time.perf_counter()-gen0)*1000:.0f}")
+            pdf_bytes = _shared_generate_proposal_pdf(**pdf_args)
+            print(f"[PDF] proposal_id={proposal_id} etag={etag[:12]} bytes={len(pdf_bytes) if pdf_bytes else 0} ms={(time.perf_counter()-gen0)*1000:.0f}")
 
             if not pdf_bytes or not isinstance(pdf_bytes, (bytes, bytearray)) or not pdf_bytes.startswith(b'%PDF'):
                 raise Exception('PDF generation failed (invalid PDF bytes)')
@@ -4574,21 +4333,6 @@ def client_export_proposal_pdf(proposal_id):
                 download_name=f"Proposal_{proposal_id}.pdf",
             )
 
-            # Persist cache (best-effort).
-            try:
-                from psycopg2 import Binary
-                cursor.execute(
-                    """
-                    INSERT INTO proposal_pdf_cache (proposal_id, cache_key, pdf_bytes)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (proposal_id, cache_key) DO NOTHING
-                    """,
-                    (proposal_id, etag, Binary(pdf_bytes)),
-                )
-                conn.commit()
-            except Exception:
-                pass
-
             if download:
                 resp.headers['Cache-Control'] = 'no-store'
             else:
@@ -5363,6 +5107,7 @@ def client_approve_proposal(proposal_id):
                     """,
                     (proposal_id,),
                 )
+                refresh_proposal_financials_safe(cursor, proposal_id)
 
                 # Store client comments, if any
                 if comments:
@@ -5529,6 +5274,7 @@ def client_reject_proposal(proposal_id):
             """, (proposal_id, invitation['invited_email']))
             
             proposal = cursor.fetchone()
+            refresh_proposal_financials_safe(cursor, proposal_id)
             if not proposal:
                 return {'detail': 'Proposal not found or access denied'}, 404
             
@@ -6149,77 +5895,13 @@ def compare_proposal_versions(username, proposal_id):
             if not cursor.fetchone():
                 return {'detail': 'Proposal not found or access denied'}, 404
             
-            # Get both versions
-            cursor.execute("""
-                SELECT id, version_number, content, created_at, created_by,
-                       u.full_name as created_by_name
-                FROM proposal_versions pv
-                LEFT JOIN users u ON pv.created_by = u.id
-                WHERE proposal_id = %s AND version_number IN (%s, %s)
-                ORDER BY version_number
-            """, (proposal_id, version1, version2))
-            
-            versions = cursor.fetchall()
+            result = compare_versions(cursor, proposal_id, version1, version2)
+            conn.commit()
             
-            if len(versions) != 2:
+            if result is None:
                 return {'detail': 'One or both versions not found'}, 404
             
-            # Parse JSON content
-            v1_content = json.loads(versions[0]['content']) if isinstance(versions[0]['content'], str) else versions[0]['content']
-            v2_content = json.loads(versions[1]['content']) if isinstance(versions[1]['content'], str) else versions[1]['content']
-            
-            # Convert to text for comparison
-            v1_text = json.dumps(v1_content, indent=2, sort_keys=True)
-            v2_text = json.dumps(v2_content, indent=2, sort_keys=True)
-            
-            # Generate diff using difflib
-            diff = difflib.unified_diff(
-                v1_text.splitlines(keepends=True),
-                v2_text.splitlines(keepends=True),
-                fromfile=f'Version {version1}',
-                tofile=f'Version {version2}',
-                lineterm=''
-            )
-            
-            # Generate HTML diff for better visualization
-            html_diff = difflib.HtmlDiff()
-            html_diff_output = html_diff.make_table(
-                v1_text.splitlines(),
-                v2_text.splitlines(),
-                fromdesc=f'Version {version1} ({versions[0]["created_at"]})',
-                todesc=f'Version {version2} ({versions[1]["created_at"]})',
-                context=True,
-                numlines=3
-            )
-            
-            # Calculate statistics
-            changes = {
-                'additions': 0,
-                'deletions': 0,
-                'modifications': 0
-            }
-            
-            for line in difflib.unified_diff(v1_text.splitlines(), v2_text.splitlines(), lineterm=''):
-                if line.startswith('+') and not line.startswith('+++'):
-                    changes['additions'] += 1
-                elif line.startswith('-') and not line.startswith('---'):
-                    changes['deletions'] += 1
-            
-            return {
-                'version1': {
-                    'version_number': versions[0]['version_number'],
-                    'created_at': versions[0]['created_at'].isoformat() if versions[0]['created_at'] else None,
-                    'created_by': versions[0]['created_by_name']
-                },
-                'version2': {
-                    'version_number': versions[1]['version_number'],
-                    'created_at': versions[1]['created_at'].isoformat() if versions[1]['created_at'] else None,
-                    'created_by': versions[1]['created_by_name']
-                },
-                'diff': '\n'.join(diff),
-                'html_diff': html_diff_output,
-                'changes': changes
-            }, 200
+            return result, 200
             
     except Exception as e:
         print(f"❌ Error comparing versions: {e}")
@@ -6313,6 +5995,7 @@ def send_for_signature(username, proposal_id):
                 SET status = 'Sent for Signature', updated_at = NOW()
                 WHERE id = %s
             """, (proposal_id,))
+            refresh_proposal_financials_safe(cursor, proposal_id)
             conn.commit()
             
             print(f"✅ Proposal {proposal_id} sent for signature to {signer_email}")
@@ -6624,6 +6307,7 @@ def docusign_webhook():
                     SET status = 'Signed', updated_at = NOW()
                     WHERE id = %s
                 """, (signature['proposal_id'],))
+                refresh_proposal_financials_safe(cursor, signature['proposal_id'])
                 
                 log_activity(
                     signature['proposal_id'],
@@ -6654,6 +6338,7 @@ def docusign_webhook():
                     SET status = 'Signature Declined', updated_at = NOW()
                     WHERE id = %s
                 """, (signature['proposal_id'],))
+                refresh_proposal_financials_safe(cursor, signature['proposal_id'])
                 
                 log_activity(
                     signature['proposal_id'],
@@ -7417,10 +7102,10 @@ def health_check():
     # Add connection pool status if available
     try:
         if _pg_pool:
-            # Try to get pool stats (note: SimpleConnectionPool doesn't expose all stats)
             pool_info["database"] = "postgresql"
-            pool_info["pool_type"] = "SimpleConnectionPool"
+            pool_info["pool_type"] = "ConnectionPool"
             pool_info["pool_configured"] = True
+            pool_info["pool_stats"] = _pg_pool.stats()
             
             # Test connection
             try:
@@ -7455,6 +7140,7 @@ if __name__ == '__main__':
         # because it expects a Flask request context.
         print("[*] Initializing PostgreSQL schema (startup)...")
         init_pg_schema()
+        _apply_migrations()
         _db_initialized = True
         print("[OK] Database schema initialized successfully")
     except Exception as e:
@@ -0,0 +1,25 @@
+"""
+Backfill the proposal_financials projection for existing proposals.
+
+Proposals created before the projection existed have no row in
+proposal_financials. Finance endpoints self-heal missing rows on read, but
+running this once after deploy avoids paying that cost on the first request.
+
+Usage:
+    python backfill_proposal_financials.py            # recompute every proposal
+    python backfill_proposal_financials.py --missing  # only proposals without a row
+"""
+import sys
+from api.utils.proposal_financials import backfill_proposal_financials
+
+if __name__ == '__main__':
+    only_missing = '--missing' in sys.argv[1:]
+    print("🔄 Backfilling proposal_financials...")
+    try:
+        count = backfill_proposal_financials(only_missing=only_missing)
+    except Exception as e:
+        print(f"❌ Error backfilling proposal financials: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    print(f"✅ Backfill complete! {count} proposals processed")
@@ -0,0 +1,27 @@
+"""
+Backfill proposals.stage_code for existing proposals.
+
+New and updated proposals get their stage_code from a trigger; rows written
+before the column existed are NULL and don't show up in stage-filtered
+dashboards. The migration that adds the column runs this once, and
+migrate_db.py repeats it on deploy, so it is only needed by hand after a change
+to STAGE_RULES.
+
+Usage:
+    python backfill_proposal_stage_codes.py        # only proposals without a code
+    python backfill_proposal_stage_codes.py --all  # reclassify every proposal
+"""
+import sys
+from api.utils.proposal_stages import backfill_stage_codes
+
+if __name__ == '__main__':
+    only_missing = '--all' not in sys.argv[1:]
+    print("🔄 Backfilling proposal stage codes...")
+    try:
+        count = backfill_stage_codes(only_missing=only_missing)
+    except Exception as e:
+        print(f"❌ Error backfilling stage codes: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    print(f"✅ Backfill complete! {count} proposals updated")
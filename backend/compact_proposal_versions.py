@@ -0,0 +1,27 @@
+"""
+Rewrite stored proposal versions into snapshot + delta chains.
+
+Versions saved before delta storage (migration 9) are full copies. The
+migration runs this once after adding the columns; run it by hand to retry a
+failed backfill or to compact a single proposal. Only rows that have not been
+compacted yet are touched, so it is safe to re-run.
+
+Usage:
+    python compact_proposal_versions.py                  # every proposal
+    python compact_proposal_versions.py --proposal 123   # one proposal
+"""
+import sys
+from api.utils.version_store import compact_versions
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    proposal_id = int(args[args.index('--proposal') + 1]) if '--proposal' in args else None
+    print("🔄 Compacting proposal versions...")
+    try:
+        count = compact_versions(proposal_id=proposal_id)
+    except Exception as e:
+        print(f"❌ Error compacting versions: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    print(f"✅ Compaction complete! {count} versions processed")
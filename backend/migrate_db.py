@@ -100,6 +100,17 @@ def run_migration():
         print("\n📋 Initializing PostgreSQL schema...")
         print("   (This will create any missing tables/columns)")
         init_pg_schema()
+
+        from api.utils.migrations import run_migrations
+
+        print("\n📋 Applying versioned migrations...")
+        applied = run_migrations()
+        print(f"   Applied: {applied or 'none pending'}")
+
+        from api.utils.proposal_stages import backfill_stage_codes
+
+        print("\n📋 Backfilling proposal stage codes...")
+        print(f"   Updated: {backfill_stage_codes()}")
         print("\n✅ Schema migration completed successfully!")
         
         return True
@@ -109,6 +109,13 @@ else:
         def __getattr__(self, name: str) -> Any:
             return getattr(self._conn, name)
 
+        def __setattr__(self, name: str, value: Any) -> None:
+            # Forward writes such as `conn.autocommit = False` to the real connection.
+            if name == "_conn":
+                object.__setattr__(self, name, value)
+            else:
+                setattr(self._conn, name, value)
+
         @property
         def status(self) -> int:
             # psycopg2: STATUS_READY=1, STATUS_IN_TRANSACTION=2 (we emulate these)
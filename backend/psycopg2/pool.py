@@ -3,80 +3,253 @@ Minimal psycopg2.pool surface used by this repo.
 
 The codebase expects:
   psycopg2.pool.SimpleConnectionPool(minconn, maxconn, **db_config)
+  psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, **db_config)
 with methods:
   - getconn()
-  - putconn(conn)
+  - putconn(conn, close=False)
+  - closeall()
 
-We implement a very small in-process pool suitable for local/dev usage.
+The pool is thread-safe and behaves like the API pool in api/utils/db_pool.py:
+  - getconn() blocks up to `timeout` seconds when exhausted (PoolError afterwards)
+  - connections idle longer than `idle_check_after` are pinged before reuse
+  - connections older than `max_lifetime` are recycled
+  - up to `max_overflow` extra connections are allowed and closed on return
+  - stats() reports size, in-use, wait time and checkouts/sec
+
+The shim must import without the application package, so it keeps its own
+copy of the checkout counters rather than using api/utils/pool_stats.py.
+
+The extra keyword arguments are optional, so psycopg2-style construction works
+unchanged.
 """
 
 from __future__ import annotations
 
 import threading
-from typing import Any, Dict, List, Optional
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+class PoolError(Exception):
+    pass
+
+
+def _is_closed(conn: Any) -> bool:
+    try:
+        closed = getattr(conn, "closed", False)
+        if callable(closed):
+            closed = closed()
+        return bool(closed)
+    except Exception:
+        return False
+
+
+def _close_quietly(conn: Any) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class _CheckoutStats:
+    """Checkout counters; the rate is kept as one count per second over `window`.
+
+    Updated under the pool's lock.
+    """
+
+    def __init__(self, window: float = 60.0):
+        self.window = window
+        self.started_at = time.monotonic()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.recycled = 0
+        # [second, checkouts in that second], oldest first
+        self._per_second: Deque[List[int]] = deque()
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.window
+        while self._per_second and self._per_second[0][0] + 1 <= cutoff:
+            self._per_second.popleft()
+
+    def record_checkout(self, now: float, waited: float) -> None:
+        self.checkouts += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        second = int(now)
+        if self._per_second and self._per_second[-1][0] == second:
+            self._per_second[-1][1] += 1
+        else:
+            self._per_second.append([second, 1])
+            self._prune(now)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._prune(now)
+        window = min(self.window, max(now - self.started_at, 1e-6))
+        return {
+            "checkouts_total": self.checkouts,
+            "checkouts_per_sec": round(sum(count for _, count in self._per_second) / window, 3),
+            "wait_ms_avg": round((self.wait_total / self.checkouts) * 1000.0, 3) if self.checkouts else 0.0,
+            "wait_ms_max": round(self.wait_max * 1000.0, 3),
+            "timeouts": self.timeouts,
+            "recycled": self.recycled,
+        }
 
 
 class SimpleConnectionPool:
-    def __init__(self, minconn: int, maxconn: int, **conn_kwargs: Any):
-        if minconn < 0 or maxconn <= 0 or minconn > maxconn:
+    def __init__(
+        self,
+        minconn: int,
+        maxconn: int,
+        *,
+        max_overflow: int = 0,
+        timeout: float = 10.0,
+        idle_check_after: float = 30.0,
+        max_lifetime: float = 1800.0,
+        **conn_kwargs: Any,
+    ):
+        if minconn < 0 or maxconn <= 0 or minconn > maxconn or max_overflow < 0:
             raise ValueError("Invalid minconn/maxconn for SimpleConnectionPool")
 
         self._minconn = minconn
         self._maxconn = maxconn
+        self._max_overflow = max_overflow
+        self._timeout = timeout
+        self._idle_check_after = idle_check_after
+        self._max_lifetime = max_lifetime
         self._conn_kwargs = dict(conn_kwargs)
-        self._lock = threading.Lock()
-        self._pool: List[Any] = []
-        self._in_use = 0
+        self._cond = threading.Condition(threading.Lock())
+        # Idle entries are (conn, created_at, last_used_at); in-use maps id(conn) -> created_at.
+        self._pool: List[Tuple[Any, float, float]] = []
+        self._used: Dict[int, float] = {}
+        self._size = 0
+        self._closed = False
+
+        self._stats = _CheckoutStats()
 
         # Pre-create min connections.
         for _ in range(self._minconn):
-            self._pool.append(self._new_conn())
+            now = time.monotonic()
+            self._pool.append((self._new_conn(), now, now))
+            self._size += 1
 
     def _new_conn(self) -> Any:
         from . import connect
 
         return connect(**self._conn_kwargs)
 
-    def getconn(self) -> Any:
-        with self._lock:
-            if self._pool:
-                self._in_use += 1
-                return self._pool.pop()
-            if self._in_use < self._maxconn:
-                self._in_use += 1
-                return self._new_conn()
-            raise RuntimeError("No available connections in pool")
-
-    def putconn(self, conn: Any) -> None:
-        with self._lock:
+    def _is_alive(self, conn: Any) -> bool:
+        try:
+            cur = conn.cursor()
             try:
-                # If connection seems closed, don't re-pool it.
-                closed = getattr(conn, "closed", False)
-                if callable(closed):
-                    closed = closed()
-            except Exception:
-                closed = False
-
-            if closed:
+                cur.execute("SELECT 1")
+                cur.fetchone()
+            finally:
+                cur.close()
+            return True
+        except Exception:
+            return False
+
+    def _drop(self, conn: Any) -> None:
+        _close_quietly(conn)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def getconn(self, key: Any = None, timeout: Optional[float] = None) -> Any:
+        timeout = self._timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            entry = None
+            with self._cond:
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+                while not self._pool and self._size >= self._maxconn + self._max_overflow:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats.timeouts += 1
+                        raise PoolError("connection pool exhausted")
+                    self._cond.wait(remaining)
+                if self._pool:
+                    entry = self._pool.pop()
+                else:
+                    self._size += 1
+
+            now = time.monotonic()
+            if entry is None:
                 try:
-                    conn.close()
+                    conn, created_at = self._new_conn(), now
                 except Exception:
-                    pass
-                self._in_use = max(0, self._in_use - 1)
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                conn, created_at, last_used_at = entry
+                expired = self._max_lifetime and now - created_at >= self._max_lifetime
+                if expired:
+                    with self._cond:
+                        self._stats.recycled += 1
+                if (
+                    expired
+                    or _is_closed(conn)
+                    or (now - last_used_at >= self._idle_check_after and not self._is_alive(conn))
+                ):
+                    self._drop(conn)
+                    continue
+
+            waited = now - started
+            with self._cond:
+                self._used[id(conn)] = created_at
+                self._stats.record_checkout(now, waited)
+            return conn
+
+    def putconn(self, conn: Any, key: Any = None, close: bool = False) -> None:
+        with self._cond:
+            created_at = self._used.pop(id(conn), None)
+        if created_at is None:
+            raise PoolError("trying to put unkeyed connection")
+
+        if close or self._closed or _is_closed(conn):
+            self._drop(conn)
+            return
+
+        with self._cond:
+            if self._size <= self._maxconn:
+                self._pool.append((conn, created_at, time.monotonic()))
+                self._cond.notify()
                 return
-
-            self._pool.append(conn)
-            self._in_use = max(0, self._in_use - 1)
+        # Overflow connection: close it once the burst has passed.
+        self._drop(conn)
 
     def closeall(self) -> None:
-        with self._lock:
-            for conn in self._pool:
-                try:
-                    conn.close()
-                except Exception:
-                    pass
-            self._pool.clear()
-
-
-__all__ = ["SimpleConnectionPool"]
-
+        with self._cond:
+            self._closed = True
+            idle, self._pool = self._pool, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _, _ in idle:
+            _close_quietly(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._pool),
+                "in_use": len(self._used),
+                "maxconn": self._maxconn,
+                "max_overflow": self._max_overflow,
+                **self._stats.snapshot(),
+            }
+
+
+# The shim pool is already thread-safe; keep psycopg2's name available too.
+ThreadedConnectionPool = SimpleConnectionPool
+
+
+__all__ = ["PoolError", "SimpleConnectionPool", "ThreadedConnectionPool"]
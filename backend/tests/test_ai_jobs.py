@@ -0,0 +1,110 @@
+"""
+Unit tests for the AI job queue helpers (dedupe keys, handler dispatch, long-poll waits).
+
+Run from backend/ directory:
+    python -m pytest tests/test_ai_jobs.py -v
+"""
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api.utils import ai_jobs
+from api.utils.ai_jobs import make_job_key, poll_delays, run_job
+
+
+class TestMakeJobKey:
+    def test_ignores_payload_key_order(self):
+        a = make_job_key('generate-section', {'section_name': 'Scope', 'max_tokens': 96}, 'alice')
+        b = make_job_key('generate-section', {'max_tokens': 96, 'section_name': 'Scope'}, 'alice')
+        assert a == b
+
+    def test_differs_by_user_action_and_prompt(self):
+        base = make_job_key('generate-section', {'proposal_text': 'x'}, 'alice')
+        assert make_job_key('generate-section', {'proposal_text': 'x'}, 'bob') != base
+        assert make_job_key('improve-area', {'proposal_text': 'x'}, 'alice') != base
+        assert make_job_key('generate-section', {'proposal_text': 'y'}, 'alice') != base
+
+
+class TestPollDelays:
+    def test_backs_off_and_sums_to_wait(self):
+        delays = list(poll_delays(3.0))
+        assert delays[:3] == [0.25, 0.5, 1.0]
+        assert max(delays) == 1.0
+        assert sum(delays) == pytest.approx(3.0)
+
+    def test_no_wait(self):
+        assert list(poll_delays(0)) == []
+
+
+class TestRunJob:
+    @pytest.fixture(autouse=True)
+    def handlers(self, monkeypatch):
+        monkeypatch.setattr(ai_jobs, '_handlers', {})
+
+    def test_success_is_done(self):
+        ai_jobs.register_job_handler('echo', lambda payload, user: ({'text': payload['t'], 'user': user}, 200))
+        status, code, result = run_job({'action': 'echo', 'payload': {'t': 'hi'}, 'username': 'alice'})
+        assert (status, code) == (ai_jobs.STATUS_DONE, 200)
+        assert result == {'text': 'hi', 'user': 'alice'}
+
+    def test_upstream_error_keeps_status(self):
+        ai_jobs.register_job_handler('busy', lambda payload, user: ({'success': False}, 503))
+        status, code, _ = run_job({'action': 'busy', 'payload': {}})
+        assert (status, code) == (ai_jobs.STATUS_ERROR, 503)
+
+    def test_handler_exception_is_error(self):
+        def broken(payload, user):
+            raise RuntimeError('boom')
+
+        ai_jobs.register_job_handler('broken', broken)
+        status, code, result = run_job({'action': 'broken', 'payload': {}})
+        assert (status, code) == (ai_jobs.STATUS_ERROR, 500)
+        assert 'boom' in result['error']
+
+    def test_unknown_action(self):
+        status, code, _ = run_job({'action': 'nope', 'payload': {}})
+        assert (status, code) == (ai_jobs.STATUS_ERROR, 500)
+
+
+class TestWaitForAiJob:
+    def _fake_jobs(self, monkeypatch, statuses):
+        calls = []
+
+        def fake_get(job_id, username=None):
+            calls.append(job_id)
+            status = statuses[min(len(calls), len(statuses)) - 1]
+            return None if status is None else {'id': job_id, 'status': status}
+
+        monkeypatch.setattr(ai_jobs, 'get_ai_job', fake_get)
+        return calls
+
+    def test_returns_when_finished(self, monkeypatch):
+        calls = self._fake_jobs(monkeypatch, ['pending', 'running', 'done'])
+        slept = []
+        job = ai_jobs.wait_for_ai_job('job-1', 'alice', 10, sleep=slept.append)
+        assert job['status'] == 'done'
+        assert len(calls) == 3
+        assert slept == [0.25, 0.5]
+
+    def test_gives_up_after_wait(self, monkeypatch):
+        self._fake_jobs(monkeypatch, ['pending'])
+        slept = []
+        job = ai_jobs.wait_for_ai_job('job-1', None, 2, sleep=slept.append)
+        assert job['status'] == 'pending'
+        assert sum(slept) == pytest.approx(2)
+
+    def test_wait_is_capped(self, monkeypatch):
+        monkeypatch.setattr(ai_jobs, 'AI_JOBS_MAX_WAIT_SECONDS', 1.0)
+        self._fake_jobs(monkeypatch, ['pending'])
+        slept = []
+        ai_jobs.wait_for_ai_job('job-1', None, 600, sleep=slept.append)
+        assert sum(slept) == pytest.approx(1.0)
+
+    def test_missing_job_returns_immediately(self, monkeypatch):
+        self._fake_jobs(monkeypatch, [None])
+        slept = []
+        assert ai_jobs.wait_for_ai_job('job-x', None, 10, sleep=slept.append) is None
+        assert slept == []
@@ -0,0 +1,237 @@
+"""
+Unit tests for the AI upstream gate (bounded in-flight calls, per-endpoint queues) and circuit breaker.
+
+The stub-server tests run a local HTTP server in place of the Hugging Face Space
+(skipped when requests is not installed).
+
+Run from backend/ directory:
+    python -m pytest tests/test_ai_upstream.py -v
+"""
+import sys
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api.utils.ai_upstream import (
+    REQUESTS_AVAILABLE,
+    CircuitBreaker,
+    CircuitOpen,
+    UpstreamBusy,
+    UpstreamGate,
+    get_upstream_session,
+)
+
+requires_requests = pytest.mark.skipif(not REQUESTS_AVAILABLE, reason='requests not installed')
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _hold(gate, endpoint, entered, release, errors):
+    try:
+        with gate.slot(endpoint):
+            entered.release()
+            release.wait(5)
+    except UpstreamBusy as exc:
+        errors.append(exc)
+
+
+class TestUpstreamGate:
+    def test_free_slot_does_not_wait(self):
+        gate = UpstreamGate(max_in_flight=2, max_queue=0)
+        with gate.slot('/generate-section') as waited:
+            assert waited < 0.5
+            assert gate.stats()['in_flight'] == 1
+        stats = gate.stats()
+        assert stats['in_flight'] == 0
+        assert stats['endpoints']['/generate-section']['calls'] == 1
+
+    def test_runs_up_to_max_in_flight_concurrently(self):
+        gate = UpstreamGate(max_in_flight=2, max_queue=4, queue_timeout=5)
+        entered, release, errors = threading.Semaphore(0), threading.Event(), []
+        threads = [threading.Thread(target=_hold, args=(gate, '/improve-area', entered, release, errors))
+                   for _ in range(3)]
+        for t in threads:
+            t.start()
+        assert entered.acquire(timeout=2) and entered.acquire(timeout=2)
+        assert not entered.acquire(timeout=0.2)  # the third caller is queued
+        stats = gate.stats()['endpoints']['/improve-area']
+        assert stats['in_flight'] == 2
+        assert stats['queued'] == 1
+        release.set()
+        for t in threads:
+            t.join(5)
+        assert errors == []
+        assert gate.stats()['endpoints']['/improve-area']['max_queued'] == 1
+
+    def test_full_queue_rejects(self):
+        gate = UpstreamGate(max_in_flight=1, max_queue=0)
+        with gate.slot('/generate-section'):
+            with pytest.raises(UpstreamBusy) as exc:
+                with gate.slot('/generate-section'):
+                    pass
+        assert exc.value.reason == 'queue full'
+        assert gate.stats()['endpoints']['/generate-section']['rejected'] == 1
+
+    def test_queues_are_per_endpoint(self):
+        gate = UpstreamGate(max_in_flight=1, max_queue=1, queue_timeout=5)
+        entered, release, errors = threading.Semaphore(0), threading.Event(), []
+        holder = threading.Thread(target=_hold, args=(gate, '/generate-section', entered, release, errors))
+        holder.start()
+        assert entered.acquire(timeout=2)
+        waiter = threading.Thread(target=_hold, args=(gate, '/generate-section', entered, release, errors))
+        waiter.start()
+        time.sleep(0.1)
+        # /generate-section's queue is full, /improve-area still has room to wait.
+        with pytest.raises(UpstreamBusy):
+            with gate.slot('/generate-section', timeout=0.05):
+                pass
+        with pytest.raises(UpstreamBusy) as exc:
+            with gate.slot('/improve-area', timeout=0.05):
+                pass
+        assert exc.value.reason.startswith('no slot')
+        release.set()
+        holder.join(5)
+        waiter.join(5)
+        endpoints = gate.stats()['endpoints']
+        assert endpoints['/improve-area']['timed_out'] == 1
+        assert endpoints['/generate-section']['rejected'] == 1
+        assert endpoints['/generate-section']['calls'] == 2
+        assert endpoints['/generate-section']['queued'] == 0
+
+    def test_slot_released_on_error(self):
+        gate = UpstreamGate(max_in_flight=1, max_queue=0)
+        with pytest.raises(RuntimeError):
+            with gate.slot('/generate-section'):
+                raise RuntimeError('boom')
+        with gate.slot('/generate-section'):
+            pass
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=clock)
+        for _ in range(2):
+            breaker.before_call()
+            breaker.record_failure()
+        breaker.before_call()
+        breaker.record_success()  # a success resets the count
+        for _ in range(3):
+            breaker.before_call()
+            breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        clock.now += 10
+        with pytest.raises(CircuitOpen) as exc:
+            breaker.before_call()
+        assert exc.value.retry_after == pytest.approx(20)
+        assert breaker.stats()['short_circuited'] == 1
+
+    def test_half_open_allows_one_trial(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+        breaker.record_failure()
+        clock.now += 30
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        breaker.before_call()
+        with pytest.raises(CircuitOpen):
+            breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.before_call()
+
+    def test_failed_trial_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+        breaker.record_failure()
+        clock.now += 30
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.stats()['opened_count'] == 2
+        clock.now += 29
+        with pytest.raises(CircuitOpen):
+            breaker.before_call()
+
+
+class _StubSpace(BaseHTTPRequestHandler):
+    """Stands in for the HF Space: slow inference, tracks peak concurrency."""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, so connection reuse is observable
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+    connections = set()
+
+    def do_POST(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+            cls.connections.add(self.client_address)
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        time.sleep(0.2)
+        body = b'{"success": true, "generated_text": "ok"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with cls.lock:
+            cls.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_space():
+    _StubSpace.active = _StubSpace.peak = 0
+    _StubSpace.connections = set()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubSpace)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+@requires_requests
+class TestAgainstStubSpace:
+    def test_gate_bounds_upstream_concurrency(self, stub_space):
+        gate = UpstreamGate(max_in_flight=2, max_queue=8, queue_timeout=10)
+        session = get_upstream_session()
+        statuses = []
+
+        def call():
+            with gate.slot('/generate-section'):
+                resp = session.post(stub_space + '/ai-assistant/generate-section', json={'x': 1}, timeout=5)
+                statuses.append(resp.status_code)
+
+        threads = [threading.Thread(target=call) for _ in range(6)]
+        started = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(10)
+        elapsed = time.monotonic() - started
+        assert statuses == [200] * 6
+        assert _StubSpace.peak == 2
+        assert elapsed < 6 * 0.2  # concurrent, not serialized behind one lock
+        assert gate.stats()['endpoints']['/generate-section']['max_queued'] >= 1
+
+    def test_session_reuses_connections(self, stub_space):
+        session = get_upstream_session()
+        for _ in range(3):
+            session.post(stub_space + '/ai-assistant/improve-area', json={}, timeout=5)
+        assert len(_StubSpace.connections) == 1
@@ -0,0 +1,123 @@
+"""
+Unit tests for the asset fetch cache, using a local HTTP server in place of Cloudinary.
+
+Run from backend/ directory:
+    python -m pytest tests/test_asset_cache.py -v
+"""
+import sys
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api.utils.asset_cache import Asset, AssetCache, AssetFetchError
+
+
+class _AssetServer:
+    """Serves /logo.png with an ETag and honours If-None-Match."""
+
+    def __init__(self):
+        self.body = b'\x89PNG fake image bytes'
+        self.etag = '"v1"'
+        self.requests = []
+        self.fail = False
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(dict(self.headers))
+                if server.fail or self.path != '/logo.png':
+                    self.send_response(500 if server.fail else 404)
+                    self.end_headers()
+                    return
+                if self.headers.get('If-None-Match') == server.etag:
+                    self.send_response(304)
+                    self.send_header('ETag', server.etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('ETag', server.etag)
+                self.send_header('Content-Length', str(len(server.body)))
+                self.end_headers()
+                self.wfile.write(server.body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+        self.thread.start()
+
+    def url(self, path='/logo.png'):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{path}"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    srv = _AssetServer()
+    yield srv
+    srv.close()
+
+
+class TestAssetCache:
+    def test_fresh_entry_served_without_network(self, server, tmp_path):
+        cache = AssetCache(str(tmp_path))
+        first = cache.fetch(server.url())
+        second = cache.fetch(server.url())
+        assert first.content == second.content == server.body
+        assert first.content_type == 'image/png'
+        assert len(server.requests) == 1
+
+    def test_expired_entry_revalidates_with_etag(self, server, tmp_path):
+        cache = AssetCache(str(tmp_path))
+        cache.fetch(server.url())
+        asset = cache.fetch(server.url(), max_age=0)
+        assert asset.content == server.body
+        assert server.requests[-1].get('If-None-Match') == '"v1"'
+        assert cache.stats()['revalidated'] == 1
+
+    def test_changed_asset_is_replaced(self, server, tmp_path):
+        cache = AssetCache(str(tmp_path))
+        cache.fetch(server.url())
+        server.body, server.etag = b'\x89PNG new logo', '"v2"'
+        assert cache.fetch(server.url(), max_age=0).content == b'\x89PNG new logo'
+
+    def test_stale_copy_served_when_origin_fails(self, server, tmp_path):
+        cache = AssetCache(str(tmp_path))
+        cache.fetch(server.url())
+        server.fail = True
+        assert cache.fetch(server.url(), max_age=0).content == server.body
+        assert cache.stats()['stale_served'] == 1
+
+    def test_missing_asset_raises(self, server, tmp_path):
+        cache = AssetCache(str(tmp_path))
+        with pytest.raises(AssetFetchError):
+            cache.fetch(server.url('/missing.png'))
+
+    def test_entries_persist_across_instances(self, server, tmp_path):
+        AssetCache(str(tmp_path)).fetch(server.url())
+        assert AssetCache(str(tmp_path)).fetch(server.url()).content == server.body
+        assert len(server.requests) == 1
+
+    def test_image_variant_without_pillow_returns_original(self, server, tmp_path, monkeypatch):
+        from api.utils import asset_cache
+
+        monkeypatch.setattr(asset_cache, 'PIL_AVAILABLE', False)
+        cache = AssetCache(str(tmp_path))
+        assert cache.image_variant(server.url(), 100) == server.body
+
+
+class TestAssetEncoding:
+    def test_roundtrip_keeps_metadata_and_binary_body(self):
+        asset = Asset(b'\x00\n\xff', 'image/png', '"e"', 'Mon, 01 Jan 2024 00:00:00 GMT', fetched_at=12.5)
+        decoded = Asset.decode(asset.encode())
+        assert decoded.content == b'\x00\n\xff'
+        assert (decoded.content_type, decoded.etag, decoded.fetched_at) == ('image/png', '"e"', 12.5)
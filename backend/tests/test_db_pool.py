@@ -0,0 +1,207 @@
+"""
+Unit tests for the thread-safe connection pool.
+
+Run from backend/ directory:
+    python -m pytest tests/test_db_pool.py -v
+"""
+import sys
+import os
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api.utils.db_pool import ConnectionPool, PoolTimeoutError
+from api.utils.pool_stats import PoolStats
+
+
+class FakeConn:
+    def __init__(self, n):
+        self.n = n
+        self.closed = False
+        self.resets = 0
+
+    def close(self):
+        self.closed = True
+
+
+def _factory():
+    created = []
+
+    def connect():
+        conn = FakeConn(len(created))
+        created.append(conn)
+        return conn
+
+    return connect, created
+
+
+class TestCheckout:
+    def test_reuses_returned_connection(self):
+        connect, created = _factory()
+        pool = ConnectionPool(connect, minconn=1, maxconn=2)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        assert pool.getconn() is conn
+        assert len(created) == 1
+
+    def test_blocks_then_times_out_when_exhausted(self):
+        connect, _ = _factory()
+        pool = ConnectionPool(connect, minconn=0, maxconn=1, timeout=0.05)
+        pool.getconn()
+        started = time.monotonic()
+        with pytest.raises(PoolTimeoutError):
+            pool.getconn()
+        assert time.monotonic() - started >= 0.04
+        assert pool.stats()["timeouts"] == 1
+
+    def test_waiter_receives_connection_when_returned(self):
+        connect, _ = _factory()
+        pool = ConnectionPool(connect, minconn=0, maxconn=1, timeout=2.0)
+        held = pool.getconn()
+        got = []
+
+        def waiter():
+            got.append(pool.getconn())
+
+        t = threading.Thread(target=waiter)
+        t.start()
+        time.sleep(0.05)
+        pool.putconn(held)
+        t.join(1.0)
+        assert got == [held]
+
+    def test_connect_failure_releases_slot(self):
+        calls = []
+
+        def connect():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+            return FakeConn(len(calls))
+
+        pool = ConnectionPool(connect, minconn=0, maxconn=1, timeout=0.05)
+        with pytest.raises(RuntimeError):
+            pool.getconn()
+        assert pool.getconn() is not None
+
+
+class TestLifecycle:
+    def test_overflow_connections_closed_on_return(self):
+        connect, created = _factory()
+        pool = ConnectionPool(connect, minconn=0, maxconn=1, max_overflow=1)
+        a = pool.getconn()
+        b = pool.getconn()
+        assert pool.stats()["overflow_in_use"] == 1
+        pool.putconn(b)
+        assert b.closed
+        pool.putconn(a)
+        assert not a.closed
+        assert pool.stats()["size"] == 1
+
+    def test_recycles_after_max_lifetime(self):
+        connect, created = _factory()
+        pool = ConnectionPool(connect, minconn=0, maxconn=1, max_lifetime=0.01)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        time.sleep(0.02)
+        fresh = pool.getconn()
+        assert fresh is not conn
+        assert conn.closed
+        assert pool.stats()["recycled"] == 1
+
+    def test_health_check_only_after_idle_threshold(self):
+        connect, _ = _factory()
+        checks = []
+
+        def is_alive(conn):
+            checks.append(conn)
+            return False
+
+        pool = ConnectionPool(connect, minconn=0, maxconn=1, idle_check_after=0.05, is_alive=is_alive)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        assert pool.getconn() is conn
+        assert checks == []
+        pool.putconn(conn)
+        time.sleep(0.06)
+        replacement = pool.getconn()
+        assert replacement is not conn
+        assert checks == [conn]
+        assert pool.stats()["health_check_failures"] == 1
+
+    def test_reset_failure_discards_connection(self):
+        connect, _ = _factory()
+
+        def reset(conn):
+            raise RuntimeError("broken")
+
+        pool = ConnectionPool(connect, minconn=0, maxconn=1, reset=reset)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        assert conn.closed
+        assert pool.stats()["size"] == 0
+
+    def test_stats_counts_checkouts(self):
+        connect, _ = _factory()
+        pool = ConnectionPool(connect, minconn=0, maxconn=2)
+        for _ in range(3):
+            pool.putconn(pool.getconn())
+        stats = pool.stats()
+        assert stats["checkouts_total"] == 3
+        assert stats["in_use"] == 0
+        assert stats["checkouts_per_sec"] > 0
+
+
+class TestPoolStats:
+    def test_rate_window_is_bounded(self):
+        stats = PoolStats(window=10.0)
+        stats.started_at = 0.0
+        for i in range(10000):
+            stats.record_checkout(i / 100.0, 0.0)
+        # 100 checkouts per second; only the last ten seconds are kept
+        assert len(stats._per_second) <= 11
+        assert stats.checkouts_per_sec(100.0) == pytest.approx(100.0, rel=0.1)
+        assert stats.checkouts == 10000
+
+    def test_idle_pool_rate_drops_to_zero(self):
+        stats = PoolStats(window=10.0)
+        stats.started_at = 0.0
+        stats.record_checkout(1.0, 0.002)
+        assert stats.snapshot(now=5.0)['checkouts_per_sec'] > 0
+        assert stats.snapshot(now=60.0)['checkouts_per_sec'] == 0
+        assert stats.snapshot(now=60.0)['wait_ms_max'] == 2.0
+
+
+class TestShimPool:
+    """psycopg2/pool.py must work without the application package on the path."""
+
+    def _load(self, monkeypatch):
+        import importlib.util
+
+        # An import of anything under `api` now raises ImportError.
+        monkeypatch.setitem(sys.modules, 'api', None)
+        path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'psycopg2', 'pool.py')
+        spec = importlib.util.spec_from_file_location('shim_pool', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    def test_stats_without_app(self, monkeypatch):
+        shim_pool = self._load(monkeypatch)
+        connect, created = _factory()
+        monkeypatch.setattr(shim_pool.SimpleConnectionPool, '_new_conn', lambda self: connect())
+        pool = shim_pool.SimpleConnectionPool(0, 1, timeout=0.01)
+
+        conn = pool.getconn()
+        with pytest.raises(shim_pool.PoolError):
+            pool.getconn()
+        pool.putconn(conn)
+
+        stats = pool.stats()
+        assert stats['checkouts_total'] == 1
+        assert stats['checkouts_per_sec'] > 0
+        assert stats['timeouts'] == 1
+        assert stats['size'] == 1 and stats['in_use'] == 0
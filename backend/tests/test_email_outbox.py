@@ -0,0 +1,135 @@
+"""
+Unit tests for the email outbox helpers (dedupe keys, backoff, SMTP transport).
+
+Run from backend/ directory:
+    python -m pytest tests/test_email_outbox.py -v
+"""
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api.utils import email_outbox
+from api.utils.email_outbox import LogTransport, SMTPTransport, backoff_seconds, deliver, make_dedupe_key
+
+
+SETTINGS = {
+    'host': 'smtp.example.com',
+    'port': 587,
+    'user': 'mailer@example.com',
+    'password': 'secret',
+    'from_email': 'mailer@example.com',
+    'from_name': 'Khonology',
+    'timeout': 5,
+    'use_ssl': False,
+}
+
+
+class FakeSMTP:
+    def __init__(self, noop_code=250, fail_send=False):
+        self.noop_code = noop_code
+        self.fail_send = fail_send
+        self.sent = []
+        self.closed = False
+
+    def noop(self):
+        return (self.noop_code, b'OK')
+
+    def send_message(self, msg):
+        if self.fail_send:
+            raise OSError('connection reset')
+        self.sent.append(msg)
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+def _transport(servers):
+    opened = []
+
+    def connect():
+        server = servers[len(opened)]
+        opened.append(server)
+        return server
+
+    return SMTPTransport(settings=SETTINGS, connect=connect), opened
+
+
+class TestDedupeKey:
+    def test_same_message_same_window(self):
+        a = make_dedupe_key('A@Example.com', 'Hi', '<p>x</p>', now=1000.0)
+        b = make_dedupe_key('a@example.com ', 'Hi', '<p>x</p>', now=1001.0)
+        assert a == b
+
+    def test_different_body_or_window(self, monkeypatch):
+        monkeypatch.setattr(email_outbox, 'EMAIL_OUTBOX_DEDUPE_WINDOW_SECONDS', 600)
+        base = make_dedupe_key('a@example.com', 'Hi', '<p>x</p>', now=0.0)
+        assert make_dedupe_key('a@example.com', 'Hi', '<p>y</p>', now=0.0) != base
+        assert make_dedupe_key('a@example.com', 'Hi', '<p>x</p>', now=600.0) != base
+
+    def test_nonce_bypasses_window(self):
+        base = make_dedupe_key('a@example.com', 'Hi', '<p>x</p>', now=0.0)
+        first = make_dedupe_key('a@example.com', 'Hi', '<p>x</p>', now=0.0, nonce='1')
+        assert first != base
+        assert make_dedupe_key('a@example.com', 'Hi', '<p>x</p>', now=0.0, nonce='2') != first
+        assert make_dedupe_key('a@example.com', 'Hi', '<p>x</p>', now=900.0, nonce='1') == first
+
+
+class TestBackoff:
+    def test_exponential_and_capped(self, monkeypatch):
+        monkeypatch.setattr(email_outbox, 'EMAIL_OUTBOX_BACKOFF_BASE_SECONDS', 10.0)
+        monkeypatch.setattr(email_outbox, 'EMAIL_OUTBOX_BACKOFF_MAX_SECONDS', 100.0)
+        mid = lambda: 0.5  # no jitter
+        assert backoff_seconds(1, mid) == 10.0
+        assert backoff_seconds(3, mid) == 40.0
+        assert backoff_seconds(10, mid) == 100.0
+
+    def test_jitter_bounds(self, monkeypatch):
+        monkeypatch.setattr(email_outbox, 'EMAIL_OUTBOX_BACKOFF_BASE_SECONDS', 10.0)
+        assert backoff_seconds(1, lambda: 0.0) == pytest.approx(8.0)
+        assert backoff_seconds(1, lambda: 1.0) == pytest.approx(12.0)
+
+
+class TestSMTPTransport:
+    def test_reuses_connection_between_messages(self):
+        server = FakeSMTP()
+        transport, opened = _transport([server])
+        transport.send('a@example.com', 'One', '<p>1</p>')
+        transport.send('b@example.com', 'Two', '<p>2</p>')
+        assert len(opened) == 1
+        assert [m['To'] for m in server.sent] == ['a@example.com', 'b@example.com']
+
+    def test_reconnects_when_noop_fails(self):
+        first, second = FakeSMTP(noop_code=421), FakeSMTP()
+        transport, opened = _transport([first, second])
+        transport.send('a@example.com', 'One', '<p>1</p>')
+        transport.send('b@example.com', 'Two', '<p>2</p>')
+        assert opened == [first, second]
+        assert first.closed
+        assert len(second.sent) == 1
+
+    def test_failed_send_drops_connection(self):
+        broken, fresh = FakeSMTP(fail_send=True), FakeSMTP()
+        transport, opened = _transport([broken, fresh])
+        error = deliver({'to_email': 'a@example.com', 'subject': 'S', 'html_content': 'x'}, transport)
+        assert 'connection reset' in error
+        assert broken.closed
+        assert deliver({'to_email': 'a@example.com', 'subject': 'S', 'html_content': 'x'}, transport) is None
+        assert opened == [broken, fresh]
+
+    def test_invalid_recipient_is_an_error(self):
+        transport, opened = _transport([FakeSMTP()])
+        error = deliver({'to_email': 'not-an-address', 'subject': 'S', 'html_content': 'x'}, transport)
+        assert error and opened == []
+
+
+class TestLogTransport:
+    def test_records_messages(self):
+        transport = LogTransport()
+        assert deliver({'to_email': 'a@example.com', 'subject': 'S', 'html_content': 'x'}, transport) is None
+        assert transport.sent[0]['subject'] == 'S'
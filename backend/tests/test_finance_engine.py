@@ -0,0 +1,134 @@
+"""
+Unit tests for the finance analytics snapshot engine.
+
+Run from backend/ directory:
+    python -m pytest tests/test_finance_engine.py -v
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api.utils import finance_engine
+from api.utils.finance_engine import (
+    FINANCE_STAGE_CODES,
+    FinanceSnapshot,
+    get_finance_snapshot,
+    group_totals,
+    invalidate_finance_snapshots,
+    mask_and,
+    mask_eq,
+    masked_count,
+    masked_sum,
+    multiply,
+    top_indices,
+)
+
+
+def _record(amount=0.0, probability=0.5, stage="Sent", signed=False, month=1, ts=0.0, client=0):
+    return {
+        "amount": amount,
+        "probability": probability,
+        "stage_code": FINANCE_STAGE_CODES[stage],
+        "is_sent": stage == "Sent",
+        "is_signed": signed,
+        "is_open": stage not in ("Signed", "Archived"),
+        "activity_year": 2026,
+        "activity_month": month,
+        "forecast_year": 2026,
+        "forecast_month": month,
+        "activity_ts": ts,
+        "client_code": client,
+    }
+
+
+def _snapshot():
+    records = [
+        _record(amount=100.0, probability=0.5, stage="Sent", month=1, ts=10.0, client=0),
+        _record(amount=200.0, probability=1.0, stage="Signed", signed=True, month=1, ts=30.0, client=1),
+        _record(amount=50.0, probability=0.2, stage="Negotiation", month=3, ts=20.0, client=0),
+        _record(amount=300.0, probability=1.0, stage="Signed", signed=True, month=3, ts=5.0, client=0),
+    ]
+    return FinanceSnapshot(list(range(len(records))), records, ["Acme", "Globex"])
+
+
+class TestReductions:
+    def test_masked_sum_and_count(self):
+        snap = _snapshot()
+        assert masked_sum(snap.amount) == 650.0
+        assert masked_sum(snap.amount, snap.is_signed) == 500.0
+        assert masked_count(snap.is_signed) == 2
+
+    def test_expected_revenue_uses_open_deals_only(self):
+        snap = _snapshot()
+        expected = masked_sum(multiply(snap.amount, snap.probability), snap.is_open)
+        assert expected == 100.0 * 0.5 + 50.0 * 0.2
+
+    def test_group_totals_by_month(self):
+        snap = _snapshot()
+        totals = group_totals(snap.activity_month, snap.amount, snap.is_signed, 13)
+        assert totals[1] == 200.0
+        assert totals[3] == 300.0
+        assert sum(totals) == 500.0
+
+    def test_group_totals_counts_when_no_weights(self):
+        snap = _snapshot()
+        counts = group_totals(snap.client_code, None, snap.all_rows_mask(), 2)
+        assert counts == [3.0, 1.0]
+
+    def test_top_indices_descending(self):
+        snap = _snapshot()
+        assert top_indices(snap.activity_ts, snap.is_signed, 5) == [1, 3]
+        assert top_indices(snap.activity_ts, snap.all_rows_mask(), 2) == [1, 2]
+
+    def test_combined_masks(self):
+        snap = _snapshot()
+        mask = mask_and(mask_eq(snap.stage_code, FINANCE_STAGE_CODES["Signed"]), mask_eq(snap.activity_month, 3))
+        assert masked_sum(snap.amount, mask) == 300.0
+
+    def test_empty_snapshot(self):
+        snap = FinanceSnapshot([], [], [])
+        assert masked_sum(snap.amount) == 0.0
+        assert group_totals(snap.activity_month, snap.amount, snap.is_signed, 13) == [0.0] * 13
+        assert top_indices(snap.activity_ts, snap.is_signed, 5) == []
+
+
+class TestSnapshotCache:
+    def setup_method(self):
+        invalidate_finance_snapshots()
+
+    def test_builds_once_within_ttl(self):
+        calls = []
+
+        def builder():
+            calls.append(1)
+            return _snapshot()
+
+        first = get_finance_snapshot(("test", 2026), builder)
+        second = get_finance_snapshot(("test", 2026), builder)
+        assert first is second
+        assert len(calls) == 1
+
+    def test_invalidate_forces_rebuild(self):
+        calls = []
+
+        def builder():
+            calls.append(1)
+            return _snapshot()
+
+        get_finance_snapshot(("test", 2026), builder)
+        invalidate_finance_snapshots()
+        get_finance_snapshot(("test", 2026), builder)
+        assert len(calls) == 2
+
+    def test_expired_snapshot_rebuilds(self, monkeypatch):
+        calls = []
+
+        def builder():
+            calls.append(1)
+            return _snapshot()
+
+        monkeypatch.setattr(finance_engine, "FINANCE_SNAPSHOT_TTL_SECONDS", 0.0)
+        get_finance_snapshot(("test", 2026), builder)
+        get_finance_snapshot(("test", 2026), builder)
+        assert len(calls) == 2
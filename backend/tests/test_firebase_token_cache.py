@@ -0,0 +1,234 @@
+"""
+Unit tests for the verified Firebase token cache, local cert-based verification
+and how verify_firebase_token handles rejected tokens.
+
+The verifier tests sign tokens with a local RSA key pair served through a fake
+cert endpoint (skipped when PyJWT / cryptography are not installed).
+
+Run from backend/ directory:
+    python -m pytest tests/test_firebase_token_cache.py -v
+"""
+import sys
+import os
+import datetime
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api.utils.firebase_token_cache import (
+    JWT_AVAILABLE,
+    CertStore,
+    LocalTokenVerifier,
+    TokenExpiredError,
+    TokenVerificationError,
+    VerifiedTokenCache,
+    token_key,
+)
+
+if JWT_AVAILABLE:
+    import jwt
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+
+requires_jwt = pytest.mark.skipif(not JWT_AVAILABLE, reason='PyJWT / cryptography not installed')
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestVerifiedTokenCache:
+    def test_hit_until_exp(self):
+        clock = FakeClock()
+        cache = VerifiedTokenCache(clock=clock)
+        cache.put('tok', {'uid': 'u1', 'exp': clock.now + 60})
+        assert cache.get('tok')['uid'] == 'u1'
+        clock.now += 60
+        assert cache.get('tok') is None
+        assert cache.stats()['entries'] == 0
+
+    def test_expired_or_expiryless_tokens_not_cached(self):
+        clock = FakeClock()
+        cache = VerifiedTokenCache(clock=clock)
+        cache.put('old', {'uid': 'u', 'exp': clock.now - 1})
+        cache.put('noexp', {'uid': 'u'})
+        assert cache.get('old') is None
+        assert cache.get('noexp') is None
+
+    def test_bounded_lru(self):
+        clock = FakeClock()
+        cache = VerifiedTokenCache(max_entries=2, clock=clock)
+        for tok in ('a', 'b'):
+            cache.put(tok, {'exp': clock.now + 60})
+        cache.get('a')
+        cache.put('c', {'exp': clock.now + 60})
+        assert cache.get('b') is None
+        assert cache.get('a') is not None
+        assert cache.stats()['evictions'] == 1
+
+    def test_hit_ratio(self):
+        clock = FakeClock()
+        cache = VerifiedTokenCache(clock=clock)
+        cache.get('tok')
+        cache.put('tok', {'exp': clock.now + 60})
+        cache.get('tok')
+        cache.get('tok')
+        cache.get('tok')
+        assert cache.stats()['hit_ratio'] == 0.75
+
+    def test_returned_claims_are_copies(self):
+        clock = FakeClock()
+        cache = VerifiedTokenCache(clock=clock)
+        cache.put('tok', {'uid': 'u1', 'exp': clock.now + 60})
+        cache.get('tok')['uid'] = 'tampered'
+        assert cache.get('tok')['uid'] == 'u1'
+
+    def test_key_is_a_hash(self):
+        assert token_key('abc') != 'abc' and len(token_key('abc')) == 64
+
+
+PROJECT = 'lukens-test'
+
+
+def _key_and_cert():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'securetoken.test')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    return key, cert.public_bytes(serialization.Encoding.PEM).decode('ascii')
+
+
+@pytest.fixture(scope='module')
+def keypair():
+    return _key_and_cert()
+
+
+class FakeCertEndpoint:
+    def __init__(self, certs, max_age=3600):
+        self.certs = certs
+        self.max_age = max_age
+        self.calls = 0
+
+    def __call__(self, url):
+        self.calls += 1
+        return 200, json.dumps(self.certs).encode('utf-8'), {'cache-control': f'public, max-age={self.max_age}'}
+
+
+def _token(key, kid='k1', **overrides):
+    import time
+
+    now = int(time.time())
+    claims = {
+        'iss': f'https://securetoken.google.com/{PROJECT}',
+        'aud': PROJECT,
+        'sub': 'firebase-uid-1',
+        'email': 'a@example.com',
+        'iat': now - 10,
+        'auth_time': now - 10,
+        'exp': now + 3600,
+    }
+    claims.update(overrides)
+    return jwt.encode(claims, key, algorithm='RS256', headers={'kid': kid})
+
+
+@requires_jwt
+class TestLocalTokenVerifier:
+    def test_valid_token(self, keypair):
+        key, pem = keypair
+        endpoint = FakeCertEndpoint({'k1': pem})
+        verifier = LocalTokenVerifier(PROJECT, CertStore(fetch=endpoint))
+        claims = verifier.verify(_token(key))
+        assert claims['uid'] == 'firebase-uid-1'
+        verifier.verify(_token(key))
+        assert endpoint.calls == 1  # certs cached between verifications
+
+    def test_rejects_wrong_audience_and_expired(self, keypair):
+        key, pem = keypair
+        verifier = LocalTokenVerifier(PROJECT, CertStore(fetch=FakeCertEndpoint({'k1': pem})))
+        with pytest.raises(TokenVerificationError) as rejected:
+            verifier.verify(_token(key, aud='other-project'))
+        assert not isinstance(rejected.value, TokenExpiredError)
+        with pytest.raises(TokenExpiredError):
+            verifier.verify(_token(key, exp=1, iat=0, auth_time=0))
+
+    def test_rejects_foreign_signature(self, keypair):
+        _, pem = keypair
+        other_key, _ = _key_and_cert()
+        verifier = LocalTokenVerifier(PROJECT, CertStore(fetch=FakeCertEndpoint({'k1': pem})))
+        with pytest.raises(TokenVerificationError):
+            verifier.verify(_token(other_key))
+
+    def test_unknown_kid_triggers_refresh(self, keypair):
+        key, pem = keypair
+        endpoint = FakeCertEndpoint({'k0': pem})
+        store = CertStore(fetch=endpoint)
+        verifier = LocalTokenVerifier(PROJECT, store)
+        with pytest.raises(TokenVerificationError):
+            verifier.verify(_token(key, kid='k1'))
+        endpoint.certs = {'k1': pem}  # key rotation
+        store._last_refresh = 0.0  # past the forced-refresh rate limit
+        assert verifier.verify(_token(key, kid='k1'))['uid'] == 'firebase-uid-1'
+        assert endpoint.calls == 2
+
+    def test_stale_certs_refetched(self, keypair):
+        key, pem = keypair
+        clock = FakeClock(0.0)
+        endpoint = FakeCertEndpoint({'k1': pem}, max_age=100)
+        store = CertStore(fetch=endpoint, clock=clock)
+        store.get_key('k1')
+        clock.now = 150.0
+        store.get_key('k1')
+        assert endpoint.calls == 2
+
+
+@requires_jwt
+class TestVerifyFirebaseToken:
+    """verify_firebase_token with LOCAL_ACCEPT_FRONTEND_FIREBASE_TOKEN set."""
+
+    @pytest.fixture
+    def firebase_auth(self, keypair, monkeypatch):
+        firebase_auth = pytest.importorskip('api.utils.firebase_auth')
+        _, pem = keypair
+        verifier = LocalTokenVerifier(PROJECT, CertStore(fetch=FakeCertEndpoint({'k1': pem})))
+        monkeypatch.setenv('LOCAL_ACCEPT_FRONTEND_FIREBASE_TOKEN', '1')
+        monkeypatch.setattr(firebase_auth, '_firebase_app', object())
+        monkeypatch.setattr(firebase_auth, 'get_token_cache', lambda: None)
+        monkeypatch.setattr(firebase_auth, '_get_local_verifier', lambda: verifier)
+        return firebase_auth
+
+    def test_expired_token_rejected(self, firebase_auth, keypair):
+        key, _ = keypair
+        assert firebase_auth.verify_firebase_token(_token(key, exp=1, iat=0, auth_time=0)) is None
+
+    def test_other_project_token_accepted_in_dev(self, firebase_auth, keypair):
+        key, _ = keypair
+        decoded = firebase_auth.verify_firebase_token(_token(key, aud='frontend-project'))
+        assert decoded['uid'] == 'firebase-uid-1'
+        assert decoded['email'] == 'a@example.com'
+
+    def test_expired_token_rejected_by_firebase_admin(self, firebase_auth, keypair, monkeypatch):
+        key, _ = keypair
+
+        def expired(token):
+            raise firebase_auth.auth.ExpiredIdTokenError('Token expired', None)
+
+        monkeypatch.setattr(firebase_auth, '_get_local_verifier', lambda: None)
+        monkeypatch.setattr(firebase_auth.auth, 'verify_id_token', expired)
+        assert firebase_auth.verify_firebase_token(_token(key, exp=1, iat=0, auth_time=0)) is None
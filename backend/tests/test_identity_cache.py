@@ -0,0 +1,129 @@
+"""
+Unit tests for the shared user identity cache.
+
+Run from backend/ directory:
+    python -m pytest tests/test_identity_cache.py -v
+"""
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api.utils.identity_cache import Identity, IdentityCache, load_identity
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def execute(self, sql, params=None):
+        self.queries.append((sql, params))
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+
+def _alice(role='manager'):
+    return Identity(7, 'alice', 'Alice@Example.com', role, 'Sales')
+
+
+class TestIdentityCache:
+    def test_lookup_by_every_alias(self):
+        cache = IdentityCache()
+        cache.put(_alice(), uid='fb-uid-1')
+        assert cache.get('email', 'alice@example.com').user_id == 7
+        assert cache.get('username', 'alice').user_id == 7
+        assert cache.get('uid', 'fb-uid-1').user_id == 7
+        assert cache.get('id', 7).username == 'alice'
+        assert cache.get('email', 'bob@example.com') is None
+
+    def test_entries_expire(self):
+        clock = FakeClock()
+        cache = IdentityCache(ttl_seconds=10, clock=clock)
+        cache.put(_alice())
+        clock.now = 9.9
+        assert cache.get('username', 'alice') is not None
+        clock.now = 10.0
+        assert cache.get('username', 'alice') is None
+        assert cache.stats()['entries'] == 0
+
+    def test_bounded_lru(self):
+        cache = IdentityCache(max_entries=2)
+        for i, name in enumerate(['a', 'b', 'c']):
+            cache.put(Identity(i, name, f'{name}@example.com'))
+            if name == 'b':
+                cache.get('username', 'a')  # 'b' becomes least recently used
+        assert cache.get('username', 'b') is None
+        assert cache.get('username', 'a') is not None
+        assert cache.stats()['evictions'] == 1
+
+    def test_invalidate_drops_all_aliases(self):
+        cache = IdentityCache()
+        cache.put(_alice(), uid='fb-uid-1')
+        cache.invalidate(email='ALICE@example.com')
+        assert cache.get('uid', 'fb-uid-1') is None
+        assert cache.get('username', 'alice') is None
+
+    def test_role_change_visible_after_put(self):
+        cache = IdentityCache()
+        cache.put(_alice(), uid='fb-uid-1')
+        cache.put(_alice(role='finance_manager'))
+        identity = cache.get('uid', 'fb-uid-1')
+        assert identity.role == 'finance_manager' and identity.is_finance
+
+    def test_renamed_alias_moves_to_new_owner(self):
+        cache = IdentityCache()
+        cache.put(Identity(1, 'sam', 'sam@example.com'))
+        cache.put(Identity(2, 'sam', 'sam2@example.com'))
+        assert cache.get('username', 'sam').user_id == 2
+        assert cache.get('email', 'sam@example.com') is None
+
+    def test_concurrent_access(self):
+        cache = IdentityCache(max_entries=50)
+        errors = []
+
+        def worker(offset):
+            try:
+                for i in range(200):
+                    uid = offset * 1000 + i
+                    cache.put(Identity(uid, f'u{uid}', f'u{uid}@example.com'))
+                    cache.get('username', f'u{uid}')
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5.0)
+        assert not errors
+        assert cache.stats()['entries'] <= 50
+
+
+class TestIdentity:
+    def test_role_helpers(self):
+        assert Identity(1, 'x', role=' CEO ').is_admin
+        assert Identity(1, 'x', role='finance_manager').is_finance
+        assert not Identity(1, 'x', role=None).is_admin
+
+    def test_load_identity_single_query(self, monkeypatch):
+        from api.utils import identity_cache
+
+        cache = IdentityCache()
+        monkeypatch.setattr(identity_cache, '_cache', cache)
+        cursor = FakeCursor([{'id': 3, 'username': 'zoe', 'email': 'zoe@example.com', 'role': 'admin', 'department': None}])
+        identity = load_identity(cursor, email='zoe@example.com', uid='u-3')
+        assert identity.is_admin
+        assert len(cursor.queries) == 1
+        assert cache.get('uid', 'u-3') is identity
+        assert load_identity(FakeCursor([]), username='nobody') is None
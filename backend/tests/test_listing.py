@@ -0,0 +1,131 @@
+"""
+Unit tests for keyset pagination and field projection of list endpoints.
+
+Run from backend/ directory:
+    python -m pytest tests/test_listing.py -v
+"""
+import sys
+import os
+import json
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api.utils import listing as listing_mod
+from api.utils.listing import (
+    SORT_KEY,
+    ListingError,
+    decode_cursor,
+    encode_cursor,
+    keyset_sql,
+    page_info,
+    paginate,
+    parse_listing_args,
+)
+
+FIELDS = ('id', 'title', 'status', 'content', 'sections')
+HEAVY = ('content', 'sections')
+
+
+class TestParseListingArgs:
+    def test_no_args_is_legacy_listing(self):
+        listing = parse_listing_args({}, FIELDS, HEAVY)
+        assert not listing.paginated
+        assert listing.fields is None
+        assert listing.wants('content')
+
+    def test_limit_paginates_without_heavy_fields(self):
+        listing = parse_listing_args({'limit': '20'}, FIELDS, HEAVY)
+        assert listing.paginated and listing.limit == 20
+        assert not listing.wants('content')
+        assert listing.project({'id': 1, 'title': 't', 'content': '{}'}) == {'id': 1, 'title': 't'}
+
+    def test_limit_is_capped(self):
+        assert parse_listing_args({'limit': '100000'}, FIELDS).limit == listing_mod.LIST_MAX_PAGE_SIZE
+
+    def test_cursor_alone_uses_default_limit(self):
+        token = encode_cursor('2025-01-01T00:00:00', 5)
+        listing = parse_listing_args({'cursor': token}, FIELDS, default_limit=7)
+        assert listing.limit == 7
+        assert listing.after == ('2025-01-01T00:00:00', 5)
+
+    def test_fields_projection_keeps_id(self):
+        listing = parse_listing_args({'fields': 'title,content'}, FIELDS, HEAVY)
+        assert not listing.paginated
+        assert listing.fields == frozenset({'id', 'title', 'content'})
+
+    def test_fields_all(self):
+        assert parse_listing_args({'limit': '5', 'fields': 'all'}, FIELDS, HEAVY).fields is None
+
+    @pytest.mark.parametrize('args', [
+        {'limit': 'ten'},
+        {'limit': '0'},
+        {'fields': 'title,secret'},
+        {'cursor': 'not-a-cursor'},
+    ])
+    def test_bad_args(self, args):
+        with pytest.raises(ListingError):
+            parse_listing_args(args, FIELDS, HEAVY)
+
+
+class TestKeyset:
+    def test_cursor_round_trip(self):
+        token = encode_cursor(datetime(2025, 3, 1, 12, 30), 'abc')
+        assert decode_cursor(token) == ('2025-03-01T12:30:00', 'abc')
+
+    def test_first_page(self):
+        listing = parse_listing_args({'limit': '10'}, FIELDS)
+        condition, tail, params = keyset_sql(listing, 'updated_at')
+        assert condition == ''
+        assert tail == 'ORDER BY updated_at DESC, id DESC LIMIT %s'
+        assert params == [11]
+
+    def test_next_page(self):
+        listing = parse_listing_args({'limit': '10', 'cursor': encode_cursor('2025-01-01', 9)}, FIELDS)
+        condition, _, params = keyset_sql(listing, 'updated_at', 'p.id')
+        assert condition == '(updated_at, p.id) < (%s, %s)'
+        assert params == ['2025-01-01', 9, 11]
+
+    def test_paginate_drops_probe_row(self):
+        listing = parse_listing_args({'limit': '2'}, FIELDS)
+        rows = [{'id': i, SORT_KEY: f'2025-01-0{i}'} for i in (3, 2, 1)]
+        page, has_more, next_cursor = paginate(listing, rows)
+        assert [r['id'] for r in page] == [3, 2]
+        assert has_more
+        assert decode_cursor(next_cursor) == ('2025-01-02', 2)
+
+    def test_last_page(self):
+        listing = parse_listing_args({'limit': '5'}, FIELDS)
+        page, has_more, next_cursor = paginate(listing, [{'id': 1, SORT_KEY: None}])
+        assert len(page) == 1 and not has_more and next_cursor is None
+
+
+class FakeCursor:
+    def __init__(self, plan_rows):
+        self.plan_rows = plan_rows
+        self.sql = []
+
+    def execute(self, sql, params=None):
+        self.sql.append(sql)
+
+    def fetchone(self):
+        return {'QUERY PLAN': json.dumps([{'Plan': {'Plan Rows': self.plan_rows}}])}
+
+
+class TestPageInfo:
+    def test_single_page_total_is_exact(self):
+        cursor = FakeCursor(999)
+        listing = parse_listing_args({'limit': '10'}, FIELDS)
+        info = page_info(cursor, listing, 3, False, None, 'FROM proposals')
+        assert info['total'] == 3 and info['total_is_estimate'] is False
+        assert cursor.sql == []
+
+    def test_multi_page_total_is_planner_estimate(self):
+        cursor = FakeCursor(1234)
+        listing = parse_listing_args({'limit': '10'}, FIELDS)
+        info = page_info(cursor, listing, 10, True, 'tok', 'FROM proposals WHERE status = %s', ['Draft'])
+        assert info == {'limit': 10, 'next_cursor': 'tok', 'has_more': True, 'total': 1234, 'total_is_estimate': True}
+        assert cursor.sql[0].startswith('EXPLAIN (FORMAT JSON) SELECT 1 FROM proposals')
+        assert 'COUNT' not in cursor.sql[0]
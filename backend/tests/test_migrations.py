@@ -0,0 +1,255 @@
+"""
+Unit tests for the versioned migration runner (ordering, skipping applied versions, failures).
+
+TestFreshDatabase runs init_pg_schema and every migration against a new, empty
+database. It needs a scratch Postgres server in TEST_DATABASE_URL and is
+skipped otherwise.
+
+Run from backend/ directory:
+    python -m pytest tests/test_migrations.py -v
+"""
+import sys
+import os
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api.utils import migrations
+from api.utils.migrations import MIGRATIONS, Migration, apply_pending
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        self.conn.pending.append((sql, params))
+        if sql.startswith('SELECT version FROM schema_migrations'):
+            self._rows = [(v,) for v in sorted(self.conn.versions)]
+        elif sql.startswith('INSERT INTO schema_migrations'):
+            self.conn.staged_versions.append(params[0])
+
+    def fetchall(self):
+        return self._rows
+
+
+class FakeConnection:
+    """Records statements; schema_migrations rows only persist on commit."""
+
+    def __init__(self, versions=()):
+        self.versions = set(versions)
+        self.pending = []
+        self.staged_versions = []
+        self.committed = []
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.committed.extend(self.pending)
+        self.versions.update(self.staged_versions)
+        self.pending, self.staged_versions = [], []
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.pending, self.staged_versions = [], []
+
+
+def _recorder(calls, version, fail=False):
+    def apply(cursor):
+        calls.append(version)
+        cursor.execute(f'-- migration {version}')
+        if fail:
+            raise RuntimeError('boom')
+    return apply
+
+
+class TestApplyPending:
+    def test_applies_in_version_order_and_records(self):
+        calls = []
+        conn = FakeConnection()
+        applied = apply_pending(conn, [
+            Migration(2, 'two', _recorder(calls, 2)),
+            Migration(1, 'one', _recorder(calls, 1)),
+        ])
+        assert applied == [1, 2]
+        assert calls == [1, 2]
+        assert conn.versions == {1, 2}
+
+    def test_skips_applied_versions(self):
+        calls = []
+        conn = FakeConnection(versions={1})
+        applied = apply_pending(conn, [
+            Migration(1, 'one', _recorder(calls, 1)),
+            Migration(2, 'two', _recorder(calls, 2)),
+        ])
+        assert applied == [2]
+        assert calls == [2]
+
+    def test_noop_when_up_to_date(self):
+        calls = []
+        conn = FakeConnection(versions={1})
+        assert apply_pending(conn, [Migration(1, 'one', _recorder(calls, 1))]) == []
+        assert calls == []
+
+    def test_failed_migration_rolled_back_and_not_recorded(self):
+        calls = []
+        conn = FakeConnection()
+        with pytest.raises(RuntimeError, match=r'\[2\]'):
+            apply_pending(conn, [
+                Migration(1, 'one', _recorder(calls, 1)),
+                Migration(2, 'two', _recorder(calls, 2, fail=True)),
+                Migration(3, 'three', _recorder(calls, 3)),
+            ])
+        assert calls == [1, 2, 3]  # later migrations still run
+        assert conn.versions == {1, 3}
+        assert conn.rollbacks == 1
+        assert not any(sql == '-- migration 2' for sql, _ in conn.committed)
+
+    def test_failure_reports_applied_versions(self):
+        with pytest.raises(migrations.MigrationError) as info:
+            apply_pending(FakeConnection(), [
+                Migration(1, 'one', lambda c: None),
+                Migration(2, 'two', _recorder([], 2, fail=True)),
+            ])
+        assert info.value.failed == [2]
+        assert info.value.applied == [1]
+
+    def test_duplicate_versions_rejected(self):
+        with pytest.raises(ValueError):
+            apply_pending(FakeConnection(), [
+                Migration(1, 'a', lambda c: None),
+                Migration(1, 'b', lambda c: None),
+            ])
+
+
+class TestRegistry:
+    def test_versions_unique_and_ascending(self):
+        versions = [m.version for m in MIGRATIONS]
+        assert versions == sorted(versions)
+        assert len(set(versions)) == len(versions)
+
+    def test_all_statements_idempotent(self, monkeypatch):
+        from api.utils import database
+
+        monkeypatch.setattr(database, 'table_exists', lambda table, cursor=None: False)
+        conn = FakeConnection()
+        cursor = conn.cursor()
+        for migration in MIGRATIONS:
+            migration.apply(cursor)
+        statements = [' '.join(sql.split()).upper() for sql, _ in conn.pending]
+        for i, text in enumerate(statements):
+            if text.startswith('SELECT'):
+                continue
+            if text.startswith('CREATE TRIGGER'):
+                assert statements[i - 1].startswith('DROP TRIGGER IF EXISTS'), text
+                continue
+            assert 'IF NOT EXISTS' in text or 'OR REPLACE' in text or 'IF EXISTS' in text, text
+
+
+class TestBackfills:
+    def test_only_for_applied_versions(self):
+        calls = []
+        registry = [
+            Migration(1, 'one', lambda c: None, lambda: calls.append(1)),
+            Migration(2, 'two', lambda c: None, lambda: calls.append(2)),
+            Migration(3, 'three', lambda c: None),
+        ]
+        migrations.run_backfills(registry, [2, 3])
+        assert calls == [2]
+
+    def test_failure_is_logged_not_raised(self):
+        def broken():
+            raise RuntimeError('boom')
+
+        migrations.run_backfills([Migration(1, 'one', lambda c: None, broken)], [1])
+
+    def test_run_after_partial_failure(self, monkeypatch):
+        from contextlib import contextmanager
+        from types import SimpleNamespace
+
+        @contextmanager
+        def fake_connection():
+            yield FakeConnection()
+
+        monkeypatch.setitem(sys.modules, 'api.utils.database', SimpleNamespace(
+            get_db_connection=fake_connection,
+            invalidate_schema_catalog=lambda: None,
+        ))
+        calls = []
+        with pytest.raises(migrations.MigrationError):
+            migrations.run_migrations([
+                Migration(1, 'one', lambda c: None, lambda: calls.append(1)),
+                Migration(2, 'two', _recorder([], 2, fail=True), lambda: calls.append(2)),
+            ])
+        assert calls == [1]
+
+
+class TestEnsureMigrations:
+    def test_runs_once_per_process(self, monkeypatch):
+        runs = []
+        monkeypatch.setattr(migrations, '_migrated', False)
+        monkeypatch.setattr(migrations, 'run_migrations', lambda: runs.append(1) or [1])
+        assert migrations.ensure_migrations() == [1]
+        assert migrations.ensure_migrations() is None
+        assert runs == [1]
+
+    def test_retries_after_failure(self, monkeypatch):
+        outcomes = [RuntimeError('db down'), []]
+
+        def fake_run():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        monkeypatch.setattr(migrations, '_migrated', False)
+        monkeypatch.setattr(migrations, 'run_migrations', fake_run)
+        with pytest.raises(RuntimeError):
+            migrations.ensure_migrations()
+        assert migrations.ensure_migrations() == []
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL not set')
+class TestFreshDatabase:
+    @pytest.fixture
+    def scratch_db(self, monkeypatch):
+        psycopg2 = pytest.importorskip('psycopg2')
+        from psycopg2.extensions import parse_dsn
+        from api.utils import database
+
+        name = f"migrations_{uuid.uuid4().hex[:12]}"
+        admin = psycopg2.connect(TEST_DATABASE_URL)
+        admin.autocommit = True
+        admin.cursor().execute(f'CREATE DATABASE {name}')
+
+        config = parse_dsn(TEST_DATABASE_URL)
+        config.pop('dbname', None)
+        config.update(database=name, host=config.get('host', 'localhost'), port=config.get('port', 5432))
+        monkeypatch.setattr(database, '_build_db_config_from_env', lambda: dict(config))
+        monkeypatch.setattr(database, '_pg_pool', None)
+        database.invalidate_schema_catalog()
+        try:
+            yield database
+        finally:
+            if database._pg_pool is not None:
+                database._pg_pool.closeall()
+            database.invalidate_schema_catalog()
+            admin.cursor().execute(f'DROP DATABASE IF EXISTS {name}')
+            admin.close()
+
+    def test_every_migration_applies(self, scratch_db):
+        scratch_db.init_pg_schema()
+        assert migrations.run_migrations() == [m.version for m in MIGRATIONS]
+        with scratch_db.get_db_connection() as conn:
+            cursor = conn.cursor()
+            assert migrations.applied_versions(cursor) == {m.version for m in MIGRATIONS}
+        columns = scratch_db.get_table_columns('proposal_client_activity')
+        assert columns['proposal_id'] == scratch_db.get_table_columns('proposals')['id']
+        assert migrations.run_migrations() == []
@@ -0,0 +1,193 @@
+"""
+Unit tests for the bulk notification and mention helpers (api/utils/helpers.py).
+
+TestAgainstPostgres runs the helpers against a scratch database created from
+init_pg_schema. It needs TEST_DATABASE_URL and is skipped otherwise.
+
+Run from backend/ directory:
+    python -m pytest tests/test_notifications.py -v
+"""
+import sys
+import os
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+pytest.importorskip('psycopg2')
+
+from api.utils import helpers
+from api.utils.helpers import create_notifications_bulk, notify_proposal_collaborators, process_mentions
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+
+class TestCreateNotificationsBulk:
+    @pytest.fixture(autouse=True)
+    def notifications_table(self, monkeypatch):
+        columns = {'id', 'user_id', 'notification_type', 'title', 'message', 'proposal_id', 'metadata', 'is_read'}
+        monkeypatch.setattr(helpers, '_notification_table', lambda cursor: ('notifications', columns))
+        monkeypatch.setattr(helpers, 'NOTIFICATION_INSERT_BATCH_SIZE', 2)
+
+    def test_multi_row_inserts_in_batches(self):
+        cursor = RecordingCursor()
+        assert create_notifications_bulk(cursor, [1, 2, 2, None, 3, 4, 5], 'comment_added', 'T', 'M', 7, {'a': 1}) == 5
+
+        assert [sql.count('(%s, %s, %s, %s, %s, %s, %s)') for sql, _ in cursor.statements] == [2, 2, 1]
+        user_ids = [params[i] for _, params in cursor.statements for i in range(0, len(params), 7)]
+        assert user_ids == [1, 2, 3, 4, 5]
+        assert cursor.statements[0][1][:7] == [1, 'comment_added', 'T', 'M', 7, '{"a": 1}', False]
+
+    def test_no_recipients(self):
+        cursor = RecordingCursor()
+        assert create_notifications_bulk(cursor, [None], 'comment_added', 'T', 'M') == 0
+        assert cursor.statements == []
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL not set')
+class TestAgainstPostgres:
+    @pytest.fixture
+    def db(self, monkeypatch):
+        import psycopg2
+        from psycopg2.extensions import parse_dsn
+        from api.utils import database
+
+        name = f"notifications_{uuid.uuid4().hex[:12]}"
+        admin = psycopg2.connect(TEST_DATABASE_URL)
+        admin.autocommit = True
+        admin.cursor().execute(f'CREATE DATABASE {name}')
+
+        config = parse_dsn(TEST_DATABASE_URL)
+        config.pop('dbname', None)
+        config.update(database=name, host=config.get('host', 'localhost'), port=config.get('port', 5432))
+        monkeypatch.setattr(database, '_build_db_config_from_env', lambda: dict(config))
+        monkeypatch.setattr(database, '_pg_pool', None)
+        database.invalidate_schema_catalog()
+        try:
+            database.init_pg_schema()
+            yield database
+        finally:
+            if database._pg_pool is not None:
+                database._pg_pool.closeall()
+            database.invalidate_schema_catalog()
+            admin.cursor().execute(f'DROP DATABASE IF EXISTS {name}')
+            admin.close()
+
+    def _users(self, cursor, *usernames):
+        ids = []
+        for username in usernames:
+            cursor.execute(
+                "INSERT INTO users (username, email, password_hash, full_name) VALUES (%s, %s, 'x', %s) RETURNING id",
+                (username, f'{username}@example.com', username.title()),
+            )
+            ids.append(cursor.fetchone()[0])
+        return ids
+
+    def _proposal(self, cursor, owner):
+        cursor.execute("INSERT INTO proposals (title, client, owner_id) VALUES ('P', 'Acme', %s) RETURNING id", (owner,))
+        return cursor.fetchone()[0]
+
+    def _accept(self, cursor, proposal_id, email, invited_by):
+        cursor.execute(
+            """
+            INSERT INTO collaboration_invitations (proposal_id, invited_email, invited_by, access_token, status)
+            VALUES (%s, %s, %s, %s, 'accepted')
+            """,
+            (proposal_id, email, invited_by, uuid.uuid4().hex),
+        )
+
+    def _notified(self, cursor, proposal_id):
+        cursor.execute('SELECT user_id FROM notifications WHERE proposal_id = %s ORDER BY user_id', (proposal_id,))
+        return [r[0] for r in cursor.fetchall()]
+
+    def test_owner_and_collaborators_notified(self, db):
+        with db.get_db_connection() as conn:
+            cursor = conn.cursor()
+            owner, collaborator, author = self._users(cursor, 'owner', 'collab', 'author')
+            proposal_id = self._proposal(cursor, owner)
+            self._accept(cursor, proposal_id, 'collab@example.com', owner)
+            self._accept(cursor, proposal_id, 'author@example.com', owner)
+            conn.commit()
+
+        notify_proposal_collaborators(proposal_id, 'comment_added', 'New Comment', 'hi', exclude_user_id=author)
+
+        with db.get_db_connection() as conn:
+            assert self._notified(conn.cursor(), proposal_id) == [owner, collaborator]
+
+    def test_numeric_owner_falls_back_to_username(self, db):
+        with db.get_db_connection() as conn:
+            cursor = conn.cursor()
+            # Legacy schema: the owner column holds a username, here one made of digits.
+            cursor.execute('ALTER TABLE proposals DROP CONSTRAINT IF EXISTS proposals_owner_id_fkey')
+            cursor.execute('ALTER TABLE proposals ALTER COLUMN owner_id TYPE VARCHAR(255)')
+            (owner,) = self._users(cursor, '4242')
+            proposal_id = self._proposal(cursor, '4242')
+            conn.commit()
+        db.invalidate_schema_catalog()
+
+        notify_proposal_collaborators(proposal_id, 'comment_added', 'New Comment', 'hi')
+
+        with db.get_db_connection() as conn:
+            assert owner != 4242
+            assert self._notified(conn.cursor(), proposal_id) == [owner]
+
+    def test_caller_cursor_commits_and_rolls_back_with_caller(self, db):
+        with db.get_db_connection() as conn:
+            cursor = conn.cursor()
+            owner, author = self._users(cursor, 'owner', 'author')
+            proposal_id = self._proposal(cursor, owner)
+            conn.commit()
+
+            notify_proposal_collaborators(proposal_id, 'comment_added', 'T', 'M', exclude_user_id=author, cursor=cursor)
+            conn.rollback()
+            assert self._notified(cursor, proposal_id) == []
+
+            notify_proposal_collaborators(proposal_id, 'comment_added', 'T', 'M', exclude_user_id=author, cursor=cursor)
+            conn.commit()
+            assert self._notified(cursor, proposal_id) == [owner]
+
+    def test_mentions_on_caller_cursor(self, db):
+        with db.get_db_connection() as conn:
+            cursor = conn.cursor()
+            owner, jane, sam = self._users(cursor, 'owner', 'jane', 'sam')
+            proposal_id = self._proposal(cursor, owner)
+            cursor.execute(
+                "INSERT INTO document_comments (proposal_id, comment_text, created_by) VALUES (%s, 'x', %s) RETURNING id",
+                (proposal_id, owner),
+            )
+            comment_id = cursor.fetchone()[0]
+
+            process_mentions(
+                comment_id, '@jane and @sam@example.com, also @owner and @nobody', owner, proposal_id,
+                send_email_flag=False, cursor=cursor,
+            )
+            conn.commit()
+
+            cursor.execute('SELECT mentioned_user_id FROM comment_mentions WHERE comment_id = %s ORDER BY 1', (comment_id,))
+            assert [r[0] for r in cursor.fetchall()] == [jane, sam]
+            assert self._notified(cursor, proposal_id) == [jane, sam]
+
+    def test_failure_on_caller_cursor_keeps_caller_transaction(self, db, monkeypatch):
+        def fail(*args, **kwargs):
+            raise RuntimeError('boom')
+
+        monkeypatch.setattr(helpers, 'create_notifications_bulk', fail)
+        with db.get_db_connection() as conn:
+            cursor = conn.cursor()
+            (owner,) = self._users(cursor, 'owner')
+            proposal_id = self._proposal(cursor, owner)
+
+            notify_proposal_collaborators(proposal_id, 'comment_added', 'T', 'M', cursor=cursor)
+            conn.commit()
+
+            cursor.execute('SELECT COUNT(*) FROM proposals WHERE id = %s', (proposal_id,))
+            assert cursor.fetchone()[0] == 1
@@ -0,0 +1,139 @@
+"""
+Unit tests for the content-addressed PDF render cache.
+
+Run from backend/ directory:
+    python -m pytest tests/test_pdf_cache.py -v
+"""
+import sys
+import os
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api.utils import pdf_cache
+from api.utils.pdf_cache import PdfRenderCache, etag_matches, pdf_cache_key
+
+
+def _pdf(n):
+    return b'%PDF-1.4 ' + bytes([65 + n]) * 10
+
+
+class TestCacheKey:
+    def test_key_changes_with_inputs(self):
+        base = pdf_cache_key(1, 'Title', '{"sections": []}', 'Acme', 'a@acme.com')
+        assert base == pdf_cache_key(1, 'Title', '{"sections": []}', 'Acme', 'a@acme.com')
+        assert base != pdf_cache_key(1, 'Title', '{"sections": [1]}', 'Acme', 'a@acme.com')
+        assert base != pdf_cache_key(1, 'Title', '{"sections": []}', 'Acme', 'a@acme.com', signer_name='Bob')
+        assert base != pdf_cache_key(2, 'Title', '{"sections": []}', 'Acme', 'a@acme.com')
+
+    def test_fields_are_delimited(self):
+        assert pdf_cache_key(1, 'ab', 'c') != pdf_cache_key(1, 'a', 'bc')
+
+    def test_renderer_version_is_part_of_key(self, monkeypatch):
+        before = pdf_cache_key(1, 'T', 'c')
+        monkeypatch.setattr(pdf_cache, 'PDF_RENDERER_VERSION', 'next')
+        assert pdf_cache_key(1, 'T', 'c') != before
+
+    def test_dict_content_is_order_independent(self):
+        assert pdf_cache_key(1, 'T', {'a': 1, 'b': 2}) == pdf_cache_key(1, 'T', {'b': 2, 'a': 1})
+
+
+class TestEtag:
+    def test_matches_quoted_weak_and_lists(self):
+        assert etag_matches('"abc"', 'abc')
+        assert etag_matches('W/"abc"', 'abc')
+        assert etag_matches('"x", "abc"', 'abc')
+        assert etag_matches('*', 'abc')
+        assert not etag_matches('"abd"', 'abc')
+        assert not etag_matches(None, 'abc')
+
+
+class TestRenderCache:
+    def test_get_or_render_renders_once(self, tmp_path):
+        cache = PdfRenderCache(str(tmp_path))
+        calls = []
+
+        def render():
+            calls.append(1)
+            return _pdf(0)
+
+        assert cache.get_or_render('k', render) == _pdf(0)
+        assert cache.get_or_render('k', render) == _pdf(0)
+        assert len(calls) == 1
+        assert cache.stats()['hits'] == 1
+
+    def test_survives_new_instance(self, tmp_path):
+        PdfRenderCache(str(tmp_path)).put('k', _pdf(1))
+        assert PdfRenderCache(str(tmp_path)).get('k') == _pdf(1)
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        size = len(_pdf(0))
+        cache = PdfRenderCache(str(tmp_path), max_bytes=size * 2, max_entries=100)
+        cache.put('a', _pdf(0))
+        cache.put('b', _pdf(1))
+        assert cache.get('a') == _pdf(0)  # 'b' is now the oldest
+        cache.put('c', _pdf(2))
+        assert cache.get('b') is None
+        assert cache.get('a') == _pdf(0)
+        assert cache.get('c') == _pdf(2)
+        assert cache.stats()['evictions'] == 1
+        assert not (tmp_path / 'b.pdf').exists()
+
+    def test_max_entries_bound(self, tmp_path):
+        cache = PdfRenderCache(str(tmp_path), max_entries=2)
+        for i, key in enumerate('abc'):
+            cache.put(key, _pdf(i))
+        assert cache.stats()['entries'] == 2
+        assert cache.get('a') is None
+
+    def test_invalid_render_is_not_cached(self, tmp_path):
+        cache = PdfRenderCache(str(tmp_path))
+        assert cache.get_or_render('k', lambda: b'not a pdf') == b'not a pdf'
+        assert cache.get('k') is None
+
+    def test_concurrent_misses_share_one_render(self, tmp_path):
+        cache = PdfRenderCache(str(tmp_path))
+        calls = []
+
+        def render():
+            calls.append(1)
+            time.sleep(0.05)
+            return _pdf(3)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_render('k', render))) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(2.0)
+        assert results == [_pdf(3)] * 4
+        assert len(calls) == 1
+
+
+class TestPrewarmVariants:
+    """prewarm_proposal_pdf must render with the arguments the send and signing paths use."""
+
+    def _variants(self, *args, **kwargs):
+        helpers = pytest.importorskip('api.utils.helpers')
+        return helpers.proposal_pdf_variants(*args, **kwargs)
+
+    def test_preview_and_signing_variants(self):
+        proposal = {'client': 'Acme', 'client_name': 'Acme Ltd', 'client_email': 'ap@acme.com'}
+        columns = {'client', 'client_name', 'client_email'}
+        assert self._variants(proposal, columns, 'signer@acme.com') == [
+            # shared.py preview / send for signature
+            ('Acme', 'ap@acme.com'),
+            # client portal signing: client_name first, invited email
+            ('Acme Ltd', 'signer@acme.com'),
+        ]
+
+    def test_same_arguments_render_once(self):
+        proposal = {'client_name': 'Acme', 'client_email': 'ap@acme.com'}
+        assert self._variants(proposal, {'client_name', 'client_email'}, 'ap@acme.com') == [('Acme', 'ap@acme.com')]
+
+    def test_missing_client_columns(self):
+        assert self._variants({}, set(), 'signer@acme.com') == [(None, None), ('Client', 'signer@acme.com')]
+        assert self._variants({}, set()) == [(None, None)]
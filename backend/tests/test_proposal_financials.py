@@ -0,0 +1,202 @@
+"""
+Unit tests for the proposal_financials projection (api/utils/proposal_financials.py).
+
+TestProjectionAgainstPostgres runs the refresh against a scratch database
+created from init_pg_schema. It needs TEST_DATABASE_URL and is skipped otherwise.
+
+Run from backend/ directory:
+    python -m pytest tests/test_proposal_financials.py -v
+"""
+import sys
+import os
+import json
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+pytest.importorskip('psycopg2')
+
+from api.utils import proposal_financials
+from api.utils.proposal_financials import compute_financials, pricing_breakdown
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+
+def _price_table(rows, header=('Item', 'Qty', 'Unit Price', 'Total'), **extra):
+    return dict({'type': 'price', 'cells': [list(header)] + [list(r) for r in rows]}, **extra)
+
+
+def _content(*tables, **extra):
+    return dict({'sections': [{'title': 'Pricing', 'tables': list(tables)}]}, **extra)
+
+
+CONTENT = _content(_price_table(
+    [('Build', '2', 'R 1,000', ''), ('Support', '1', '500', '750')],
+    vatRate=0.15,
+    currency='usd',
+))
+
+
+class TestComputeFinancials:
+    def test_totals_and_vat(self):
+        fin = compute_financials(json.dumps(CONTENT))
+        # Build has no total so falls back to qty x unit price; Support's total column wins.
+        assert fin['subtotal'] == 2750.0
+        assert fin['vat_amount'] == 412.5
+        assert fin['amount'] == 3162.5
+        assert fin['currency'] == 'USD'
+
+    def test_tables_summed_across_sections_and_positioned_tables(self):
+        content = {'sections': [
+            {'tables': [_price_table([('A', '1', '100', '')])]},
+            {'positionedPricingTables': [{'table': _price_table([('B', '3', '10', '')], vatRate=0.1)}]},
+            {'tables': [{'type': 'text', 'cells': [['Total'], ['999']]}]},
+        ]}
+        assert pricing_breakdown(content) == {'subtotal': 130.0, 'vat': 3.0, 'currency': None}
+
+    def test_explicit_amount_column_wins(self):
+        fin = compute_financials(CONTENT, amount_field='R 12,000.50')
+        assert fin['amount'] == 12000.5
+        assert fin['subtotal'] == 2750.0
+
+    def test_non_positive_amount_column_ignored(self):
+        assert compute_financials(CONTENT, amount_field='0')['amount'] == 3162.5
+
+    def test_content_budget_before_price_tables(self):
+        fin = compute_financials(dict(CONTENT, budget='5000'))
+        assert fin['amount'] == 5000.0
+        assert fin['vat_amount'] == 412.5
+
+    def test_sections_column_fallback(self):
+        fin = compute_financials('{}', sections=json.dumps(CONTENT['sections']))
+        assert fin['subtotal'] == 2750.0
+        assert fin['amount'] == 3162.5
+
+    def test_currency_from_content_then_default(self, monkeypatch):
+        untagged = _content(_price_table([('A', '1', '100', '')]))
+        assert compute_financials(dict(untagged, currency='eur'))['currency'] == 'EUR'
+        monkeypatch.setattr(proposal_financials, 'DEFAULT_CURRENCY', 'ZAR')
+        assert compute_financials(untagged)['currency'] == 'ZAR'
+
+    def test_discounts(self):
+        content = dict(CONTENT, discount='10%', terms={'earlyPaymentDiscount': 2.5})
+        fin = compute_financials(content)
+        assert fin['discount_lines'] == [
+            {'path': 'discount', 'value': 10.0},
+            {'path': 'terms.earlyPaymentDiscount', 'value': 2.5},
+        ]
+        assert fin['max_discount'] == 10.0
+        assert compute_financials(CONTENT)['max_discount'] == 0.0
+
+    @pytest.mark.parametrize('status, stage', [
+        (None, 'Draft'),
+        ('Draft', 'Draft'),
+        ('Pending CEO Approval', 'In Review'),
+        ('Sent to Client', 'Sent'),
+        ('Signed', 'Signed'),
+        ('Client Declined', 'Archived'),
+    ])
+    def test_stage_follows_status(self, status, stage):
+        assert compute_financials(CONTENT, status=status)['stage'] == stage
+
+    def test_malformed_json(self):
+        fin = compute_financials('{not json', sections='[oops')
+        assert (fin['amount'], fin['subtotal'], fin['vat_amount'], fin['discount_lines']) == (0.0, 0.0, 0.0, [])
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL not set')
+class TestProjectionAgainstPostgres:
+    @pytest.fixture
+    def db(self, monkeypatch):
+        import psycopg2
+        from psycopg2.extensions import parse_dsn
+        from api.utils import database
+
+        name = f"financials_{uuid.uuid4().hex[:12]}"
+        admin = psycopg2.connect(TEST_DATABASE_URL)
+        admin.autocommit = True
+        admin.cursor().execute(f'CREATE DATABASE {name}')
+
+        config = parse_dsn(TEST_DATABASE_URL)
+        config.pop('dbname', None)
+        config.update(database=name, host=config.get('host', 'localhost'), port=config.get('port', 5432))
+        monkeypatch.setattr(database, '_build_db_config_from_env', lambda: dict(config))
+        monkeypatch.setattr(database, '_pg_pool', None)
+        database.invalidate_schema_catalog()
+        try:
+            database.init_pg_schema()
+            yield database
+        finally:
+            if database._pg_pool is not None:
+                database._pg_pool.closeall()
+            database.invalidate_schema_catalog()
+            admin.cursor().execute(f'DROP DATABASE IF EXISTS {name}')
+            admin.close()
+
+    def _proposal(self, cursor, status='Draft'):
+        cursor.execute(
+            "INSERT INTO users (username, email, password_hash) VALUES (%s, %s, 'x') RETURNING id",
+            (uuid.uuid4().hex[:8], f'{uuid.uuid4().hex[:8]}@example.com'),
+        )
+        owner = cursor.fetchone()[0]
+        cursor.execute(
+            "INSERT INTO proposals (title, client, owner_id, status, content) VALUES ('P', 'Acme', %s, %s, %s) RETURNING id",
+            (owner, status, json.dumps(CONTENT)),
+        )
+        return cursor.fetchone()[0]
+
+    def _projection(self, cursor, proposal_id):
+        cursor.execute('SELECT amount, vat_amount, stage FROM proposal_financials WHERE proposal_id = %s', (proposal_id,))
+        row = cursor.fetchone()
+        return row and (float(row[0]), float(row[1]), row[2])
+
+    def test_status_write_refreshes_stage_with_caller_transaction(self, db):
+        with db.get_db_connection() as conn:
+            cursor = conn.cursor()
+            proposal_id = self._proposal(cursor)
+            proposal_financials.refresh_proposal_financials_safe(cursor, proposal_id)
+            conn.commit()
+            assert self._projection(cursor, proposal_id) == (3162.5, 412.5, 'Draft')
+
+            cursor.execute("UPDATE proposals SET status = 'Sent to Client' WHERE id = %s", (proposal_id,))
+            proposal_financials.refresh_proposal_financials_safe(cursor, proposal_id)
+            conn.rollback()
+            assert self._projection(cursor, proposal_id) == (3162.5, 412.5, 'Draft')
+
+            cursor.execute("UPDATE proposals SET status = 'Signed' WHERE id = %s", (proposal_id,))
+            proposal_financials.refresh_proposal_financials_safe(cursor, proposal_id)
+            conn.commit()
+            assert self._projection(cursor, proposal_id) == (3162.5, 412.5, 'Signed')
+
+    def test_failed_refresh_keeps_status_write(self, db, monkeypatch):
+        def fail(*args, **kwargs):
+            raise RuntimeError('boom')
+
+        monkeypatch.setattr(proposal_financials, '_upsert_rows', fail)
+        with db.get_db_connection() as conn:
+            cursor = conn.cursor()
+            proposal_id = self._proposal(cursor)
+            cursor.execute("UPDATE proposals SET status = 'Signed' WHERE id = %s", (proposal_id,))
+            proposal_financials.refresh_proposal_financials_safe(cursor, proposal_id)
+            conn.commit()
+
+            cursor.execute('SELECT status FROM proposals WHERE id = %s', (proposal_id,))
+            assert cursor.fetchone()[0] == 'Signed'
+            assert self._projection(cursor, proposal_id) is None
+
+    def test_backfill_matches_compute_financials(self, db):
+        with db.get_db_connection() as conn:
+            cursor = conn.cursor()
+            ids = [self._proposal(cursor, status) for status in ('Draft', 'Signed')]
+            conn.commit()
+
+        assert proposal_financials.backfill_proposal_financials(batch_size=1) == 2
+
+        with db.get_db_connection() as conn:
+            cursor = conn.cursor()
+            assert [self._projection(cursor, pid) for pid in ids] == [
+                (3162.5, 412.5, 'Draft'),
+                (3162.5, 412.5, 'Signed'),
+            ]
@@ -0,0 +1,220 @@
+"""
+Unit tests for the canonical proposal stage codes and their per-view labels.
+
+Run from backend/ directory:
+    python -m pytest tests/test_proposal_stages.py -v
+"""
+import sys
+import os
+import sqlite3
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api.utils.proposal_stages import (
+    CLIENT_DASHBOARD_CODES,
+    CLIENT_PORTAL_CODES,
+    PIPELINE_STAGES,
+    STAGE_CHANGES_REQUESTED,
+    STAGE_CLIENT_CHANGES_REQUESTED,
+    STAGE_DECLINED,
+    STAGE_DRAFT,
+    STAGE_IN_REVIEW,
+    STAGE_OTHER,
+    STAGE_PENDING,
+    STAGE_REJECTED,
+    STAGE_RELEASED,
+    STAGE_SENT_FOR_SIGNATURE,
+    STAGE_SIGNED,
+    STAGE_SUBMITTED,
+    client_group,
+    codes_for,
+    finance_stage,
+    pipeline_stage,
+    stage_code_case_sql,
+    stage_code_for_status,
+    stage_code_in_sql,
+)
+
+# Statuses the application actually writes, plus a few free-form variants.
+STATUSES = [
+    None, '', '  ', 'Draft', 'draft', 'Submitted', 'Resubmitted', 'In Review',
+    'Pending CEO Approval', 'Pending', 'Approved', 'Changes Requested', 'Client Requested Changes',
+    'Sent to Client', 'Released', 'Sent for Signature', 'sent', 'Viewed', 'Opened',
+    'Negotiation', 'Client Signed', 'Signed', 'signed', 'Won', 'Client Declined',
+    'Signature Declined', 'declined', 'Rejected', 'Archived', 'cancelled', 'Lost',
+    'voided', 'something else',
+]
+
+
+class TestStageCodeForStatus:
+    @pytest.mark.parametrize('status,code', [
+        (None, STAGE_DRAFT),
+        ('', STAGE_DRAFT),
+        ('Draft', STAGE_DRAFT),
+        ('Resubmitted', STAGE_SUBMITTED),
+        ('Pending CEO Approval', STAGE_IN_REVIEW),
+        ('Pending', STAGE_PENDING),
+        ('Rejected', STAGE_REJECTED),
+        ('Changes Requested', STAGE_CHANGES_REQUESTED),
+        ('Client Requested Changes', STAGE_CLIENT_CHANGES_REQUESTED),
+        ('Sent to Client', STAGE_RELEASED),
+        ('Sent for Signature', STAGE_SENT_FOR_SIGNATURE),
+        ('Client Signed', STAGE_SIGNED),
+        ('Signature Declined', STAGE_DECLINED),
+        ('something else', STAGE_OTHER),
+    ])
+    def test_codes(self, status, code):
+        assert stage_code_for_status(status) == code
+
+    def test_review_is_not_viewed(self):
+        assert finance_stage(stage_code_for_status('In Review')) == 'In Review'
+        assert finance_stage(stage_code_for_status('Viewed')) == 'Viewed'
+
+
+class TestViews:
+    def test_finance_labels(self):
+        assert finance_stage(stage_code_for_status('Sent for Signature')) == 'Sent'
+        assert finance_stage(stage_code_for_status('Client Declined')) == 'Archived'
+        assert finance_stage(stage_code_for_status('Negotiation')) == 'Negotiation'
+        assert finance_stage(None) == 'Other'
+
+    def test_pipeline_labels(self):
+        assert pipeline_stage(stage_code_for_status('Approved')) == 'In Review'
+        assert pipeline_stage(stage_code_for_status('Released')) == 'Released'
+        assert pipeline_stage(stage_code_for_status('Lost')) == 'Archived'
+        assert pipeline_stage(stage_code_for_status('Sent for Signature')) is None
+
+    def test_client_groups(self):
+        assert client_group(stage_code_for_status('Client Signed')) == 'signed'
+        assert client_group(stage_code_for_status('Approved')) == 'signed'
+        assert client_group(stage_code_for_status('Rejected')) == 'rejected'
+        assert client_group(stage_code_for_status('Client Requested Changes')) == 'requested_changes'
+        assert client_group(stage_code_for_status('Sent to Client')) == 'active'
+        assert client_group(stage_code_for_status('')) == 'active'
+
+    def test_internal_changes_requested_hidden_from_clients(self):
+        assert stage_code_for_status('Changes Requested') not in CLIENT_DASHBOARD_CODES
+        assert set(CLIENT_PORTAL_CODES) <= set(CLIENT_DASHBOARD_CODES)
+
+    def test_codes_for(self):
+        assert codes_for(PIPELINE_STAGES, ['archived']) == tuple(sorted(
+            c for c, label in PIPELINE_STAGES.items() if label == 'Archived'))
+        assert codes_for(PIPELINE_STAGES, ['nope']) == ()
+
+
+def _old_finance_stage(status):
+    s = (str(status or '')).strip().lower()
+    if not s or 'draft' in s:
+        return 'Draft'
+    if 'signed' in s or 'client signed' in s or 'won' in s:
+        return 'Signed'
+    if 'negotiat' in s:
+        return 'Negotiation'
+    if 'view' in s or 'opened' in s:
+        return 'Viewed'
+    if 'sent' in s or 'released' in s:
+        return 'Sent'
+    if 'review' in s or 'pending' in s or 'approved' in s:
+        return 'In Review'
+    if 'archiv' in s or 'cancel' in s or 'declin' in s or 'lost' in s:
+        return 'Archived'
+    return 'Other'
+
+
+def _old_pipeline_stage(status):
+    s = (status or "").strip().lower()
+    if not s or "draft" in s:
+        return "Draft"
+    if "archiv" in s or "cancel" in s or "declin" in s or "lost" in s:
+        return "Archived"
+    if "signed" in s or "won" in s:
+        return "Signed"
+    if "sent to client" in s or "released" in s:
+        return "Released"
+    if "review" in s or ("pending" in s and "ceo" in s) or "approved" in s:
+        return "In Review"
+    return None
+
+
+def _old_client_group(status):
+    s = (status or '').lower().strip()
+    if not s:
+        return 'active'
+    if 'request' in s and 'change' in s:
+        return 'requested_changes'
+    if 'change requested' in s or 'requested changes' in s:
+        return 'requested_changes'
+    if 'reject' in s or 'declin' in s:
+        return 'rejected'
+    if 'signed' in s or 'client signed' in s or 'approved' in s:
+        return 'signed'
+    return 'active'
+
+
+class TestMatchesPreviousClassifiers:
+    """Stage codes must not move proposals between buckets.
+
+    The _old_* functions are the per-view classifiers the stage codes replaced.
+    The one intended difference: finance read 'In Review' as 'Viewed'.
+    """
+
+    def _counts(self, classify):
+        counts = {}
+        for status in STATUSES:
+            label = classify(status)
+            counts[label] = counts.get(label, 0) + 1
+        return counts
+
+    def test_finance_counts(self):
+        statuses = [s for s in STATUSES if s != 'In Review']
+        for status in statuses:
+            assert finance_stage(stage_code_for_status(status)) == _old_finance_stage(status), status
+        assert finance_stage(stage_code_for_status('In Review')) == 'In Review'
+
+    def test_pipeline_counts(self):
+        assert self._counts(lambda s: pipeline_stage(stage_code_for_status(s))) == self._counts(_old_pipeline_stage)
+
+    def test_client_group_counts(self):
+        assert self._counts(lambda s: client_group(stage_code_for_status(s))) == self._counts(_old_client_group)
+
+    def test_client_portal_visibility(self):
+        portal = ('sent to client', 'released', 'sent for signature', 'signed')
+        dashboard = portal + ('declined', 'rejected')
+        for status in STATUSES:
+            s = (status or '').lower()
+            assert (stage_code_for_status(status) in CLIENT_PORTAL_CODES) == any(f in s for f in portal), status
+            old_dashboard = any(f in s for f in dashboard) or ('request' in s and 'change' in s.split('request', 1)[1])
+            assert (stage_code_for_status(status) in CLIENT_DASHBOARD_CODES) == old_dashboard, status
+
+    def test_rejected_and_submitted_stay_out_of_review_and_archive(self):
+        assert finance_stage(stage_code_for_status('Rejected')) == 'Other'
+        assert finance_stage(stage_code_for_status('Submitted')) == 'Other'
+        assert pipeline_stage(stage_code_for_status('Rejected')) is None
+        assert pipeline_stage(stage_code_for_status('Pending')) is None
+        assert pipeline_stage(stage_code_for_status('Pending CEO Approval')) == 'In Review'
+
+
+class TestSql:
+    def _sqlite_codes(self, sql_expr):
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE TABLE proposals (id INTEGER PRIMARY KEY, status TEXT)')
+        conn.executemany('INSERT INTO proposals (status) VALUES (?)', [(s,) for s in STATUSES])
+        # SQLite spells BTRIM as TRIM; the CASE is otherwise portable.
+        rows = conn.execute(f"SELECT status, {sql_expr.replace('BTRIM(', 'TRIM(')} FROM proposals ORDER BY id").fetchall()
+        conn.close()
+        return rows
+
+    def test_case_sql_matches_python(self):
+        for status, code in self._sqlite_codes(stage_code_case_sql('status')):
+            assert code == stage_code_for_status(status), status
+
+    def test_in_sql_uses_column(self):
+        assert stage_code_in_sql([10, 5, 5]) == 'p.stage_code IN (5, 10)'
+        assert stage_code_in_sql([]) == 'p.stage_code IN (NULL)'
+
+    def test_in_sql_fallback_escapes_percent(self):
+        sql = stage_code_in_sql([STAGE_SIGNED], has_column=False)
+        assert "LIKE '%%signed%%'" in sql
+        assert sql.endswith(f'IN ({STAGE_SIGNED})')
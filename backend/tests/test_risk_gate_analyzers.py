@@ -0,0 +1,185 @@
+"""
+Unit tests for the risk_gate embedding cache, pattern engine and clause index.
+
+risk_gate/tests/test_risk_gate.py imports the whole engine (transformers,
+chromadb and the package's relative imports), so pytest cannot collect it.
+These tests load only the modules they exercise, as top-level modules from
+the risk_gate directory, the way the engine itself falls back to them.
+
+Run from backend/ directory:
+    python -m pytest tests/test_risk_gate_analyzers.py -v
+"""
+import sys
+import os
+import re
+import importlib.util
+from unittest.mock import Mock, patch
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+RISK_GATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'risk_gate')
+sys.path.append(RISK_GATE_DIR)
+
+from analyzers.clause_analyzer import ClauseAnalyzer
+from analyzers.clause_index import ClauseIndex
+from analyzers.weakness_analyzer import WeaknessAnalyzer
+from utils import pattern_engine
+from utils.pattern_engine import PatternSet, trigger_literals
+
+
+def _load_embedding_cache():
+    # vector_store/__init__ pulls in chromadb; the cache module itself only needs numpy.
+    path = os.path.join(RISK_GATE_DIR, 'vector_store', 'embedding_cache.py')
+    spec = importlib.util.spec_from_file_location('risk_gate_embedding_cache', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+EmbeddingCache = _load_embedding_cache().EmbeddingCache
+
+
+class TestEmbeddingCache:
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return EmbeddingCache(str(tmp_path), "test/model", 4)
+
+    def test_round_trip(self, cache):
+        vectors = np.arange(8, dtype=np.float32).reshape(2, 4)
+        assert cache.put_many(["a", "b"], vectors) == 2
+
+        result = cache.get_many(["b", "missing", "a"])
+        np.testing.assert_array_equal(result[0], vectors[1])
+        assert result[1] is None
+        np.testing.assert_array_equal(result[2], vectors[0])
+
+    def test_duplicates_not_stored_twice(self, cache):
+        vector = np.ones((1, 4), dtype=np.float32)
+        cache.put_many(["a"], vector)
+        assert cache.put_many(["a", "a"], np.vstack([vector, vector])) == 0
+        assert len(cache) == 1
+
+    def test_persists_and_shares_between_instances(self, cache, tmp_path):
+        other = EmbeddingCache(str(tmp_path), "test/model", 4)
+        cache.put_many(["a"], np.full((1, 4), 2.0, dtype=np.float32))
+
+        np.testing.assert_array_equal(other.get_many(["a"])[0], np.full(4, 2.0, dtype=np.float32))
+        assert len(EmbeddingCache(str(tmp_path), "test/model", 4)) == 1
+
+    def test_keyed_by_model(self, cache, tmp_path):
+        cache.put_many(["a"], np.ones((1, 4), dtype=np.float32))
+        assert EmbeddingCache(str(tmp_path), "test/other-model", 4).get_many(["a"])[0] is None
+
+    def test_max_rows(self, tmp_path):
+        cache = EmbeddingCache(str(tmp_path), "test/small", 4, max_rows=1)
+        assert cache.put_many(["a", "b"], np.ones((2, 4), dtype=np.float32)) == 1
+        assert cache.get_many(["b"])[0] is None
+
+
+class TestPatternEngine:
+    TEXT = ("Payment terms: net 30. The İnvoice is due upon delivery. "
+            "Our team is experienced; timeline is approximate, 6 weeks roughly.")
+
+    def test_trigger_literals(self):
+        assert trigger_literals(r'(?i)(payment\s+terms?|payment\s+schedule|billing\s+terms?)') == \
+            frozenset({'payment', 'schedule', 'billing'})
+        assert trigger_literals(r'\b\d{3}[-\s]?\d{4}\b') is None
+
+    @pytest.mark.parametrize('pattern', [
+        r'(?i)(invoice|billing|payment\s+method)',
+        r'(?i)(net\s+\d+|payment\s+within|due\s+upon)',
+        r'(?i)(\d+\s*weeks?|\d+\s*months?)(.{0,50})?(approximately|about|roughly)',
+        r'(?i)(warranty|guarantee|assurance)',
+    ])
+    def test_matches_re_module(self, pattern):
+        assert pattern_engine.findall(pattern, self.TEXT, re.IGNORECASE) == \
+            re.findall(pattern, self.TEXT, re.IGNORECASE)
+        assert [m.span() for m in pattern_engine.finditer(pattern, self.TEXT)] == \
+            [m.span() for m in re.finditer(pattern, self.TEXT)]
+
+    def test_pattern_set_reports_source(self):
+        patterns = PatternSet('clause', {'payment_terms': [r'(?i)(invoice|billing)', r'(?i)(net\s+\d+)']})
+        hits = list(patterns.finditer(self.TEXT, 'payment_terms'))
+        assert [(h.analyzer, h.group, h.pattern, h.found.group(0)) for h in hits] == [
+            ('clause', 'payment_terms', r'(?i)(invoice|billing)', 'İnvoice'),
+            ('clause', 'payment_terms', r'(?i)(net\s+\d+)', 'net 30'),
+        ]
+        assert patterns.search('no matching words here', 'payment_terms') is None
+
+    def test_weakness_findings_unchanged(self):
+        analyzer = WeaknessAnalyzer()
+        result = analyzer.check_area_strength(self.TEXT, 'timeline')
+        expected = []
+        for pattern in analyzer.weakness_patterns['weak_timeline']['indicators']:
+            matches = re.findall(pattern, self.TEXT, re.IGNORECASE)
+            expected.extend([m[0] if isinstance(m, tuple) else m for m in matches[:3]])
+        assert result['indicators_found'][:len(expected)] == expected
+
+
+class TestClauseIndex:
+    TEMPLATES = [
+        "Payment terms: the client shall pay each invoice within thirty days of receipt.",
+        "Either party may terminate this agreement with sixty days written notice.",
+        "All intellectual property rights in the deliverables transfer to the client on payment.",
+        "Invoices are issued monthly and payment is due within thirty days of the invoice date.",
+        "The supplier's liability is limited to the fees paid under this agreement.",
+    ]
+    CLAUSES = [
+        "The client shall pay each invoice within 45 days of receipt.",
+        "Either party may terminate this agreement with thirty days notice.",
+        "Ownership of all deliverables remains with the supplier.",
+        "Completely unrelated text about catering arrangements.",
+    ]
+
+    def _exhaustive(self, clause):
+        analyzer = ClauseAnalyzer()
+        best, best_template = 0.0, ""
+        for template in self.TEMPLATES:
+            similarity = analyzer._calculate_similarity(clause, template)
+            if similarity > best:
+                best, best_template = similarity, template
+        return best, best_template
+
+    def test_zero_tolerance_matches_exhaustive_scorer(self, tmp_path):
+        index = ClauseIndex(self.TEMPLATES, tolerance=0.0, cache_dir=str(tmp_path))
+        for clause in self.CLAUSES:
+            match = index.best_match(clause)
+            assert (match.score, match.template) == self._exhaustive(clause)
+            assert match.tolerance == 0.0
+
+    def test_reported_tolerance_bounds_the_gap(self, tmp_path):
+        index = ClauseIndex(self.TEMPLATES, tolerance=0.1, cache_dir=str(tmp_path))
+        for clause in self.CLAUSES:
+            match = index.best_match(clause)
+            assert match.tolerance <= 0.1
+            assert self._exhaustive(clause)[0] - match.score <= match.tolerance + 1e-12
+
+    def test_index_persisted_by_content_hash(self, tmp_path):
+        index = ClauseIndex(self.TEMPLATES, cache_dir=str(tmp_path))
+        assert os.path.exists(index.path)
+        reloaded = ClauseIndex(self.TEMPLATES, cache_dir=str(tmp_path))
+        assert np.array_equal(index.signatures, reloaded.signatures)
+        changed = ClauseIndex(self.TEMPLATES[:-1] + ["A new liability clause."], cache_dir=str(tmp_path))
+        assert changed.path != index.path
+
+    @patch('analyzers.clause_index.CLAUSE_INDEX_MAX_FILES', 2)
+    def test_old_indexes_evicted(self, tmp_path):
+        paths = []
+        for i in range(4):
+            index = ClauseIndex(self.TEMPLATES + [f"Extra clause {i}."], cache_dir=str(tmp_path))
+            os.utime(index.path, (i, i))
+            paths.append(index.path)
+        ClauseIndex(self.TEMPLATES, cache_dir=str(tmp_path))
+        assert len(os.listdir(tmp_path)) == 2
+        assert os.path.exists(paths[-1])
+
+    @patch('analyzers.clause_index.CLAUSE_INDEX_CACHE_ENABLED', False)
+    def test_analyzer_reports_tolerance(self):
+        loader = Mock()
+        loader.get_template_sections.return_value = self.TEMPLATES
+        analyzer = ClauseAnalyzer(template_loader=loader)
+        result = analyzer.analyze_clauses("Payment terms: the client shall pay each invoice within 45 days.")
+        assert 'clause_similarity_tolerance' in result
+        assert result['clause_similarity_scores']['payment_terms'] > 0.0
@@ -0,0 +1,67 @@
+"""
+Unit tests for the Risk Gate result cache keys and hit-rate reporting.
+
+Run from backend/ directory:
+    python -m pytest tests/test_risk_gate_cache.py -v
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api.utils.risk_gate_cache import cache_hit_rate, content_hash, make_cache_key
+
+PROPOSAL = {
+    'id': 7,
+    'title': 'Data platform',
+    'content': '{"sections": [{"title": "Scope", "content": "Build it"}]}',
+    'status': 'Draft',
+    'stage_code': 1,
+    'updated_at': '2026-01-01T10:00:00',
+    'created_at': '2025-12-01T09:00:00',
+}
+
+
+class TestContentHash:
+    def test_ignores_timestamps_and_status(self):
+        changed = dict(PROPOSAL, status='In Review', stage_code=2, updated_at='2026-02-02T00:00:00')
+        assert content_hash(changed) == content_hash(PROPOSAL)
+
+    def test_content_change_misses(self):
+        changed = dict(PROPOSAL, content='{"sections": [{"title": "Scope", "content": "Build it twice"}]}')
+        assert content_hash(changed) != content_hash(PROPOSAL)
+
+    def test_key_order_insensitive(self):
+        assert content_hash(dict(reversed(list(PROPOSAL.items())))) == content_hash(PROPOSAL)
+
+
+class TestMakeCacheKey:
+    def test_depends_on_model_and_prompt_version(self):
+        h = content_hash(PROPOSAL)
+        base = make_cache_key(h, 'huggingface:https://a', '1')
+        assert make_cache_key(h, 'huggingface:https://a', '1') == base
+        assert make_cache_key(h, 'huggingface:https://b', '1') != base
+        assert make_cache_key(h, 'huggingface:https://a', '2') != base
+
+
+class FakeCursor:
+    def __init__(self, row):
+        self.row = row
+        self.params = None
+
+    def execute(self, sql, params=None):
+        self.params = params
+
+    def fetchone(self):
+        return self.row
+
+
+class TestCacheHitRate:
+    def test_rate(self):
+        cursor = FakeCursor({'hits': 3, 'misses': 1})
+        stats = cache_hit_rate(cursor, 7)
+        assert cursor.params == (7,)
+        assert stats == {'days': 7, 'hits': 3, 'misses': 1, 'hit_rate': 0.75}
+
+    def test_no_runs(self):
+        assert cache_hit_rate(FakeCursor((0, 0)))['hit_rate'] == 0.0
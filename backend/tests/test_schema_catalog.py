@@ -0,0 +1,181 @@
+"""
+Unit tests for the process-wide schema catalog (get_table_columns / column_exists).
+
+TestCatalogAgainstPostgres checks invalidation after real DDL and migrations.
+It needs a scratch Postgres database in TEST_DATABASE_URL and is skipped otherwise.
+
+Run from backend/ directory:
+    python -m pytest tests/test_schema_catalog.py -v
+"""
+import sys
+import os
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+pytest.importorskip('psycopg2')
+
+from api.utils import database
+from api.utils.database import (
+    column_exists,
+    get_id_type,
+    get_table_columns,
+    invalidate_schema_catalog,
+    pick_column,
+    table_exists,
+)
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+# Far above the real migration numbers, so the probe never collides with them.
+PROBE_VERSION = 900001
+
+
+class CatalogCursor:
+    """Answers the catalog's information_schema query from an in-memory schema."""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.queries = 0
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        assert 'information_schema.columns' in sql
+        self.queries += 1
+        wanted = params[0] if params else None
+        self._rows = [
+            (table, column, data_type)
+            for table, columns in sorted(self.tables.items())
+            if wanted is None or table == wanted
+            for column, data_type in columns.items()
+        ]
+
+    def fetchall(self):
+        return self._rows
+
+
+@pytest.fixture(autouse=True)
+def empty_catalog(monkeypatch):
+    monkeypatch.setattr(database, '_schema_catalog', {})
+    monkeypatch.setattr(database, '_schema_catalog_loaded_at', 0.0)
+    monkeypatch.setattr(database, '_schema_catalog_misses', {})
+
+
+@pytest.fixture
+def cursor():
+    return CatalogCursor({
+        'proposals': {'id': 'integer', 'owner_id': 'integer', 'title': 'text'},
+        'clients': {'id': 'uuid', 'company_name': 'character varying'},
+    })
+
+
+class TestLookups:
+    def test_first_lookup_loads_whole_catalog_once(self, cursor):
+        assert get_table_columns('proposals', cursor) == {'id': 'integer', 'owner_id': 'integer', 'title': 'text'}
+        assert column_exists('clients', 'company_name', cursor)
+        assert pick_column('proposals', ['user_id', 'owner_id'], cursor) == 'owner_id'
+        assert get_id_type('clients', 'id', cursor).pg_type == 'uuid'
+        assert cursor.queries == 1
+
+    def test_returned_columns_are_a_copy(self, cursor):
+        get_table_columns('proposals', cursor)['extra'] = 'text'
+        assert not column_exists('proposals', 'extra', cursor)
+
+    def test_missing_table(self, cursor):
+        assert get_table_columns('no_such_table', cursor) == {}
+        assert not table_exists('no_such_table', cursor)
+        assert not column_exists('no_such_table', 'id', cursor)
+        assert get_id_type('no_such_table', 'id', cursor).pg_type == 'text'
+        # Loaded once, probed once; the miss is remembered
+        assert cursor.queries == 2
+
+    def test_table_created_after_load_is_probed(self, cursor):
+        assert table_exists('proposals', cursor)
+        cursor.tables['ai_jobs'] = {'id': 'bigint'}
+        assert table_exists('ai_jobs', cursor)
+        assert cursor.queries == 2
+
+    def test_catalog_expires(self, cursor, monkeypatch):
+        get_table_columns('proposals', cursor)
+        monkeypatch.setattr(database, 'SCHEMA_CATALOG_TTL_SECONDS', 0.0)
+        get_table_columns('proposals', cursor)
+        assert cursor.queries == 2
+
+
+class TestInvalidation:
+    def test_table_invalidation_after_ddl(self, cursor):
+        assert not column_exists('proposals', 'identity_last4_hash', cursor)
+        cursor.tables['proposals']['identity_last4_hash'] = 'text'
+        assert not column_exists('proposals', 'identity_last4_hash', cursor)
+        invalidate_schema_catalog('proposals')
+        assert column_exists('proposals', 'identity_last4_hash', cursor)
+
+    def test_invalidation_clears_remembered_misses(self, cursor):
+        assert not table_exists('proposal_client_activity', cursor)
+        cursor.tables['proposal_client_activity'] = {'id': 'uuid'}
+        assert not table_exists('proposal_client_activity', cursor)
+        invalidate_schema_catalog()
+        assert table_exists('proposal_client_activity', cursor)
+
+    def test_full_invalidation_reloads(self, cursor):
+        get_table_columns('proposals', cursor)
+        invalidate_schema_catalog()
+        del cursor.tables['clients']
+        assert not table_exists('clients', cursor)
+        # Initial load, reload, then one probe for the table that is now missing
+        assert cursor.queries == 3
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL not set')
+class TestCatalogAgainstPostgres:
+    @pytest.fixture
+    def conn(self):
+        import psycopg2
+
+        conn = psycopg2.connect(TEST_DATABASE_URL)
+        try:
+            yield conn
+        finally:
+            conn.rollback()
+            conn.close()
+
+    def test_alter_table_then_invalidate(self, conn):
+        table = f"catalog_probe_{uuid.uuid4().hex[:12]}"
+        cur = conn.cursor()
+        cur.execute(f'CREATE TABLE {table} (id SERIAL PRIMARY KEY)')
+        assert get_table_columns(table, cur) == {'id': 'integer'}
+        cur.execute(f'ALTER TABLE {table} ADD COLUMN note TEXT')
+        assert not column_exists(table, 'note', cur)
+        invalidate_schema_catalog(table)
+        assert column_exists(table, 'note', cur)
+
+    def test_migrations_invalidate_catalog(self, monkeypatch):
+        from contextlib import contextmanager
+        import psycopg2
+        from api.utils import migrations
+        from api.utils.migrations import Migration
+
+        table = f"catalog_migration_{uuid.uuid4().hex[:12]}"
+        conn = psycopg2.connect(TEST_DATABASE_URL)
+
+        @contextmanager
+        def fake_pool_connection():
+            yield conn
+
+        monkeypatch.setattr(database, 'get_db_connection', fake_pool_connection)
+        try:
+            assert not table_exists(table, conn.cursor())
+            conn.rollback()
+            migrations.run_migrations([
+                Migration(PROBE_VERSION, 'probe', lambda c: c.execute(f'CREATE TABLE IF NOT EXISTS {table} (id BIGINT)')),
+            ])
+            assert get_table_columns(table, conn.cursor()) == {'id': 'bigint'}
+        finally:
+            conn.rollback()
+            cur = conn.cursor()
+            cur.execute(f'DROP TABLE IF EXISTS {table}')
+            cur.execute('DELETE FROM schema_migrations WHERE version = %s', (PROBE_VERSION,))
+            conn.commit()
+            conn.close()
@@ -0,0 +1,84 @@
+"""
+Unit tests for the legacy-token session store (memory backend, sweeper, legacy file import).
+
+Run from backend/ directory:
+    python -m pytest tests/test_session_store.py -v
+"""
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api.utils.session_store import MemorySessionStore, hash_token, import_token_file
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMemorySessionStore:
+    def test_put_get_delete(self):
+        store = MemorySessionStore()
+        store.put('tok', 'alice', 60)
+        assert store.get('tok') == 'alice'
+        assert store.get('other') is None
+        store.delete('tok')
+        assert store.get('tok') is None
+
+    def test_expired_session_not_returned_without_sweep(self):
+        clock = FakeClock()
+        store = MemorySessionStore(clock=clock)
+        store.put('tok', 'alice', 60)
+        clock.now += 60
+        assert store.get('tok') is None
+        assert store.count() == 1  # removed by the sweeper, not inline
+
+    def test_sweep_removes_only_expired(self):
+        clock = FakeClock()
+        store = MemorySessionStore(clock=clock)
+        store.put('short', 'a', 10)
+        store.put('long', 'b', 100)
+        clock.now += 50
+        assert store.sweep() == 1
+        assert store.get('long') == 'b'
+        assert store.count() == 1
+
+    def test_reissued_token_survives_old_expiry(self):
+        clock = FakeClock()
+        store = MemorySessionStore(clock=clock)
+        store.put('tok', 'alice', 10)
+        store.put('tok', 'alice', 100)
+        clock.now += 50
+        assert store.sweep() == 0
+        assert store.get('tok') == 'alice'
+
+    def test_tokens_stored_hashed(self):
+        store = MemorySessionStore()
+        store.put('secret-token', 'alice', 60)
+        assert 'secret-token' not in store._sessions
+        assert hash_token('secret-token') in store._sessions
+
+
+class TestImportTokenFile:
+    def test_imports_live_tokens_and_renames_file(self, tmp_path):
+        path = tmp_path / 'auth_tokens.json'
+        now = datetime.now()
+        path.write_text(json.dumps({
+            'live': {'username': 'alice', 'created_at': now.isoformat(), 'expires_at': (now + timedelta(days=1)).isoformat()},
+            'dead': {'username': 'bob', 'created_at': now.isoformat(), 'expires_at': (now - timedelta(days=1)).isoformat()},
+        }))
+        store = MemorySessionStore()
+        assert import_token_file(str(path), store) == 1
+        assert store.get('live') == 'alice'
+        assert store.get('dead') is None
+        assert not path.exists()
+        assert (tmp_path / 'auth_tokens.json.imported').exists()
+
+    def test_missing_file_is_noop(self, tmp_path):
+        assert import_token_file(str(tmp_path / 'nope.json'), MemorySessionStore()) == 0
@@ -0,0 +1,155 @@
+"""
+Unit tests for log_activity / log_status_change (api/utils/helpers.py) on a
+caller's cursor.
+
+TestAgainstPostgres runs the helpers against a scratch database created from
+init_pg_schema. It needs TEST_DATABASE_URL and is skipped otherwise.
+
+Run from backend/ directory:
+    python -m pytest tests/test_status_change.py -v
+"""
+import sys
+import os
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+pytest.importorskip('psycopg2')
+
+from api.utils import helpers
+from api.utils.helpers import log_activity, log_status_change
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+
+class RecordingCursor:
+    def __init__(self, fail_on=None):
+        self.statements = []
+        self.fail_on = fail_on
+
+    def execute(self, sql, params=None):
+        self.statements.append(' '.join(sql.split()))
+        if self.fail_on and self.fail_on in sql:
+            raise RuntimeError('boom')
+
+
+class TestLogActivityOnCallerCursor:
+    @pytest.fixture(autouse=True)
+    def no_pool(self, monkeypatch):
+        def fail():
+            raise AssertionError('opened its own connection')
+
+        monkeypatch.setattr(helpers, 'get_db_connection', fail)
+
+    def test_insert_inside_savepoint(self):
+        cursor = RecordingCursor()
+        log_activity(7, 1, 'status_changed', 'd', {'to': 'Signed'}, cursor=cursor)
+
+        assert cursor.statements[0] == 'SAVEPOINT activity_log_insert'
+        assert cursor.statements[1].startswith('INSERT INTO activity_log')
+        assert cursor.statements[2] == 'RELEASE SAVEPOINT activity_log_insert'
+
+    def test_failure_rolls_back_to_savepoint(self):
+        cursor = RecordingCursor(fail_on='INSERT INTO activity_log')
+        log_activity(7, 1, 'status_changed', 'd', cursor=cursor)
+
+        assert cursor.statements[-2:] == [
+            'ROLLBACK TO SAVEPOINT activity_log_insert',
+            'RELEASE SAVEPOINT activity_log_insert',
+        ]
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL not set')
+class TestAgainstPostgres:
+    @pytest.fixture
+    def db(self, monkeypatch):
+        import psycopg2
+        from psycopg2.extensions import parse_dsn
+        from api.utils import database
+
+        name = f"status_change_{uuid.uuid4().hex[:12]}"
+        admin = psycopg2.connect(TEST_DATABASE_URL)
+        admin.autocommit = True
+        admin.cursor().execute(f'CREATE DATABASE {name}')
+
+        config = parse_dsn(TEST_DATABASE_URL)
+        config.pop('dbname', None)
+        config.update(database=name, host=config.get('host', 'localhost'), port=config.get('port', 5432))
+        monkeypatch.setattr(database, '_build_db_config_from_env', lambda: dict(config))
+        monkeypatch.setattr(database, '_pg_pool', None)
+        database.invalidate_schema_catalog()
+        try:
+            database.init_pg_schema()
+            yield database
+        finally:
+            if database._pg_pool is not None:
+                database._pg_pool.closeall()
+            database.invalidate_schema_catalog()
+            admin.cursor().execute(f'DROP DATABASE IF EXISTS {name}')
+            admin.close()
+
+    def _proposal(self, cursor):
+        cursor.execute("INSERT INTO users (username, email, password_hash) VALUES ('owner', 'o@example.com', 'x') RETURNING id")
+        owner = cursor.fetchone()[0]
+        cursor.execute("INSERT INTO proposals (title, client, owner_id, status) VALUES ('P', 'Acme', %s, 'Draft') RETURNING id", (owner,))
+        return owner, cursor.fetchone()[0]
+
+    def _change_status(self, cursor, proposal_id, user_id, to_status):
+        cursor.execute('SELECT status FROM proposals WHERE id = %s', (proposal_id,))
+        from_status = cursor.fetchone()[0]
+        cursor.execute('UPDATE proposals SET status = %s WHERE id = %s', (to_status, proposal_id))
+        log_status_change(proposal_id, user_id, from_status, to_status, cursor=cursor)
+
+    def _state(self, cursor, proposal_id):
+        cursor.execute(
+            """
+            SELECT p.status, p.last_status_change_at IS NOT NULL, pf.stage,
+                   (SELECT array_agg(al.metadata->>'to' ORDER BY al.id) FROM activity_log al
+                    WHERE al.proposal_id = p.id AND al.action_type = 'status_changed')
+            FROM proposals p LEFT JOIN proposal_financials pf ON pf.proposal_id = p.id
+            WHERE p.id = %s
+            """,
+            (proposal_id,),
+        )
+        return cursor.fetchone()
+
+    def test_audit_row_rolls_back_with_status_change(self, db):
+        with db.get_db_connection() as conn:
+            cursor = conn.cursor()
+            owner, proposal_id = self._proposal(cursor)
+            conn.commit()
+
+            self._change_status(cursor, proposal_id, owner, 'Signed')
+            conn.rollback()
+
+        with db.get_db_connection() as conn:
+            assert self._state(conn.cursor(), proposal_id) == ('Draft', False, None, None)
+
+    def test_audit_row_commits_with_status_change(self, db):
+        with db.get_db_connection() as conn:
+            cursor = conn.cursor()
+            owner, proposal_id = self._proposal(cursor)
+            conn.commit()
+
+            self._change_status(cursor, proposal_id, owner, 'Sent to Client')
+            self._change_status(cursor, proposal_id, owner, 'Signed')
+            conn.commit()
+
+        with db.get_db_connection() as conn:
+            assert self._state(conn.cursor(), proposal_id) == ('Signed', True, 'Signed', ['Sent to Client', 'Signed'])
+
+    def test_failed_audit_insert_keeps_status_change(self, db):
+        with db.get_db_connection() as conn:
+            cursor = conn.cursor()
+            owner, proposal_id = self._proposal(cursor)
+            conn.commit()
+
+            cursor.execute('UPDATE proposals SET status = %s WHERE id = %s', ('Signed', proposal_id))
+            # A user id that violates the activity_log foreign key aborts only the savepoint.
+            log_status_change(proposal_id, owner + 1000, 'Draft', 'Signed', cursor=cursor)
+            conn.commit()
+
+        with db.get_db_connection() as conn:
+            assert self._state(conn.cursor(), proposal_id) == ('Signed', True, 'Signed', None)
@@ -0,0 +1,78 @@
+"""
+Unit tests for the streaming export helpers (chunked CSV, spooled file streaming, headers).
+
+Run from backend/ directory:
+    python -m pytest tests/test_streaming_export.py -v
+"""
+import sys
+import os
+import csv
+import io
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api.utils import streaming_export
+from api.utils.streaming_export import UTF8_BOM, export_headers, file_size, iter_csv, iter_file, spooled_file
+
+
+class TestIterCsv:
+    def test_bom_header_and_crlf(self):
+        body = b''.join(iter_csv(['a', 'b'], [[1, 'x'], [2, 'y,z']]))
+        assert body.startswith(UTF8_BOM)
+        text = body[len(UTF8_BOM):].decode('utf-8')
+        assert text == 'a,b\r\n1,x\r\n2,"y,z"\r\n'
+
+    def test_without_bom(self):
+        assert b''.join(iter_csv(['a'], [], bom=False)) == b'a\r\n'
+
+    def test_yields_bounded_chunks_lazily(self):
+        consumed = []
+
+        def rows():
+            for i in range(1000):
+                consumed.append(i)
+                yield [i, 'x' * 50]
+
+        stream = iter_csv(['n', 'pad'], rows(), chunk_bytes=1024)
+        next(stream)  # header chunk
+        first = next(stream)
+        assert len(first) < 1024 + 100
+        assert len(consumed) < 50  # rows are pulled only as chunks are needed
+        rest = b''.join(stream)
+        parsed = list(csv.reader(io.StringIO((first + rest).decode('utf-8'))))
+        assert len(parsed) == 1000
+        assert parsed[-1][0] == '999'
+
+    def test_non_ascii_is_utf8(self):
+        body = b''.join(iter_csv(['name'], [['Zoë']], bom=False))
+        assert body.decode('utf-8') == 'name\r\nZoë\r\n'
+
+
+class TestSpooledFile:
+    def test_iter_file_streams_and_closes(self):
+        spool = spooled_file()
+        spool.write(b'x' * 10)
+        assert file_size(spool) == 10
+        assert b''.join(iter_file(spool, chunk_bytes=3)) == b'x' * 10
+        assert spool.closed
+
+    def test_rolls_over_to_disk(self, monkeypatch):
+        monkeypatch.setattr(streaming_export, 'EXPORT_SPOOL_MAX_BYTES', 16)
+        spool = spooled_file()
+        spool.write(b'y' * 64)
+        assert spool._rolled
+        assert b''.join(iter_file(spool)) == b'y' * 64
+
+
+class TestExportHeaders:
+    def test_row_count_and_length(self):
+        headers = export_headers('report.csv', 'csv', row_count=42, content_length=100)
+        assert headers['Content-Disposition'] == 'attachment; filename="report.csv"'
+        assert headers['X-Export-Row-Count'] == '42'
+        assert headers['X-Export-Format'] == 'csv'
+        assert headers['Content-Length'] == '100'
+
+    def test_optional_fields_omitted(self):
+        headers = export_headers('report.pdf', 'pdf')
+        assert 'X-Export-Row-Count' not in headers
+        assert 'Content-Length' not in headers
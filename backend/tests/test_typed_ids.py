@@ -0,0 +1,175 @@
+"""
+Unit tests for typed id binding (IdType) and the index-friendly id filters it enables.
+
+The EXPLAIN tests build temporary copies of proposals / notifications /
+proposal_client_activity with their indexes and check that the rewritten
+predicates are served by an index. They need a scratch Postgres database in
+TEST_DATABASE_URL and are skipped otherwise.
+
+Run from backend/ directory:
+    python -m pytest tests/test_typed_ids.py -v
+"""
+import sys
+import os
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+psycopg2 = pytest.importorskip('psycopg2')
+
+from api.utils.database import IdType
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+requires_db = pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL not set')
+
+
+class TestIdType:
+    @pytest.mark.parametrize('data_type,pg_type', [
+        ('integer', 'integer'),
+        ('BIGINT', 'bigint'),
+        ('uuid', 'uuid'),
+        ('character varying', 'text'),
+        (None, 'text'),
+    ])
+    def test_from_data_type(self, data_type, pg_type):
+        assert IdType.from_data_type(data_type).pg_type == pg_type
+
+    def test_int_coercion(self):
+        ids = IdType('integer')
+        assert ids.coerce(7) == 7
+        assert ids.coerce(' 42 ') == 42
+        assert ids.coerce('abc') is None
+        assert ids.coerce(True) is None
+        assert ids.coerce(None) is None
+
+    def test_uuid_coercion_is_canonical_text(self):
+        ids = IdType('uuid')
+        value = uuid.uuid4()
+        assert ids.coerce(value) == str(value)
+        assert ids.coerce(str(value).upper()) == str(value)
+        assert ids.coerce('12') is None
+
+    def test_text_coercion(self):
+        ids = IdType('text')
+        assert ids.coerce(5) == '5'
+        assert ids.coerce('  ') is None
+
+    def test_coerce_many_dedupes_and_drops_invalid(self):
+        assert IdType('integer').coerce_many(['3', 3, 'x', None, 1]) == [3, 1]
+        assert IdType('integer').coerce_many(None) == []
+
+    def test_any_sql_binds_typed_array(self):
+        assert IdType('uuid').any_sql('p.id') == 'p.id = ANY(%s::uuid[])'
+        assert '::text' not in IdType('integer').any_sql('a.proposal_id')
+
+
+def _plan(cursor, query, params):
+    cursor.execute('EXPLAIN ' + query, params)
+    return '\n'.join(row[0] for row in cursor.fetchall())
+
+
+@pytest.fixture
+def cursor():
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            CREATE TEMP TABLE proposals (
+                id SERIAL PRIMARY KEY,
+                user_id VARCHAR(255),
+                status TEXT,
+                created_at TIMESTAMP DEFAULT NOW()
+            ) ON COMMIT DROP
+            """
+        )
+        cur.execute(
+            """
+            CREATE TEMP TABLE proposal_client_activity (
+                id SERIAL PRIMARY KEY,
+                proposal_id INTEGER,
+                client_id INTEGER,
+                event_type TEXT,
+                created_at TIMESTAMP DEFAULT NOW()
+            ) ON COMMIT DROP
+            """
+        )
+        cur.execute(
+            """
+            CREATE TEMP TABLE notifications (
+                id SERIAL PRIMARY KEY,
+                user_id INTEGER,
+                is_read BOOLEAN DEFAULT FALSE,
+                created_at TIMESTAMP DEFAULT NOW()
+            ) ON COMMIT DROP
+            """
+        )
+        cur.execute('CREATE INDEX ON proposals (user_id)')
+        cur.execute('CREATE INDEX ON proposal_client_activity (proposal_id)')
+        cur.execute('CREATE INDEX ON notifications (user_id, is_read, created_at DESC)')
+        cur.execute(
+            "INSERT INTO proposals (user_id, status) "
+            "SELECT (g % 50)::text, 'Sent to Client' FROM generate_series(1, 5000) g"
+        )
+        cur.execute(
+            "INSERT INTO proposal_client_activity (proposal_id, client_id, event_type) "
+            "SELECT g % 5000 + 1, g % 20, 'open' FROM generate_series(1, 5000) g"
+        )
+        cur.execute(
+            "INSERT INTO notifications (user_id) SELECT g % 100 FROM generate_series(1, 5000) g"
+        )
+        cur.execute('ANALYZE proposals')
+        cur.execute('ANALYZE proposal_client_activity')
+        cur.execute('ANALYZE notifications')
+        cur.execute('SET LOCAL enable_seqscan = off')
+        yield cur
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+@requires_db
+class TestIndexUsage:
+    def test_dashboard_proposal_ids_use_primary_key(self, cursor):
+        ids = IdType('integer')
+        plan = _plan(
+            cursor,
+            f"SELECT p.status, COUNT(*) FROM proposals p WHERE {ids.any_sql('p.id')} GROUP BY p.status",
+            (ids.coerce_many(['1', '2', '3']),),
+        )
+        assert 'Index Cond' in plan and 'proposals_pkey' in plan, plan
+
+    def test_text_cast_is_not_index_served(self, cursor):
+        plan = _plan(
+            cursor,
+            "SELECT p.status FROM proposals p WHERE p.id::text = ANY(%s)",
+            (['1', '2', '3'],),
+        )
+        assert 'Index Cond' not in plan, plan
+
+    def test_activity_proposal_filter_uses_index(self, cursor):
+        ids = IdType('integer')
+        plan = _plan(
+            cursor,
+            f"SELECT a.event_type FROM proposal_client_activity a WHERE a.client_id = %s "
+            f"AND {ids.any_sql('a.proposal_id')}",
+            (3, ids.coerce_many([1, 2, 3])),
+        )
+        assert 'Index Cond' in plan and 'proposal_id' in plan, plan
+
+    def test_notifications_by_user_use_index(self, cursor):
+        user_id = IdType('integer').coerce('7')
+        plan = _plan(
+            cursor,
+            "SELECT id FROM notifications WHERE user_id = %s ORDER BY created_at DESC LIMIT 500",
+            (user_id,),
+        )
+        assert 'Index Cond' in plan and '::text' not in plan, plan
+
+    def test_varchar_owner_bound_as_text_uses_index(self, cursor):
+        user_id = IdType.from_data_type('character varying').coerce(7)
+        plan = _plan(cursor, "SELECT id FROM proposals WHERE user_id = %s", (user_id,))
+        assert 'Index Cond' in plan, plan
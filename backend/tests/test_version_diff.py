@@ -0,0 +1,104 @@
+"""
+Unit tests for the structural proposal version diff.
+
+Run from backend/ directory:
+    python -m pytest tests/test_version_diff.py -v
+"""
+import sys
+import os
+import copy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api.utils.version_diff import diff_documents, diff_texts, diff_words, format_path, legacy_change_counts
+
+
+def _proposal():
+    return {
+        'title': 'Data platform',
+        'sections': [
+            {'id': f's{i}', 'title': f'Section {i}', 'content': f'Section {i} covers scope and deliverables.'}
+            for i in range(4)
+        ],
+        'metadata': {'currency': 'ZAR'},
+    }
+
+
+def _rebuild(segments, side):
+    """Reassemble one side of a word diff (elided runs as '*' * n)."""
+    keep = {'old': ('=', '-'), 'new': ('=', '+')}[side]
+    return ''.join('*' * seg[1] if seg[0] == '~' else seg[1] for seg in segments if seg[0] in keep + ('~',))
+
+
+class TestDiffWords:
+    def test_word_level_segments(self):
+        segments, added, removed = diff_words('The quick brown fox', 'The slow brown fox jumps')
+        assert segments == [['=', 'The '], ['-', 'quick'], ['+', 'slow'], ['=', ' brown fox'], ['+', ' jumps']]
+        assert (added, removed) == (2, 1)
+
+    def test_long_unchanged_runs_are_elided(self):
+        old = 'a ' * 200 + 'old ' + 'b ' * 200
+        new = 'a ' * 200 + 'new ' + 'b ' * 200
+        segments, _, _ = diff_words(old, new)
+        assert segments[0][0] == '~'
+        assert segments[-1][0] == '~'
+        assert ['-', 'old'] in segments and ['+', 'new'] in segments
+        assert len(_rebuild(segments, 'old')) == len(old)
+        assert len(_rebuild(segments, 'new')) == len(new)
+
+
+class TestDiffDocuments:
+    def test_identical_documents(self):
+        diff = diff_documents(_proposal(), _proposal())
+        assert diff['changes'] == []
+
+    def test_section_insert_is_one_addition(self):
+        new = _proposal()
+        new['sections'].insert(1, {'id': 'x', 'title': 'Pricing', 'content': 'Totals'})
+        diff = diff_documents(_proposal(), new)
+        assert [(c['op'], c['label']) for c in diff['changes']] == [('added', 'sections[id=x]')]
+        assert diff['stats']['sections_added'] == 1
+
+    def test_section_field_change_is_word_diff(self):
+        new = _proposal()
+        new['sections'][2]['content'] = 'Section 2 covers scope, pricing and deliverables.'
+        changes = diff_documents(_proposal(), new)['changes']
+        assert len(changes) == 1
+        assert changes[0]['path'] == ['sections', {'id': 's2'}, 'content']
+        assert changes[0]['segments'] == [['=', 'Section 2 covers scope'], ['+', ', pricing'], ['=', ' and deliverables.']]
+        assert changes[0]['words_added'] == 1
+
+    def test_reorder_is_move(self):
+        new = _proposal()
+        new['sections'][0], new['sections'][3] = new['sections'][3], new['sections'][0]
+        diff = diff_documents(_proposal(), new)
+        assert {c['op'] for c in diff['changes']} == {'moved'}
+
+    def test_removed_and_scalar_changes(self):
+        old = _proposal()
+        new = copy.deepcopy(old)
+        del new['sections'][1]
+        new['metadata']['currency'] = 'USD'
+        new['metadata']['discount'] = 5
+        ops = {(c['op'], c['label']) for c in diff_documents(old, new)['changes']}
+        assert ops == {
+            ('removed', 'sections[id=s1]'),
+            ('changed', 'metadata.currency'),
+            ('added', 'metadata.discount'),
+        }
+
+    def test_lists_without_ids_align_on_content(self):
+        old = {'rows': [[1, 2], [3, 4], [5, 6]]}
+        new = {'rows': [[1, 2], [9, 9], [3, 4], [5, 6]]}
+        changes = diff_documents(old, new)['changes']
+        assert [(c['op'], c['path']) for c in changes] == [('added', ['rows', 1])]
+
+    def test_non_json_text(self):
+        diff = diff_texts('plain old text', 'plain new text')
+        assert diff['changes'][0]['label'] == '(document)'
+        assert legacy_change_counts(diff) == {'additions': 1, 'deletions': 1, 'modifications': 1}
+
+
+def test_format_path():
+    assert format_path(['sections', {'id': 'a'}, 'tables', 0]) == 'sections[id=a].tables[0]'
+    assert format_path([]) == '(document)'
@@ -0,0 +1,159 @@
+"""
+Unit tests for delta-compressed proposal version storage.
+
+Run from backend/ directory:
+    python -m pytest tests/test_version_store.py -v
+"""
+import sys
+import os
+import copy
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api.utils import version_store
+from api.utils.version_store import (
+    KIND_DELTA,
+    KIND_FULL,
+    VersionChainError,
+    apply_ops,
+    diff_json,
+    list_versions,
+    plan_version,
+    replay_chain,
+    summarize_ops,
+)
+
+
+def _proposal(sections=5):
+    return {
+        'title': 'Data platform',
+        'sections': [
+            {'title': f'Section {i}', 'content': 'Scope and deliverables for the engagement. ' * 10}
+            for i in range(sections)
+        ],
+        'metadata': {'currency': 'ZAR', 'tags': ['data']},
+    }
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+class TestDiffJson:
+    @pytest.mark.parametrize('change', [
+        lambda d: d['sections'][2].__setitem__('content', d['sections'][2]['content'] + ' Added sentence.'),
+        lambda d: d['sections'].insert(1, {'title': 'New', 'content': 'x'}),
+        lambda d: d['sections'].pop(3),
+        lambda d: d['metadata'].pop('tags'),
+        lambda d: d.__setitem__('budget', 1200.5),
+        lambda d: d.__setitem__('title', 'Renamed'),
+        lambda d: d['metadata'].__setitem__('currency', None),
+    ])
+    def test_round_trip(self, change):
+        old = _proposal()
+        new = copy.deepcopy(old)
+        change(new)
+        ops = diff_json(old, new)
+        assert apply_ops(copy.deepcopy(old), ops) == new
+
+    def test_no_changes(self):
+        assert diff_json(_proposal(), _proposal()) == []
+
+    def test_long_string_edit_is_spliced(self):
+        old = _proposal()
+        new = copy.deepcopy(old)
+        new['sections'][0]['content'] += '!'
+        ops = diff_json(old, new)
+        assert ops == [['s', ['sections', 0, 'content'], len(old['sections'][0]['content']),
+                        len(old['sections'][0]['content']), '!']]
+
+    def test_key_order_change_replaces_dict(self):
+        ops = diff_json({'a': 1, 'b': 2}, {'b': 2, 'a': 1})
+        assert ops == [['r', [], {'b': 2, 'a': 1}]]
+
+    def test_summary(self):
+        ops = diff_json({'title': 'a', 'items': [1]}, {'title': 'b', 'items': [1, 2], 'extra': True})
+        assert summarize_ops(ops) == '3 changes: title, items (items added/removed), extra'
+        assert summarize_ops([]) == 'No changes'
+
+
+class TestPlanVersion:
+    def test_first_version_is_snapshot(self):
+        plan = plan_version(None, None, _dumps(_proposal()))
+        assert plan['storage_kind'] == KIND_FULL
+        assert plan['change_summary'] == 'Initial version'
+
+    def test_small_edit_is_delta(self):
+        old = _proposal()
+        new = copy.deepcopy(old)
+        new['sections'][1]['content'] += ' Updated.'
+        plan = plan_version(_dumps(old), 0, _dumps(new))
+        assert plan['storage_kind'] == KIND_DELTA
+        assert plan['chain_length'] == 1
+        assert plan['stored_size'] < plan['content_size'] / 10
+        assert plan['change_summary'] == '1 change: sections[1].content'
+
+    def test_snapshot_interval(self, monkeypatch):
+        monkeypatch.setattr(version_store, 'PROPOSAL_VERSION_SNAPSHOT_INTERVAL', 3)
+        old = _proposal()
+        new = copy.deepcopy(old)
+        new['title'] = 'Renamed'
+        assert plan_version(_dumps(old), 1, _dumps(new))['storage_kind'] == KIND_DELTA
+        assert plan_version(_dumps(old), 2, _dumps(new))['storage_kind'] == KIND_FULL
+
+    def test_unreproducible_formatting_is_snapshot(self):
+        old = _dumps(_proposal())
+        new = json.dumps(_proposal(), indent=2)
+        assert plan_version(old, 0, new)['storage_kind'] == KIND_FULL
+
+    def test_non_json_is_snapshot(self):
+        plan = plan_version('plain text', 0, 'plain text, edited')
+        assert plan['storage_kind'] == KIND_FULL
+        assert plan['change_summary'] == 'Content replaced'
+
+
+class TestReplayChain:
+    def test_replays_to_exact_text(self):
+        texts = []
+        doc = _proposal()
+        for i in range(6):
+            doc = copy.deepcopy(doc)
+            doc['sections'][i % 5]['content'] += f' Edit {i}.'
+            texts.append(json.dumps(doc, ensure_ascii=False))
+        rows = [{'storage_kind': KIND_FULL, 'content': texts[0]}]
+        chain = 0
+        for prev, text in zip(texts, texts[1:]):
+            plan = plan_version(prev, chain, text)
+            assert plan['storage_kind'] == KIND_DELTA
+            chain = plan['chain_length']
+            rows.append({'storage_kind': KIND_DELTA, 'content': None, 'delta': plan['delta']})
+        for end in range(1, len(rows) + 1):
+            assert replay_chain(rows[:end]) == texts[end - 1]
+
+    def test_chain_must_start_with_snapshot(self):
+        with pytest.raises(VersionChainError):
+            replay_chain([{'storage_kind': KIND_DELTA, 'content': None, 'delta': b''}])
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.sql = None
+
+    def execute(self, sql, params=None):
+        self.sql = sql
+
+    def fetchall(self):
+        return self.rows
+
+
+class TestListVersions:
+    def test_listing_never_reads_content(self):
+        cursor = FakeCursor([{'id': 1, 'version_number': 1, 'created_at': None, 'change_summary': 'Initial version'}])
+        versions = list_versions(cursor, 7)
+        assert versions[0]['change_summary'] == 'Initial version'
+        assert 'content' not in cursor.sql.replace('content_size', '')
+        assert 'delta' not in cursor.sql
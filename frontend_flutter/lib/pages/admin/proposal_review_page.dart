@@ -200,7 +200,7 @@ class _ProposalReviewPageState extends State<ProposalReviewPage> {
   Future<void> _loadVersions(int proposalId, String token) async {
     try {
       final response = await http.get(
-        Uri.parse('${ApiService.baseUrl}/api/proposals/$proposalId/versions'),
+        Uri.parse('${ApiService.baseUrl}/api/proposals/$proposalId/versions?content=false'),
         headers: {
           'Authorization': 'Bearer $token',
           'Content-Type': 'application/json',
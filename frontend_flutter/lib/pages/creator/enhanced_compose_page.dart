@@ -56,6 +56,7 @@ class _EnhancedComposePageState extends State<EnhancedComposePage>
       final versions = await ApiService.getVersions(
         token: token,
         proposalId: proposalIdInt,
+        includeContent: false,
       );
 
       if (versions.isEmpty) {
@@ -481,10 +481,12 @@ class ApiService {
   static Future<List<dynamic>> getVersions({
     required String token,
     required int proposalId,
+    bool includeContent = true,
   }) async {
     try {
+      final query = includeContent ? '' : '?content=false';
       final response = await http.get(
-        Uri.parse('$baseUrl/api/proposals/$proposalId/versions'),
+        Uri.parse('$baseUrl/api/proposals/$proposalId/versions$query'),
         headers: _getHeaders(token),
       );
 
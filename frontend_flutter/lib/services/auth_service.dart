@@ -315,9 +315,22 @@ class AuthService {
 
   // Logout
   static void logout() {
+    final token = _token;
     _token = null;
     _currentUser = null;
     _clearSessionStorage();
+    if (token != null) {
+      // Revoke the backend session; local state is already cleared either way
+      http
+          .post(
+            Uri.parse('$baseUrl/api/logout'),
+            headers: {'Authorization': 'Bearer $token'},
+          )
+          .catchError((e) {
+        print('⚠️ AuthService: Logout request failed: $e');
+        return http.Response('', 0);
+      });
+    }
   }
 
   // Get headers for authenticated requests
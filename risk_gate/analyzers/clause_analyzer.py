@@ -3,12 +3,21 @@ Clause Analyzer Module
 Detects altered or incomplete clauses by comparing against templates
 """
 
-import re
 from typing import Dict, List, Any, Optional, Tuple
 import logging
 from difflib import SequenceMatcher
 import numpy as np
 
+try:
+    from ..utils.pattern_engine import PatternSet
+except ImportError:
+    from utils.pattern_engine import PatternSet
+
+try:
+    from .clause_index import get_clause_index
+except ImportError:
+    from analyzers.clause_index import get_clause_index
+
 
 class ClauseAnalyzer:
     """Analyzes proposal clauses against template clauses for alterations"""
@@ -52,6 +61,7 @@ class ClauseAnalyzer:
                 r'(?i)(fit\s+for\s+purpose|suitable\s+for)'
             ]
         }
+        self.patterns = PatternSet('clause', self.clause_patterns)
     
     def analyze_clauses(self, proposal_text: str) -> Dict[str, Any]:
         """
@@ -69,6 +79,7 @@ class ClauseAnalyzer:
                 'missing_clauses': [],
                 'clause_similarity_scores': {},
                 'clause_risk_score': 0.0,
+                'clause_similarity_tolerance': 0.0,
                 'recommendations': []
             }
             
@@ -92,6 +103,9 @@ class ClauseAnalyzer:
                     results['missing_clauses'].extend(clause_result['missing_clauses'])
                 
                 results['clause_similarity_scores'][clause_type] = clause_result['similarity_score']
+                results['clause_similarity_tolerance'] = max(
+                    results['clause_similarity_tolerance'], clause_result['similarity_tolerance']
+                )
             
             # Calculate overall clause risk score
             results['clause_risk_score'] = self._calculate_clause_risk_score(results)
@@ -126,7 +140,7 @@ class ClauseAnalyzer:
         
         # Just check for presence of common clauses
         for clause_type, patterns in self.clause_patterns.items():
-            has_clause = any(re.search(pattern, proposal_text) for pattern in patterns)
+            has_clause = self.patterns.search(proposal_text, clause_type) is not None
             
             if not has_clause:
                 results['missing_clauses'].append({
@@ -151,19 +165,18 @@ class ClauseAnalyzer:
         """Extract clauses from text based on patterns"""
         clauses = {}
         
-        for clause_type, patterns in self.clause_patterns.items():
+        for clause_type in self.clause_patterns:
             clause_texts = []
             
-            for pattern in patterns:
-                matches = re.finditer(pattern, text)
-                for match in matches:
-                    # Extract context around the match
-                    start = max(0, match.start() - 50)
-                    end = min(len(text), match.end() + 200)
-                    clause_text = text[start:end].strip()
-                    
-                    if clause_text and clause_text not in clause_texts:
-                        clause_texts.append(clause_text)
+            for hit in self.patterns.finditer(text, clause_type):
+                match = hit.found
+                # Extract context around the match
+                start = max(0, match.start() - 50)
+                end = min(len(text), match.end() + 200)
+                clause_text = text[start:end].strip()
+                
+                if clause_text and clause_text not in clause_texts:
+                    clause_texts.append(clause_text)
             
             clauses[clause_type] = clause_texts
         
@@ -175,7 +188,8 @@ class ClauseAnalyzer:
         result = {
             'altered_clauses': [],
             'missing_clauses': [],
-            'similarity_score': 0.0
+            'similarity_score': 0.0,
+            'similarity_tolerance': 0.0
         }
         
         # Get template clauses for this type
@@ -194,19 +208,16 @@ class ClauseAnalyzer:
             
             return result
         
-        # Compare proposal clauses against templates
+        # Compare proposal clauses against templates (shortlisted by the clause index,
+        # within its reported tolerance of scoring every template)
         best_similarity = 0.0
+        index = get_clause_index(template_clauses)
         
         for proposal_clause in proposal_clauses.get(clause_type, []):
-            max_similarity = 0.0
-            best_template = ""
-            
-            for template_clause in template_clauses:
-                similarity = self._calculate_similarity(proposal_clause, template_clause)
-                
-                if similarity > max_similarity:
-                    max_similarity = similarity
-                    best_template = template_clause
+            match = index.best_match(proposal_clause)
+            max_similarity = match.score
+            best_template = match.template
+            result['similarity_tolerance'] = max(result['similarity_tolerance'], match.tolerance)
             
             if max_similarity < self.similarity_threshold:
                 result['altered_clauses'].append({
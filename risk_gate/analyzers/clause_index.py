@@ -0,0 +1,291 @@
+"""
+Clause Similarity Index Module
+MinHash/LSH index over template clauses for ClauseAnalyzer
+
+Scoring a proposal clause used to run the full scorer (SequenceMatcher, word
+Jaccard and character 3-gram Jaccard) against every template clause. The index
+is built once per template set and does the following:
+
+  - keeps each template's lowercased text, word set, 3-gram set and character
+    counts, plus a SequenceMatcher primed with the template, so per-template
+    work is not repeated for every clause
+  - shortlists candidates with MinHash signatures of the 3-gram sets split
+    into LSH bands, and runs the exact scorer on the shortlist first
+  - scores any other template whose upper bound could still beat the best
+    score by more than the tolerance. Bounds are tiered: text and set sizes
+    first, then exact Jaccards plus SequenceMatcher.quick_ratio's
+    character-count bound. A template left unscored therefore cannot score
+    more than `tolerance` above the reported best.
+  - reports that bound per match, so callers know how far the result can be
+    from the exhaustive scorer (0.0 when every template that could win was
+    scored)
+
+Signatures are persisted as `<index dir>/<key>.npz`, where the key hashes the
+template texts and the MinHash parameters. A changed template set gets a new
+file instead of a stale index; only the most recently written files are kept.
+
+Environment:
+  RISK_GATE_CLAUSE_INDEX_CACHE           "false" keeps indexes in memory only
+  RISK_GATE_CLAUSE_INDEX_DIR             index directory (default $XDG_CACHE_HOME/risk_gate/clause_index,
+                                         i.e. ~/.cache/risk_gate/clause_index)
+  RISK_GATE_CLAUSE_INDEX_MAX_FILES       index files kept in the directory (default 16)
+  RISK_GATE_CLAUSE_SIMILARITY_TOLERANCE  largest score gap to the exhaustive scorer (default 0.02)
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import zlib
+from collections import Counter, namedtuple
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+CLAUSE_INDEX_CACHE_ENABLED = os.getenv("RISK_GATE_CLAUSE_INDEX_CACHE", "true").strip().lower() not in ("0", "false", "no")
+CLAUSE_INDEX_DIR = os.getenv("RISK_GATE_CLAUSE_INDEX_DIR") or os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "risk_gate", "clause_index"
+)
+CLAUSE_INDEX_MAX_FILES = int(os.getenv("RISK_GATE_CLAUSE_INDEX_MAX_FILES", "16"))
+CLAUSE_SIMILARITY_TOLERANCE = float(os.getenv("RISK_GATE_CLAUSE_SIMILARITY_TOLERANCE", "0.02"))
+
+INDEX_FORMAT = 1
+NUM_PERM = 64
+LSH_BANDS = 16
+NGRAM_SIZE = 3
+
+# Scorer weights, as in ClauseAnalyzer._calculate_similarity
+SEQ_WEIGHT = 0.4
+WORD_WEIGHT = 0.4
+NGRAM_WEIGHT = 0.2
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_perm_rng = np.random.RandomState(1)
+_PERM_A = _perm_rng.randint(1, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _perm_rng.randint(0, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+
+logger = logging.getLogger(__name__)
+
+ClauseMatch = namedtuple('ClauseMatch', ['score', 'template', 'template_index', 'tolerance', 'scored'])
+
+
+def ngrams(text: str, n: int = NGRAM_SIZE) -> frozenset:
+    return frozenset(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _size_bound(a: int, b: int) -> float:
+    """Upper bound of Jaccard for sets of sizes a and b."""
+    if not a or not b:
+        return 0.0
+    return min(a, b) / max(a, b)
+
+
+def _ratio(matches: int, length: int) -> float:
+    """SequenceMatcher's ratio formula."""
+    return 2.0 * matches / length if length else 1.0
+
+
+def combine(seq: float, word: float, ngram: float) -> float:
+    return SEQ_WEIGHT * seq + WORD_WEIGHT * word + NGRAM_WEIGHT * ngram
+
+
+def minhash(shingles: frozenset) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint64 values) of a shingle set."""
+    if not shingles:
+        return np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+    permuted = ((hashes[:, None] * _PERM_A + _PERM_B) % _MERSENNE_PRIME) & _MAX_HASH
+    return permuted.min(axis=0)
+
+
+def _band_keys(signature: np.ndarray) -> List[bytes]:
+    rows = NUM_PERM // LSH_BANDS
+    return [signature[band * rows:(band + 1) * rows].tobytes() for band in range(LSH_BANDS)]
+
+
+def index_key(templates: Sequence[str]) -> str:
+    """Content hash naming the index of a template set."""
+    digest = hashlib.sha256(f"v{INDEX_FORMAT}:{NUM_PERM}:{LSH_BANDS}:{NGRAM_SIZE}".encode('utf-8'))
+    for text in templates:
+        digest.update(hashlib.sha256(text.encode('utf-8')).digest())
+    return digest.hexdigest()
+
+
+class _Profile:
+    """Everything the scorer needs from one text, computed once."""
+
+    __slots__ = ('lower', 'words', 'ngrams', 'chars')
+
+    def __init__(self, text: str):
+        self.lower = text.lower()
+        self.words = frozenset(self.lower.split())
+        self.ngrams = ngrams(self.lower)
+        self.chars = Counter(self.lower)
+
+
+class ClauseIndex:
+    """Similarity index over one set of template clauses"""
+
+    def __init__(self, templates: Sequence[str], tolerance: float = CLAUSE_SIMILARITY_TOLERANCE,
+                 cache_dir: Optional[str] = None):
+        """
+        Build (or load) the index for a template set
+
+        Args:
+            templates: Template clause texts, in the order ties are resolved
+            tolerance: Largest allowed gap between a match and the exhaustive best
+            cache_dir: Where signatures are persisted (None: CLAUSE_INDEX_DIR, unless disabled)
+        """
+        self.templates = list(templates)
+        self.tolerance = max(0.0, tolerance)
+        self.key = index_key(self.templates)
+        self._profiles = [_Profile(text) for text in self.templates]
+        self._matchers: List[Optional[SequenceMatcher]] = [None] * len(self.templates)
+        self._lock = threading.Lock()
+
+        if cache_dir is None and CLAUSE_INDEX_CACHE_ENABLED:
+            cache_dir = CLAUSE_INDEX_DIR
+        self.path = os.path.join(cache_dir, f"{self.key}.npz") if cache_dir else None
+        self.signatures = self._load_signatures()
+        if self.signatures is None:
+            self.signatures = np.array([minhash(p.ngrams) for p in self._profiles], dtype=np.uint64).reshape(-1, NUM_PERM)
+            self._save_signatures()
+
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(LSH_BANDS)]
+        for i, signature in enumerate(self.signatures):
+            for band, key in enumerate(_band_keys(signature)):
+                self._buckets[band].setdefault(key, []).append(i)
+
+    def _load_signatures(self) -> Optional[np.ndarray]:
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with np.load(self.path) as data:
+                signatures = data['signatures']
+            if signatures.shape == (len(self.templates), NUM_PERM):
+                return signatures.astype(np.uint64, copy=False)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable clause index {self.path}: {str(e)}")
+        return None
+
+    def _save_signatures(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, signatures=self.signatures)
+            os.replace(tmp_path, self.path)
+            self._evict_old_indexes()
+        except Exception as e:
+            logger.warning(f"Could not persist clause index {self.path}: {str(e)}")
+
+    def _evict_old_indexes(self):
+        """Remove all but the CLAUSE_INDEX_MAX_FILES most recently written indexes"""
+        directory = os.path.dirname(self.path) or '.'
+        paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.npz')]
+        if len(paths) <= CLAUSE_INDEX_MAX_FILES:
+            return
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for stale in paths[max(1, CLAUSE_INDEX_MAX_FILES):]:
+            if stale != self.path:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+
+    def candidates(self, signature: np.ndarray) -> List[int]:
+        """Templates sharing at least one LSH band with the signature"""
+        found = set()
+        for band, key in enumerate(_band_keys(signature)):
+            found.update(self._buckets[band].get(key, ()))
+        return sorted(found)
+
+    def _score(self, query: _Profile, i: int, word: float, ngram: float) -> float:
+        """Exact score; identical to ClauseAnalyzer._calculate_similarity(query, template i)."""
+        with self._lock:
+            matcher = self._matchers[i]
+            if matcher is None:
+                matcher = self._matchers[i] = SequenceMatcher(None)
+                matcher.set_seq2(self._profiles[i].lower)
+            matcher.set_seq1(query.lower)
+            seq = matcher.ratio()
+        return combine(seq, word, ngram)
+
+    def best_match(self, clause: str) -> ClauseMatch:
+        """
+        Best-scoring template for a clause
+
+        Returns:
+            ClauseMatch(score, template, template_index, tolerance, scored), where
+            tolerance bounds how far the exhaustive best can be above `score`
+            and scored is how many templates ran the exact scorer
+        """
+        query = _Profile(clause)
+        scores: Dict[int, float] = {}
+        for i in self.candidates(minhash(query.ngrams)):
+            p = self._profiles[i]
+            scores[i] = self._score(query, i, jaccard(query.words, p.words), jaccard(query.ngrams, p.ngrams))
+        best = max(scores.values(), default=0.0)
+
+        # Visit the rest from the loosest bound down, so the best score rises early
+        # and everything after the first bound within tolerance can be skipped.
+        remaining = []
+        for i, p in enumerate(self._profiles):
+            if i not in scores:
+                remaining.append((combine(
+                    _ratio(min(len(query.lower), len(p.lower)), len(query.lower) + len(p.lower)),
+                    _size_bound(len(query.words), len(p.words)),
+                    _size_bound(len(query.ngrams), len(p.ngrams)),
+                ), i))
+        remaining.sort(key=lambda item: -item[0])
+
+        slack = 0.0
+        for bound, i in remaining:
+            if bound <= best + self.tolerance:
+                slack = max(slack, bound)
+                break
+            p = self._profiles[i]
+            word = jaccard(query.words, p.words)
+            ngram = jaccard(query.ngrams, p.ngrams)
+            bound = combine(_ratio(sum((query.chars & p.chars).values()), len(query.lower) + len(p.lower)), word, ngram)
+            if bound <= best + self.tolerance:
+                slack = max(slack, bound)
+                continue
+            scores[i] = self._score(query, i, word, ngram)
+            best = max(best, scores[i])
+
+        # Earliest template wins ties, as in the exhaustive loop
+        best_index = min((i for i, s in scores.items() if s == best and s > 0.0), default=None)
+        return ClauseMatch(
+            score=best,
+            template=self.templates[best_index] if best_index is not None else "",
+            template_index=best_index,
+            tolerance=max(0.0, slack - best),
+            scored=len(scores),
+        )
+
+
+_indexes: Dict[str, ClauseIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_clause_index(templates: Sequence[str]) -> ClauseIndex:
+    """The shared index for a template set (built once per process and content hash)"""
+    key = index_key(templates)
+    with _indexes_lock:
+        index = _indexes.get(key)
+    if index is None:
+        index = ClauseIndex(templates)
+        with _indexes_lock:
+            index = _indexes.setdefault(key, index)
+    return index
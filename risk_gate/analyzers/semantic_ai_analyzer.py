@@ -17,6 +17,24 @@ except ImportError:
     EMBEDDING_AVAILABLE = False
     logging.warning("Vector store not available, using fallback analysis")
 
+try:
+    from ..utils.pattern_engine import PatternSet
+except ImportError:
+    from utils.pattern_engine import PatternSet
+
+# Contradiction checks used by check_semantic_coherence: (pattern, issue type)
+CONTRADICTION_PATTERNS = [
+    (r'(?i)(experienced|qualified)(.{0,100})(but|however)(.{0,100})(inexperienced|new|junior)', 'experience_contradiction'),
+    (r'(?i)(complete|finish)(.{0,100})(but|however)(.{0,100})(delay|extend|postpone)', 'timeline_contradiction'),
+    (r'(?i)(budget|cost)(.{0,100})(but|however)(.{0,100})(expensive|costly|overpriced)', 'budget_contradiction'),
+    (r'(?i)(comprehensive|complete)(.{0,100})(but|however)(.{0,100})(limited|small|basic)', 'scope_contradiction')
+]
+_CONTRADICTIONS = PatternSet(
+    'semantic_coherence',
+    {issue_type: [pattern] for pattern, issue_type in CONTRADICTION_PATTERNS},
+    re.IGNORECASE,
+)
+
 
 class SemanticAIAnalyzer:
     """Uses embeddings and semantic analysis for deeper risk detection"""
@@ -83,6 +101,12 @@ class SemanticAIAnalyzer:
                 'weight': 0.15
             }
         }
+        
+        groups = {}
+        for risk_type, config in self.semantic_patterns.items():
+            groups[f'{risk_type}.keywords'] = [rf'(?i)\b{re.escape(keyword)}\b' for keyword in config['keywords']]
+            groups[f'{risk_type}.context'] = config['context_patterns']
+        self.patterns = PatternSet('semantic', groups, re.IGNORECASE)
     
     def analyze_semantic_risks(self, proposal_text: str) -> Dict[str, Any]:
         """
@@ -150,28 +174,24 @@ class SemanticAIAnalyzer:
             score = 0.0
             
             # Check keyword presence
-            keyword_matches = 0
-            for keyword in config['keywords']:
-                if re.search(rf'(?i)\b{re.escape(keyword)}\b', text):
-                    keyword_matches += 1
+            keyword_matches = len(self.patterns.matched(text, f'{risk_type}.keywords'))
             
             # Check context patterns
             context_matches = 0
-            for pattern in config['context_patterns']:
-                matches = re.findall(pattern, text, re.IGNORECASE)
-                if matches:
-                    context_matches += len(matches)
-                    # Extract context for flags
-                    for match in matches[:3]:  # Limit to 3 matches per pattern
-                        context = str(match[0] if isinstance(match, tuple) else match)
-                        if len(context) > 50:
-                            context = context[:100] + "..."
-                        flags.append({
-                            'type': risk_type,
-                            'pattern': pattern,
-                            'context': context,
-                            'severity': 'high' if context_matches > 2 else 'medium'
-                        })
+            for hit in self.patterns.findall(text, f'{risk_type}.context'):
+                matches = hit.found
+                context_matches += len(matches)
+                # Extract context for flags
+                for match in matches[:3]:  # Limit to 3 matches per pattern
+                    context = str(match[0] if isinstance(match, tuple) else match)
+                    if len(context) > 50:
+                        context = context[:100] + "..."
+                    flags.append({
+                        'type': risk_type,
+                        'pattern': hit.pattern,
+                        'context': context,
+                        'severity': 'high' if context_matches > 2 else 'medium'
+                    })
             
             # Calculate score for this risk type
             if keyword_matches > 0 or context_matches > 0:
@@ -356,15 +376,8 @@ class SemanticAIAnalyzer:
             coherence_issues = []
             
             # Check for contradictory statements
-            contradiction_patterns = [
-                (r'(?i)(experienced|qualified)(.{0,100})(but|however)(.{0,100})(inexperienced|new|junior)', 'experience_contradiction'),
-                (r'(?i)(complete|finish)(.{0,100})(but|however)(.{0,100})(delay|extend|postpone)', 'timeline_contradiction'),
-                (r'(?i)(budget|cost)(.{0,100})(but|however)(.{0,100})(expensive|costly|overpriced)', 'budget_contradiction'),
-                (r'(?i)(comprehensive|complete)(.{0,100})(but|however)(.{0,100})(limited|small|basic)', 'scope_contradiction')
-            ]
-            
-            for pattern, issue_type in contradiction_patterns:
-                matches = re.findall(pattern, text, re.IGNORECASE)
+            for _, issue_type in CONTRADICTION_PATTERNS:
+                matches = [m for hit in _CONTRADICTIONS.findall(text, issue_type) for m in hit.found]
                 if matches:
                     coherence_issues.append({
                         'type': issue_type,
@@ -7,6 +7,11 @@ import re
 from typing import Dict, List, Any, Optional
 import logging
 
+try:
+    from ..utils.pattern_engine import PatternSet
+except ImportError:
+    from utils.pattern_engine import PatternSet
+
 
 class WeaknessAnalyzer:
     """Analyzes proposals for weak areas and incomplete information"""
@@ -126,6 +131,12 @@ class WeaknessAnalyzer:
                 r'(?i)(measurable|quantifiable|specific)(.{0,50})?(deliverables|outputs)'
             ]
         }
+        
+        groups = dict(self.quality_indicators)
+        for weakness_type, config in self.weakness_patterns.items():
+            groups[f'{weakness_type}.indicators'] = config['indicators']
+            groups[f'{weakness_type}.negative_indicators'] = config['negative_indicators']
+        self.patterns = PatternSet('weakness', groups, re.IGNORECASE)
     
     def analyze_weaknesses(self, proposal_text: str) -> Dict[str, Any]:
         """
@@ -205,28 +216,23 @@ class WeaknessAnalyzer:
         weakness_count = 0
         total_indicators = len(config['indicators'])
         
-        for pattern in config['indicators']:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                weakness_count += len(matches)
-                result['indicators_found'].extend([match[0] if isinstance(match, tuple) else match for match in matches[:3]])
+        for hit in self.patterns.findall(text, f'{weakness_type}.indicators'):
+            matches = hit.found
+            weakness_count += len(matches)
+            result['indicators_found'].extend([match[0] if isinstance(match, tuple) else match for match in matches[:3]])
         
         # Check for negative indicators (more severe)
         negative_count = 0
-        for pattern in config['negative_indicators']:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                negative_count += len(matches)
-                result['indicators_found'].extend([match[0] if isinstance(match, tuple) else match for match in matches[:2]])
+        for hit in self.patterns.findall(text, f'{weakness_type}.negative_indicators'):
+            matches = hit.found
+            negative_count += len(matches)
+            result['indicators_found'].extend([match[0] if isinstance(match, tuple) else match for match in matches[:2]])
         
         # Check for quality indicators (reduce weakness score)
         quality_count = 0
         if weakness_type.replace('weak_', 'strong_') in self.quality_indicators:
-            quality_patterns = self.quality_indicators[weakness_type.replace('weak_', 'strong_')]
-            for pattern in quality_patterns:
-                matches = re.findall(pattern, text, re.IGNORECASE)
-                if matches:
-                    quality_count += len(matches)
+            for hit in self.patterns.findall(text, weakness_type.replace('weak_', 'strong_')):
+                quality_count += len(hit.found)
         
         # Calculate weakness score
         base_weakness_score = (weakness_count + (negative_count * 2)) / max(1, total_indicators)
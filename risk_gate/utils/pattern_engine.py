@@ -0,0 +1,240 @@
+"""
+Pattern Engine Module
+Compiles the analyzers' and validators' regex patterns once and shares one
+scan of the proposal text between them.
+
+Every pattern is compiled once per process (`compile_pattern`) together with
+its trigger literals: a set of words, one of which must occur in any text the
+pattern can match (e.g. 'payment' or 'billing' for
+`(payment\\s+terms?|billing\\s+terms?)`). They are read from the parsed regex,
+so they are exact rather than hand-maintained.
+
+`scan_text` folds the text once and answers "does this literal occur?" with a
+memoised substring search. Patterns whose triggers are absent are skipped
+without running the regex, and every regex result is memoised on the scan, so
+the clause, weakness and semantic analyzers and the validators only pay for
+each pattern once per text. The last few scans are kept, since the risk gate
+runs every analyzer over the same text in turn.
+
+`PatternSet` holds an analyzer's named pattern groups and reports each hit as
+a `PatternMatch(analyzer, group, pattern, found)`. Results are identical to
+calling `re.finditer`/`re.findall`/`re.search` with the same pattern and flags.
+"""
+
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterator, List, Mapping, Optional, Sequence
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+# Characters that match an ASCII letter under re.IGNORECASE but do not
+# lower() to it. Folding them lets literal checks run on `text.lower()`.
+_FOLD = {0x130: 'i', 0x131: 'i', 0x17F: 's', 0x212A: 'k'}
+
+_SCAN_CACHE_SIZE = 8
+
+
+def fold(text: str) -> str:
+    return text.translate(_FOLD).lower()
+
+
+def _literal_char(op, av) -> Optional[str]:
+    """The character matched by a LITERAL (or one-character class) node, if ASCII."""
+    name = str(op)
+    if name == 'IN' and len(av) == 1 and str(av[0][0]) == 'LITERAL':
+        op, av = av[0]
+        name = 'LITERAL'
+    if name == 'LITERAL' and av < 128:
+        return fold(chr(av))
+    return None
+
+
+def _required(seq) -> Optional[FrozenSet[str]]:
+    """Literals of which at least one occurs in every match of `seq`; None if unknown."""
+    candidates = []
+    run = []
+
+    def close_run():
+        if run:
+            candidates.append(frozenset([''.join(run)]))
+            run.clear()
+
+    for op, av in seq:
+        name = str(op)
+        char = _literal_char(op, av)
+        if char is not None:
+            run.append(char)
+            continue
+        close_run()
+        if name == 'SUBPATTERN':
+            sub = _required(av[-1])
+        elif name == 'ATOMIC_GROUP':
+            sub = _required(av)
+        elif name == 'BRANCH':
+            alternatives = [_required(branch) for branch in av[1]]
+            sub = None if any(a is None for a in alternatives) else frozenset().union(*alternatives)
+        elif name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT') and av[0] >= 1:
+            sub = _required(av[2])
+        else:
+            sub = None
+        if sub:
+            candidates.append(sub)
+    close_run()
+
+    if not candidates:
+        return None
+    # Prefer the most selective requirement: longest shortest-literal, then fewest literals.
+    return max(candidates, key=lambda lits: (min(len(lit) for lit in lits), -len(lits)))
+
+
+def trigger_literals(pattern: str, flags: int = 0) -> Optional[FrozenSet[str]]:
+    """Folded literals one of which every match of `pattern` contains (None: always run it)."""
+    try:
+        return _required(sre_parse.parse(pattern, flags))
+    except Exception:
+        return None
+
+
+class CompiledPattern:
+    """A compiled regex plus the trigger literals used to skip it cheaply."""
+
+    __slots__ = ('pattern', 'flags', 'regex', 'triggers')
+
+    def __init__(self, pattern: str, flags: int = 0):
+        self.pattern = pattern
+        self.flags = flags
+        self.regex = re.compile(pattern, flags)
+        self.triggers = trigger_literals(pattern, flags)
+
+    def __repr__(self):
+        return f"CompiledPattern({self.pattern!r})"
+
+
+@lru_cache(maxsize=None)
+def compile_pattern(pattern: str, flags: int = 0) -> CompiledPattern:
+    return CompiledPattern(pattern, flags)
+
+
+class TextScan:
+    """One text, folded once, with memoised literal checks and regex results."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.folded = fold(text)
+        self._literals: Dict[str, bool] = {}
+        self._results: Dict[tuple, object] = {}
+
+    def contains(self, literal: str) -> bool:
+        found = self._literals.get(literal)
+        if found is None:
+            found = self._literals[literal] = literal in self.folded
+        return found
+
+    def may_match(self, compiled: CompiledPattern) -> bool:
+        return compiled.triggers is None or any(self.contains(lit) for lit in compiled.triggers)
+
+    def _memo(self, kind: str, compiled: CompiledPattern, run):
+        key = (kind, compiled.pattern, compiled.flags)
+        if key not in self._results:
+            self._results[key] = run() if self.may_match(compiled) else None
+        return self._results[key]
+
+    def search(self, compiled: CompiledPattern):
+        return self._memo('search', compiled, lambda: compiled.regex.search(self.text))
+
+    def finditer(self, compiled: CompiledPattern) -> List:
+        return list(self._memo('finditer', compiled, lambda: tuple(compiled.regex.finditer(self.text))) or ())
+
+    def findall(self, compiled: CompiledPattern) -> List:
+        return list(self._memo('findall', compiled, lambda: tuple(compiled.regex.findall(self.text))) or ())
+
+
+_scans: 'OrderedDict[str, TextScan]' = OrderedDict()
+_scans_lock = threading.Lock()
+
+
+def scan_text(text: str) -> TextScan:
+    """The shared scan for `text` (recent scans are reused)."""
+    with _scans_lock:
+        scan = _scans.get(text)
+        if scan is not None:
+            _scans.move_to_end(text)
+            return scan
+    scan = TextScan(text)
+    with _scans_lock:
+        _scans[text] = scan
+        while len(_scans) > _SCAN_CACHE_SIZE:
+            _scans.popitem(last=False)
+    return scan
+
+
+def search(pattern: str, text: str, flags: int = 0):
+    """Same result as re.search(pattern, text, flags)."""
+    return scan_text(text).search(compile_pattern(pattern, flags))
+
+
+def finditer(pattern: str, text: str, flags: int = 0) -> Iterator:
+    """Same matches as re.finditer(pattern, text, flags)."""
+    return iter(scan_text(text).finditer(compile_pattern(pattern, flags)))
+
+
+def findall(pattern: str, text: str, flags: int = 0) -> List:
+    """Same result as re.findall(pattern, text, flags)."""
+    return scan_text(text).findall(compile_pattern(pattern, flags))
+
+
+PatternMatch = namedtuple('PatternMatch', ['analyzer', 'group', 'pattern', 'found'])
+
+
+class PatternSet:
+    """An analyzer's named groups of patterns, compiled when the set is built."""
+
+    def __init__(self, analyzer: str, groups: Mapping[str, Sequence[str]], flags: int = 0):
+        self.analyzer = analyzer
+        self.groups: Dict[str, List[CompiledPattern]] = {
+            group: [compile_pattern(p, flags) for p in patterns] for group, patterns in groups.items()
+        }
+
+    def patterns(self, group: str) -> List[CompiledPattern]:
+        return self.groups[group]
+
+    def finditer(self, text: str, group: str) -> Iterator[PatternMatch]:
+        """Every match of the group's patterns, pattern by pattern; `found` is the re.Match."""
+        scan = scan_text(text)
+        for compiled in self.groups[group]:
+            for match in scan.finditer(compiled):
+                yield PatternMatch(self.analyzer, group, compiled.pattern, match)
+
+    def findall(self, text: str, group: str) -> List[PatternMatch]:
+        """One entry per pattern that matched; `found` is its re.findall() list."""
+        scan = scan_text(text)
+        hits = []
+        for compiled in self.groups[group]:
+            found = scan.findall(compiled)
+            if found:
+                hits.append(PatternMatch(self.analyzer, group, compiled.pattern, found))
+        return hits
+
+    def matched(self, text: str, group: str) -> List[PatternMatch]:
+        """One entry per pattern that matches anywhere; `found` is its first re.Match."""
+        scan = scan_text(text)
+        hits = []
+        for compiled in self.groups[group]:
+            match = scan.search(compiled)
+            if match is not None:
+                hits.append(PatternMatch(self.analyzer, group, compiled.pattern, match))
+        return hits
+
+    def search(self, text: str, group: str) -> Optional[PatternMatch]:
+        """The first pattern of the group that matches, or None."""
+        scan = scan_text(text)
+        for compiled in self.groups[group]:
+            match = scan.search(compiled)
+            if match is not None:
+                return PatternMatch(self.analyzer, group, compiled.pattern, match)
+        return None
@@ -10,7 +10,7 @@ import chromadb
 from chromadb.config import Settings
 from chromadb.utils import embedding_functions
 
-from .embedder import MiniLMEmbedder
+from .embedder import get_embedder
 
 
 class ChromaVectorStore:
@@ -33,7 +33,7 @@ class ChromaVectorStore:
         self.embedding_model = embedding_model
         
         # Initialize embedder
-        self.embedder = MiniLMEmbedder(model_name=embedding_model)
+        self.embedder = get_embedder(embedding_model)
         
         # Initialize ChromaDB client
         self.client = self._init_chroma_client()
@@ -1,9 +1,21 @@
 """
 MiniLM Embedder for Risk Gate Vector Store
 Hugging Face sentence-transformers integration for document embeddings
+
+Models are loaded once per process and shared: every MiniLMEmbedder for the
+same (model_name, device) reuses the same SentenceTransformer, and
+get_embedder() returns one embedder per model name. Encoded texts are kept in
+a persistent EmbeddingCache (see embedding_cache.py) so repeated similarity
+checks only encode texts the model has not seen before.
+
+Environment:
+  RISK_GATE_EMBEDDING_CACHE          "false" disables the on-disk cache
+  RISK_GATE_EMBEDDING_CACHE_DIR      cache directory (default <cache_dir>/embeddings)
+  RISK_GATE_EMBEDDING_CACHE_MAX_ROWS stop adding rows past this size (default 200000)
 """
 
 import os
+import threading
 import time
 from typing import List, Union, Optional, Tuple, Dict, Any
 import numpy as np
@@ -11,6 +23,16 @@ from sentence_transformers import SentenceTransformer
 import chromadb
 from chromadb.utils.embedding_functions import EmbeddingFunction
 
+from .embedding_cache import EmbeddingCache
+
+EMBEDDING_CACHE_ENABLED = os.getenv("RISK_GATE_EMBEDDING_CACHE", "true").strip().lower() not in ("0", "false", "no")
+EMBEDDING_CACHE_DIR = os.getenv("RISK_GATE_EMBEDDING_CACHE_DIR", "")
+EMBEDDING_CACHE_MAX_ROWS = int(os.getenv("RISK_GATE_EMBEDDING_CACHE_MAX_ROWS", "200000"))
+
+# Process-wide model registry: (model_name, device) -> SentenceTransformer
+_models: Dict[Tuple[str, str], SentenceTransformer] = {}
+_models_lock = threading.Lock()
+
 
 class MiniLMEmbedder:
     """Hugging Face MiniLM embedding model for risk gate documents"""
@@ -34,30 +56,87 @@ class MiniLMEmbedder:
         # Ensure cache directory exists
         os.makedirs(self.cache_dir, exist_ok=True)
         
-        # Initialize model
+        # Initialize model (shared with other embedders for the same model/device)
         self.model = self._load_model()
         
         # Model info
         self.max_seq_length = self.model.max_seq_length
         self.embedding_dimension = self.model.get_sentence_embedding_dimension()
         
-        print(f"Loaded MiniLM model: {model_name}")
-        print(f"Embedding dimension: {self.embedding_dimension}")
-        print(f"Max sequence length: {self.max_seq_length}")
+        self.cache = self._open_cache()
     
     def _load_model(self) -> SentenceTransformer:
-        """Load the sentence transformer model"""
+        """Load the sentence transformer model, or reuse the one already loaded in this process"""
+        key = (self.model_name, self.device)
+        with _models_lock:
+            model = _models.get(key)
+            if model is not None:
+                return model
+            try:
+                model = SentenceTransformer(
+                    self.model_name,
+                    device=self.device,
+                    cache_folder=self.cache_dir
+                )
+            except Exception as e:
+                error_msg = f"Failed to load model {self.model_name}: {str(e)}"
+                print(error_msg)
+                raise RuntimeError(error_msg)
+            _models[key] = model
+        
+        print(f"Loaded MiniLM model: {self.model_name}")
+        print(f"Embedding dimension: {model.get_sentence_embedding_dimension()}")
+        print(f"Max sequence length: {model.max_seq_length}")
+        return model
+    
+    def _open_cache(self) -> Optional[EmbeddingCache]:
+        """Open the persistent embedding cache (None when disabled or unavailable)"""
+        if not EMBEDDING_CACHE_ENABLED:
+            return None
         try:
-            model = SentenceTransformer(
+            return EmbeddingCache(
+                EMBEDDING_CACHE_DIR or os.path.join(self.cache_dir, "embeddings"),
                 self.model_name,
-                device=self.device,
-                cache_folder=self.cache_dir
+                self.embedding_dimension,
+                max_rows=EMBEDDING_CACHE_MAX_ROWS
             )
-            return model
         except Exception as e:
-            error_msg = f"Failed to load model {self.model_name}: {str(e)}"
-            print(error_msg)
-            raise RuntimeError(error_msg)
+            print(f"Embedding cache unavailable, encoding without it: {str(e)}")
+            return None
+    
+    def _encode(self, texts: List[str], batch_size: int = 32, show_progress: bool = False) -> np.ndarray:
+        """
+        Encode texts, reusing cached embeddings and encoding each missing text once
+        
+        Args:
+            texts: List of texts to embed
+            batch_size: Batch size for the texts that have to be encoded
+            show_progress: Whether to show progress bar
+            
+        Returns:
+            float32 matrix with one row per input text
+        """
+        if not texts:
+            return np.zeros((0, self.embedding_dimension), dtype=np.float32)
+        cached = self.cache.get_many(texts) if self.cache is not None else [None] * len(texts)
+        
+        missing = list(dict.fromkeys(t for t, vec in zip(texts, cached) if vec is None))
+        encoded: Dict[str, np.ndarray] = {}
+        if missing:
+            vectors = self.model.encode(
+                missing,
+                batch_size=batch_size,
+                show_progress_bar=show_progress,
+                convert_to_numpy=True
+            ).astype(np.float32, copy=False)
+            encoded = dict(zip(missing, vectors))
+            if self.cache is not None:
+                try:
+                    self.cache.put_many(missing, vectors)
+                except Exception as e:
+                    print(f"Embedding cache write failed: {str(e)}")
+        
+        return np.stack([vec if vec is not None else encoded[t] for t, vec in zip(texts, cached)])
     
     def embed(self, texts: Union[str, List[str]]) -> Union[np.ndarray, List[np.ndarray]]:
         """
@@ -72,12 +151,10 @@ class MiniLMEmbedder:
         try:
             if isinstance(texts, str):
                 # Single text
-                embedding = self.model.encode(texts, convert_to_numpy=True)
-                return embedding
+                return self._encode([texts])[0]
             else:
                 # List of texts
-                embeddings = self.model.encode(texts, convert_to_numpy=True)
-                return embeddings
+                return self._encode(list(texts))
                 
         except Exception as e:
             error_msg = f"Embedding failed: {str(e)}"
@@ -97,13 +174,8 @@ class MiniLMEmbedder:
             List of embeddings as numpy arrays
         """
         try:
-            embeddings = self.model.encode(
-                texts,
-                batch_size=batch_size,
-                show_progress_bar=show_progress,
-                convert_to_numpy=True
-            )
-            return embeddings.tolist() if isinstance(embeddings, np.ndarray) else embeddings
+            embeddings = self._encode(list(texts), batch_size=batch_size, show_progress=show_progress)
+            return embeddings.tolist()
             
         except Exception as e:
             error_msg = f"Batch embedding failed: {str(e)}"
@@ -205,7 +277,8 @@ class MiniLMEmbedder:
             "embedding_dimension": self.embedding_dimension,
             "max_seq_length": self.max_seq_length,
             "device": self.device,
-            "cache_dir": self.cache_dir
+            "cache_dir": self.cache_dir,
+            "embedding_cache": self.cache.stats() if self.cache is not None else None
         }
 
 
@@ -243,15 +316,20 @@ class ChromaEmbeddingFunction(EmbeddingFunction):
             return [[0.0] * self.embedder.get_embedding_dimension() for _ in input]
 
 
-# Global embedder instance
-_embedder_instance = None
+# Global embedder instances, one per model name
+_embedder_instances: Dict[str, MiniLMEmbedder] = {}
+_embedder_lock = threading.Lock()
 
 def get_embedder(model_name: str = "sentence-transformers/all-MiniLM-L6-v2") -> MiniLMEmbedder:
-    """Get or create global embedder instance"""
-    global _embedder_instance
-    if _embedder_instance is None:
-        _embedder_instance = MiniLMEmbedder(model_name=model_name)
-    return _embedder_instance
+    """Get or create the shared embedder for a model"""
+    embedder = _embedder_instances.get(model_name)
+    if embedder is None:
+        with _embedder_lock:
+            embedder = _embedder_instances.get(model_name)
+            if embedder is None:
+                embedder = MiniLMEmbedder(model_name=model_name)
+                _embedder_instances[model_name] = embedder
+    return embedder
 
 # Convenience functions
 def embed_texts(texts: Union[str, List[str]]) -> Union[np.ndarray, List[np.ndarray]]:
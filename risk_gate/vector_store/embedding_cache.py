@@ -0,0 +1,206 @@
+"""
+Persistent Embedding Cache for Risk Gate Vector Store
+Memory-mapped float32 matrix of embeddings keyed by (model, text hash)
+
+Similarity checks re-encode the same template and clause texts on every call.
+Embeddings are deterministic for a given model, so each text is encoded once
+and stored on disk:
+
+  - one pair of files per model in the cache directory:
+    `<model>.f32` holds the vectors as a raw row-major float32 matrix and
+    `<model>.keys` holds one sha256(text) per line, line i naming row i
+  - reads go through `numpy.memmap`, so lookups page in only the rows they
+    touch and the matrix is shared between processes by the OS page cache
+  - appends take an exclusive file lock (where fcntl is available), pick up
+    rows other processes added since the last sync, then write vectors before
+    keys so a key never points at an unwritten row
+  - the matrix is append-only and stops growing at `max_rows`; delete the
+    files to reset it (for example after changing a model's weights)
+"""
+
+import hashlib
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+
+def text_key(text: str) -> str:
+    """Cache key for a text (sha256 of its UTF-8 bytes)"""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def _model_slug(model_name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name).strip("_") or "model"
+
+
+class EmbeddingCache:
+    """Append-only on-disk embedding store for one model"""
+
+    def __init__(self, cache_dir: str, model_name: str, dimension: int, max_rows: int = 200000):
+        """
+        Open (or create) the cache files for a model
+
+        Args:
+            cache_dir: Directory holding the cache files
+            model_name: Embedding model name (part of the cache key)
+            dimension: Embedding dimension of the model
+            max_rows: Rows after which new embeddings are no longer stored
+        """
+        self.model_name = model_name
+        self.dimension = int(dimension)
+        self.max_rows = max_rows
+        os.makedirs(cache_dir, exist_ok=True)
+        slug = _model_slug(model_name)
+        self.vectors_path = os.path.join(cache_dir, f"{slug}.f32")
+        self.keys_path = os.path.join(cache_dir, f"{slug}.keys")
+        self.lock_path = os.path.join(cache_dir, f"{slug}.lock")
+
+        self._lock = threading.RLock()
+        self._rows: Dict[str, int] = {}
+        self._keys_offset = 0
+        self._row_count = 0
+        self._matrix: Optional[np.memmap] = None
+        self.hits = 0
+        self.misses = 0
+
+        with self._lock:
+            self._sync_keys()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _rows_on_disk(self) -> int:
+        try:
+            size = os.path.getsize(self.vectors_path)
+        except OSError:
+            return 0
+        return size // (4 * self.dimension)
+
+    def _sync_keys(self) -> None:
+        """Read key lines appended since the last sync (by this or another process)"""
+        if not os.path.exists(self.keys_path):
+            return
+        with open(self.keys_path, "r", encoding="ascii") as handle:
+            handle.seek(self._keys_offset)
+            chunk = handle.read()
+        # Ignore a trailing partial line; it is re-read once complete.
+        complete = chunk[: chunk.rfind("\n") + 1]
+        limit = self._rows_on_disk()
+        for line in complete.splitlines(keepends=True):
+            if self._row_count >= limit:
+                break
+            self._rows.setdefault(line.strip(), self._row_count)
+            self._row_count += 1
+            self._keys_offset += len(line)
+
+    def _mapped(self, min_rows: int) -> Optional[np.memmap]:
+        """Memory map covering at least `min_rows` rows (remapped when the file has grown)"""
+        if self._matrix is None or self._matrix.shape[0] < min_rows:
+            rows = self._rows_on_disk()
+            if rows == 0:
+                return None
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dimension))
+        return self._matrix
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Cached embeddings for texts
+
+        Args:
+            texts: Texts to look up
+
+        Returns:
+            One float32 vector (a copy) or None per text, in order
+        """
+        with self._lock:
+            keys = [text_key(t) for t in texts]
+            if any(k not in self._rows for k in keys):
+                self._sync_keys()
+            rows = [self._rows.get(k) for k in keys]
+            present = [r for r in rows if r is not None]
+            matrix = self._mapped(max(present) + 1) if present else None
+            out: List[Optional[np.ndarray]] = []
+            for row in rows:
+                if row is None or matrix is None:
+                    out.append(None)
+                    self.misses += 1
+                else:
+                    out.append(np.array(matrix[row], dtype=np.float32))
+                    self.hits += 1
+            return out
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[np.ndarray]) -> int:
+        """
+        Store embeddings for texts not cached yet
+
+        Args:
+            texts: Texts that were encoded
+            vectors: Their embeddings, same order
+
+        Returns:
+            Number of rows appended
+        """
+        with self._lock, self._file_lock():
+            self._sync_keys()
+            new_keys: List[str] = []
+            new_vectors: List[np.ndarray] = []
+            for text, vector in zip(texts, vectors):
+                key = text_key(text)
+                if key in self._rows or key in new_keys:
+                    continue
+                if self._row_count + len(new_keys) >= self.max_rows:
+                    break
+                vec = np.asarray(vector, dtype=np.float32).reshape(-1)
+                if vec.shape[0] != self.dimension:
+                    raise ValueError(f"Expected {self.dimension}-d embedding, got {vec.shape[0]}")
+                new_keys.append(key)
+                new_vectors.append(vec)
+            if not new_keys:
+                return 0
+
+            # Drop any rows or partial key line left by a writer that died mid-append.
+            start = self._row_count
+            with open(self.vectors_path, "ab") as handle:
+                handle.truncate(start * 4 * self.dimension)
+                handle.write(np.stack(new_vectors).astype(np.float32, copy=False).tobytes())
+                handle.flush()
+                os.fsync(handle.fileno())
+            with open(self.keys_path, "a", encoding="ascii") as handle:
+                handle.truncate(self._keys_offset)
+                handle.write("".join(k + "\n" for k in new_keys))
+            self._sync_keys()
+            return len(new_keys)
+
+    def stats(self) -> Dict[str, object]:
+        """Cache size and hit/miss counters for this process"""
+        with self._lock:
+            return {
+                "model_name": self.model_name,
+                "rows": len(self._rows),
+                "max_rows": self.max_rows,
+                "hits": self.hits,
+                "misses": self.misses,
+                "path": self.vectors_path,
+            }